@@ -0,0 +1,72 @@
+"""Compare the aggregation of hourly series to daily and monthly values by pandas resample and by the extension
+(hydrogr.aggregation), and a GR4H run followed by a resample of the flow with a run aggregating the flow in the
+kernel.
+
+Usage:
+    python benchmarks/aggregation.py [n_repeats]
+"""
+
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from hydrogr import ModelGr4h
+from hydrogr.aggregation import aggregate
+
+DATA = Path(__file__).resolve().parent.parent / "data" / "L0123003.pkl"
+PARAMETERS = {"X1": 521.113, "X2": -2.918, "X3": 218.009, "X4": 4.124}
+
+
+def timed(function, n_repeats):
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        result = function()
+    return (time.perf_counter() - start) / n_repeats, result
+
+
+if __name__ == "__main__":
+    n_repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    data = pd.read_pickle(DATA)
+    data.columns = [
+        "date",
+        "precipitation",
+        "temperature",
+        "evapotranspiration",
+        "flow",
+        "flow_mm",
+    ]
+    data.index = pd.DatetimeIndex(data["date"])
+    # Missing values make their period missing, where pandas skips them : series without gaps are compared
+    inputs = (
+        data[["precipitation", "evapotranspiration", "flow_mm"]].interpolate().bfill()
+    )
+    how = {"precipitation": "sum", "evapotranspiration": "sum", "flow_mm": "mean"}
+    arrays = {name: inputs[name].values for name in inputs}
+
+    for frequency in ("D", "MS"):
+        resample, expected = timed(
+            lambda: inputs.resample(frequency).agg(how), n_repeats
+        )
+        extension, (values, labels) = timed(
+            lambda: aggregate(arrays, inputs.index, frequency, how, complete=False),
+            n_repeats,
+        )
+        same = all(
+            np.allclose(values[name], expected[name], rtol=1e-12) for name in how
+        )
+        print(
+            f"forcing to {frequency:2s} : resample {1e3 * resample:8.3f} ms, extension {1e3 * extension:8.3f} ms "
+            f"(x{resample / extension:5.1f}), same values : {same}"
+        )
+
+    model = ModelGr4h(PARAMETERS)
+    resample, expected = timed(
+        lambda: model.run(inputs)["flow"].resample("D").sum(), n_repeats
+    )
+    fused, daily = timed(lambda: model.run(inputs, aggregation="D"), n_repeats)
+    same = np.allclose(daily["flow"], expected.loc[daily.index], rtol=1e-12)
+    print(
+        f"GR4H daily flow : run + resample {1e3 * resample:8.3f} ms, aggregated run {1e3 * fused:8.3f} ms "
+        f"(x{resample / fused:5.1f}), same values : {same}"
+    )
@@ -0,0 +1,31 @@
+"""Compare the run time of the reference and fast precision kernels.
+
+Usage:
+    python benchmarks/fast_math.py [repeat]
+"""
+import sys
+import timeit
+from pathlib import Path
+import numpy as np
+from pandas import read_csv
+from hydrogr import ModelGr4j, ModelGr6j
+
+DATA = Path(__file__).resolve().parent.parent / "data" / "L0123001.csv"
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    data = read_csv(DATA)
+    inputs = {
+        "precipitation": np.tile(data["P"].values.astype(float), 10),
+        "evapotranspiration": np.tile(data["E"].values.astype(float), 10),
+    }
+    cases = {
+        ModelGr4j: {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208},
+        ModelGr6j: {"X1": 242.257, "X2": 0.637, "X3": 53.517, "X4": 2.218, "X5": 0.424, "X6": 4.759},
+    }
+    for Model, parameters in cases.items():
+        for precision in Model.precisions:
+            model = Model(dict(parameters), precision=precision)
+            timing = min(timeit.repeat(lambda: model.run_arrays(inputs), number=1, repeat=repeat))
+            steps = len(inputs["precipitation"])
+            print(f"{Model.name} {precision:10s} {1000 * timing:8.2f} ms {steps / timing / 1e6:8.2f} Msteps/s")
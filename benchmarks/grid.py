@@ -0,0 +1,46 @@
+"""Run GR4J over a synthetic (time, y, x) grid stored in .npy files, and report the throughput in cell steps per second.
+
+Usage:
+    python benchmarks/grid.py [n_years] [ny] [nx]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from hydrogr import ModelGr4j
+from hydrogr.grid import create_grid, open_grid, run_grid
+
+if __name__ == "__main__":
+    n_years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    ny = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    nx = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    shape = (365 * n_years, ny, nx)
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        for name, scale in [("precipitation", 3.0), ("evapotranspiration", 1.5)]:
+            grid = create_grid(folder / f"{name}.npy", shape, fill_value=None)
+            for t in range(0, shape[0], 365):
+                grid[t : t + 365] = rng.exponential(scale, (min(365, shape[0] - t), ny, nx))
+            grid.flush()
+            del grid
+
+        parameters = {
+            "X1": rng.uniform(100.0, 500.0, (ny, nx)),
+            "X2": rng.uniform(-2.0, 2.0, (ny, nx)),
+            "X3": rng.uniform(20.0, 200.0, (ny, nx)),
+            "X4": rng.uniform(1.0, 4.0, (ny, nx)),
+        }
+        start = time.perf_counter()
+        run_grid(
+            ModelGr4j,
+            parameters,
+            open_grid(folder / "precipitation.npy"),
+            open_grid(folder / "evapotranspiration.npy"),
+            out=folder / "flow.npy",
+        )
+        timing = time.perf_counter() - start
+        cell_steps = shape[0] * ny * nx
+        print(f"{shape} {timing:8.2f} s {cell_steps / timing / 1e6:8.2f} Mcell-steps/s")
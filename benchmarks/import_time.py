@@ -0,0 +1,30 @@
+"""Measure the import time of hydrogr, with and without pandas.
+
+Usage:
+    python benchmarks/import_time.py [repeat]
+"""
+import subprocess
+import sys
+import time
+
+
+def measure(code: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cases = {
+        "python": "pass",
+        "import hydrogr": "import hydrogr",
+        "hydrogr.ModelGr4j": "import hydrogr; hydrogr.ModelGr4j",
+        "hydrogr.InputDataHandler (pandas)": "import hydrogr; hydrogr.InputDataHandler",
+    }
+    baseline = measure(cases.pop("python"), repeat)
+    for name, code in cases.items():
+        print(f"{name:40s} {1000 * (measure(code, repeat) - baseline):8.1f} ms")
@@ -0,0 +1,59 @@
+"""Time the GR4J, GR4H, GR5J and GR6J kernels in both precisions, and compare against a saved baseline.
+
+Run it on a build to record its timings, then on another build to check that no kernel got slower:
+
+Usage:
+    python benchmarks/kernels.py [--save baseline.json] [--baseline baseline.json] [--repeat 20] [--tolerance 0.05]
+"""
+import argparse
+import json
+import timeit
+from pathlib import Path
+import numpy as np
+from pandas import read_csv
+from hydrogr import ModelGr4h, ModelGr4j, ModelGr5j, ModelGr6j
+
+DATA = Path(__file__).resolve().parent.parent / "data" / "L0123001.csv"
+
+CASES = {
+    ModelGr4j: {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208},
+    ModelGr4h: {"X1": 350.0, "X2": -0.5, "X3": 90.0, "X4": 7.3},
+    ModelGr5j: {"X1": 245.918, "X2": 1.027, "X3": 90.017, "X4": 2.198, "X5": 0.434},
+    ModelGr6j: {"X1": 242.257, "X2": 0.637, "X3": 53.517, "X4": 2.218, "X5": 0.424, "X6": 4.759},
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", help="JSON file where the timings are written")
+    parser.add_argument("--baseline", help="JSON file of the timings of a previous build")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    data = read_csv(DATA)
+    inputs = {
+        "precipitation": np.tile(data["P"].values.astype(float), 10),
+        "evapotranspiration": np.tile(data["E"].values.astype(float), 10),
+    }
+    steps = len(inputs["precipitation"])
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else {}
+    timings = {}
+    slower = []
+    for Model, parameters in CASES.items():
+        for precision in Model.precisions:
+            model = Model(dict(parameters), precision=precision)
+            timing = min(timeit.repeat(lambda: model.run_arrays(inputs), number=1, repeat=args.repeat))
+            key = f"{Model.name} {precision}"
+            timings[key] = 1e9 * timing / steps
+            line = f"{Model.name} {precision:10s} {timings[key]:8.2f} ns/step"
+            if key in baseline:
+                ratio = timings[key] / baseline[key]
+                line += f" {ratio:6.3f} x baseline"
+                if ratio > 1.0 + args.tolerance:
+                    slower.append(key)
+            print(line)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(timings, indent=2))
+    if slower:
+        raise SystemExit("Slower than the baseline : {}".format(", ".join(slower)))
@@ -0,0 +1,71 @@
+"""Compare evaluations of GR4J parameter sets on NSE with and without pruning, and report the run time and the
+fraction of time steps simulated : screening of random parameter sets against fixed thresholds, and NSGA-II
+calibrations (children pruned against the worst member of the population).
+
+Usage:
+    python benchmarks/pruning.py [population_size] [n_generations]
+"""
+
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from pandas import read_csv
+from hydrogr import ModelGr4j, profiling
+from hydrogr.batch import evaluate_batch
+from hydrogr.calibration import bounds_array, nsga2
+
+DATA = Path(__file__).resolve().parent.parent / "data" / "L0123001.csv"
+
+if __name__ == "__main__":
+    population_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n_generations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    data = read_csv(DATA)
+    inputs = {
+        "precipitation": data["P"].values.astype(float),
+        "evapotranspiration": data["E"].values.astype(float),
+        "flow_mm": data["Qmm"].values.astype(float),
+    }
+    n_steps = len(inputs["precipitation"])
+    lower, upper = bounds_array(ModelGr4j).T
+    candidates = lower + np.random.default_rng(0).random((2000, 4)) * (upper - lower)
+    for threshold in (None, 0.5, 0.8):
+        start = time.perf_counter()
+        _, pruned, steps = evaluate_batch(
+            ModelGr4j,
+            candidates,
+            inputs["precipitation"],
+            inputs["evapotranspiration"],
+            inputs["flow_mm"],
+            ["nse"],
+            warmup=365,
+            threshold=threshold,
+            return_pruning=True,
+        )
+        timing = time.perf_counter() - start
+        print(
+            f"screening threshold={threshold!s:4s} {timing:8.3f} s {100 * pruned.mean():6.1f} % pruned "
+            f"{100 * steps.sum() / (len(candidates) * n_steps):6.1f} % of the time steps simulated"
+        )
+
+    total = (n_generations + 1) * population_size * len(inputs["precipitation"])
+    results = {}
+    for prune in (False, True):
+        with profiling.profile() as profiler:
+            start = time.perf_counter()
+            results[prune] = nsga2(
+                ModelGr4j,
+                inputs,
+                "flow_mm",
+                objectives=("nse",),
+                population_size=population_size,
+                n_generations=n_generations,
+                warmup=365,
+                seed=0,
+                prune=prune,
+            )
+            timing = time.perf_counter() - start
+        steps = profiler.as_dict()["phases"]["gr4j"]["kernel"]["steps"]
+        print(f"nsga2 prune={prune!s:5s} {timing:8.3f} s {100 * steps / total:6.1f} % of the time steps simulated")
+    same = all(np.array_equal(a, b) for a, b in zip(results[False], results[True]))
+    print(f"Same Pareto front : {same}")
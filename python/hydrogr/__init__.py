@@ -1,20 +1,38 @@
 __version__ = "1.2.1"
 
-from hydrogr.input_data import InputDataHandler
-from hydrogr.gr1a import ModelGr1a
-from hydrogr.gr2m import ModelGr2m
-from hydrogr.gr4j import ModelGr4j
-from hydrogr.gr5j import ModelGr5j
-from hydrogr.gr6j import ModelGr6j
-from hydrogr.gr4h import ModelGr4h
+import importlib
+
+# Models and input handler are imported on first access, so that "import hydrogr" stays cheap and does not import
+# pandas, which is only required by the InputDataHandler and the dataframe outputs.
+_lazy_attributes = {
+    "InputDataHandler": "hydrogr.input_data",
+    "ModelGr1a": "hydrogr.gr1a",
+    "ModelGr2m": "hydrogr.gr2m",
+    "ModelGr4j": "hydrogr.gr4j",
+    "ModelGr5j": "hydrogr.gr5j",
+    "ModelGr6j": "hydrogr.gr6j",
+    "ModelGr4h": "hydrogr.gr4h",
+}
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
 
 
 __all__ = [
-    InputDataHandler,
-    ModelGr1a,
-    ModelGr2m,
-    ModelGr4j,
-    ModelGr5j,
-    ModelGr6j,
-    ModelGr4h,
-]
\ No newline at end of file
+    "InputDataHandler",
+    "ModelGr1a",
+    "ModelGr2m",
+    "ModelGr4j",
+    "ModelGr5j",
+    "ModelGr6j",
+    "ModelGr4h",
+]
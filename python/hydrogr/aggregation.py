@@ -0,0 +1,160 @@
+from typing import Any, Dict, Mapping, Tuple, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr._hydrogr import aggregate as _aggregate
+
+"""
+Aggregation of time series to a coarser frequency (hourly to daily, daily to monthly or yearly...), computed by the
+Rust extension in a single pass over each series, instead of a pandas resample. The periods are calendar periods
+labelled by their start : hours, days, months or years. They are found once from the timestamps (bounds of the
+periods over the time steps) and shared by all the series of the same index.
+
+The kernels of the daily and hourly models aggregate the flow as it is computed, see ModelGrInterface.run(), and
+InputDataHandler.aggregated() aggregates the forcing to the frequency of a model.
+
+Example:
+
+    >>> from hydrogr.aggregation import aggregate
+    >>> daily, days = aggregate({"precipitation": hourly_p, "temperature": hourly_t}, index, "D",
+    ...                         how={"precipitation": "sum", "temperature": "mean"})
+"""
+
+REDUCTIONS = ["sum", "mean"]
+
+# Unit of the datetime64 periods of the frequency aliases of the models (see ModelGrInterface.frequency)
+_UNITS = {
+    "H": "h",
+    "h": "h",
+    "D": "D",
+    "B": "D",
+    "C": "D",
+    "M": "M",
+    "MS": "M",
+    "SM": "M",
+    "SMS": "M",
+    "BM": "M",
+    "BMS": "M",
+    "CBM": "M",
+    "CBMS": "M",
+    "ME": "M",
+    "A": "Y",
+    "Y": "Y",
+    "AS": "Y",
+    "YS": "Y",
+    "BA": "Y",
+    "BY": "Y",
+    "BAS": "Y",
+    "BYS": "Y",
+    "YE": "Y",
+}
+
+
+def frequency_unit(frequency: Union[str, Any]) -> str:
+    """Return the datetime64 unit of the periods of a frequency.
+
+    Args:
+        frequency (Union[str, Any]): Frequency alias ("h", "D", "MS", "YS"...), or a model class whose first
+            declared frequency is used.
+
+    Returns:
+        str: "h", "D", "M" or "Y".
+    """
+    if not isinstance(frequency, str):
+        frequency = frequency.frequency[0]
+    # Annual aliases may carry the month (A-DEC)
+    unit = _UNITS.get(frequency.split("-")[0])
+    if unit is None:
+        raise ValueError(
+            "Unknown aggregation frequency {}, should be one of : {}".format(
+                frequency, list(_UNITS)
+            )
+        )
+    return unit
+
+
+def periods(
+    index: Any, frequency: Union[str, Any], complete: bool = True
+) -> Tuple[ndarray, ndarray]:
+    """Return the periods of a frequency covered by sorted timestamps.
+
+    Args:
+        index (Any): Timestamps of the time steps (datetime index or datetime64 array), sorted.
+        frequency (Union[str, Any]): Frequency of the periods, see frequency_unit().
+        complete (bool): If True (default), the first and last periods are dropped when the timestamps do not cover
+            them entirely (a series starting or ending within a month for example).
+
+    Returns:
+        Tuple[ndarray, ndarray]: Bounds of the periods over the time steps (int64, period k covering the time steps
+            bounds[k]:bounds[k + 1]) and start of each period (datetime64[ns]).
+    """
+    unit = frequency_unit(frequency)
+    dates = np.asarray(index, dtype="datetime64[ns]")
+    if dates.size == 0:
+        raise ValueError("Aggregation requires at least one time step")
+    if (np.diff(dates) <= np.timedelta64(0, "ns")).any():
+        raise ValueError("Timestamps should be sorted and unique for aggregation")
+    keys = dates.astype("datetime64[{}]".format(unit))
+    starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    bounds = np.concatenate([[0], starts, [dates.size]]).astype(np.int64)
+    labels = keys[bounds[:-1]].astype("datetime64[ns]")
+
+    if complete:
+        first, last = 0, labels.size
+        # The first period starts before the first time step
+        if dates[0] != labels[0]:
+            first = 1
+        # The time step following the last one (median time step) is still in the last period
+        if dates.size > 1:
+            step = np.timedelta64(int(np.median(np.diff(dates).astype(np.int64))), "ns")
+            if (dates[-1] + step).astype(keys.dtype) == keys[-1]:
+                last -= 1
+        if first >= last:
+            raise ValueError(
+                "The timestamps do not cover any complete period of frequency {}".format(
+                    frequency
+                )
+            )
+        bounds = bounds[first : last + 1]
+        labels = labels[first:last]
+    return bounds, labels
+
+
+def aggregate(
+    values: Mapping[str, ndarray],
+    index: Any,
+    frequency: Union[str, Any],
+    how: Union[str, Mapping[str, str]] = "sum",
+    complete: bool = True,
+) -> Tuple[Dict[str, ndarray], ndarray]:
+    """Aggregate time series over the periods of a coarser frequency, in a single call of the extension. A missing
+    value (NaN) makes its period missing.
+
+    Args:
+        values (Mapping[str, ndarray]): Time series by name, 1D arrays of the length of the index.
+        index (Any): Timestamps of the time steps, see periods().
+        frequency (Union[str, Any]): Frequency of the periods, see frequency_unit().
+        how (Union[str, Mapping[str, str]]): Reduction, "sum" (default) or "mean", for all the series or by name.
+        complete (bool): Drop the incomplete first and last periods, see periods().
+
+    Returns:
+        Tuple[Dict[str, ndarray], ndarray]: Aggregated time series by name, and start of each period.
+    """
+    names = list(values)
+    reductions = [how if isinstance(how, str) else how[name] for name in names]
+    for reduction in reductions:
+        if reduction not in REDUCTIONS:
+            raise ValueError(
+                "Unknown reduction {}, should be one of : {}".format(
+                    reduction, REDUCTIONS
+                )
+            )
+    bounds, labels = periods(index, frequency, complete)
+    series = np.array([values[name] for name in names], dtype=float, ndmin=2)
+    if series.shape[1] != len(index):
+        raise ValueError(
+            "Time series should have one value per timestamp ({}), got {}".format(
+                len(index), series.shape[1]
+            )
+        )
+    aggregated = _aggregate(series, bounds, reductions)
+    return {name: aggregated[i] for i, name in enumerate(names)}, labels
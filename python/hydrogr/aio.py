@@ -0,0 +1,245 @@
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+import asyncio
+import concurrent.futures
+import functools
+import os
+import threading
+import numpy as np
+from numpy import ndarray
+
+"""
+Awaitable model runs for asyncio applications. The runs (validation, simulation and output build) are handed to a
+pool of worker threads, so that the event loop is not blocked : the kernels release the GIL while stepping, and the
+Python phases only hold it by short slices.
+
+The pool bounds the number of runs submitted and not finished (back-pressure) : beyond max_pending, callers wait
+before their run is queued. A cancelled call is removed from the queue if it did not start yet ; a kernel that
+already started runs to completion, its result being discarded, and keeps its slot until then, so that the limit
+always reflects the work actually in the pool.
+
+Example:
+
+    >>> from hydrogr.aio import WorkerPool
+    >>> pool = WorkerPool(max_workers=8, max_pending=64)
+    >>> results = await model.arun(inputs, pool=pool)
+    >>> flow, states = await arun_batch(ModelGr4j, parameters, precipitation, evapotranspiration, pool=pool)
+"""
+
+
+class WorkerPool(object):
+    """Pool of worker threads with a bound on the calls submitted and not finished.
+
+    Args:
+        max_workers (int, optional): Number of worker threads, HYDROGR_NUM_THREADS or the number of cores by
+            default.
+        max_pending (int, optional): Maximum number of calls queued or running, 4 * max_workers by default.
+
+    Methods:
+        submit(function, *args, **kwargs):
+            Run a function in the pool and return its result (coroutine).
+        shutdown(wait):
+            Stop the worker threads.
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, max_pending: Optional[int] = None
+    ):
+        if max_workers is None:
+            max_workers = int(
+                os.environ.get("HYDROGR_NUM_THREADS", 0) or os.cpu_count() or 1
+            )
+        if max_pending is None:
+            max_pending = 4 * max_workers
+        if max_workers < 1 or max_pending < 1:
+            raise ValueError(
+                "Pool sizes should be positive, got max_workers={}, max_pending={}".format(
+                    max_workers, max_pending
+                )
+            )
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hydrogr"
+        )
+        # Slots are counted under a lock, as they are released from the worker threads, and the waiting callers of
+        # each event loop are woken up through their loop.
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._waiters = []
+
+    @property
+    def pending(self) -> int:
+        """Number of calls queued or running."""
+        return self._pending
+
+    async def _acquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._pending < self.max_pending:
+                    self._pending += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+                raise
+
+    def _release(self, _future: Any = None):
+        with self._lock:
+            self._pending -= 1
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    async def submit(self, function: Callable, *args, **kwargs) -> Any:
+        """Run a function in the pool and return its result, waiting first for a free slot if max_pending calls are
+        queued or running.
+
+        Args:
+            function (Callable): Function to run in a worker thread.
+            args, kwargs: Arguments of the function.
+
+        Returns:
+            Any: Result of the function.
+        """
+        await self._acquire()
+        try:
+            future = self._executor.submit(function, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is released when the call finishes, or when it is cancelled before starting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads, after the running calls if wait is True. Queued calls are cancelled."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool() -> WorkerPool:
+    """Return the pool used when none is given, created on first use with the default sizes."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WorkerPool()
+        return _default_pool
+
+
+async def arun(
+    model, inputs: Any, output: str = "pandas", pool: Optional[WorkerPool] = None
+) -> Any:
+    """Awaitable counterpart of model.run(), executed in a worker pool.
+
+    The model states are updated as by run() : the same model instance should not be run concurrently.
+
+    Args:
+        model (ModelGrInterface): Model instance.
+        inputs (Any): Input data, see ModelGrInterface.run().
+        output (str): Format of the results, see ModelGrInterface.run().
+        pool (WorkerPool, optional): Worker pool, default_pool() by default.
+
+    Returns:
+        Any: Results of the simulation.
+    """
+    pool = default_pool() if pool is None else pool
+    return await pool.submit(model.run, inputs, output)
+
+
+async def arun_batch(
+    Model,
+    parameters: Union[Mapping[str, Any], ndarray],
+    precipitation: ndarray,
+    evapotranspiration: ndarray,
+    states: Optional[Mapping[str, Any]] = None,
+    precision: str = "reference",
+    pool: Optional[WorkerPool] = None,
+    chunk_size: Optional[int] = None,
+) -> Tuple[ndarray, Dict[str, ndarray]]:
+    """Awaitable counterpart of batch.run_batch(), executed in a worker pool.
+
+    With chunk_size, the members are split in chunks submitted separately, so that a large batch shares the pool
+    with the other requests and can be cancelled between chunks.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        parameters, precipitation, evapotranspiration, states, precision: See batch.run_batch().
+        pool (WorkerPool, optional): Worker pool, default_pool() by default.
+        chunk_size (int, optional): Number of members per submitted chunk, all the members in one call by default.
+
+    Returns:
+        Tuple[ndarray, Dict[str, ndarray]]: (n, n_steps) flow and final states of the members.
+    """
+    from hydrogr.batch import _check_model, _member_states, parameters_array, run_batch
+
+    pool = default_pool() if pool is None else pool
+    precipitation = np.asarray(precipitation, dtype=float)
+    evapotranspiration = np.asarray(evapotranspiration, dtype=float)
+    n = precipitation.shape[0] if precipitation.ndim == 2 else None
+    parameters = parameters_array(Model, parameters, n)
+    if chunk_size is None or n is None or chunk_size >= n:
+        return await pool.submit(
+            run_batch,
+            Model,
+            parameters,
+            precipitation,
+            evapotranspiration,
+            states,
+            precision,
+        )
+    if chunk_size < 1:
+        raise ValueError("Chunk size should be positive, got {}".format(chunk_size))
+    _check_model(Model, precision)
+
+    # States of all the members, scalars and shared unit hydrographs broadcast, so that each chunk takes its rows
+    member_states = None if states is None else _member_states(Model, n, states)
+
+    def chunk_states(start: int, end: int) -> Optional[Dict[str, Any]]:
+        if member_states is None:
+            return None
+        return {name: value[start:end] for name, value in member_states.items()}
+
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    tasks = [
+        asyncio.ensure_future(
+            pool.submit(
+                functools.partial(
+                    run_batch,
+                    Model,
+                    parameters[start:end],
+                    precipitation[start:end],
+                    evapotranspiration[start:end],
+                    chunk_states(start, end),
+                    precision,
+                )
+            )
+        )
+        for start, end in bounds
+    ]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    flow = np.concatenate([result[0] for result in results])
+    final_states = {
+        name: np.concatenate([result[1][name] for result in results])
+        for name in results[0][1]
+    }
+    return flow, final_states
@@ -0,0 +1,590 @@
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+import warnings
+import numpy as np
+from numpy import ndarray
+from hydrogr import profiling
+from hydrogr._hydrogr import run_batch as _run_batch
+from hydrogr._hydrogr import evaluate as _evaluate
+from hydrogr._hydrogr import evaluate_batch as _evaluate_batch
+from hydrogr._hydrogr import summarise_batch as _summarise_batch
+from hydrogr._hydrogr import spin_up as _spin_up
+from hydrogr.streaming import QuantisedArray
+
+"""
+Batched simulation of n members (catchments, grid cells, parameter sets) of the same model in a single kernel call.
+The members are simulated in parallel by the Rust kernel, with the GIL released. The number of threads is given by the
+HYDROGR_NUM_THREADS environment variable (all available cores by default).
+
+Only the models that define the batch class attributes (parameters_thresholds, stores, uh_lengths) are supported :
+GR4J, GR5J, GR6J and GR4H.
+"""
+
+# Criteria computed by evaluate_batch() :
+#   nse : Nash-Sutcliffe efficiency,
+#   nse_log : Nash-Sutcliffe efficiency on log(flow + mean observed flow / 100),
+#   kge : Kling-Gupta efficiency (2009),
+#   bias : relative volume error, sum(simulated) / sum(observed) - 1,
+#   rmse : root mean square error [mm].
+CRITERIA = ["nse", "nse_log", "kge", "bias", "rmse"]
+
+# Criteria that can be used to prune simulations in evaluate_batch(), computed from sums of squared errors
+PRUNABLE_CRITERIA = ["nse", "nse_log", "rmse"]
+
+# Output types of summarise_batch() : NumPy float types, or "quantised" (16 bits codes, see QuantisedArray)
+SUMMARY_DTYPES = ["float64", "float32", "float16", "quantised"]
+
+
+def _check_model(Model, precision: str = "reference"):
+    for attribute in ["parameters_thresholds", "stores", "uh_lengths"]:
+        if not hasattr(Model, attribute):
+            raise ValueError(
+                "Batch runs are not available for model {}".format(Model.name)
+            )
+    if precision not in Model.precisions:
+        raise ValueError(
+            "Precision {} not available for {}, should be one of : {}".format(
+                precision, Model.name, Model.precisions
+            )
+        )
+
+
+def parameters_array(
+    Model, parameters: Union[Mapping[str, Any], ndarray], n: Optional[int] = None
+) -> ndarray:
+    """Return the parameters of n members as a (n, n_parameters) array, with values under the model thresholds
+    replaced by the thresholds.
+
+    Args:
+        Model (ModelGrInterface): Model class.
+        parameters (Union[Mapping[str, Any], ndarray]): Values by parameter name (scalars or arrays of length n), or
+            (n, n_parameters) array in the order of Model.parameters_names.
+        n (int, optional): Number of members, required if all the parameters are scalars.
+
+    Returns:
+        ndarray: Parameters, one row per member.
+    """
+    _check_model(Model)
+    if isinstance(parameters, Mapping):
+        for parameter_name in Model.parameters_names:
+            if parameter_name not in parameters:
+                raise AttributeError(f"Parameters should have a key : {parameter_name}")
+        columns = [
+            np.asarray(parameters[name], dtype=float) for name in Model.parameters_names
+        ]
+        if n is None:
+            n = max(column.size for column in columns)
+        array = np.empty((n, len(columns)), dtype=float)
+        for i, column in enumerate(columns):
+            array[:, i] = column
+    else:
+        array = np.array(parameters, dtype=float, ndmin=2)
+        if array.shape[1] != len(Model.parameters_names):
+            raise ValueError(
+                "Parameters array should have {} columns ({}), got shape {}".format(
+                    len(Model.parameters_names), Model.parameters_names, array.shape
+                )
+            )
+
+    for name, threshold in Model.parameters_thresholds.items():
+        column = array[:, Model.parameters_names.index(name)]
+        under = column < threshold
+        if under.any():
+            column[under] = threshold
+            warnings.warn(
+                "Parameter {} under threshold {} for {} members. Will replaced by the threshold.".format(
+                    name, threshold, int(under.sum())
+                )
+            )
+    return array
+
+
+def default_states(Model, n: int) -> Dict[str, ndarray]:
+    """Return the default states of n members : stores filling rates [-] and unit hydrographs, one row per member."""
+    _check_model(Model)
+    states = {name: np.full(n, default) for name, (_, default) in Model.stores.items()}
+    states["uh1"] = np.zeros((n, Model.uh_lengths[0]), dtype=float)
+    states["uh2"] = np.zeros((n, Model.uh_lengths[1]), dtype=float)
+    return states
+
+
+def run_batch(
+    Model,
+    parameters: Union[Mapping[str, Any], ndarray],
+    precipitation: ndarray,
+    evapotranspiration: ndarray,
+    states: Optional[Mapping[str, Any]] = None,
+    precision: str = "reference",
+) -> Tuple[ndarray, Dict[str, ndarray]]:
+    """Simulate n members of a model, each with its own parameters, input time series and states.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        parameters (Union[Mapping[str, Any], ndarray]): Parameters of the members, see parameters_array().
+        precipitation (ndarray): (n, n_steps) precipitation [mm].
+        evapotranspiration (ndarray): (n, n_steps) evapotranspiration [mm].
+        states (Mapping[str, Any], optional): Initial states, with the same keys as the model states (stores filling
+            rates [-] as scalars or arrays of length n, unit hydrographs as (n, length) arrays). Missing keys take
+            the default values.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Returns:
+        Tuple[ndarray, Dict[str, ndarray]]: (n, n_steps) flow and final states of the members.
+    """
+    _check_model(Model, precision)
+    precipitation = np.ascontiguousarray(precipitation, dtype=float)
+    evapotranspiration = np.ascontiguousarray(evapotranspiration, dtype=float)
+    if precipitation.ndim != 2 or precipitation.shape != evapotranspiration.shape:
+        raise ValueError(
+            "Input data should be 2D arrays (members, time steps) of the same shape! Shapes : {}, {}".format(
+                precipitation.shape, evapotranspiration.shape
+            )
+        )
+    n = precipitation.shape[0]
+    parameters = parameters_array(Model, parameters, n)
+
+    stores, uh1, uh2 = _member_initial_states(Model, parameters, states)
+
+    stores, uh1, uh2, flow = _run_levels(
+        Model,
+        parameters,
+        precipitation,
+        evapotranspiration,
+        stores,
+        uh1,
+        uh2,
+        precision,
+    )
+
+    return flow, _filling_states(Model, parameters, stores, uh1, uh2)
+
+
+def _filling_states(
+    Model, parameters: ndarray, stores: ndarray, uh1: ndarray, uh2: ndarray
+) -> Dict[str, ndarray]:
+    # States of the members with the stores levels [mm] converted to filling rates [-]
+    states = {
+        name: stores[:, i] / parameters[:, Model.parameters_names.index(capacity)]
+        for i, (name, (capacity, _)) in enumerate(Model.stores.items())
+    }
+    states["uh1"] = uh1
+    states["uh2"] = uh2
+    return states
+
+
+def _year_length(Model) -> int:
+    # Number of time steps of a year for the batch models, hourly (GR4H) or daily
+    return 365 * 24 if "H" in Model.frequency else 365
+
+
+def climatological_year(values: ndarray, period: int = 365) -> ndarray:
+    """Return the mean of a time series at each position of the period (day of the year for a daily series and the
+    default period), over all the periods of the series. NaN values are ignored.
+
+    Args:
+        values (ndarray): (n_steps,) time series, or (n, n_steps) time series of n members.
+        period (int): Number of time steps of the period (365 * 24 for hourly series).
+
+    Returns:
+        ndarray: (period,) or (n, period) climatological period.
+    """
+    values = np.asarray(values, dtype=float)
+    n_steps = values.shape[-1]
+    if n_steps < period:
+        raise ValueError(
+            "The series ({} time steps) should cover at least one period of {} time steps".format(
+                n_steps, period
+            )
+        )
+    n_periods = -(-n_steps // period)
+    padded = np.full(values.shape[:-1] + (n_periods * period,), np.nan)
+    padded[..., :n_steps] = values
+    padded = padded.reshape(values.shape[:-1] + (n_periods, period))
+    with warnings.catch_warnings():
+        # Positions without any value are NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(padded, axis=-2)
+
+
+def spin_up(
+    Model,
+    parameters: Union[Mapping[str, Any], ndarray],
+    precipitation: ndarray,
+    evapotranspiration: ndarray,
+    states: Optional[Mapping[str, Any]] = None,
+    tolerance: float = 1e-3,
+    max_cycles: int = 50,
+    precision: str = "reference",
+) -> Tuple[Dict[str, ndarray], ndarray]:
+    """Return the equilibrium states of n members : the forcing (a climatological year, see climatological_year(),
+    or any repeated period) is simulated in cycles, each cycle starting from the states at the end of the previous
+    one, until the stores converge.
+
+    Starting the simulations from the equilibrium states rather than from the default states removes the need of a
+    warm-up period, discarded from the evaluation. A warning is issued for the members that do not converge.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        parameters (Union[Mapping[str, Any], ndarray]): Parameters of the members, see parameters_array().
+        precipitation (ndarray): (n, n_steps) precipitation [mm] of a cycle, or (n_steps,) shared by all the members.
+        evapotranspiration (ndarray): Evapotranspiration [mm] of a cycle, of the same shape as precipitation.
+        states (Mapping[str, Any], optional): States at the start of the first cycle, see run_batch().
+        tolerance (float): Convergence threshold of the largest change of the stores filling rates over a cycle.
+        max_cycles (int): Maximum number of cycles.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Returns:
+        Tuple[Dict[str, ndarray], ndarray]: Equilibrium states of the members, in the layout of run_batch(), and
+            (n,) number of cycles simulated per member.
+    """
+    _check_model(Model, precision)
+    precipitation = np.ascontiguousarray(np.atleast_2d(precipitation), dtype=float)
+    evapotranspiration = np.ascontiguousarray(
+        np.atleast_2d(evapotranspiration), dtype=float
+    )
+    if precipitation.ndim != 2 or precipitation.shape != evapotranspiration.shape:
+        raise ValueError(
+            "Input data should be arrays of the same shape! Shapes : {}, {}".format(
+                precipitation.shape, evapotranspiration.shape
+            )
+        )
+    parameters = parameters_array(
+        Model,
+        parameters,
+        None if precipitation.shape[0] == 1 else precipitation.shape[0],
+    )
+    stores, uh1, uh2 = _member_initial_states(Model, parameters, states)
+
+    with profiling.phase(Model.name, "spin_up") as phase:
+        stores, uh1, uh2, cycles, changes = _spin_up(
+            Model.name,
+            parameters,
+            precipitation,
+            evapotranspiration,
+            np.ascontiguousarray(stores),
+            np.ascontiguousarray(uh1, dtype=float),
+            np.ascontiguousarray(uh2, dtype=float),
+            tolerance=float(tolerance),
+            max_cycles=int(max_cycles),
+            fast=precision == "fast",
+        )
+        phase.add(steps=int(cycles.sum()) * precipitation.shape[1])
+    not_converged = ~(changes <= tolerance)
+    if not_converged.any():
+        warnings.warn(
+            "{} of {} members did not converge within {} cycles".format(
+                not_converged.sum(), len(not_converged), max_cycles
+            )
+        )
+    return _filling_states(Model, parameters, stores, uh1, uh2), cycles
+
+
+def _member_states(
+    Model, n: int, states: Optional[Mapping[str, Any]] = None
+) -> Dict[str, ndarray]:
+    # States of n members, missing states taking the default values and scalars being broadcast
+    initial_states = default_states(Model, n)
+    if states is not None:
+        for name, value in states.items():
+            if name not in initial_states:
+                raise AttributeError(
+                    "Unknown state {} for model {}".format(name, Model.name)
+                )
+            initial_states[name] = np.broadcast_to(
+                np.asarray(value, dtype=float), initial_states[name].shape
+            )
+    return initial_states
+
+
+def _member_initial_states(
+    Model, parameters: ndarray, states: Optional[Mapping[str, Any]] = None
+) -> Tuple[ndarray, ndarray, ndarray]:
+    # Initial store levels [mm] and unit hydrographs of each member, from the states given as filling rates
+    n = parameters.shape[0]
+    initial_states = _member_states(Model, n, states)
+
+    stores = np.empty((n, len(Model.stores)), dtype=float)
+    for i, (name, (capacity, _)) in enumerate(Model.stores.items()):
+        stores[:, i] = (
+            initial_states[name] * parameters[:, Model.parameters_names.index(capacity)]
+        )
+    return stores, initial_states["uh1"], initial_states["uh2"]
+
+
+def _run_levels(
+    Model,
+    parameters: ndarray,
+    precipitation: ndarray,
+    evapotranspiration: ndarray,
+    stores: ndarray,
+    uh1: ndarray,
+    uh2: ndarray,
+    precision: str,
+) -> Tuple[ndarray, ndarray, ndarray, ndarray]:
+    # Run the batch kernel with the stores given as levels [mm] rather than filling rates, so that the results of a
+    # simulation split in several calls are the same as those of a single call.
+    with profiling.phase(Model.name, "kernel") as phase:
+        stores, uh1, uh2, flow = _run_batch(
+            Model.name,
+            parameters,
+            precipitation,
+            evapotranspiration,
+            stores,
+            np.ascontiguousarray(uh1, dtype=float),
+            np.ascontiguousarray(uh2, dtype=float),
+            fast=precision == "fast",
+        )
+        phase.add(steps=flow.size, bytes_allocated=flow.nbytes)
+    return stores, uh1, uh2, flow
+
+
+def _shared_initial_states(
+    Model, parameters: ndarray, states: Optional[Mapping[str, Any]] = None
+) -> Tuple[ndarray, ndarray, ndarray]:
+    # Initial store levels of each parameter set, and unit hydrographs shared by all the parameter sets
+    initial_states = default_states(Model, 1)
+    if states is not None:
+        initial_states.update(states)
+    levels = np.empty((parameters.shape[0], len(Model.stores)), dtype=float)
+    for i, (name, (capacity, _)) in enumerate(Model.stores.items()):
+        levels[:, i] = (
+            np.asarray(initial_states[name], dtype=float)
+            * parameters[:, Model.parameters_names.index(capacity)]
+        )
+    uh1 = np.ascontiguousarray(initial_states["uh1"], dtype=float).reshape(-1)
+    uh2 = np.ascontiguousarray(initial_states["uh2"], dtype=float).reshape(-1)
+    return levels, uh1, uh2
+
+
+def _check_criteria(criteria) -> list:
+    criteria = list(criteria)
+    for criterion in criteria:
+        if criterion not in CRITERIA:
+            raise ValueError(
+                "Unknown criterion {}, should be one of : {}".format(
+                    criterion, CRITERIA
+                )
+            )
+    return criteria
+
+
+def evaluate(
+    simulated: ndarray,
+    observed: ndarray,
+    criteria=("nse",),
+    warmup: int = 0,
+) -> ndarray:
+    """Evaluate a simulated flow against observed flow, with the criteria of evaluate_batch() computed in the same
+    single pass. Time steps where the observed flow is NaN are ignored.
+
+    Args:
+        simulated (ndarray): Simulated flow time series [mm].
+        observed (ndarray): Observed flow time series [mm], of the same length.
+        criteria (Iterable[str]): Names of the criteria, among CRITERIA.
+        warmup (int): Number of time steps at the beginning of the series excluded from the evaluation.
+
+    Returns:
+        ndarray: (n_criteria,) criteria values.
+    """
+    criteria = _check_criteria(criteria)
+    return _evaluate(
+        np.ascontiguousarray(simulated, dtype=float),
+        np.ascontiguousarray(observed, dtype=float),
+        criteria,
+        warmup=warmup,
+    )
+
+
+def evaluate_batch(
+    Model,
+    parameters: Union[Mapping[str, Any], ndarray],
+    precipitation: ndarray,
+    evapotranspiration: ndarray,
+    observed: ndarray,
+    criteria=("nse",),
+    warmup: int = 0,
+    states: Optional[Mapping[str, Any]] = None,
+    precision: str = "reference",
+    groups: Optional[ndarray] = None,
+    threshold: Optional[float] = None,
+    return_pruning: bool = False,
+) -> Union[ndarray, Tuple[ndarray, ndarray, ndarray]]:
+    """Evaluate n parameter sets of a model against observed flow, on the same input time series.
+
+    The parameter sets are simulated in parallel and all the criteria are computed in the same pass over each
+    simulation, the simulated flows are not stored. Time steps where the observed flow is NaN are ignored.
+    Several observed series (for example the same flow masked on different periods) can be given, each parameter set
+    being evaluated against the series of its group.
+
+    With a threshold (the score of the best or of the worst retained parameter set of a calibration, for example),
+    the simulation of a parameter set stops as soon as its first criterion (nse, nse_log or rmse, computed from sums
+    of squared errors that can only grow) can not reach the threshold anymore. The first criterion of a pruned
+    parameter set is then the bound reached by its partial simulation (higher than its actual NSE, lower than its
+    actual RMSE, but worse than the threshold), its other criteria are NaN. Parameter sets that are not pruned get
+    exactly the values of a full evaluation.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        parameters (Union[Mapping[str, Any], ndarray]): Parameter sets, see parameters_array().
+        precipitation (ndarray): Precipitation time series [mm].
+        evapotranspiration (ndarray): Evapotranspiration time series [mm].
+        observed (ndarray): Observed flow time series [mm], (n_steps,) or (n_groups, n_steps).
+        criteria (Iterable[str]): Names of the criteria, among CRITERIA.
+        warmup (int): Number of time steps at the beginning of the series excluded from the evaluation.
+        states (Mapping[str, Any], optional): Initial states, see run_batch(). Unit hydrographs are shared by all
+            the parameter sets ((length,) arrays) or given per parameter set ((n, length) arrays, equilibrium states
+            of spin_up() for example).
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+        groups (ndarray, optional): (n,) row of the observed series of each parameter set, 0 by default.
+        threshold (float, optional): Value of the first criterion under which (above which for rmse) the
+            simulations are stopped. No pruning by default.
+        return_pruning (bool): Also return the pruned flags and the number of time steps simulated per parameter
+            set.
+
+    Returns:
+        Union[ndarray, Tuple[ndarray, ndarray, ndarray]]: (n, n_criteria) criteria values, and if return_pruning,
+            (n,) pruned flags and (n,) numbers of simulated time steps.
+    """
+    _check_model(Model, precision)
+    criteria = _check_criteria(criteria)
+    if threshold is not None and (not criteria or criteria[0] not in PRUNABLE_CRITERIA):
+        raise ValueError(
+            "Pruning requires one of {} as first criterion, got {}".format(
+                PRUNABLE_CRITERIA, criteria[:1]
+            )
+        )
+    parameters = parameters_array(Model, parameters)
+    n = parameters.shape[0]
+
+    levels, uh1, uh2 = _shared_initial_states(Model, parameters, states)
+    uh1 = uh1.reshape(-1, Model.uh_lengths[0])
+    uh2 = uh2.reshape(-1, Model.uh_lengths[1])
+
+    with profiling.phase(Model.name, "kernel") as phase:
+        values, steps = _evaluate_batch(
+            Model.name,
+            parameters,
+            np.ascontiguousarray(precipitation, dtype=float),
+            np.ascontiguousarray(evapotranspiration, dtype=float),
+            np.ascontiguousarray(np.atleast_2d(observed), dtype=float),
+            levels,
+            uh1,
+            uh2,
+            criteria,
+            groups=(
+                None if groups is None else np.ascontiguousarray(groups, dtype=np.int64)
+            ),
+            warmup=warmup,
+            threshold=None if threshold is None else float(threshold),
+            fast=precision == "fast",
+        )
+        # Time steps actually simulated, fewer than n * n_steps when parameter sets are pruned
+        phase.add(steps=int(steps.sum()))
+    if return_pruning:
+        return values, steps < len(precipitation), steps
+    return values
+
+
+def summarise_batch(
+    Model,
+    parameters: Union[Mapping[str, Any], ndarray],
+    precipitation: ndarray,
+    evapotranspiration: ndarray,
+    states: Optional[Mapping[str, Any]] = None,
+    probabilities=(0.05, 0.5, 0.95),
+    flow_range: Tuple[float, float] = (1e-4, 1e4),
+    n_bins: int = 400,
+    dtype: str = "float64",
+    precision: str = "reference",
+) -> Dict[str, Any]:
+    """Simulate n members of a model and return the statistics of their flow per time step, across the members.
+
+    The statistics are accumulated in the kernel as the members are simulated, the (n, n_steps) flow matrix is never
+    stored. Mean and variance are exact. Quantiles are estimated from histograms over logarithmic bins, as
+    streaming.StreamingQuantiles (relative error bounded by (high / low) ** (1 / n_bins), about 2.3 % with the
+    defaults), of n_bins 32 bits counts per time step. Up to n_bins / 2 members, the flows take less memory than the
+    histograms : they are kept per time step instead and the quantiles are exact (linear interpolation, as
+    numpy.quantile). The accumulators thus take at most n_steps * n_bins * 4 bytes (1.6 kB per time step with the
+    defaults). Time steps where the flow is NaN are ignored.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        parameters (Union[Mapping[str, Any], ndarray]): Parameters of the members, see parameters_array(). A single
+            parameter set is shared by all the members of an input ensemble.
+        precipitation (ndarray): (n, n_steps) precipitation [mm], or (n_steps,) shared by all the members.
+        evapotranspiration (ndarray): Evapotranspiration [mm], of the same shape as precipitation.
+        states (Mapping[str, Any], optional): Initial states, see run_batch().
+        probabilities (Iterable[float]): Probabilities of the flow quantiles, between 0 and 1. Histograms are not
+            built if empty.
+        flow_range (Tuple[float, float]): Lower and upper edges [mm] of the quantiles histograms.
+        n_bins (int): Number of bins of the quantiles histograms.
+        dtype (str): Type of the returned statistics, among SUMMARY_DTYPES. The kernel computes them in float64,
+            they are converted afterwards to reduce the memory of the kept summaries.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Returns:
+        Dict[str, Any]: Number of members with a flow value ("count", (n_steps,) integers), "mean" and "variance"
+            (population variance) of the flow, (n_steps,), and "quantiles", (n_probabilities, n_steps), as arrays of
+            the requested type or QuantisedArray.
+    """
+    _check_model(Model, precision)
+    if dtype not in SUMMARY_DTYPES:
+        raise ValueError(
+            "Unknown summary type {}, should be one of : {}".format(
+                dtype, SUMMARY_DTYPES
+            )
+        )
+    probabilities = [float(p) for p in probabilities]
+    precipitation = np.ascontiguousarray(np.atleast_2d(precipitation), dtype=float)
+    evapotranspiration = np.ascontiguousarray(
+        np.atleast_2d(evapotranspiration), dtype=float
+    )
+    if precipitation.ndim != 2 or precipitation.shape != evapotranspiration.shape:
+        raise ValueError(
+            "Input data should be arrays (members, time steps) or (time steps,) of the same shape! Shapes : {}, {}".format(
+                precipitation.shape, evapotranspiration.shape
+            )
+        )
+    n_inputs = precipitation.shape[0]
+    parameters = parameters_array(Model, parameters, n_inputs if n_inputs > 1 else None)
+    if parameters.shape[0] == 1 and n_inputs > 1:
+        parameters = np.repeat(parameters, n_inputs, axis=0)
+    n = parameters.shape[0]
+    if n_inputs not in (1, n):
+        raise ValueError(
+            "Inputs should have one row or one row per member ({}), got {}".format(
+                n, n_inputs
+            )
+        )
+
+    stores, uh1, uh2 = _member_initial_states(Model, parameters, states)
+
+    with profiling.phase(Model.name, "kernel") as phase:
+        values = _summarise_batch(
+            Model.name,
+            parameters,
+            precipitation,
+            evapotranspiration,
+            stores,
+            np.ascontiguousarray(uh1, dtype=float),
+            np.ascontiguousarray(uh2, dtype=float),
+            probabilities=probabilities,
+            low=flow_range[0],
+            high=flow_range[1],
+            n_bins=n_bins,
+            fast=precision == "fast",
+        )
+        phase.add(steps=n * precipitation.shape[1], bytes_allocated=values.nbytes)
+
+    def convert(array: ndarray) -> Any:
+        if dtype == "quantised":
+            return QuantisedArray.encode(array)
+        return array.astype(dtype)
+
+    summary = {
+        "count": values[0].astype(np.int64),
+        "mean": convert(values[1]),
+        "variance": convert(values[2]),
+    }
+    if probabilities:
+        summary["quantiles"] = convert(values[3:])
+    return summary
@@ -0,0 +1,342 @@
+from typing import Any, Iterable, Mapping, Optional, Tuple, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr import columnar
+from hydrogr.batch import (
+    CRITERIA,
+    PRUNABLE_CRITERIA,
+    _check_model,
+    _year_length,
+    climatological_year,
+    evaluate_batch,
+)
+from hydrogr.batch import spin_up as _spin_up
+
+"""
+Multi-objective calibration of the models with NSGA-II (Deb et al., 2002). Each generation is evaluated with a single
+call to the batch kernel, that simulates the whole population in parallel and computes all the objectives in the same
+pass over each simulation.
+
+With a single objective computed from squared errors (nse, nse_log or rmse), the simulation of the children can be
+pruned : a child is stopped as soon as it can not beat the worst member of the current population, as it could not
+be selected anyway. The result is the same as without pruning, in fewer simulated time steps.
+
+Example:
+
+    >>> from hydrogr import ModelGr5j
+    >>> from hydrogr.calibration import nsga2
+    >>> parameters, objectives = nsga2(ModelGr5j, inputs, "flow_mm", objectives=("nse", "nse_log"), warmup=365)
+"""
+
+
+def _losses(values: ndarray, objectives: Iterable[str]) -> ndarray:
+    # Objectives as losses to minimise : efficiencies are maximised, bias is minimised in absolute value
+    losses = np.empty_like(values)
+    for j, objective in enumerate(objectives):
+        if objective in ("nse", "nse_log", "kge"):
+            losses[:, j] = 1.0 - values[:, j]
+        elif objective == "bias":
+            losses[:, j] = np.abs(values[:, j])
+        else:
+            losses[:, j] = values[:, j]
+    losses[np.isnan(losses)] = np.inf
+    return losses
+
+
+def bounds_array(
+    Model, bounds: Optional[Mapping[str, Tuple[float, float]]] = None
+) -> ndarray:
+    """Return the calibration range of the model parameters as a (n_parameters, 2) array.
+
+    Args:
+        Model (ModelGrInterface): Model class.
+        bounds (Mapping[str, Tuple[float, float]], optional): (lower, upper) bounds by parameter name, overriding the
+            model default parameters_bounds. Equal bounds fix the parameter.
+
+    Returns:
+        ndarray: Lower and upper bounds, in the order of Model.parameters_names.
+    """
+    ranges = dict(Model.parameters_bounds)
+    if bounds is not None:
+        for name in bounds:
+            if name not in ranges:
+                raise ValueError(
+                    "Unknown parameter {} for model {}".format(name, Model.name)
+                )
+        ranges.update(bounds)
+    array = np.array([ranges[name] for name in Model.parameters_names], dtype=float)
+    if (array[:, 0] > array[:, 1]).any():
+        raise ValueError(
+            "Lower bounds should be lower than upper bounds : {}".format(ranges)
+        )
+    return array
+
+
+def non_dominated_sort(losses: ndarray) -> ndarray:
+    """Return the Pareto front rank of each point (0 for the non-dominated points), objectives being minimised.
+
+    Args:
+        losses (ndarray): (n, n_objectives) objective values.
+
+    Returns:
+        ndarray: (n,) ranks.
+    """
+    n = losses.shape[0]
+    not_worse = (losses[:, None, :] <= losses[None, :, :]).all(axis=-1)
+    better = (losses[:, None, :] < losses[None, :, :]).any(axis=-1)
+    dominates = not_worse & better  # dominates[i, j] : i dominates j
+    n_dominating = dominates.sum(axis=0)
+
+    ranks = np.full(n, -1, dtype=int)
+    rank = 0
+    front = np.flatnonzero(n_dominating == 0)
+    while front.size:
+        ranks[front] = rank
+        n_dominating -= dominates[front].sum(axis=0)
+        n_dominating[ranks >= 0] = -1
+        front = np.flatnonzero(n_dominating == 0)
+        rank += 1
+    return ranks
+
+
+def crowding_distance(losses: ndarray, ranks: ndarray) -> ndarray:
+    """Return the crowding distance of each point within its front, infinite at the boundaries of the fronts."""
+    distances = np.zeros(losses.shape[0])
+    for rank in np.unique(ranks):
+        front = np.flatnonzero(ranks == rank)
+        for j in range(losses.shape[1]):
+            values = losses[front, j]
+            order = np.argsort(values, kind="stable")
+            distances[front[order[[0, -1]]]] = np.inf
+            span = values[order[-1]] - values[order[0]]
+            if front.size > 2 and np.isfinite(span) and span > 0.0:
+                distances[front[order[1:-1]]] += (
+                    values[order[2:]] - values[order[:-2]]
+                ) / span
+    return distances
+
+
+def _tournament(rng, ranks: ndarray, distances: ndarray, n: int) -> ndarray:
+    first = rng.integers(0, ranks.size, n)
+    second = rng.integers(0, ranks.size, n)
+    first_wins = (ranks[first] < ranks[second]) | (
+        (ranks[first] == ranks[second]) & (distances[first] > distances[second])
+    )
+    return np.where(first_wins, first, second)
+
+
+def _offspring(
+    rng,
+    parents: ndarray,
+    bounds: ndarray,
+    crossover_probability: float,
+    crossover_eta: float,
+    mutation_eta: float,
+) -> ndarray:
+    # Simulated binary crossover and polynomial mutation, normalised by the parameter ranges
+    lower, upper = bounds[:, 0], bounds[:, 1]
+    span = np.where(upper > lower, upper - lower, 1.0)
+    x = (parents - lower) / span
+    half = x.shape[0] // 2
+    x1, x2 = x[:half], x[half : 2 * half]
+
+    u = rng.random(x1.shape)
+    beta = np.where(
+        u <= 0.5,
+        (2.0 * u) ** (1.0 / (crossover_eta + 1.0)),
+        (1.0 / (2.0 * (1.0 - u))) ** (1.0 / (crossover_eta + 1.0)),
+    )
+    crossed = (rng.random(x1.shape) < 0.5) & (
+        rng.random((x1.shape[0], 1)) < crossover_probability
+    )
+    beta = np.where(crossed, beta, 1.0)
+    children = np.concatenate(
+        [
+            0.5 * ((1.0 + beta) * x1 + (1.0 - beta) * x2),
+            0.5 * ((1.0 - beta) * x1 + (1.0 + beta) * x2),
+            x[2 * half :],
+        ]
+    )
+
+    u = rng.random(children.shape)
+    delta = np.where(
+        u < 0.5,
+        (2.0 * u) ** (1.0 / (mutation_eta + 1.0)) - 1.0,
+        1.0 - (2.0 * (1.0 - u)) ** (1.0 / (mutation_eta + 1.0)),
+    )
+    mutated = rng.random(children.shape) < 1.0 / children.shape[1]
+    children = np.clip(children + np.where(mutated, delta, 0.0), 0.0, 1.0)
+    return lower + children * (upper - lower)
+
+
+def _random_population(rng, bounds: ndarray, n: int) -> ndarray:
+    return bounds[:, 0] + rng.random((n, bounds.shape[0])) * (
+        bounds[:, 1] - bounds[:, 0]
+    )
+
+
+def _select(
+    population: ndarray, values: ndarray, losses: ndarray, population_size: int
+) -> Tuple[ndarray, ndarray, ndarray, ndarray, ndarray]:
+    # Elitist selection of the next generation among parents and children, by front rank then crowding distance
+    ranks = non_dominated_sort(losses)
+    distances = crowding_distance(losses, ranks)
+    selected = np.lexsort((-distances, ranks))[:population_size]
+    return (
+        population[selected],
+        values[selected],
+        losses[selected],
+        ranks[selected],
+        distances[selected],
+    )
+
+
+def _pareto_front(
+    population: ndarray, values: ndarray, losses: ndarray, ranks: ndarray
+) -> Tuple[ndarray, ndarray]:
+    # Unique non-dominated parameter sets, sorted by the first objective
+    front = np.flatnonzero(ranks == 0)
+    front = front[np.unique(population[front], axis=0, return_index=True)[1]]
+    front = front[np.argsort(losses[front, 0], kind="stable")]
+    return population[front], values[front]
+
+
+def _check_objectives(objectives: Iterable[str]) -> list:
+    objectives = list(objectives)
+    for objective in objectives:
+        if objective not in CRITERIA:
+            raise ValueError(
+                "Unknown objective {}, should be one of : {}".format(
+                    objective, CRITERIA
+                )
+            )
+    return objectives
+
+
+def nsga2(
+    Model,
+    inputs: Any,
+    observed: Union[str, ndarray],
+    objectives: Iterable[str] = ("nse", "nse_log"),
+    bounds: Optional[Mapping[str, Tuple[float, float]]] = None,
+    population_size: int = 100,
+    n_generations: int = 50,
+    warmup: int = 0,
+    crossover_probability: float = 0.9,
+    crossover_eta: float = 15.0,
+    mutation_eta: float = 20.0,
+    seed: Optional[int] = None,
+    precision: str = "reference",
+    prune: bool = False,
+    spin_up: bool = False,
+) -> Tuple[ndarray, ndarray]:
+    """Search the Pareto front of the model parameters for several objectives with NSGA-II.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        inputs (Any): Input time series (precipitation, evapotranspiration) : dataframe, columnar data or mapping of
+            arrays.
+        observed (Union[str, ndarray]): Observed flow [mm], or name of the observed flow column of the inputs. NaN
+            values are ignored.
+        objectives (Iterable[str]): Criteria to optimise, among batch.CRITERIA. Efficiencies (nse, nse_log, kge) are
+            maximised, the absolute bias and the rmse are minimised.
+        bounds (Mapping[str, Tuple[float, float]], optional): Parameter ranges overriding the model defaults, see
+            bounds_array().
+        population_size (int): Number of parameter sets per generation.
+        n_generations (int): Number of generations.
+        warmup (int): Number of time steps at the beginning of the series excluded from the objectives.
+        crossover_probability (float): Probability of crossover of a pair of parents.
+        crossover_eta (float): Distribution index of the simulated binary crossover.
+        mutation_eta (float): Distribution index of the polynomial mutation.
+        seed (int, optional): Seed of the random generator.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+        prune (bool): Stop the simulation of the children that can not enter the population, for a single objective
+            among batch.PRUNABLE_CRITERIA. The number of simulated time steps is recorded by the profiler.
+        spin_up (bool): Start the simulation of each parameter set from its equilibrium states on the climatological
+            year of the inputs (see batch.spin_up()) instead of the default states, so that the warm-up period can be
+            shortened or removed.
+
+    Returns:
+        Tuple[ndarray, ndarray]: Non-dominated parameter sets (n, n_parameters), in the order of
+            Model.parameters_names, and their objective values (n, n_objectives), sorted by the first objective.
+    """
+    _check_model(Model, precision)
+    objectives = _check_objectives(objectives)
+    if population_size < 4:
+        raise ValueError("Population size should be at least 4")
+    if prune and (len(objectives) != 1 or objectives[0] not in PRUNABLE_CRITERIA):
+        raise ValueError(
+            "Pruning requires a single objective among {}, got {}".format(
+                PRUNABLE_CRITERIA, objectives
+            )
+        )
+    bounds = bounds_array(Model, bounds)
+    arrays = columnar.get_float_columns(
+        inputs, [requirement.name for requirement in Model.input_requirements]
+    )
+    if isinstance(observed, str):
+        observed = columnar.to_float_array(columnar.get_column(inputs, observed))
+    observed = np.asarray(observed, dtype=float)
+
+    if spin_up:
+        climatology = {
+            name: climatological_year(arrays[name], _year_length(Model))
+            for name in ("precipitation", "evapotranspiration")
+        }
+
+    def evaluate(parameters, threshold=None):
+        states = None
+        if spin_up:
+            states, _ = _spin_up(
+                Model,
+                parameters,
+                climatology["precipitation"],
+                climatology["evapotranspiration"],
+                precision=precision,
+            )
+        values = evaluate_batch(
+            Model,
+            parameters,
+            arrays["precipitation"],
+            arrays["evapotranspiration"],
+            observed,
+            objectives,
+            warmup=warmup,
+            states=states,
+            precision=precision,
+            threshold=threshold,
+        )
+        return values, _losses(values, objectives)
+
+    rng = np.random.default_rng(seed)
+    population = _random_population(rng, bounds, population_size)
+    values, losses = evaluate(population)
+    ranks = non_dominated_sort(losses)
+    distances = crowding_distance(losses, ranks)
+
+    for _ in range(n_generations):
+        parents = population[_tournament(rng, ranks, distances, population_size)]
+        children = _offspring(
+            rng,
+            parents,
+            bounds,
+            crossover_probability,
+            crossover_eta,
+            mutation_eta,
+        )
+        # With a single objective, a child strictly worse than the whole population is never selected
+        threshold = None
+        if prune:
+            worst = np.argmax(losses[:, 0])
+            if np.isfinite(losses[worst, 0]):
+                threshold = values[worst, 0]
+        children_values, children_losses = evaluate(children, threshold)
+
+        population, values, losses, ranks, distances = _select(
+            np.concatenate([population, children]),
+            np.concatenate([values, children_values]),
+            np.concatenate([losses, children_losses]),
+            population_size,
+        )
+
+    return _pareto_front(population, values, losses, ranks)
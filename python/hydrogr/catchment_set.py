@@ -0,0 +1,304 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr.batch import (
+    _check_model,
+    _member_states,
+    _run_levels,
+    parameters_array,
+    spin_up,
+)
+
+"""
+Structure of arrays container of n catchments of the same model : parameters, stores filling rates and unit
+hydrographs are held in contiguous 2D arrays with one row per catchment, instead of one model instance per
+catchment. Parameters and states are validated by array operations, and the arrays are given as is to the batch
+kernel (see hydrogr.batch).
+
+Example:
+
+    >>> from hydrogr.catchment_set import CatchmentSet
+    >>> catchments = CatchmentSet(ModelGr4j, ids, parameters)  # (n, 4) parameters
+    >>> flow = catchments.run(precipitation, evapotranspiration)  # (n, n_steps) inputs and flow
+    >>> upstream = catchments[["L0123001", "L0123003"]]
+"""
+
+
+class CatchmentSet(object):
+    """Parameters and states of n catchments of the same model, as arrays with one row per catchment.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        ids (Iterable[str]): Catchment identifiers.
+        parameters (Union[Mapping[str, Any], ndarray]): Parameters, see batch.parameters_array().
+        states (Mapping[str, Any], optional): Initial states, see set_states(). Model default states by default.
+
+    Attributes:
+        ids (List[str]): Catchment identifiers.
+        parameters (ndarray): (n, n_parameters) parameters, in the order of Model.parameters_names.
+        stores (ndarray): (n, n_stores) stores filling rates [-], in the order of Model.stores.
+        uh1 (ndarray): (n, length) unit hydrograph uh1 states.
+        uh2 (ndarray): (n, length) unit hydrograph uh2 states.
+
+    Methods:
+        set_parameters(parameters):
+            Set the parameters of all the catchments.
+        set_states(states):
+            Set the states of all the catchments.
+        get_states():
+            Get the states of all the catchments.
+        run(precipitation, evapotranspiration, precision):
+            Run all the catchments and update their states.
+        spin_up(precipitation, evapotranspiration, tolerance, max_cycles, precision):
+            Set the states of all the catchments to their equilibrium states.
+        rows(ids):
+            Return the rows of catchments.
+        from_models(ids, models):
+            Create a set from model instances (class method).
+        to_models():
+            Create a model instance per catchment.
+    """
+
+    def __init__(
+        self,
+        Model,
+        ids: Iterable[str],
+        parameters: Union[Mapping[str, Any], ndarray],
+        states: Optional[Mapping[str, Any]] = None,
+    ):
+        _check_model(Model)
+        self.Model = Model
+        self.ids = [str(catchment) for catchment in ids]
+        self._rows = {catchment: row for row, catchment in enumerate(self.ids)}
+        if len(self._rows) != len(self.ids):
+            raise ValueError("Catchment identifiers should be unique")
+        self.set_parameters(parameters)
+        self.stores = np.empty((len(self.ids), len(Model.stores)))
+        self.set_states({} if states is None else states)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return "CatchmentSet({}, {} catchments)".format(self.Model.name, len(self))
+
+    def set_parameters(self, parameters: Union[Mapping[str, Any], ndarray]):
+        """Set the parameters of all the catchments. Values under the model thresholds are replaced by the
+        thresholds, with a single warning per parameter.
+
+        Args:
+            parameters (Union[Mapping[str, Any], ndarray]): Values by parameter name (scalars or arrays of length
+                n), or (n, n_parameters) array in the order of Model.parameters_names.
+        """
+        parameters = parameters_array(self.Model, parameters, len(self.ids))
+        if parameters.shape[0] != len(self.ids):
+            raise ValueError(
+                "Parameters should have one row per catchment ({}), got {}".format(
+                    len(self.ids), parameters.shape[0]
+                )
+            )
+        self.parameters = np.ascontiguousarray(parameters)
+
+    def set_states(self, states: Mapping[str, Any]):
+        """Set the states of all the catchments. Missing states take the model default values.
+
+        Args:
+            states (Mapping[str, Any]): Stores filling rates [-] (scalars or arrays of length n), between 0 and 1,
+                and unit hydrographs ((n, length) arrays or a single (length,) array for all the catchments).
+        """
+        states = _member_states(self.Model, len(self.ids), states)
+        stores = np.column_stack([states[name] for name in self.Model.stores])
+        invalid = ~((stores >= 0.0) & (stores <= 1.0))
+        if invalid.any():
+            rows, columns = np.nonzero(invalid)
+            raise ValueError(
+                "Stores filling rates should be between 0 and 1 : {} of catchment {} is {}".format(
+                    list(self.Model.stores)[columns[0]],
+                    self.ids[rows[0]],
+                    stores[rows[0], columns[0]],
+                )
+            )
+        self.stores = np.ascontiguousarray(stores)
+        self.uh1 = np.array(states["uh1"], dtype=float)
+        self.uh2 = np.array(states["uh2"], dtype=float)
+
+    def get_states(self) -> Dict[str, ndarray]:
+        """Get the states of all the catchments, in the layout of batch.run_batch() (stores filling rates as (n,)
+        views, unit hydrographs as (n, length) arrays)."""
+        states = {name: self.stores[:, i] for i, name in enumerate(self.Model.stores)}
+        states["uh1"] = self.uh1
+        states["uh2"] = self.uh2
+        return states
+
+    def rows(self, ids: Union[str, Iterable[str]]) -> Union[int, ndarray]:
+        """Return the row of a catchment, or the rows of several catchments."""
+        if isinstance(ids, str):
+            return self._rows[ids]
+        return np.array([self._rows[catchment] for catchment in ids], dtype=np.int64)
+
+    def __getitem__(self, key: Union[str, slice, Iterable[Any]]) -> "CatchmentSet":
+        """Subset of catchments, by identifiers, slice, boolean mask or rows. The arrays are copied."""
+        if isinstance(key, str):
+            rows = np.array([self._rows[key]])
+        elif isinstance(key, slice):
+            rows = np.arange(len(self.ids))[key]
+        else:
+            key = list(key)
+            if key and isinstance(key[0], str):
+                rows = self.rows(key)
+            else:
+                rows = np.arange(len(self.ids))[np.asarray(key)]
+        subset = CatchmentSet.__new__(CatchmentSet)
+        subset.Model = self.Model
+        subset.ids = [self.ids[row] for row in rows]
+        subset._rows = {catchment: row for row, catchment in enumerate(subset.ids)}
+        subset.parameters = self.parameters[rows]
+        subset.stores = self.stores[rows]
+        subset.uh1 = self.uh1[rows]
+        subset.uh2 = self.uh2[rows]
+        return subset
+
+    def run(
+        self,
+        precipitation: ndarray,
+        evapotranspiration: ndarray,
+        precision: str = "reference",
+    ) -> ndarray:
+        """Run all the catchments in a single call of the batch kernel, and update their states.
+
+        Args:
+            precipitation (ndarray): (n, n_steps) precipitation [mm].
+            evapotranspiration (ndarray): (n, n_steps) evapotranspiration [mm].
+            precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+        Returns:
+            ndarray: (n, n_steps) flow [mm].
+        """
+        _check_model(self.Model, precision)
+        precipitation = np.ascontiguousarray(precipitation, dtype=float)
+        evapotranspiration = np.ascontiguousarray(evapotranspiration, dtype=float)
+        if (
+            precipitation.shape != evapotranspiration.shape
+            or precipitation.shape[:1] != (len(self.ids),)
+            or precipitation.ndim != 2
+        ):
+            raise ValueError(
+                "Input data should be 2D arrays (catchments, time steps) of {} rows! Shapes : {}, {}".format(
+                    len(self.ids), precipitation.shape, evapotranspiration.shape
+                )
+            )
+        capacities = self.parameters[:, self._capacity_columns()]
+        levels, self.uh1, self.uh2, flow = _run_levels(
+            self.Model,
+            self.parameters,
+            precipitation,
+            evapotranspiration,
+            self.stores * capacities,
+            self.uh1,
+            self.uh2,
+            precision,
+        )
+        self.stores = levels / capacities
+        return flow
+
+    def spin_up(
+        self,
+        precipitation: ndarray,
+        evapotranspiration: ndarray,
+        tolerance: float = 1e-3,
+        max_cycles: int = 50,
+        precision: str = "reference",
+    ) -> ndarray:
+        """Set the states of all the catchments to their equilibrium states on a repeated forcing period, see
+        batch.spin_up().
+
+        Args:
+            precipitation (ndarray): (n, n_steps) precipitation [mm] of a cycle (a climatological year for example),
+                or (n_steps,) shared by all the catchments.
+            evapotranspiration (ndarray): Evapotranspiration [mm] of a cycle, of the same shape as precipitation.
+            tolerance (float): Convergence threshold of the largest change of the stores filling rates over a cycle.
+            max_cycles (int): Maximum number of cycles.
+            precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+        Returns:
+            ndarray: (n,) number of cycles simulated per catchment.
+        """
+        states, cycles = spin_up(
+            self.Model,
+            self.parameters,
+            precipitation,
+            evapotranspiration,
+            self.get_states(),
+            tolerance,
+            max_cycles,
+            precision,
+        )
+        self.stores = np.column_stack([states[name] for name in self.Model.stores])
+        self.uh1 = states["uh1"]
+        self.uh2 = states["uh2"]
+        return cycles
+
+    def _capacity_columns(self) -> List[int]:
+        # Column of the parameter giving the capacity of each store
+        return [
+            self.Model.parameters_names.index(capacity)
+            for capacity, _ in self.Model.stores.values()
+        ]
+
+    @classmethod
+    def from_models(cls, ids: Iterable[str], models: Iterable[Any]) -> "CatchmentSet":
+        """Create a set from model instances of the same model class, with their parameters and states.
+
+        Args:
+            ids (Iterable[str]): Catchment identifiers.
+            models (Iterable[ModelGrInterface]): Model instance of each catchment.
+
+        Returns:
+            CatchmentSet: Catchments of the models.
+        """
+        models = list(models)
+        Model = type(models[0])
+        if any(type(model) is not Model for model in models):
+            raise ValueError("All the models should be of the same class")
+        parameters = np.array(
+            [
+                [model.parameters[name] for name in Model.parameters_names]
+                for model in models
+            ],
+            dtype=float,
+        )
+        states = [model.get_states() for model in models]
+        return cls(
+            Model,
+            ids,
+            parameters,
+            {
+                name: np.array([state[name] for state in states], dtype=float)
+                for name in list(Model.stores) + ["uh1", "uh2"]
+            },
+        )
+
+    def to_models(self, **kwargs) -> List[Any]:
+        """Create a model instance per catchment, with its parameters and states.
+
+        Args:
+            kwargs: Other arguments of the model constructor (precision, gaps).
+
+        Returns:
+            List[ModelGrInterface]: Model of each catchment, in the order of ids.
+        """
+        models = []
+        for row in range(len(self.ids)):
+            model = self.Model(
+                dict(zip(self.Model.parameters_names, self.parameters[row].tolist())),
+                **kwargs,
+            )
+            states = {
+                name: float(self.stores[row, i])
+                for i, name in enumerate(self.Model.stores)
+            }
+            states["uh1"] = self.uh1[row].copy()
+            states["uh2"] = self.uh2[row].copy()
+            model.set_states(states)
+            models.append(model)
+        return models
@@ -0,0 +1,146 @@
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr import columnar, profiling
+from hydrogr.batch import _check_model
+from hydrogr.model_interface import check_input_arrays
+from hydrogr._hydrogr import ChunkedRun
+
+"""
+Simulation of very long series in bounded memory : the input time series are consumed by blocks, either sliced from
+(possibly memory mapped) arrays or taken from any iterator of blocks, and the flow of each block is written directly
+in the output array, that can be memory mapped. The model states are kept in the extension between blocks, so the
+results do not depend on the block size. Peak memory is that of one block, whatever the length of the series.
+
+Example:
+
+    >>> from hydrogr.chunked import run_chunked
+    >>> from hydrogr.grid import create_grid
+    >>> flow = create_grid("flow.npy", (n_steps,))
+    >>> run_chunked(model, {"precipitation": precipitation_memmap, "evapotranspiration": evapotranspiration_memmap},
+    ...             out=flow)
+"""
+
+
+def _is_series(inputs: Any) -> bool:
+    # Whole series (mapping of arrays, dataframes, tables) rather than an iterable of blocks
+    return columnar.is_columnar(inputs) or hasattr(inputs, "columns")
+
+
+def _blocks(inputs: Any, block_size: int) -> Iterator[Any]:
+    if _is_series(inputs):
+        names = list(columnar.column_names(inputs))
+        n_steps = len(columnar.get_column(inputs, names[0]))
+        for start in range(0, n_steps, block_size):
+            yield columnar.slice_rows(inputs, start, min(start + block_size, n_steps))
+    else:
+        yield from inputs
+
+
+def run_chunked(
+    model,
+    inputs: Union[Any, Iterable[Any]],
+    out: Optional[Union[ndarray, str, Path]] = None,
+    block_size: int = 8760,
+) -> ndarray:
+    """Run the model over a long series, block by block, and update the model states.
+
+    Args:
+        model (ModelGrInterface): Model instance, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        inputs (Union[Any, Iterable[Any]]): Input time series (precipitation, evapotranspiration) as a mapping of 1D
+            arrays (that can be memory mapped) or columnar data, sliced in blocks of block_size steps. Or any iterable
+            of such blocks, of arbitrary lengths.
+        out (Union[ndarray, str, Path], optional): 1D array that receives the flow, typically a memory mapped array,
+            or path of a .npy file to create (only if the length of the inputs is known). Without it, the flow of the
+            blocks is concatenated in a new array.
+        block_size (int): Number of steps of the blocks sliced from the inputs.
+
+    Returns:
+        ndarray: Flow [mm] for each time step of the inputs, the out array if given.
+    """
+    _check_model(type(model))
+    if model.gaps != "propagate":
+        raise ValueError(
+            "Gap policy {} not available for chunked runs, fill the gaps of the blocks beforehand".format(
+                model.gaps
+            )
+        )
+    names = [requirement.name for requirement in model.input_requirements]
+
+    if isinstance(out, (str, Path)):
+        if not _is_series(inputs):
+            raise ValueError(
+                "Length of the inputs is unknown, the output file can not be created!"
+            )
+        from hydrogr.grid import create_grid
+
+        out = create_grid(out, (len(columnar.get_column(inputs, names[0])),))
+
+    states = np.array(
+        [
+            getattr(model, name) * model.parameters[capacity]
+            for name, (capacity, _) in model.stores.items()
+        ]
+    )
+    run = ChunkedRun(
+        model.name,
+        [model.parameters[name] for name in model.parameters_names],
+        states,
+        np.asarray(model.uh1, dtype=float),
+        np.asarray(model.uh2, dtype=float),
+        fast=model.precision == "fast",
+    )
+
+    blocks_flow = []
+    start = 0
+    for block in _blocks(inputs, block_size):
+        arrays = columnar.get_float_columns(block, names)
+        n_steps = arrays[names[0]].size
+        for name, values in arrays.items():
+            if values.shape != (n_steps,):
+                raise ValueError(
+                    "Input blocks should be 1D arrays of the same length! "
+                    '"{}" shape : {}'.format(name, values.shape)
+                )
+        check_input_arrays(model, arrays)
+
+        if out is None:
+            target = np.empty(n_steps)
+            blocks_flow.append(target)
+        else:
+            if start + n_steps > out.shape[0]:
+                raise ValueError(
+                    "Output array of length {} is too short for the inputs".format(
+                        out.shape[0]
+                    )
+                )
+            target = out[start : start + n_steps]
+
+        # The kernel writes directly in float64 contiguous outputs, others go through a block buffer
+        direct = (
+            target.dtype == np.float64
+            and target.flags.c_contiguous
+            and target.flags.writeable
+        )
+        buffer = target if direct else np.empty(n_steps)
+        with profiling.phase(model.name, "kernel") as phase:
+            run.run_block(
+                np.ascontiguousarray(arrays[names[0]]),
+                np.ascontiguousarray(arrays[names[1]]),
+                buffer,
+            )
+            phase.add(steps=n_steps)
+        if not direct:
+            target[:] = buffer
+        start += n_steps
+
+    if out is None:
+        out = np.concatenate(blocks_flow) if blocks_flow else np.empty(0)
+    elif hasattr(out, "flush"):
+        out.flush()
+
+    stores, model.uh1, model.uh2 = run.get_states()
+    for i, (name, (capacity, _)) in enumerate(model.stores.items()):
+        setattr(model, name, stores[i] / model.parameters[capacity])
+    return out
@@ -0,0 +1,410 @@
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set
+from pathlib import Path
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from hydrogr.batch import CRITERIA, evaluate
+from hydrogr.gr4h import ModelGr4h
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.gr5j import ModelGr5j
+from hydrogr.gr6j import ModelGr6j
+
+"""
+Command line batch runner : the catchments of a directory of forcing files are run with their parameters in a pool
+of worker threads, and the flows, final states and scores are written to columnar files (Parquet or Arrow IPC,
+require pyarrow).
+
+Forcing files are CSV files in the layout of the data folder, one per catchment named after the catchment : a "date"
+column (day first), precipitation "P" and evapotranspiration "E" [mm], and optionally the observed flow "Qmm" [mm]
+used for the scores. The parameter table is a CSV file with the catchment identifiers in the first column and one
+column per model parameter.
+
+The results are written by parts of a few catchments in three directories of the output directory, each readable as
+a dataset (pandas.read_parquet(output / "flows") for example) :
+    - flows : catchment, date and flow [mm] of each time step,
+    - states : catchment and final states,
+    - scores : catchment, number of time steps, read and run times [s], throughput [steps/s] and criteria.
+A part is written to a temporary file and renamed, the scores part last : after an interruption, the catchments of
+the written scores parts are skipped by the next run and the incomplete parts are removed.
+
+Example:
+
+    $ hydrogr run data parameters.csv --model gr4j --output results --workers 8 --criteria nse kge
+"""
+
+MODELS = {Model.name: Model for Model in [ModelGr4j, ModelGr5j, ModelGr6j, ModelGr4h]}
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+TABLES = ["flows", "states", "scores"]
+# Columns of the forcing files
+COLUMNS = {"P": "precipitation", "E": "evapotranspiration", "Qmm": "observed"}
+
+
+def read_forcing(path: Path) -> pd.DataFrame:
+    """Read a forcing file into a dataframe indexed by date, with the columns precipitation, evapotranspiration and
+    observed (if available) as floats."""
+    data = pd.read_csv(path)
+    index = pd.DatetimeIndex(pd.to_datetime(data["date"], dayfirst=True))
+    columns = [name for name in COLUMNS if name in data]
+    forcing = data[columns].rename(columns=COLUMNS).astype(float)
+    forcing.index = index
+    return forcing
+
+
+def run_catchment(
+    Model,
+    catchment: str,
+    path: Path,
+    parameters: Mapping[str, float],
+    criteria: Sequence[str] = (),
+    warmup: int = 0,
+    precision: str = "reference",
+) -> Dict[str, Any]:
+    """Run a catchment from its forcing file, with the model default initial states.
+
+    Returns:
+        Dict[str, Any]: catchment, dates, flow, final states, scores by criterion, number of time steps, and read
+            and run times [s].
+    """
+    start = time.perf_counter()
+    forcing = read_forcing(path)
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = Model(dict(parameters), precision=precision)
+    flow = model.run(forcing[["precipitation", "evapotranspiration"]], output="numpy")[
+        "flow"
+    ]
+    scores = {}
+    if criteria and "observed" in forcing:
+        # Scores of the simulated flow, the catchment is run once
+        values = evaluate(flow, forcing["observed"].values, criteria, warmup)
+        scores = dict(zip(criteria, values.tolist()))
+    return {
+        "catchment": catchment,
+        "dates": forcing.index.values,
+        "flow": flow,
+        "states": model.get_states(),
+        "scores": scores,
+        "n_steps": len(flow),
+        "read_seconds": read_seconds,
+        "run_seconds": time.perf_counter() - start,
+    }
+
+
+class ResultWriter(object):
+    """Parts of the flows, states and scores tables in an output directory, see the module documentation.
+
+    Args:
+        directory (Path): Output directory, created if needed.
+        format (str): "parquet" or "arrow".
+        criteria (Sequence[str]): Criteria of the scores, NaN when the observed flow is not available.
+
+    Attributes:
+        done (Set[str]): Catchments of the written parts.
+
+    Methods:
+        write(results):
+            Write a part with the results of several catchments.
+    """
+
+    def __init__(
+        self, directory: Path, format: str = "parquet", criteria: Sequence[str] = ()
+    ):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("pyarrow is required to write the results!") from e
+        self.directory = Path(directory)
+        self.format = format
+        self.criteria = list(criteria)
+        self.extension = FORMATS[format]
+        for table in TABLES:
+            (self.directory / table).mkdir(parents=True, exist_ok=True)
+
+        # Parts are complete when their scores part exists, the others were interrupted
+        parts = {path.stem for path in self._parts("scores")}
+        for table in TABLES:
+            for path in (self.directory / table).glob("part-*"):
+                if path.suffix == ".tmp" or (
+                    path.suffix == self.extension and path.stem not in parts
+                ):
+                    path.unlink()
+        self.done: Set[str] = set()
+        for path in self._parts("scores"):
+            self.done.update(self._read(path, ["catchment"])["catchment"].to_pylist())
+        self._next_part = (
+            max((int(part.split("-")[1]) for part in parts), default=-1) + 1
+        )
+
+    def _parts(self, table: str) -> List[Path]:
+        return sorted((self.directory / table).glob("part-*" + self.extension))
+
+    def _read(self, path: Path, columns: List[str]):
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.read_table(path, columns=columns)
+        import pyarrow.feather as feather
+
+        return feather.read_table(path, columns=columns)
+
+    def _write(self, table: str, columns: Mapping[str, Any], name: str):
+        import pyarrow as pa
+
+        path = self.directory / table / (name + self.extension)
+        temporary = path.with_suffix(".tmp")
+        data = pa.table(dict(columns))
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(data, temporary)
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(data, temporary)
+        os.replace(temporary, path)
+
+    def write(self, results: List[Dict[str, Any]]):
+        """Write a part with the results of several catchments (see run_catchment())."""
+        if not results:
+            return
+        import pyarrow as pa
+
+        name = "part-{:05d}".format(self._next_part)
+        catchments = [result["catchment"] for result in results]
+        self._write(
+            "flows",
+            {
+                "catchment": np.repeat(
+                    catchments, [result["n_steps"] for result in results]
+                ),
+                "date": np.concatenate([result["dates"] for result in results]),
+                "flow": np.concatenate([result["flow"] for result in results]),
+            },
+            name,
+        )
+        states = {"catchment": catchments}
+        for state in results[0]["states"]:
+            values = [result["states"][state] for result in results]
+            if np.ndim(values[0]) == 0:
+                states[state] = np.array(values, dtype=float)
+            else:
+                states[state] = pa.array([np.asarray(value) for value in values])
+        self._write("states", states, name)
+        scores = {
+            "catchment": catchments,
+            "n_steps": np.array([result["n_steps"] for result in results]),
+        }
+        for column in ["read_seconds", "run_seconds"]:
+            scores[column] = np.array([result[column] for result in results])
+        scores["steps_per_second"] = scores["n_steps"] / scores["run_seconds"]
+        for criterion in self.criteria:
+            scores[criterion] = np.array(
+                [result["scores"].get(criterion, np.nan) for result in results]
+            )
+        self._write("scores", scores, name)
+        self.done.update(catchments)
+        self._next_part += 1
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="hydrogr", description="GR hydrological models in Rust."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser(
+        "run",
+        help="Run the catchments of a directory of forcing files.",
+        description="Run the catchments of a directory of forcing files with their parameters, and write the "
+        "flows, final states and scores to columnar files. An interrupted run is resumed by running the same "
+        "command again.",
+    )
+    run.add_argument("forcing", type=Path, help="Directory of the forcing CSV files.")
+    run.add_argument(
+        "parameters",
+        type=Path,
+        help="CSV table of the parameters, catchment identifiers in the first column.",
+    )
+    run.add_argument(
+        "-m", "--model", required=True, choices=sorted(MODELS), help="Model name."
+    )
+    run.add_argument(
+        "-o", "--output", type=Path, required=True, help="Output directory."
+    )
+    run.add_argument(
+        "--pattern", default="*.csv", help="Forcing files pattern (default: *.csv)."
+    )
+    run.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker threads (default: HYDROGR_NUM_THREADS or the number of cores).",
+    )
+    run.add_argument(
+        "--part-size",
+        type=int,
+        default=64,
+        help="Number of catchments per output part, bounding the results held in memory (default: 64).",
+    )
+    run.add_argument(
+        "--criteria",
+        nargs="*",
+        default=["nse", "kge"],
+        choices=CRITERIA,
+        help="Scores against the Qmm column (default: nse kge).",
+    )
+    run.add_argument(
+        "--warmup",
+        type=int,
+        default=365,
+        help="Time steps excluded from the scores (default: 365).",
+    )
+    run.add_argument("--precision", default="reference", choices=["reference", "fast"])
+    run.add_argument("--format", default="parquet", choices=sorted(FORMATS))
+    run.add_argument(
+        "-q", "--quiet", action="store_true", help="Do not report each catchment."
+    )
+    return parser
+
+
+def _run(args: argparse.Namespace) -> int:
+    Model = MODELS[args.model]
+    parameters = pd.read_csv(args.parameters, index_col=0)
+    parameters.index = parameters.index.astype(str)
+    missing = [name for name in Model.parameters_names if name not in parameters]
+    if missing:
+        print(
+            "Parameters {} not found in {}".format(missing, args.parameters),
+            file=sys.stderr,
+        )
+        return 2
+    files = {path.stem: path for path in sorted(args.forcing.glob(args.pattern))}
+    unknown = sorted(set(files) - set(parameters.index))
+    if unknown:
+        print("No parameters for catchments {}".format(unknown), file=sys.stderr)
+
+    writer = ResultWriter(args.output, args.format, args.criteria)
+    todo = [
+        catchment
+        for catchment in files
+        if catchment in parameters.index and catchment not in writer.done
+    ]
+    print(
+        "{} catchments to run, {} already done".format(
+            len(todo), len(writer.done & set(files))
+        )
+    )
+
+    workers = args.workers or int(
+        os.environ.get("HYDROGR_NUM_THREADS", 0) or os.cpu_count() or 1
+    )
+    start = time.perf_counter()
+    buffer, failures, n_steps = [], 0, 0
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+
+    def collect(future: concurrent.futures.Future):
+        nonlocal failures, n_steps
+        catchment = pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as error:
+            failures += 1
+            print("{} : failed : {}".format(catchment, error), file=sys.stderr)
+            return
+        buffer.append(result)
+        n_steps += result["n_steps"]
+        if not args.quiet:
+            scores = " ".join(
+                "{}={:.4f}".format(name, value)
+                for name, value in result["scores"].items()
+            )
+            print(
+                "{} : {} steps, read {:.3f} s, run {:.3f} s ({:.0f} steps/s) {}".format(
+                    catchment,
+                    result["n_steps"],
+                    result["read_seconds"],
+                    result["run_seconds"],
+                    result["n_steps"] / result["run_seconds"],
+                    scores,
+                ).rstrip()
+            )
+        if len(buffer) >= args.part_size:
+            writer.write(buffer)
+            buffer.clear()
+
+    try:
+        for catchment in todo:
+            # Bounded number of catchments in flight
+            while len(pending) >= 2 * workers:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    collect(future)
+            future = executor.submit(
+                run_catchment,
+                Model,
+                catchment,
+                files[catchment],
+                parameters.loc[catchment, Model.parameters_names]
+                .astype(float)
+                .to_dict(),
+                args.criteria,
+                args.warmup,
+                args.precision,
+            )
+            pending[future] = catchment
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                collect(future)
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        writer.write(buffer)
+        print(
+            "Interrupted : {} catchments written, run the same command to resume".format(
+                len(writer.done)
+            ),
+            file=sys.stderr,
+        )
+        return 130
+    executor.shutdown()
+    writer.write(buffer)
+
+    elapsed = time.perf_counter() - start
+    print(
+        "{} catchments, {} failed, {} steps in {:.3f} s ({:.0f} steps/s)".format(
+            len(todo),
+            failures,
+            n_steps,
+            elapsed,
+            n_steps / elapsed if elapsed > 0 else 0.0,
+        )
+    )
+    return 1 if failures else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Entry point of the hydrogr command.
+
+    Args:
+        argv (Sequence[str], optional): Command line arguments, sys.argv[1:] by default.
+
+    Returns:
+        int: Exit status, 0 on success, 1 if some catchments failed, 130 if interrupted.
+    """
+    args = _parser().parse_args(argv)
+    if args.command == "run":
+        return _run(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+from typing import Any, Dict, Iterable, Mapping, Optional
+import numpy as np
+from numpy import ndarray
+
+"""
+Helpers to borrow the float64 buffers of columnar data (Apache Arrow tables and arrays, Polars dataframes and series,
+pandas dataframes and series, mappings of arrays) without materialising intermediate pandas objects.
+pyarrow and polars are optional, they are never imported unless the data already comes from them.
+"""
+
+
+def _module_name(data: Any) -> str:
+    return type(data).__module__.split(".")[0]
+
+
+def is_columnar(data: Any) -> bool:
+    """Return True if the data is an Arrow table or record batch, a Polars dataframe or a mapping of arrays."""
+    module = _module_name(data)
+    if module == "pyarrow":
+        return hasattr(data, "column_names")
+    if module == "polars":
+        return hasattr(data, "get_column")
+    return isinstance(data, Mapping)
+
+
+def to_float_array(column: Any) -> ndarray:
+    """Return the values of a column as a float64 NumPy array, sharing the column buffer when possible.
+
+    The buffer is borrowed when the column is already a contiguous float64 array without missing values, which is
+    the case of single chunk Arrow arrays and Polars series. Otherwise, a copy is made and missing values are
+    replaced by NaN.
+
+    Args:
+        column (Any): NumPy array, pandas series, Arrow array or chunked array, Polars series or any array-like.
+
+    Returns:
+        ndarray: Float64 values.
+    """
+    module = _module_name(column)
+    if module == "pyarrow":
+        if hasattr(column, "num_chunks"):
+            if column.num_chunks == 1:
+                column = column.chunk(0)
+            else:
+                column = column.combine_chunks()
+        import pyarrow as pa
+
+        if not pa.types.is_float64(column.type):
+            column = column.cast(pa.float64())
+        if column.null_count == 0:
+            return column.to_numpy(zero_copy_only=True)
+        return column.fill_null(np.nan).to_numpy(zero_copy_only=True)
+    if module == "polars":
+        import polars as pl
+
+        if column.dtype != pl.Float64:
+            column = column.cast(pl.Float64)
+        if column.null_count() > 0:
+            column = column.fill_null(np.nan)
+        return column.to_numpy()
+    if module == "pandas":
+        return column.to_numpy(dtype=float, na_value=np.nan)
+    return np.asarray(column, dtype=float)
+
+
+def get_column(data: Any, name: str) -> Any:
+    """Return a column of columnar data, raise a KeyError if not found."""
+    if name not in column_names(data):
+        raise KeyError(name)
+    if _module_name(data) == "polars":
+        return data.get_column(name)
+    if _module_name(data) == "pyarrow":
+        return data.column(name)
+    return data[name]
+
+
+def column_names(data: Any) -> Iterable[str]:
+    if _module_name(data) == "pyarrow":
+        return data.column_names
+    if _module_name(data) in ("polars", "pandas"):
+        return data.columns
+    return data.keys()
+
+
+def get_float_columns(data: Any, names: Iterable[str]) -> Dict[str, ndarray]:
+    """Return the selected columns of columnar data as float64 arrays, see to_float_array().
+
+    Args:
+        data (Any): Arrow table, Polars or pandas dataframe, or mapping of arrays.
+        names (Iterable[str]): Names of the columns.
+
+    Returns:
+        Dict[str, ndarray]: Float64 values by column name.
+    """
+    return {name: to_float_array(get_column(data, name)) for name in names}
+
+
+def get_time_column(data: Any, name: str) -> Optional[ndarray]:
+    """Return a time column as a datetime64[ns] NumPy array, None if the column does not exist."""
+    if name not in column_names(data):
+        return None
+    column = get_column(data, name)
+    if _module_name(column) in ("pyarrow", "polars"):
+        column = column.to_numpy()
+    return np.asarray(column, dtype="datetime64[ns]")
+
+
+def slice_rows(data: Any, start: int, stop: int) -> Any:
+    """Return rows [start, stop[ of columnar data. Arrow and Polars slices do not copy the buffers."""
+    if _module_name(data) in ("pyarrow", "polars"):
+        return data.slice(start, stop - start)
+    return {name: data[name][start:stop] for name in column_names(data)}
+
+
+def to_arrow_table(columns: Mapping[str, ndarray]):
+    """Build an Arrow table from NumPy arrays. Float arrays without NaN are wrapped without copy.
+
+    Args:
+        columns (Mapping[str, ndarray]): Arrays by column name.
+
+    Returns:
+        pyarrow.Table: Arrow table.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("pyarrow is required to return Arrow results!") from e
+
+    return pa.table({name: pa.array(values) for name, values in columns.items()})
@@ -0,0 +1,302 @@
+from typing import Any, Iterable, List, Mapping, Optional, Tuple, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr import columnar
+from hydrogr.batch import _check_model, evaluate_batch
+from hydrogr.calibration import (
+    _check_objectives,
+    _losses,
+    _offspring,
+    _pareto_front,
+    _random_population,
+    _select,
+    _tournament,
+    bounds_array,
+    crowding_distance,
+    non_dominated_sort,
+)
+
+"""
+Temporal cross-validation of the models : split-sample test (Klemeš, 1986) and k-fold validation over contiguous blocks
+of the record.
+
+The model is always simulated over the whole input series and the folds only mask the observations, so the warm-up of
+every period is the preceding record, shared by all the folds, instead of a separate warm-up simulation per period.
+The folds are calibrated together with NSGA-II, generation by generation : the populations of all the folds are
+evaluated in a single call to the batch kernel, each parameter set against the calibration observations of its fold.
+
+Example:
+
+    >>> from hydrogr import ModelGr4j
+    >>> from hydrogr.cross_validation import k_fold, cross_validate
+    >>> folds = k_fold(inputs.index, k=5, warmup=365)
+    >>> scores = cross_validate(ModelGr4j, inputs, "flow_mm", folds)
+"""
+
+
+class Fold(object):
+    """Calibration and validation periods of a cross-validation fold.
+
+    Attributes:
+        calibration (ndarray) : Boolean mask of the calibration time steps.
+        validation (ndarray) : Boolean mask of the validation time steps.
+    """
+
+    def __init__(self, calibration: ndarray, validation: ndarray):
+        self.calibration = np.asarray(calibration, dtype=bool)
+        self.validation = np.asarray(validation, dtype=bool)
+        if self.calibration.shape != self.validation.shape:
+            raise ValueError(
+                "Calibration and validation masks should have the same shape"
+            )
+
+
+def _steps(index: Any) -> Tuple[int, Optional[ndarray]]:
+    # Number of time steps and dates, the index being a length or timestamps
+    if isinstance(index, (int, np.integer)):
+        return int(index), None
+    dates = np.asarray(index, dtype="datetime64[ns]")
+    return dates.size, dates
+
+
+def split_sample(
+    index: Any, split: Union[float, Any] = 0.5, warmup: int = 0
+) -> List[Fold]:
+    """Return the two folds of the split-sample test : calibration on the first period and validation on the second,
+    and conversely.
+
+    Args:
+        index (Any): Timestamps of the time steps (datetime index or datetime64 array), or number of time steps.
+        split (Union[float, Any]): Start of the second period, as a fraction of the record or as a date.
+        warmup (int): Number of time steps at the beginning of the series excluded from all the periods.
+
+    Returns:
+        List[Fold]: The two folds.
+    """
+    n_steps, dates = _steps(index)
+    if isinstance(split, (float, np.floating)):
+        if not 0.0 < split < 1.0:
+            raise ValueError("Split fraction should be in ]0, 1[, got {}".format(split))
+        cut = int(round(split * n_steps))
+    elif dates is None:
+        raise ValueError("Split date requires the timestamps of the time steps")
+    else:
+        cut = int(np.searchsorted(dates, np.datetime64(split, "ns")))
+    steps = np.arange(n_steps)
+    scored = steps >= warmup
+    first = scored & (steps < cut)
+    second = scored & (steps >= cut)
+    if not first.any() or not second.any():
+        raise ValueError("Both periods of the split-sample test should be non empty")
+    return [Fold(first, second), Fold(second, first)]
+
+
+def k_fold(index: Any, k: int = 5, warmup: int = 0) -> List[Fold]:
+    """Return k folds over contiguous blocks of the record : each block is validated once, with a calibration on the
+    other blocks.
+
+    Args:
+        index (Any): Timestamps of the time steps (datetime index or datetime64 array), or number of time steps.
+        k (int): Number of folds.
+        warmup (int): Number of time steps at the beginning of the series excluded from all the blocks.
+
+    Returns:
+        List[Fold]: The k folds, in the order of the validation blocks.
+    """
+    n_steps, _ = _steps(index)
+    if k < 2 or k > n_steps - warmup:
+        raise ValueError(
+            "Number of folds should be between 2 and the number of time steps"
+        )
+    blocks = np.array_split(np.arange(warmup, n_steps), k)
+    folds = []
+    for block in blocks:
+        validation = np.zeros(n_steps, dtype=bool)
+        validation[block] = True
+        calibration = np.zeros(n_steps, dtype=bool)
+        calibration[warmup:] = True
+        calibration[block] = False
+        folds.append(Fold(calibration, validation))
+    return folds
+
+
+def _time_index(inputs: Any, time_column: str) -> Optional[ndarray]:
+    # Timestamps of the inputs : datetime index of a dataframe or time column of columnar data, None if not dated
+    if columnar.is_columnar(inputs):
+        return columnar.get_time_column(inputs, time_column)
+    index = getattr(inputs, "index", None)
+    if index is None or not np.issubdtype(index.dtype, np.datetime64):
+        return None
+    return np.asarray(index, dtype="datetime64[ns]")
+
+
+def cross_validate(
+    Model,
+    inputs: Any,
+    observed: Union[str, ndarray],
+    folds: Iterable[Fold],
+    objectives: Iterable[str] = ("nse",),
+    scores: Iterable[str] = ("nse", "kge", "bias"),
+    bounds: Optional[Mapping[str, Tuple[float, float]]] = None,
+    population_size: int = 50,
+    n_generations: int = 50,
+    crossover_probability: float = 0.9,
+    crossover_eta: float = 15.0,
+    mutation_eta: float = 20.0,
+    seed: Optional[int] = None,
+    precision: str = "reference",
+    time_column: str = "date",
+    output: str = "pandas",
+) -> Any:
+    """Calibrate the model on the calibration period of each fold, and score it on the calibration and validation
+    periods.
+
+    Each fold is calibrated with NSGA-II (see calibration.nsga2) on the objectives, and the parameter set of its
+    Pareto front that is the best on the first objective is retained.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        inputs (Any): Input time series (precipitation, evapotranspiration) : dataframe, columnar data or mapping of
+            arrays.
+        observed (Union[str, ndarray]): Observed flow [mm], or name of the observed flow column of the inputs. NaN
+            values are ignored.
+        folds (Iterable[Fold]): Folds, see split_sample() and k_fold().
+        objectives (Iterable[str]): Calibration criteria, among batch.CRITERIA.
+        scores (Iterable[str]): Criteria reported for the calibration and validation periods, among batch.CRITERIA.
+        bounds (Mapping[str, Tuple[float, float]], optional): Parameter ranges overriding the model defaults.
+        population_size (int): Number of parameter sets per generation and per fold.
+        n_generations (int): Number of generations.
+        crossover_probability (float): Probability of crossover of a pair of parents.
+        crossover_eta (float): Distribution index of the simulated binary crossover.
+        mutation_eta (float): Distribution index of the polynomial mutation.
+        seed (int, optional): Seed of the random generators, each fold having its own stream.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+        time_column (str): For columnar inputs, name of the optional column that contains the timestamps.
+        output (str): Format of the table, "pandas" (default) dataframe or "numpy" dictionary of arrays.
+
+    Returns:
+        Any: One row per fold, with the validation period (first and last time step, as dates when the inputs are
+            dated), the number of calibration and validation steps, the calibrated parameters, and the scores on
+            the calibration and validation periods ("calibration_nse", "validation_nse"...).
+    """
+    _check_model(Model, precision)
+    objectives = _check_objectives(objectives)
+    scores = _check_objectives(scores)
+    if output not in ("pandas", "numpy"):
+        raise ValueError(
+            'Unknown output format {}, should be "pandas" or "numpy"'.format(output)
+        )
+    if population_size < 4:
+        raise ValueError("Population size should be at least 4")
+    folds = list(folds)
+    bounds = bounds_array(Model, bounds)
+    arrays = columnar.get_float_columns(
+        inputs, [requirement.name for requirement in Model.input_requirements]
+    )
+    if isinstance(observed, str):
+        observed = columnar.to_float_array(columnar.get_column(inputs, observed))
+    observed = np.asarray(observed, dtype=float)
+    for fold in folds:
+        if fold.calibration.shape != observed.shape:
+            raise ValueError(
+                "Folds should have one value per time step ({})".format(observed.size)
+            )
+    n_folds = len(folds)
+    calibration_observed = np.stack(
+        [np.where(fold.calibration, observed, np.nan) for fold in folds]
+    )
+
+    def evaluate(populations):
+        # Populations of all the folds in a single kernel call, each one against the calibration period of its fold
+        sizes = [population.shape[0] for population in populations]
+        values = evaluate_batch(
+            Model,
+            np.concatenate(populations),
+            arrays["precipitation"],
+            arrays["evapotranspiration"],
+            calibration_observed,
+            objectives,
+            precision=precision,
+            groups=np.repeat(np.arange(n_folds), sizes),
+        )
+        values = np.split(values, np.cumsum(sizes)[:-1])
+        return values, [_losses(fold_values, objectives) for fold_values in values]
+
+    rngs = [
+        np.random.default_rng(child)
+        for child in np.random.SeedSequence(seed).spawn(n_folds)
+    ]
+    populations = [_random_population(rng, bounds, population_size) for rng in rngs]
+    values, losses = evaluate(populations)
+    ranks = [non_dominated_sort(fold_losses) for fold_losses in losses]
+    distances = [
+        crowding_distance(fold_losses, fold_ranks)
+        for fold_losses, fold_ranks in zip(losses, ranks)
+    ]
+
+    for _ in range(n_generations):
+        children = [
+            _offspring(
+                rngs[f],
+                populations[f][
+                    _tournament(rngs[f], ranks[f], distances[f], population_size)
+                ],
+                bounds,
+                crossover_probability,
+                crossover_eta,
+                mutation_eta,
+            )
+            for f in range(n_folds)
+        ]
+        children_values, children_losses = evaluate(children)
+        for f in range(n_folds):
+            populations[f], values[f], losses[f], ranks[f], distances[f] = _select(
+                np.concatenate([populations[f], children[f]]),
+                np.concatenate([values[f], children_values[f]]),
+                np.concatenate([losses[f], children_losses[f]]),
+                population_size,
+            )
+
+    calibrated = np.stack(
+        [
+            _pareto_front(population, value, loss, rank)[0][0]
+            for population, value, loss, rank in zip(populations, values, losses, ranks)
+        ]
+    )
+
+    # Calibration and validation scores of all the folds in a single kernel call
+    validation_observed = np.stack(
+        [np.where(fold.validation, observed, np.nan) for fold in folds]
+    )
+    fold_scores = evaluate_batch(
+        Model,
+        np.concatenate([calibrated, calibrated]),
+        arrays["precipitation"],
+        arrays["evapotranspiration"],
+        np.concatenate([calibration_observed, validation_observed]),
+        scores,
+        precision=precision,
+        groups=np.arange(2 * n_folds),
+    )
+
+    dates = _time_index(inputs, time_column)
+    first = np.array([np.flatnonzero(fold.validation)[0] for fold in folds])
+    last = np.array([np.flatnonzero(fold.validation)[-1] for fold in folds])
+    table = {
+        "fold": np.arange(n_folds),
+        "validation_start": first if dates is None else dates[first],
+        "validation_end": last if dates is None else dates[last],
+        "calibration_steps": np.array([fold.calibration.sum() for fold in folds]),
+        "validation_steps": np.array([fold.validation.sum() for fold in folds]),
+    }
+    for j, name in enumerate(Model.parameters_names):
+        table[name] = calibrated[:, j]
+    for j, name in enumerate(scores):
+        table["calibration_" + name] = fold_scores[:n_folds, j]
+        table["validation_" + name] = fold_scores[n_folds:, j]
+
+    if output == "pandas":
+        from pandas import DataFrame
+
+        return DataFrame(table)
+    return table
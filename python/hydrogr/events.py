@@ -0,0 +1,174 @@
+from typing import Any, Optional
+import numpy as np
+from numpy import ndarray
+
+"""
+Detection of hydrological events in time series : flood events above a flow threshold, low flow spells below a
+threshold and storm events of the rainfall. The series is scanned once by vectorised operations and the events are
+returned as an (n_events, 2) int64 array of time step ranges [start, stop[, sorted by start, that slice the inputs,
+the outputs and the observations of a model run directly.
+
+Events closer than min_separation time steps are merged, unless a time step between them is NaN, then the events
+shorter than min_duration time steps are dropped. Time steps where the series is NaN never belong to an event.
+
+Example:
+
+    >>> from hydrogr import events
+    >>> floods = events.flood_events(flow, np.nanquantile(flow, 0.9), min_separation=5)
+    >>> for handler in inputs.get_events(floods, warmup=365):  # Input data of each event, without copy
+    ...     model.run(handler)
+    >>> observed_floods = events.mask(flow, floods)  # Observed flow restricted to the floods, for calibration
+"""
+
+
+def runs(condition: Any) -> ndarray:
+    """Return the ranges of consecutive time steps where a condition holds.
+
+    Args:
+        condition (Any): Boolean series.
+
+    Returns:
+        ndarray: (n_runs, 2) int64 array of [start, stop[ ranges.
+    """
+    condition = np.asarray(condition, dtype=bool)
+    if condition.ndim != 1:
+        raise ValueError(
+            "Events are detected on 1D series, got shape {}".format(condition.shape)
+        )
+    edges = np.flatnonzero(np.diff(condition, prepend=False, append=False))
+    return edges.reshape(-1, 2).astype(np.int64)
+
+
+def select(
+    ranges: ndarray,
+    min_duration: int = 1,
+    min_separation: int = 0,
+    missing: Optional[Any] = None,
+) -> ndarray:
+    """Merge the ranges separated by less than min_separation time steps, then drop those shorter than min_duration.
+
+    Args:
+        ranges (ndarray): (n, 2) [start, stop[ ranges, sorted and disjoint.
+        min_duration (int): Minimum number of time steps of an event.
+        min_separation (int): Minimum number of time steps between two events.
+        missing (Any, optional): Boolean series of the missing time steps : ranges separated by a missing time step
+            are never merged.
+
+    Returns:
+        ndarray: (n_events, 2) int64 array of [start, stop[ ranges.
+    """
+    ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+    if min_duration < 1 or min_separation < 0:
+        raise ValueError(
+            "Events should last at least 1 time step and be separated by at least 0, got {} and {}".format(
+                min_duration, min_separation
+            )
+        )
+    if len(ranges) > 1 and min_separation > 0:
+        # An event starts at each range far enough from the previous one
+        first = np.concatenate(
+            ([True], ranges[1:, 0] - ranges[:-1, 1] >= min_separation)
+        )
+        if missing is not None:
+            # Number of missing time steps before each time step
+            before = np.concatenate(([0], np.cumsum(np.asarray(missing, dtype=bool))))
+            first[1:] |= before[ranges[1:, 0]] > before[ranges[:-1, 1]]
+        starts = np.flatnonzero(first)
+        stops = np.append(starts[1:], len(ranges)) - 1
+        ranges = np.column_stack((ranges[starts, 0], ranges[stops, 1]))
+    return ranges[ranges[:, 1] - ranges[:, 0] >= min_duration]
+
+
+def flood_events(
+    flow: Any,
+    threshold: float,
+    min_duration: int = 1,
+    min_separation: int = 0,
+) -> ndarray:
+    """Return the periods where the flow exceeds a threshold.
+
+    Args:
+        flow (Any): Flow series.
+        threshold (float): Flow threshold, a high flow quantile for example.
+        min_duration (int): Minimum number of time steps of an event.
+        min_separation (int): Events separated by less time steps are merged.
+
+    Returns:
+        ndarray: (n_events, 2) int64 array of [start, stop[ ranges.
+    """
+    flow = np.asarray(flow, dtype=float)
+    return select(runs(flow > threshold), min_duration, min_separation, np.isnan(flow))
+
+
+def low_flow_spells(
+    flow: Any,
+    threshold: float,
+    min_duration: int = 1,
+    min_separation: int = 0,
+) -> ndarray:
+    """Return the periods where the flow is below a threshold.
+
+    Args:
+        flow (Any): Flow series.
+        threshold (float): Flow threshold, a low flow quantile for example.
+        min_duration (int): Minimum number of time steps of a spell.
+        min_separation (int): Spells separated by less time steps are merged.
+
+    Returns:
+        ndarray: (n_spells, 2) int64 array of [start, stop[ ranges.
+    """
+    flow = np.asarray(flow, dtype=float)
+    return select(runs(flow < threshold), min_duration, min_separation, np.isnan(flow))
+
+
+def storm_events(
+    precipitation: Any,
+    threshold: float = 0.0,
+    min_separation: int = 1,
+    min_depth: float = 0.0,
+    min_duration: int = 1,
+) -> ndarray:
+    """Return the storm events of a rainfall series : rainy time steps (above threshold) separated by less than
+    min_separation dry time steps belong to the same event, and the events of total depth below min_depth are dropped.
+
+    Args:
+        precipitation (Any): Precipitation series [mm].
+        threshold (float): Precipitation above which a time step is rainy.
+        min_separation (int): Minimum number of dry time steps between two events.
+        min_depth (float): Minimum total precipitation of an event [mm].
+        min_duration (int): Minimum number of time steps of an event.
+
+    Returns:
+        ndarray: (n_events, 2) int64 array of [start, stop[ ranges.
+    """
+    precipitation = np.asarray(precipitation, dtype=float)
+    events = select(
+        runs(precipitation > threshold),
+        min_duration,
+        min_separation,
+        np.isnan(precipitation),
+    )
+    if min_depth > 0.0:
+        total = np.concatenate(([0.0], np.cumsum(np.nan_to_num(precipitation))))
+        events = events[total[events[:, 1]] - total[events[:, 0]] >= min_depth]
+    return events
+
+
+def mask(values: Any, events: ndarray) -> ndarray:
+    """Return a copy of a series with NaN outside the events, to restrict the criteria of a calibration or an
+    evaluation to the events (NaN observations are ignored).
+
+    Args:
+        values (Any): Series, the observed flow for example.
+        events (ndarray): (n_events, 2) [start, stop[ ranges.
+
+    Returns:
+        ndarray: Float series, equal to values within the events.
+    """
+    values = np.asarray(values, dtype=float)
+    events = np.asarray(events, dtype=np.int64).reshape(-1, 2)
+    # Number of events covering each time step
+    covering = np.zeros(len(values) + 1, dtype=np.int64)
+    np.add.at(covering, events[:, 0], 1)
+    np.add.at(covering, events[:, 1], -1)
+    return np.where(np.cumsum(covering[:-1]) > 0, values, np.nan)
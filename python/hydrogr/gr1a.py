@@ -1,7 +1,7 @@
 from typing import Dict, Any
+from numpy import ndarray
 from hydrogr.model_interface import ModelGrInterface
 from hydrogr._hydrogr import gr1a
-from pandas import DataFrame
 
 
 class ModelGr1a(ModelGrInterface):
@@ -60,21 +60,19 @@ class ModelGr1a(ModelGrInterface):
         """Return empty dict"""
         return dict()
 
-    def _run_model(self, inputs: DataFrame) -> DataFrame:
+    def _run_arrays(self, inputs: Dict[str, ndarray]) -> Dict[str, ndarray]:
         """Run the model.
 
         Args:
-            inputs (DataFrame): Input data handler, should contain precipitation and evapotranspiration time series.
+            inputs (Dict[str, ndarray]): Should contain precipitation and evapotranspiration time series.
 
         Returns:
-            DataFrame: Dataframe that contains the flow time series [mm/year].
+            Dict[str, ndarray]: Contains the flow time series [mm/year].
         """
         parameters = [self.parameters["X1"]]
-        precipitation = inputs["precipitation"].values.astype(float)
-        evapotranspiration = inputs["evapotranspiration"].values.astype(float)
+        precipitation = inputs["precipitation"]
+        evapotranspiration = inputs["evapotranspiration"]
 
         flow = self.model(parameters, precipitation, evapotranspiration)
 
-        results = DataFrame({"flow": flow})
-        results.index = inputs.index
-        return results
+        return {"flow": flow}
@@ -1,8 +1,8 @@
 from typing import Dict
 import warnings
 import numpy as np
-from pandas import DataFrame
-from hydrogr.model_interface import ModelGrInterface
+from numpy import ndarray
+from hydrogr.model_interface import GAP_POLICIES, ModelGrInterface
 from hydrogr._hydrogr import gr2m
 
 
@@ -41,16 +41,18 @@ class ModelGr2m(ModelGrInterface):
     frequency = ["M", "SM", "BM", "CBM", "MS", "SMS", "BMS", "CBMS"]
     parameters_names = ["X1", "X2"]
     states_names = ["production_store", "routing_store"]
+    gap_policies = GAP_POLICIES
 
-    def __init__(self, parameters: Dict[str, float]):
+    def __init__(self, parameters: Dict[str, float], gaps: str = "propagate"):
         """Constructs an ModelGr2m object.
 
         Args:
             parameters (Dict[str, float]): Value of the parameters require by the model:
                 X1 = production store capacity [mm],
                 X2 = groundwater exchange coefficient [-]
+            gaps (str): Handling of the missing values of the inputs, see ModelGrInterface.
         """
-        super().__init__(parameters)
+        super().__init__(parameters, gaps=gaps)
 
         # Default states values
         self.production_store = 0.3
@@ -125,33 +127,32 @@ class ModelGr2m(ModelGrInterface):
         }
         return states
 
-    def _run_model(self, inputs: DataFrame) -> DataFrame:
+    def _run_arrays(self, inputs: Dict[str, ndarray]) -> Dict[str, ndarray]:
         """Run the model.
 
         Args:
-            inputs (DataFrame): Input data handler, should contain precipitation and evapotranspiration time series.
+            inputs (Dict[str, ndarray]): Should contain precipitation and evapotranspiration time series.
 
         Returns:
-            DataFrame: Dataframe that contains the flow time series [mm/month].
+            Dict[str, ndarray]: Contains the flow time series [mm/month].
         """
         parameters = [self.parameters["X1"], self.parameters["X2"]]
-        precipitation = inputs["precipitation"].values.astype(float)
-        evapotranspiration = inputs["evapotranspiration"].values.astype(float)
+        precipitation = inputs["precipitation"]
+        evapotranspiration = inputs["evapotranspiration"]
         states = np.zeros(2, dtype=float)
         states[0] = self.production_store * self.parameters["X1"]
         states[1] = self.routing_store * self.parameters["X2"]
 
-        states, flow = self.model(
+        states, flow, self._gap_counts = self.model(
             parameters,
             precipitation,
             evapotranspiration,
             states,
+            **self._gap_options(),
         )
 
         # Update states :
         self.production_store = states[0] / self.parameters["X1"]
         self.routing_store = states[1] / self.parameters["X2"]
 
-        results = DataFrame({"flow": flow})
-        results.index = inputs.index
-        return results
+        return {"flow": flow}
@@ -1,9 +1,9 @@
 from typing import Dict, Any
 import warnings
-from hydrogr.model_interface import ModelGrInterface
+from hydrogr.model_interface import AGGREGATIONS, GAP_POLICIES, ModelGrInterface
 from hydrogr._hydrogr import gr4j
 import numpy as np
-from pandas import DataFrame
+from numpy import ndarray
 
 
 class ModelGr4j(ModelGrInterface):
@@ -46,9 +46,29 @@ class ModelGr4j(ModelGrInterface):
     model = gr4j
     frequency = ["D", "B", "C"]
     parameters_names = ["X1", "X2", "X3", "X4"]
+    precisions = ["reference", "fast"]
+    gap_policies = GAP_POLICIES
+    aggregations = AGGREGATIONS
+    in_place = True
     states_names = ["production_store", "routing_store", "uh1", "uh2"]
-
-    def __init__(self, parameters: Dict[str, float]):
+    # Batch runs (see hydrogr.batch) : lower bound of the parameters, parameter giving the capacity of each store
+    # with its default filling rate, length of the unit hydrographs, and default calibration range of the parameters.
+    parameters_thresholds = {"X1": 0.01, "X3": 0.01, "X4": 0.5}
+    stores = {"production_store": ("X1", 0.3), "routing_store": ("X3", 0.5)}
+    uh_lengths = (20, 40)
+    parameters_bounds = {
+        "X1": (10.0, 2500.0),
+        "X2": (-5.0, 5.0),
+        "X3": (1.0, 1000.0),
+        "X4": (0.5, 10.0),
+    }
+
+    def __init__(
+        self,
+        parameters: Dict[str, float],
+        precision: str = "reference",
+        gaps: str = "propagate",
+    ):
         """Constructs an ModelGr4j object.
 
         Args:
@@ -57,14 +77,18 @@ class ModelGr4j(ModelGrInterface):
                 X2 = inter-catchment exchange coefficient [mm/d],
                 X3 = routing store capacity [mm]
                 X4 = unit hydrograph time constant [d]
+            precision (str): "reference" (default) or "fast" kernel elementary functions.
+            gaps (str): Handling of the missing values of the inputs, see ModelGrInterface.
         """
-        super().__init__(parameters)
+        super().__init__(parameters, precision, gaps)
 
         # Default states values
         self.production_store = 0.3
         self.routing_store = 0.5
         self.uh1 = np.zeros(20, dtype=float)
         self.uh2 = np.zeros(40, dtype=float)
+        # Stores levels given to the kernel, updated in place as the unit hydrographs
+        self._levels = np.zeros(2, dtype=float)
 
     def set_parameters(self, parameters: Dict[str, float]):
         """Set model parameters
@@ -135,13 +159,13 @@ class ModelGr4j(ModelGrInterface):
 
         if states["uh1"] is not None:
             assert isinstance(states["uh1"], (np.ndarray, np.generic))
-            self.uh1 = states["uh1"]
+            self.uh1 = np.array(states["uh1"], dtype=float)
         else:
             self.uh1 = np.zeros(20, dtype=float)
 
         if states["uh2"] is not None:
             assert isinstance(states["uh2"], (np.ndarray, np.generic))
-            self.uh2 = states["uh2"]
+            self.uh2 = np.array(states["uh2"], dtype=float)
         else:
             self.uh2 = np.zeros(40, dtype=float)
 
@@ -158,19 +182,19 @@ class ModelGr4j(ModelGrInterface):
         states = {
             "production_store": self.production_store,
             "routing_store": self.routing_store,
-            "uh1": self.uh1,
-            "uh2": self.uh2,
+            "uh1": self.uh1.copy(),
+            "uh2": self.uh2.copy(),
         }
         return states
 
-    def _run_model(self, inputs: DataFrame) -> DataFrame:
+    def _run_arrays(self, inputs: Dict[str, ndarray]) -> Dict[str, ndarray]:
         """Run the model.
 
         Args:
-            inputs (DataFrame): Input data handler, should contain precipitation and evapotranspiration time series.
+            inputs (Dict[str, ndarray]): Should contain precipitation and evapotranspiration time series.
 
         Returns:
-            DataFrame: Dataframe that contains the flow time series [mm/d].
+            Dict[str, ndarray]: Contains the flow time series [mm/d].
         """
         parameters = [
             self.parameters["X1"],
@@ -178,20 +202,27 @@ class ModelGr4j(ModelGrInterface):
             self.parameters["X3"],
             self.parameters["X4"],
         ]
-        precipitation = inputs["precipitation"].values.astype(float)
-        evapotranspiration = inputs["evapotranspiration"].values.astype(float)
-        states = np.zeros(2, dtype=float)
+        precipitation = inputs["precipitation"]
+        evapotranspiration = inputs["evapotranspiration"]
+        states = self._levels
         states[0] = self.production_store * self.parameters["X1"]
         states[1] = self.routing_store * self.parameters["X3"]
 
-        states, self.uh1, self.uh2, flow = self.model(
-            parameters, precipitation, evapotranspiration, states, self.uh1, self.uh2
+        states, self.uh1, self.uh2, flow, self._gap_counts = self.model(
+            parameters,
+            precipitation,
+            evapotranspiration,
+            states,
+            self.uh1,
+            self.uh2,
+            fast=self.precision == "fast",
+            **self._gap_options(),
+            **self._aggregation_options(),
+            **self._buffer_options(),
         )
 
         # Update states :
         self.production_store = states[0] / self.parameters["X1"]
         self.routing_store = states[1] / self.parameters["X3"]
 
-        results = DataFrame({"flow": flow})
-        results.index = inputs.index
-        return results
+        return {"flow": flow}
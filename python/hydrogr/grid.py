@@ -0,0 +1,221 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Any, List, Mapping, Optional, Tuple, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr.batch import default_states, parameters_array, _run_levels
+
+"""
+Gridded simulation : one model per cell of a (time, y, x) forcing cube, with 2D parameter maps.
+
+The grid is processed by spatial chunks of chunk_shape cells, each chunk being streamed over time by blocks of
+time_chunk steps, the model states being carried from one block to the next. Only one block of inputs and outputs per
+chunk in progress is held in memory, so the inputs and outputs can be larger than memory when they are on-disk arrays.
+Any array-like that supports slicing with NumPy semantic can be used (NumPy memmaps, HDF5, Zarr or NetCDF variables,
+xarray DataArrays). A local file backend based on .npy memmaps is provided by create_grid() and open_grid().
+
+Example:
+
+    >>> from hydrogr import ModelGr4j
+    >>> from hydrogr.grid import create_grid, open_grid, run_grid
+    >>> flow = create_grid("flow.npy", precipitation.shape)
+    >>> run_grid(ModelGr4j, parameter_maps, open_grid("precipitation.npy"), open_grid("evapotranspiration.npy"),
+    ...          mask=~land, out=flow)
+"""
+
+
+def create_grid(
+    path: Union[str, Path], shape: Tuple[int, ...], fill_value: float = np.nan
+) -> ndarray:
+    """Create a float64 .npy file of the given shape and return it as a writable memmap.
+
+    Args:
+        path (Union[str, Path]): Path of the file, overwritten if it exists.
+        shape (Tuple[int, ...]): Shape of the array, typically (time, y, x).
+        fill_value (float): Initial value, NaN by default. None to leave the file uninitialised (zeros).
+
+    Returns:
+        ndarray: Memory mapped array.
+    """
+    grid = np.lib.format.open_memmap(path, mode="w+", dtype=float, shape=tuple(shape))
+    if fill_value is not None and fill_value != 0.0:
+        grid.fill(fill_value)
+    return grid
+
+
+def open_grid(path: Union[str, Path], mode: str = "r") -> ndarray:
+    """Open a .npy file as a memmap, read only by default ("r+" to update it)."""
+    return np.load(path, mmap_mode=mode)
+
+
+def _chunks(size: int, chunk_size: int) -> List[slice]:
+    return [
+        slice(start, min(start + chunk_size, size))
+        for start in range(0, size, chunk_size)
+    ]
+
+
+def _run_chunk(
+    Model,
+    parameters: ndarray,
+    precipitation: Any,
+    evapotranspiration: Any,
+    out: Any,
+    y: slice,
+    x: slice,
+    active: ndarray,
+    time_chunk: int,
+    precision: str,
+):
+    n_steps = out.shape[0]
+    shape = (active.shape[0] * active.shape[1],)
+    active = active.reshape(shape)
+    parameters = parameters.reshape(shape + parameters.shape[2:])[active]
+    states = default_states(Model, parameters.shape[0])
+    stores = np.stack(
+        [
+            states[name] * parameters[:, Model.parameters_names.index(capacity)]
+            for name, (capacity, _) in Model.stores.items()
+        ],
+        axis=-1,
+    )
+    uh1, uh2 = states["uh1"], states["uh2"]
+
+    for t in _chunks(n_steps, time_chunk):
+        # Blocks are transposed to one row per cell, as expected by the batch kernel
+        block_precipitation = np.asarray(precipitation[t, y, x], dtype=float)
+        block_precipitation = block_precipitation.reshape(-1, shape[0]).T[active]
+        block_evapotranspiration = np.asarray(evapotranspiration[t, y, x], dtype=float)
+        block_evapotranspiration = block_evapotranspiration.reshape(-1, shape[0]).T[
+            active
+        ]
+        stores, uh1, uh2, flow = _run_levels(
+            Model,
+            parameters,
+            np.ascontiguousarray(block_precipitation),
+            np.ascontiguousarray(block_evapotranspiration),
+            stores,
+            uh1,
+            uh2,
+            precision,
+        )
+        block_flow = np.full((shape[0], flow.shape[1]), np.nan)
+        block_flow[active] = flow
+        out[t, y, x] = block_flow.T.reshape(
+            (flow.shape[1], y.stop - y.start, x.stop - x.start)
+        )
+
+
+def run_grid(
+    Model,
+    parameters: Mapping[str, Any],
+    precipitation: Any,
+    evapotranspiration: Any,
+    mask: Optional[ndarray] = None,
+    out: Optional[Any] = None,
+    chunk_shape: Tuple[int, int] = (64, 64),
+    time_chunk: int = 365,
+    n_workers: int = 2,
+    precision: str = "reference",
+) -> Any:
+    """Simulate each cell of a grid with its own parameters and forcing.
+
+    Masked cells, and cells where a parameter is NaN, are not simulated and get a NaN flow. All the cells start from the
+    default model states.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        parameters (Mapping[str, Any]): (y, x) parameter maps (or scalars) by parameter name.
+        precipitation (Any): (time, y, x) precipitation [mm], NumPy array or chunked on-disk array.
+        evapotranspiration (Any): (time, y, x) evapotranspiration [mm], same shape as the precipitation.
+        mask (ndarray, optional): (y, x) boolean array, True for the cells that are not simulated.
+        out (Any, optional): (time, y, x) writable array that receives the flow, or path of a .npy file to create.
+            A NumPy array is allocated if not given.
+        chunk_shape (Tuple[int, int]): Number of cells (y, x) of the spatial chunks.
+        time_chunk (int): Number of time steps read and simulated at once.
+        n_workers (int): Number of chunks processed concurrently. The cells of a chunk are already simulated in
+            parallel by the kernel, several workers let the reading and writing of a chunk overlap with the
+            simulation of another.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Returns:
+        Any: (time, y, x) flow [mm], the out array if given.
+    """
+    if len(precipitation.shape) != 3 or tuple(precipitation.shape) != tuple(
+        evapotranspiration.shape
+    ):
+        raise ValueError(
+            "Input data should be 3D arrays (time, y, x) of the same shape! Shapes : {}, {}".format(
+                precipitation.shape, evapotranspiration.shape
+            )
+        )
+    shape = tuple(precipitation.shape)
+    grid_shape = shape[1:]
+
+    maps = {}
+    for parameter_name in Model.parameters_names:
+        if parameter_name not in parameters:
+            raise AttributeError(f"Parameters should have a key : {parameter_name}")
+        maps[parameter_name] = np.broadcast_to(
+            np.asarray(parameters[parameter_name], dtype=float), grid_shape
+        )
+    parameters = np.stack([maps[name] for name in Model.parameters_names], axis=-1)
+
+    active = ~np.isnan(parameters).any(axis=-1)
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != grid_shape:
+            raise ValueError(
+                "Mask shape {} does not match the grid shape {}".format(
+                    mask.shape, grid_shape
+                )
+            )
+        active &= ~mask
+    # Check the parameters once for the whole grid, so that threshold warnings are not repeated for each chunk
+    parameters[active] = parameters_array(Model, parameters[active])
+
+    if out is None:
+        out = np.full(shape, np.nan)
+    elif isinstance(out, (str, Path)):
+        out = create_grid(out, shape)
+    elif tuple(out.shape) != shape:
+        raise ValueError(
+            "Output shape {} does not match the input shape {}".format(out.shape, shape)
+        )
+
+    tasks = []
+    for y, x in product(
+        _chunks(grid_shape[0], chunk_shape[0]), _chunks(grid_shape[1], chunk_shape[1])
+    ):
+        if active[y, x].any():
+            tasks.append((y, x))
+        else:
+            out[:, y, x] = np.nan
+
+    def run(task):
+        y, x = task
+        _run_chunk(
+            Model,
+            parameters[y, x],
+            precipitation,
+            evapotranspiration,
+            out,
+            y,
+            x,
+            active[y, x],
+            time_chunk,
+            precision,
+        )
+
+    if n_workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for _ in executor.map(run, tasks):
+                pass
+    else:
+        for task in tasks:
+            run(task)
+
+    if hasattr(out, "flush"):
+        out.flush()
+    return out
@@ -1,12 +1,22 @@
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
 import warnings
 import pandas as pd
 import pandas.api.types as ptypes
 from datetime import datetime
+import numpy as np
+from numpy import ndarray
+from hydrogr import aggregation, columnar, profiling
+from hydrogr.model_interface import _copied_bytes, check_input_arrays
+from hydrogr.model_interface import (
+    InputRequirements,
+)  # noqa: F401 (kept importable from here)
 
 """
 Todo:
     - Add method to create train and test set from input data (not necessary in the handler)
-    - Add method to get period based on the flow or the rainfall (not necessary in the handler) => Useful for specific calibration
+
+Periods based on the flow or the rainfall (floods, low flows, storms) are detected by hydrogr.events, and selected with
+InputDataHandler.get_events().
 """
 
 
@@ -19,10 +29,19 @@ class InputDataHandler(object):
 
     Args:
         Model (ModelGrInterface): Model that will use the input data.
-        data (Dataframe): Input data.
+        data (Any): Input data, as a pandas dataframe with a datetime or period index, or as columnar data (Arrow
+            table, Polars dataframe or mapping of arrays). Columnar data is not converted to pandas, its float64
+            buffers are used directly by the model.
+        time_column (str): For columnar data, name of the optional column that contains the timestamps. The data
+            frequency is only checked if this column exists.
 
     Methods:
         get_sub_period(start_date, end_date) : Get input data on a sub-period.
+        get_period_bounds(start_date, end_date) : Get the range of time steps of a sub-period.
+        get_rows(start, stop) : Get input data on a range of time steps.
+        get_events(events, warmup) : Get input data on each event of hydrogr.events.
+        get_arrays() : Get the input time series required by the model as float64 arrays, converted once.
+        aggregated(Model, data, time_column, how) : Aggregate finer input data to the model frequency (class method).
 
     Example:
 
@@ -31,36 +50,157 @@ class InputDataHandler(object):
         >>> input_handler = InputDataHandler(ModelGr1a, df)
     """
 
-    def __init__(self, Model, data: pd.DataFrame):
-        if not isinstance(data, pd.DataFrame):
+    def __init__(self, Model, data: Any, time_column: str = "date"):
+        self.Model = Model
+        self.time_column = time_column
+        self.data = data
+
+        if isinstance(data, pd.DataFrame):
+            self.__check_data()
+            self.__convert_arrays()
+            self.index = self.data.index
+            self.__check_data_frequency()
+        elif columnar.is_columnar(data):
+            self.__check_columnar_data()
+            self.index = columnar.get_time_column(self.data, time_column)
+            if self.index is not None:
+                self.index = pd.DatetimeIndex(self.index)
+                if len(self.index) != self.n_inputs:
+                    raise ValueError(
+                        'Time column "{}" should have one value per time step! Length : {}, expected {}'.format(
+                            time_column, len(self.index), self.n_inputs
+                        )
+                    )
+                self.__check_data_frequency()
+        else:
             raise TypeError(
-                "Expecting a pandas.Dataframe for input data, received {} instead.".format(
-                    type(data)
-                )
+                "Expecting a pandas.Dataframe or columnar data (Arrow table, Polars dataframe, mapping of arrays) "
+                "for input data, received {} instead.".format(type(data))
             )
 
-        self.Model = Model
+        if self.index is not None:
+            self.start_date = self.index[0]
+            self.end_date = self.index[-1]
+        else:
+            self.start_date = None
+            self.end_date = None
+
+    def get_arrays(self) -> Dict[str, ndarray]:
+        """Return the input time series required by the model as float64 arrays. The buffers of the data are shared
+        when they already contain float64 values without missing values, other columns are converted once when the
+        handler is created.
+
+        Returns:
+            Dict[str, ndarray]: Input time series by name.
+        """
+        return dict(self._arrays)
+
+    def __convert_arrays(self):
+        """
+        Converts the input time series required by the model to float64 arrays, and checks that they are 1D arrays of
+        the same length.
+        """
+        with profiling.phase(self.Model.name, "copy") as phase:
+            self._arrays = columnar.get_float_columns(
+                self.data,
+                [requirement.name for requirement in self.Model.input_requirements],
+            )
+            phase.add(bytes_copied=_copied_bytes(self._arrays, self.data))
 
-        self.data: pd.DataFrame = data
-        self.__check_data()
-        self.__check_data_frequency()
+        self.n_inputs = self._arrays[self.Model.input_requirements[0].name].size
+        for name, values in self._arrays.items():
+            if values.shape != (self.n_inputs,):
+                raise ValueError(
+                    "Input data should be 1D arrays of the same length! "
+                    '"{}" shape : {}'.format(name, values.shape)
+                )
 
-        self.n_inputs = len(self.data.index)
-        self.start_date = self.data.index[0]
-        self.end_date = self.data.index[-1]
+    @classmethod
+    def aggregated(
+        cls,
+        Model,
+        data: Any,
+        time_column: str = "date",
+        how: Optional[Union[str, Mapping[str, str]]] = None,
+    ) -> "InputDataHandler":
+        """Return an input handler with data aggregated to the frequency of the model (hourly data for a daily
+        model, daily data for a monthly or annual model...), in a single pass of the extension over each time series
+        instead of a pandas resample (see hydrogr.aggregation). Only the complete periods are kept.
+
+        Args:
+            Model (ModelGrInterface): Model that will use the input data.
+            data (Any): Input data at a finer frequency, dated by its index or its time column, see
+                InputDataHandler.
+            time_column (str): For columnar data, name of the column that contains the timestamps.
+            how (Union[str, Mapping[str, str]], optional): Reduction, "sum" (default) or "mean", for all the inputs or
+                by name. Other columns given in a mapping (observed flow for example) are aggregated too.
+
+        Returns:
+            InputDataHandler: Data at the model frequency, indexed (or dated) by the start of the periods.
+        """
+        if isinstance(data, pd.DataFrame):
+            index = data.index
+            if isinstance(index, pd.PeriodIndex):
+                index = index.to_timestamp()
+        else:
+            index = columnar.get_time_column(data, time_column)
+        if index is None:
+            raise ValueError(
+                'Aggregation require a time column "{}" in the input data!'.format(
+                    time_column
+                )
+            )
+
+        names = [requirement.name for requirement in Model.input_requirements]
+        if how is None:
+            how = "sum"
+        if not isinstance(how, str):
+            how = dict(how)
+            names += [name for name in how if name not in names]
+            how = {name: how.get(name, "sum") for name in names}
+        values, labels = aggregation.aggregate(
+            columnar.get_float_columns(data, names), index, Model, how
+        )
+
+        if isinstance(data, pd.DataFrame):
+            return cls(Model, pd.DataFrame(values, index=pd.DatetimeIndex(labels)))
+        return cls(Model, {time_column: labels, **values}, time_column)
 
     def get_sub_period(
         self, start_date: datetime, end_date: datetime
     ) -> "InputDataHandler":
-        """Return a new input handler with input data on the selected period.
+        """Return a new input handler with input data on the selected period. The period is found by binary search
+        on the time index and the data is sliced without copy (see get_rows()).
 
         Args:
             start_date (datetime): Period start date
-            end_date (datetime): Period start date
+            end_date (datetime): Period end date (included)
 
         Returns:
             InputDataHandler: Data on the selected period.
         """
+        start, stop = self.get_period_bounds(start_date, end_date)
+        return self.get_rows(start, stop)
+
+    def get_period_bounds(
+        self, start_date: datetime, end_date: datetime
+    ) -> Tuple[int, int]:
+        """Return the range of time steps of a sub-period, by binary search on the time index.
+
+        Args:
+            start_date (datetime): Period start date
+            end_date (datetime): Period end date (included)
+
+        Returns:
+            Tuple[int, int]: Range [start, stop[ of the time steps within the period.
+        """
+        if self.index is None:
+            raise ValueError(
+                'Sub-period selection require a time column "{}" in the input data!'.format(
+                    self.time_column
+                )
+            )
+
         if start_date < self.start_date:
             warnings.warn(
                 "The selected start date ({}) is prior to the date of the first datasample : {}".format(
@@ -74,8 +214,78 @@ class InputDataHandler(object):
                 )
             )
 
-        mask = (self.data.index >= start_date) & (self.data.index <= end_date)
-        return InputDataHandler(self.Model, self.data.loc[mask])
+        start = int(self.index.searchsorted(start_date, side="left"))
+        stop = int(self.index.searchsorted(end_date, side="right"))
+        return start, max(start, stop)
+
+    def get_rows(self, start: int, stop: int) -> "InputDataHandler":
+        """Return a new input handler with input data on the time steps [start, stop[. The data was validated with
+        the whole series : it is sliced without copy nor new validation.
+
+        Args:
+            start (int): First time step.
+            stop (int): Time step following the last one.
+
+        Returns:
+            InputDataHandler: Data on the selected time steps.
+        """
+        if not 0 <= start < stop <= self.n_inputs:
+            raise ValueError(
+                "Time steps range [{}, {}[ should be non empty and within the {} time steps of the input data".format(
+                    start, stop, self.n_inputs
+                )
+            )
+        handler = object.__new__(type(self))
+        handler.Model = self.Model
+        handler.time_column = self.time_column
+        if isinstance(self.data, pd.DataFrame):
+            handler.data = self.data.iloc[start:stop]
+        else:
+            handler.data = columnar.slice_rows(self.data, start, stop)
+        handler._arrays = {
+            name: values[start:stop] for name, values in self._arrays.items()
+        }
+        handler.n_inputs = stop - start
+        if self.index is not None:
+            handler.index = self.index[start:stop]
+            handler.start_date = handler.index[0]
+            handler.end_date = handler.index[-1]
+        else:
+            handler.index = None
+            handler.start_date = None
+            handler.end_date = None
+        return handler
+
+    def get_events(self, events: Any, warmup: int = 0) -> List["InputDataHandler"]:
+        """Return the input data of each event, as detected by hydrogr.events, without copy.
+
+        Args:
+            events (Any): (n_events, 2) [start, stop[ ranges of time steps.
+            warmup (int): Number of time steps kept before each event, for the warm-up of the model states (fewer
+                at the start of the data).
+
+        Returns:
+            List[InputDataHandler]: Data of each event.
+        """
+        return [
+            self.get_rows(max(int(start) - warmup, 0), int(stop))
+            for start, stop in np.asarray(events, dtype=np.int64).reshape(-1, 2)
+        ]
+
+    def __check_columnar_data(self):
+        """
+        Checks the data prerequisites, defined in the models, for columnar data.
+        """
+        names = columnar.column_names(self.data)
+        for prerequisite in self.Model.input_requirements:
+            if prerequisite.name not in names:
+                raise ValueError(
+                    'Input data should contains "{}" data! Keyword "{}" not found.'.format(
+                        prerequisite.name, prerequisite.name
+                    )
+                )
+        self.__convert_arrays()
+        check_input_arrays(self.Model, self._arrays)
 
     def __check_data(self):
         """
@@ -117,11 +327,11 @@ class InputDataHandler(object):
         Check input data frequency using pandas offset aliases :
         https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html
         """
-        freq = self.data.index.freq
+        freq = self.index.freq
         if freq is not None:
             freq = freq.name
         else:
-            freq = pd.infer_freq(self.data.index)
+            freq = pd.infer_freq(self.index)
 
         # For annual frequency pandas also return the month so we have to split the result :
         if freq.split("-")[0] in self.Model.frequency:
@@ -136,29 +346,16 @@ class InputDataHandler(object):
             )
 
     def __check_for_na_in_inputs(self, column_name):
+        # NA are expected when the model fills the gaps of the inputs
+        if getattr(self.Model, "gaps", "propagate") != "propagate":
+            return
         detected_na = self.data[column_name].isnull().values.any()
         if detected_na:
-            warnings.warn(
-                "NA detected in {} time series! ({})".format(
-                    InputDataHandler.data_names[column_name], column_name
-                )
-            )
+            warnings.warn("NA detected in {} time series!".format(column_name))
 
     def __check_for_negative_values_in_inputs(self, column_name):
         detected_neg = (self.data[column_name] < 0.0).any()
         if detected_neg:
             warnings.warn(
-                "Negative values detected in {} time series! ({})".format(
-                    InputDataHandler.data_names[column_name], column_name
-                )
+                "Negative values detected in {} time series!".format(column_name)
             )
-
-
-class InputRequirements(object):
-    """
-    Simple helper to define model mandatory input time series as well as the associated rules
-    """
-
-    def __init__(self, name, positive=False):
-        self.name = name
-        self.positive = positive
@@ -1,7 +1,105 @@
-from typing import Dict, Any
+from typing import Dict, Any, Mapping, Optional, Tuple, TYPE_CHECKING
 import abc
-from pandas import DataFrame
-from hydrogr.input_data import InputDataHandler, InputRequirements
+import warnings
+import numpy as np
+from numpy import ndarray
+from hydrogr import aggregation as _aggregation
+from hydrogr import columnar, profiling
+
+if TYPE_CHECKING:
+    from hydrogr.aio import WorkerPool
+    from hydrogr.input_data import InputDataHandler
+
+"""
+Pandas is only imported when a dataframe is given to or returned by a model (run() method), so that the models can be
+used through the run_arrays() method with a NumPy only dependency.
+"""
+
+
+OUTPUT_FORMATS = ["pandas", "numpy", "arrow"]
+GAP_POLICIES = ["propagate", "zero", "linear", "climatology", "skip"]
+AGGREGATIONS = _aggregation.REDUCTIONS
+
+
+class InputRequirements(object):
+    """
+    Simple helper to define model mandatory input time series as well as the associated rules
+    """
+
+    def __init__(self, name, positive=False):
+        self.name = name
+        self.positive = positive
+
+
+def check_input_arrays(Model, arrays: Mapping[str, ndarray]):
+    """Warn about NA and negative values in the input time series, following the model input requirements. NA are
+    not reported when the model fills the gaps (gaps policy other than "propagate").
+
+    Args:
+        Model (ModelGrInterface): Model that will use the input data.
+        arrays (Mapping[str, ndarray]): Float arrays of the input time series, by name.
+    """
+    fill_gaps = getattr(Model, "gaps", "propagate") != "propagate"
+    for requirement in Model.input_requirements:
+        values = arrays[requirement.name]
+        if not fill_gaps and np.isnan(values).any():
+            warnings.warn("NA detected in {} time series!".format(requirement.name))
+        if requirement.positive and (values < 0.0).any():
+            warnings.warn(
+                "Negative values detected in {} time series!".format(requirement.name)
+            )
+
+
+def _copied_bytes(arrays: Mapping[str, ndarray], data: Any) -> int:
+    # Arrays that own their data were allocated by the conversion, views share the buffer of the input data.
+    copied = 0
+    for name, array in arrays.items():
+        if array.flags.owndata and array is not columnar.get_column(data, name):
+            copied += array.nbytes
+    return copied
+
+
+def seasons(index: Any) -> ndarray:
+    """Return the season of each time step, used to fill the gaps of the inputs with their climatology : hour of the
+    year for sub-daily data, day of the year for daily data, month for monthly data, a single season otherwise.
+
+    Args:
+        index (Any): Timestamps of the time steps (datetime index or datetime64 array).
+
+    Returns:
+        ndarray: Season index of each time step, as int64.
+    """
+    dates = np.asarray(index, dtype="datetime64[ns]")
+    if dates.size > 1:
+        # Median time step [h]
+        step = np.median(np.diff(dates).astype("timedelta64[h]").astype(np.int64))
+    else:
+        step = 24
+    days = (dates.astype("datetime64[D]") - dates.astype("datetime64[Y]")).astype(
+        np.int64
+    )
+    if step < 24:
+        hours = (dates.astype("datetime64[h]") - dates.astype("datetime64[D]")).astype(
+            np.int64
+        )
+        return days * 24 + hours
+    if step < 28 * 24:
+        return days
+    if step < 365 * 24:
+        return (dates.astype("datetime64[M]") - dates.astype("datetime64[Y]")).astype(
+            np.int64
+        )
+    return np.zeros(dates.size, dtype=np.int64)
+
+
+def _gaps_report(counts: Tuple[int, int, int]) -> Dict[str, int]:
+    # Number of time steps filled in each input and number of time steps skipped, as counted by the kernel
+    precipitation, evapotranspiration, skipped = counts
+    return {
+        "precipitation": precipitation,
+        "evapotranspiration": evapotranspiration,
+        "skipped": skipped,
+    }
 
 
 class ModelGrInterface(object, metaclass=abc.ABCMeta):
@@ -10,10 +108,29 @@ class ModelGrInterface(object, metaclass=abc.ABCMeta):
 
     Args:
         parameters (Dict[str, float]): Model parameters.
+        precision (str): Precision of the model kernel, one of the model "precisions" :
+            "reference" (default) use the standard elementary functions,
+            "fast" replace the power functions and the hyperbolic tangent by cheaper forms, within a few ulps.
+        gaps (str): Handling of the missing values (NaN) of the inputs by the kernel, one of the model
+            "gap_policies" :
+            "propagate" (default) pass them to the model, the flow is NaN from the first gap,
+            "zero" replace them by 0,
+            "linear" interpolate them linearly, the nearest value being held at the edges of the series,
+            "climatology" replace them by the mean of the same season (see seasons()), require dated inputs,
+            "skip" skip the time step, the states are held and the flow is NaN.
+            "linear" and "climatology" do not fill the gaps of an input without any valid value.
+
+    Attributes:
+        gaps_report (Dict[str, int]) : After a run, number of filled time steps of each input and number of
+            skipped time steps ("skipped").
 
     Methods:
-        run(inputs):
+        run(inputs, output, aggregation, how):
             Run the model over the period of the input data.
+        run_arrays(inputs, out):
+            Run the model over NumPy arrays, without pandas.
+        arun(inputs):
+            Awaitable counterpart of run(), executed in a worker pool.
         set_parameters(parameters):
             Set model parameters.
         set_states(states):
@@ -34,12 +151,25 @@ class ModelGrInterface(object, metaclass=abc.ABCMeta):
         InputRequirements(name="precipitation", positive=True),
         InputRequirements(name="evapotranspiration", positive=True),
     ]
+    precisions = ["reference"]
+    gap_policies = ["propagate"]
+    # Reductions of the flow over coarser periods computed by the kernel (see run())
+    aggregations = []
+    # Kernel writing the flow into a given array and updating the model states in place (see run_arrays())
+    in_place = False
 
-    def __init__(self, parameters: Dict[str, float]):
+    def __init__(
+        self,
+        parameters: Dict[str, float],
+        precision: str = "reference",
+        gaps: str = "propagate",
+    ):
         """Constructs an ModelGrInterface object.
 
         Args:
             parameters (Dict[str, float]): Value of the parameters require by the model.
+            precision (str): Precision of the model kernel, one of the model "precisions".
+            gaps (str): Handling of the missing values of the inputs, one of the model "gap_policies".
         """
         # Check that model posses all mandatory properties :
         for property_name in ModelGrInterface.__mandatory_class_properties:
@@ -50,21 +180,154 @@ class ModelGrInterface(object, metaclass=abc.ABCMeta):
                     )
                 )
 
+        if precision not in self.precisions:
+            raise ValueError(
+                "Precision {} not available for {}, should be one of : {}".format(
+                    precision, self.name, self.precisions
+                )
+            )
+        self.precision = precision
+
+        if gaps not in self.gap_policies:
+            raise ValueError(
+                "Gap policy {} not available for {}, should be one of : {}".format(
+                    gaps, self.name, self.gap_policies
+                )
+            )
+        self.gaps = gaps
+        self.gaps_report = None
+        self._seasons = None
+        self._periods = None
+        self._out = None
+
         self.set_parameters(parameters)
 
-    def run(self, inputs: DataFrame) -> DataFrame:
-        """Run the model on the given input data. Return the results as a Pandas dataframe.
+    def run(
+        self,
+        inputs: Any,
+        output: str = "pandas",
+        aggregation: Optional[str] = None,
+        how: str = "sum",
+    ) -> Any:
+        """Run the model on the given input data. Return the results as a Pandas dataframe by default.
 
         Args:
-            inputs (DataFrame): Dataframe that define the require inputs time series for the simulation duration.
+            inputs (Any): Dataframe that define the require inputs time series for the simulation duration. Columnar
+                data (Arrow table, Polars dataframe, mapping of arrays) is also accepted and used without conversion
+                to pandas, see InputDataHandler.
+            output (str): Format of the results :
+                "pandas" (default) : dataframe indexed as the input data,
+                "numpy" : dictionary of arrays,
+                "arrow" : Arrow table, with the input time column if any (require pyarrow).
+            aggregation (str, optional): Coarser frequency of the results ("D", "MS", "YS"...), see
+                hydrogr.aggregation. The flow is aggregated by the kernel as it is computed, over the complete periods
+                of the input data, and the results are indexed by the start of the periods. Require dated inputs.
+            how (str): Reduction of the flow over the periods, one of the model "aggregations" : "sum" (default)
+                or "mean".
 
         Returns:
-            DataFrame: Dataframe that contains the results of the simulation, for each timestamp in the input data.
+            Any: Results of the simulation, for each timestamp in the input data, or for each period.
         """
-        inputs = InputDataHandler(
-            self, inputs
-        )  # To ensure input data is coherent with the model.
-        return self._run_model(inputs.data)
+        if output not in OUTPUT_FORMATS:
+            raise ValueError(
+                "Unknown output format {}, should be one of : {}".format(
+                    output, OUTPUT_FORMATS
+                )
+            )
+        if aggregation is not None and how not in self.aggregations:
+            raise ValueError(
+                "Aggregation by {} not available for {}, should be one of : {}".format(
+                    how, self.name, self.aggregations
+                )
+            )
+        from hydrogr.input_data import InputDataHandler
+
+        with profiling.phase(self.name, "validation"):
+            inputs = InputDataHandler(
+                self, inputs
+            )  # To ensure input data is coherent with the model.
+        return self._run_model(inputs, output, aggregation, how)
+
+    def run_arrays(
+        self, inputs: Any, out: Optional[ndarray] = None
+    ) -> Dict[str, ndarray]:
+        """Run the model on input time series given as arrays. Return the results as NumPy arrays.
+        Unlike run(), the frequency of the data can not be checked and pandas is not required.
+
+        Args:
+            inputs (Any): Input time series by name (precipitation, evapotranspiration), as 1D arrays of the same
+                length, or any columnar data (Arrow table, Polars dataframe).
+            out (ndarray, optional): Writable float64 array of one element per time step into which the flow is
+                written and returned, a row of a 2D array of flows for example, so that loops over many runs do not
+                allocate their outputs. Require a model with an "in_place" kernel.
+
+        Returns:
+            Dict[str, ndarray]: Output time series by name, for each time step of the input data.
+        """
+        names = columnar.column_names(inputs)
+        for requirement in self.input_requirements:
+            if requirement.name not in names:
+                raise ValueError(
+                    'Input data should contains "{}" data! Keyword "{}" not found.'.format(
+                        requirement.name, requirement.name
+                    )
+                )
+
+        with profiling.phase(self.name, "copy") as phase:
+            arrays = columnar.get_float_columns(
+                inputs, [requirement.name for requirement in self.input_requirements]
+            )
+            phase.add(bytes_copied=_copied_bytes(arrays, inputs))
+
+        with profiling.phase(self.name, "validation"):
+            n_inputs = arrays[self.input_requirements[0].name].size
+            for name, values in arrays.items():
+                if values.shape != (n_inputs,):
+                    raise ValueError(
+                        "Input data should be 1D arrays of the same length! "
+                        '"{}" shape : {}'.format(name, values.shape)
+                    )
+            check_input_arrays(self, arrays)
+            if out is not None:
+                if not self.in_place:
+                    raise ValueError(
+                        "Output arrays are not available for {}".format(self.name)
+                    )
+                if not (
+                    isinstance(out, ndarray)
+                    and out.dtype == np.float64
+                    and out.shape == (n_inputs,)
+                    and out.flags.writeable
+                ):
+                    raise ValueError(
+                        "Output should be a writable float64 array of shape ({},)".format(
+                            n_inputs
+                        )
+                    )
+
+        self._out = out
+        try:
+            return self._run_kernel(arrays, columnar.get_time_column(inputs, "date"))
+        finally:
+            self._out = None
+
+    async def arun(
+        self, inputs: Any, output: str = "pandas", pool: Optional["WorkerPool"] = None
+    ) -> Any:
+        """Run the model as run(), in a worker pool so that the event loop is not blocked (see hydrogr.aio).
+        The same model instance should not be run concurrently.
+
+        Args:
+            inputs (Any): Input data, see run().
+            output (str): Format of the results, see run().
+            pool (WorkerPool, optional): Worker pool, hydrogr.aio.default_pool() by default.
+
+        Returns:
+            Any: Results of the simulation, for each timestamp in the input data.
+        """
+        from hydrogr import aio
+
+        return await aio.arun(self, inputs, output, pool)
 
     @abc.abstractmethod
     def set_parameters(self, parameters: Dict[str, float]):
@@ -93,6 +356,103 @@ class ModelGrInterface(object, metaclass=abc.ABCMeta):
         """
         raise NotImplementedError("Not implemented in abstract class!")
 
+    def _run_model(
+        self,
+        inputs: "InputDataHandler",
+        output: str = "pandas",
+        aggregation: Optional[str] = None,
+        how: str = "sum",
+    ) -> Any:
+        """Run the model on validated input data.
+
+        Args:
+            inputs (InputDataHandler): Input data, should contain the time series listed in the model input
+                requirements.
+            output (str): Format of the results, "pandas", "numpy" or "arrow".
+            aggregation (str, optional): Coarser frequency of the results, see run().
+            how (str): Reduction of the flow over the periods, see run().
+
+        Returns:
+            Any: Results of the simulation, for each timestamp in the input data, or for each period.
+        """
+        # Converted once by the input handler, see InputDataHandler.get_arrays()
+        arrays = inputs.get_arrays()
+        index = inputs.index
+        if aggregation is not None:
+            if index is None:
+                raise ValueError(
+                    'Aggregated runs require dated inputs (time index or "date" column)!'
+                )
+            bounds, index = _aggregation.periods(index, aggregation)
+            self._periods = (bounds, how)
+        try:
+            outputs = self._run_kernel(arrays, inputs.index)
+        finally:
+            self._periods = None
+
+        with profiling.phase(self.name, "output") as phase:
+            if output == "pandas":
+                from pandas import DataFrame
+
+                results = DataFrame(outputs, index=index)
+                phase.add(bytes_allocated=int(results.memory_usage(index=False).sum()))
+            elif output == "arrow":
+                columns = dict(outputs)
+                if index is not None:
+                    columns = {inputs.time_column: np.asarray(index), **columns}
+                results = columnar.to_arrow_table(columns)
+            else:
+                results = outputs
+        return results
+
+    def _run_kernel(
+        self, arrays: Dict[str, ndarray], index: Any = None
+    ) -> Dict[str, ndarray]:
+        self._seasons = None
+        # Gap counts returned by the kernels, none for the models without gap policy
+        self._gap_counts = (0, 0, 0)
+        if self.gaps == "climatology":
+            if index is None:
+                raise ValueError(
+                    'Climatology gap filling require dated inputs (time index or "date" column)!'
+                )
+            self._seasons = seasons(index)
+
+        with profiling.phase(self.name, "kernel") as phase:
+            outputs = self._run_arrays(arrays)
+            phase.add(
+                steps=arrays[self.input_requirements[0].name].size,
+                bytes_allocated=sum(
+                    array.nbytes for array in outputs.values() if array is not self._out
+                ),
+            )
+        self.gaps_report = _gaps_report(self._gap_counts)
+        return outputs
+
+    def _gap_options(self) -> Dict[str, Any]:
+        # Keyword arguments of the kernels for the gap policy
+        return {"gaps": self.gaps, "seasons": self._seasons}
+
+    def _aggregation_options(self) -> Dict[str, Any]:
+        # Keyword arguments of the kernels for an aggregated run, none for a run at the model time step
+        if self._periods is None:
+            return {}
+        bounds, how = self._periods
+        return {"periods": bounds, "reduction": how}
+
+    def _buffer_options(self) -> Dict[str, Any]:
+        # Keyword arguments of the in place kernels : the states buffers of the model are updated in place, and the
+        # flow is written into the output array of run_arrays() if any
+        return {"out": self._out, "inplace": True}
+
     @abc.abstractmethod
-    def _run_model(self, inputs: DataFrame):
+    def _run_arrays(self, inputs: Dict[str, ndarray]) -> Dict[str, ndarray]:
+        """Run the model kernel and update the model states.
+
+        Args:
+            inputs (Dict[str, ndarray]): Float arrays of the input time series, by name.
+
+        Returns:
+            Dict[str, ndarray]: Output time series, by name.
+        """
         raise NotImplementedError("Not implemented in abstract class!")
@@ -0,0 +1,93 @@
+from typing import Any, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr._hydrogr import evapotranspiration as _evapotranspiration
+
+"""
+Potential evapotranspiration from the air temperature, computed by the Rust extension for many catchments at once :
+temperature is given as a (n_catchments, n_steps) array with the latitude of each catchment and the timestamps shared
+by all the catchments. The extraterrestrial radiation and the day length are tabulated once per latitude for the 366
+days of the year, and the tables are kept by the extension for the next calls.
+
+Available formulas :
+    - "oudin" : Oudin et al. (2005), from the extraterrestrial radiation (FAO-56), zero below -5 °C,
+    - "hamon" : Hamon (1961) as in Lu et al. (2005), from the day length and the saturated vapour density.
+
+The values are daily totals [mm/d], spread evenly over the time steps of sub-daily series. The result is a float64
+array in the layout of the inputs of the model kernels, so that it can be given to them directly.
+
+Example:
+
+    >>> from hydrogr import pet
+    >>> evapotranspiration = pet.compute(temperature, latitudes, dates)  # (n, n_steps) temperature [°C]
+    >>> flow, states = run_batch(ModelGr4j, parameters, precipitation, evapotranspiration)
+    >>> model.run_arrays({"precipitation": p, "evapotranspiration": pet.compute(t, 48.2, dates)})
+"""
+
+FORMULAS = ["oudin", "hamon"]
+
+
+def day_of_year(index: Any) -> ndarray:
+    """Return the day of the year (1 to 366) of timestamps.
+
+    Args:
+        index (Any): Timestamps (datetime index or datetime64 array).
+
+    Returns:
+        ndarray: Day of the year of each timestamp, as int64.
+    """
+    dates = np.asarray(index, dtype="datetime64[ns]")
+    return (dates.astype("datetime64[D]") - dates.astype("datetime64[Y]")).astype(
+        np.int64
+    ) + 1
+
+
+def compute(
+    temperature: ndarray,
+    latitude: Union[float, ndarray],
+    index: Any,
+    formula: str = "oudin",
+) -> ndarray:
+    """Compute the potential evapotranspiration of one or several catchments.
+
+    Args:
+        temperature (ndarray): Air temperature [°C], (n_steps,) for a single catchment or (n, n_steps).
+        latitude (Union[float, ndarray]): Latitude [°] of the catchment, or (n,) latitudes of the catchments.
+        index (Any): Timestamps of the time steps (datetime index or datetime64 array), daily or sub-daily.
+        formula (str): "oudin" (default) or "hamon".
+
+    Returns:
+        ndarray: Potential evapotranspiration [mm] of each time step, of the shape of temperature.
+    """
+    if formula not in FORMULAS:
+        raise ValueError(
+            "Unknown evapotranspiration formula {}, should be one of : {}".format(
+                formula, FORMULAS
+            )
+        )
+    temperature = np.asarray(temperature, dtype=float)
+    series = np.ascontiguousarray(np.atleast_2d(temperature))
+    latitudes = np.broadcast_to(np.asarray(latitude, dtype=float), series.shape[:1])
+
+    dates = np.asarray(index, dtype="datetime64[ns]")
+    if dates.shape != series.shape[1:]:
+        raise ValueError(
+            "Temperature should have one value per timestamp ({}), got {}".format(
+                dates.size, series.shape[1]
+            )
+        )
+    # Length of the time step [d], the daily values being spread over sub-daily time steps
+    scale = 1.0
+    if dates.size > 1:
+        step = np.median(np.diff(dates).astype(np.int64)) / 86400e9
+        if step > 1.0 + 1e-9:
+            raise ValueError(
+                "Evapotranspiration is computed for daily or sub-daily time steps, aggregate it afterwards "
+                "(see hydrogr.aggregation)"
+            )
+        scale = step
+
+    values = _evapotranspiration(
+        series, latitudes.tolist(), day_of_year(dates), formula, scale
+    )
+    return values.reshape(temperature.shape)
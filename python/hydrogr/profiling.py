@@ -0,0 +1,237 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+from hydrogr._hydrogr import profiling_enable, profiling_reset, profiling_counters
+
+"""
+Opt-in instrumentation of the model calls.
+
+When enabled, each model call records the wall time, the number of calls, the bytes allocated and copied, and the
+number of simulated steps of the following phases :
+    - validation : input data checks done by the InputDataHandler in ModelGrInterface.run(),
+    - copy : conversion of the input time series to float arrays (only bytes actually copied are counted),
+    - kernel : call to the Rust model,
+    - output : construction of the output dataframe or table.
+The Rust kernels also record their own counters (unit hydrograph initialisation and main loop time, steps and
+allocated bytes). When disabled, instrumentation reduces to a module attribute lookup per phase.
+
+Example:
+
+    >>> from hydrogr import profiling
+    >>> with profiling.profile() as profiler:
+    ...     outputs = model.run(inputs)
+    >>> profiler.as_dict()
+"""
+
+
+class PhaseStatistics(object):
+    """Accumulated statistics of a phase."""
+
+    __slots__ = ["calls", "wall_time", "bytes_allocated", "bytes_copied", "steps"]
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.0
+        self.bytes_allocated = 0
+        self.bytes_copied = 0
+        self.steps = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        statistics = {
+            "calls": self.calls,
+            "wall_time": self.wall_time,
+            "bytes_allocated": self.bytes_allocated,
+            "bytes_copied": self.bytes_copied,
+            "steps": self.steps,
+        }
+        if self.steps and self.wall_time > 0.0:
+            statistics["steps_per_second"] = self.steps / self.wall_time
+        return statistics
+
+
+class Profiler(object):
+    """Collect the phase statistics of the model calls, per model.
+
+    Methods:
+        reset() : Clear the statistics, including the Rust kernel counters.
+        as_dict() : Export the statistics as a dictionary.
+        to_json() : Export the statistics as a JSON string.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, Dict[str, PhaseStatistics]] = {}
+
+    def reset(self):
+        with self._lock:
+            self.phases = {}
+        profiling_reset()
+
+    def record(
+        self,
+        model: str,
+        name: str,
+        wall_time: float,
+        steps: int = 0,
+        bytes_allocated: int = 0,
+        bytes_copied: int = 0,
+    ):
+        with self._lock:
+            statistics = self.phases.setdefault(model, {}).setdefault(
+                name, PhaseStatistics()
+            )
+            statistics.calls += 1
+            statistics.wall_time += wall_time
+            statistics.steps += steps
+            statistics.bytes_allocated += bytes_allocated
+            statistics.bytes_copied += bytes_copied
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Export the statistics.
+
+        Returns:
+            Dict[str, Any]: With keys :
+                phases : statistics of the Python phases, per model and phase name.
+                kernels : counters of the Rust kernels, per model.
+        """
+        with self._lock:
+            phases = {
+                model: {name: stats.as_dict() for name, stats in model_phases.items()}
+                for model, model_phases in self.phases.items()
+            }
+
+        kernels = {}
+        for model, counters in profiling_counters().items():
+            if counters["calls"] == 0:
+                continue
+            kernel = {
+                "calls": counters["calls"],
+                "steps": counters["steps"],
+                "uh_init_time": counters["uh_init_ns"] * 1e-9,
+                "loop_time": counters["loop_ns"] * 1e-9,
+                "bytes_allocated": counters["bytes_allocated"],
+            }
+            if counters["loop_ns"] > 0:
+                kernel["steps_per_second"] = counters["steps"] / (
+                    counters["loop_ns"] * 1e-9
+                )
+            kernels[model] = kernel
+
+        return {"phases": phases, "kernels": kernels}
+
+    def to_json(self, **kwargs) -> str:
+        """Export the statistics as a JSON string. Keyword arguments are passed to json.dumps."""
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+class _Phase(object):
+    __slots__ = [
+        "profiler",
+        "model",
+        "name",
+        "steps",
+        "bytes_allocated",
+        "bytes_copied",
+        "start",
+    ]
+
+    def __init__(self, profiler: Profiler, model: str, name: str):
+        self.profiler = profiler
+        self.model = model
+        self.name = name
+        self.steps = 0
+        self.bytes_allocated = 0
+        self.bytes_copied = 0
+
+    def add(self, steps: int = 0, bytes_allocated: int = 0, bytes_copied: int = 0):
+        self.steps += steps
+        self.bytes_allocated += bytes_allocated
+        self.bytes_copied += bytes_copied
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(
+            self.model,
+            self.name,
+            time.perf_counter() - self.start,
+            self.steps,
+            self.bytes_allocated,
+            self.bytes_copied,
+        )
+        return False
+
+
+class _DisabledPhase(object):
+    __slots__ = []
+
+    def add(self, steps: int = 0, bytes_allocated: int = 0, bytes_copied: int = 0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_disabled_phase = _DisabledPhase()
+_profiler: Optional[Profiler] = None
+
+
+def phase(model: str, name: str):
+    """Context manager that time a phase of a model call. Does nothing if profiling is disabled.
+
+    Args:
+        model (str): Name of the model.
+        name (str): Name of the phase.
+    """
+    if _profiler is None:
+        return _disabled_phase
+    return _Phase(_profiler, model, name)
+
+
+def enable(profiler: Optional[Profiler] = None) -> Profiler:
+    """Enable profiling.
+
+    Args:
+        profiler (Profiler, optional): Profiler that collect the statistics. A new one is created if not given.
+
+    Returns:
+        Profiler: The active profiler.
+    """
+    global _profiler
+    _profiler = profiler if profiler is not None else Profiler()
+    profiling_enable(True)
+    return _profiler
+
+
+def disable():
+    """Disable profiling. Statistics already collected stay available in the profiler."""
+    global _profiler
+    _profiler = None
+    profiling_enable(False)
+
+
+def is_enabled() -> bool:
+    return _profiler is not None
+
+
+def get_profiler() -> Optional[Profiler]:
+    """Return the active profiler, None if profiling is disabled."""
+    return _profiler
+
+
+@contextmanager
+def profile():
+    """Enable profiling inside a with block and yield the profiler. Kernel counters are reset on entry."""
+    profiler = enable()
+    profiler.reset()
+    try:
+        yield profiler
+    finally:
+        disable()
@@ -0,0 +1,124 @@
+from typing import Any, Iterable, Mapping, Optional, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr import profiling
+from hydrogr._hydrogr import regionalise as _regionalise
+from hydrogr.batch import CRITERIA, _check_model, _shared_initial_states
+from hydrogr.batch import parameters_array
+
+"""
+Regionalisation by parameter transfer : the parameter sets of n donor catchments are run on the forcing of m receiver
+(ungauged or validation) catchments. The n × m simulations are run in parallel by the Rust kernel, and each one is
+reduced as soon as it is computed, so that the (n, m, n_steps) flow tensor is only allocated when requested :
+    - "criteria" : criteria of each donor on each receiver, against the receiver observations (donor selection),
+    - "mean" : weighted mean of the donor flows for each receiver (output averaging),
+    - "flow" : flow of every donor × receiver pair.
+
+Example:
+
+    >>> from hydrogr import ModelGr4j
+    >>> from hydrogr.regionalisation import regionalise
+    >>> flow = regionalise(ModelGr4j, donors, precipitation, evapotranspiration, weights=1.0 / distances ** 2)
+"""
+
+REDUCTIONS = ["mean", "criteria", "flow"]
+
+
+def regionalise(
+    Model,
+    donors: Union[Mapping[str, Any], ndarray],
+    precipitation: ndarray,
+    evapotranspiration: ndarray,
+    reduction: str = "mean",
+    weights: Optional[ndarray] = None,
+    observed: Optional[ndarray] = None,
+    criteria: Iterable[str] = ("nse",),
+    warmup: int = 0,
+    states: Optional[Mapping[str, Any]] = None,
+    precision: str = "reference",
+) -> ndarray:
+    """Run the parameter sets of n donor catchments on the forcing of m receiver catchments.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        donors (Union[Mapping[str, Any], ndarray]): Donor parameter sets, see batch.parameters_array().
+        precipitation (ndarray): (m, n_steps) precipitation of the receivers [mm].
+        evapotranspiration (ndarray): (m, n_steps) evapotranspiration of the receivers [mm].
+        reduction (str): "mean" (default), "criteria" or "flow", see the module documentation.
+        weights (ndarray, optional): For the "mean" reduction, (n, m) weight of each donor for each receiver (equal
+            weights by default), with a positive sum for each receiver. Donors with a zero weight are not simulated
+            for the receiver.
+        observed (ndarray, optional): For the "criteria" reduction, (m, n_steps) observed flow of the receivers [mm],
+            NaN values are ignored.
+        criteria (Iterable[str]): For the "criteria" reduction, names of the criteria, among batch.CRITERIA.
+        warmup (int): Number of time steps at the beginning of the series excluded from the criteria.
+        states (Mapping[str, Any], optional): Initial states, see batch.run_batch(). Unit hydrographs are shared by
+            all the donors.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Returns:
+        ndarray: "mean" : (m, n_steps) flow [mm], "criteria" : (n, m, n_criteria) criteria values, "flow" :
+            (n, m, n_steps) flow [mm].
+    """
+    _check_model(Model, precision)
+    if reduction not in REDUCTIONS:
+        raise ValueError(
+            "Unknown reduction {}, should be one of : {}".format(reduction, REDUCTIONS)
+        )
+    criteria = list(criteria)
+    for criterion in criteria:
+        if criterion not in CRITERIA:
+            raise ValueError(
+                "Unknown criterion {}, should be one of : {}".format(
+                    criterion, CRITERIA
+                )
+            )
+    donors = parameters_array(Model, donors)
+    precipitation = np.ascontiguousarray(np.atleast_2d(precipitation), dtype=float)
+    evapotranspiration = np.ascontiguousarray(
+        np.atleast_2d(evapotranspiration), dtype=float
+    )
+    n, (m, n_steps) = donors.shape[0], precipitation.shape
+    levels, uh1, uh2 = _shared_initial_states(Model, donors, states)
+
+    if reduction == "mean":
+        if weights is None:
+            weights = np.ones((n, m))
+        weights = np.ascontiguousarray(np.broadcast_to(weights, (n, m)), dtype=float)
+        if (weights < 0.0).any():
+            raise ValueError("Donor weights should be non negative")
+        empty = np.flatnonzero(~(weights.sum(axis=0) > 0.0))
+        if empty.size:
+            raise ValueError(
+                "Donor weights of each receiver should have a positive sum, receivers without weight : {}".format(
+                    empty.tolist()
+                )
+            )
+    if reduction == "criteria":
+        if observed is None:
+            raise ValueError("Criteria reduction requires the receiver observations")
+        observed = np.ascontiguousarray(np.atleast_2d(observed), dtype=float)
+
+    with profiling.phase(Model.name, "kernel") as phase:
+        values = _regionalise(
+            Model.name,
+            donors,
+            precipitation,
+            evapotranspiration,
+            levels,
+            uh1,
+            uh2,
+            reduction,
+            observed=observed,
+            criteria=criteria,
+            weights=weights,
+            warmup=warmup,
+            fast=precision == "fast",
+        )
+        phase.add(steps=n * m * n_steps)
+
+    if reduction == "criteria":
+        return values.reshape(n, m, len(criteria))
+    if reduction == "flow":
+        return values.reshape(n, m, n_steps)
+    return values
@@ -0,0 +1,608 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import json
+import os
+import threading
+import time
+import numpy as np
+from numpy import ndarray
+from hydrogr import profiling
+from hydrogr.batch import _check_model, _member_initial_states, _run_levels
+from hydrogr.batch import parameters_array
+from hydrogr.gr4h import ModelGr4h
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.gr5j import ModelGr5j
+from hydrogr.gr6j import ModelGr6j
+
+"""
+Local forecasting service : calibrated parameters and current states of many catchments are kept in memory by a
+registry, and the forcing of concurrent requests is gathered in micro-batches, each run by a single call of the batch
+kernel (see hydrogr.batch). The registry is periodically checkpointed to disk.
+
+Requests are JSON documents posted to /forecast :
+    {"catchment": "L0123001", "precipitation": [...], "evapotranspiration": [...], "update_states": false}
+The response gives the flow [mm] : {"catchment": "L0123001", "flow": [...]}. With "update_states", the final states
+of the run replace the catchment states (assimilation of the observed forcing), otherwise they are left unchanged
+(forecast). GET /catchments lists the registered catchments.
+
+Example:
+
+    >>> from hydrogr.serving import ForecastServer, StateRegistry
+    >>> registry = StateRegistry()
+    >>> registry.register("L0123001", ModelGr4j, {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208})
+    >>> server = ForecastServer(registry, port=8080, checkpoint_path="registry.npz", checkpoint_interval=600.0)
+    >>> server.serve_forever()
+"""
+
+MODELS = {Model.name: Model for Model in [ModelGr4j, ModelGr5j, ModelGr6j, ModelGr4h]}
+
+
+class _Group(object):
+    # Catchments of the same model, stored as arrays with one row per catchment : parameters, stores levels [mm] and
+    # unit hydrographs, so that a batch of catchments is gathered by indexing.
+    def __init__(self, Model):
+        self.Model = Model
+        self.ids = []
+        self.rows = {}
+        self.parameters = np.empty((0, len(Model.parameters_names)))
+        self.stores = np.empty((0, len(Model.stores)))
+        self.uh1 = np.empty((0, Model.uh_lengths[0]))
+        self.uh2 = np.empty((0, Model.uh_lengths[1]))
+
+    def set(self, catchment: str, parameters: ndarray, stores, uh1, uh2):
+        if catchment in self.rows:
+            row = self.rows[catchment]
+        else:
+            row = len(self.ids)
+            self.ids.append(catchment)
+            self.rows[catchment] = row
+            self.parameters = _append_row(self.parameters)
+            self.stores = _append_row(self.stores)
+            self.uh1 = _append_row(self.uh1)
+            self.uh2 = _append_row(self.uh2)
+        self.parameters[row] = parameters
+        self.set_states(catchment, stores, uh1, uh2)
+
+    def set_states(self, catchment: str, stores, uh1, uh2):
+        row = self.rows[catchment]
+        self.stores[row] = stores
+        self.uh1[row] = uh1
+        self.uh2[row] = uh2
+
+
+def _append_row(array: ndarray) -> ndarray:
+    # Capacity is doubled when full, the arrays are views of the filled rows
+    n = array.shape[0]
+    base = array.base if array.base is not None else array
+    if base.shape[0] == n:
+        base = np.empty((max(2 * n, 16),) + array.shape[1:])
+        base[:n] = array
+    return base[: n + 1]
+
+
+class StateRegistry(object):
+    """Parameters and current states of catchments, resident in memory. The catchments of the same model are stored
+    as arrays, one row per catchment. Methods are thread safe.
+
+    Args:
+        path (Union[str, Path], optional): Checkpoint file to load (see save()).
+
+    Methods:
+        register(catchment, Model, parameters, states):
+            Add or replace a catchment.
+        get_states(catchment):
+            Return the states of a catchment.
+        run(requests, update_states):
+            Run catchments on their forcing, by batches of the same model and length.
+        save(path):
+            Checkpoint the registry to a file.
+        load(path):
+            Replace the registry by the content of a checkpoint file.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self._lock = threading.RLock()
+        self._groups = {}
+        self._models = {}
+        if path is not None:
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __contains__(self, catchment: str) -> bool:
+        return catchment in self._models
+
+    @property
+    def catchments(self) -> Dict[str, str]:
+        """Model name of each registered catchment."""
+        with self._lock:
+            return dict(self._models)
+
+    def register(
+        self,
+        catchment: str,
+        Model,
+        parameters: Union[Mapping[str, Any], ndarray],
+        states: Optional[Mapping[str, Any]] = None,
+    ):
+        """Add or replace a catchment.
+
+        Args:
+            catchment (str): Catchment identifier.
+            Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+            parameters (Union[Mapping[str, Any], ndarray]): Calibrated parameters, by name or in the order of
+                Model.parameters_names.
+            states (Mapping[str, Any], optional): Initial states (stores filling rates [-] and unit hydrographs),
+                model default states by default.
+        """
+        _check_model(Model)
+        parameters = parameters_array(Model, parameters, 1)
+        # The unit hydrographs of the batch kernel have a fixed length
+        x4 = parameters[0, Model.parameters_names.index("X4")]
+        if np.ceil(x4) > Model.uh_lengths[0]:
+            raise ValueError(
+                "X4 of catchment {} should be at most {} time steps, got {}".format(
+                    catchment, Model.uh_lengths[0], x4
+                )
+            )
+        stores, uh1, uh2 = _member_initial_states(Model, parameters, states)
+        with self._lock:
+            previous = self._models.get(catchment)
+            if previous is not None and previous != Model.name:
+                self._remove(catchment)
+            group = self._groups.setdefault(Model.name, _Group(Model))
+            group.set(catchment, parameters[0], stores[0], uh1[0], uh2[0])
+            self._models[catchment] = Model.name
+
+    def _remove(self, catchment: str):
+        group = self._groups[self._models.pop(catchment)]
+        row = group.rows.pop(catchment)
+        last = len(group.ids) - 1
+        # The last row takes the place of the removed one
+        for name in ["parameters", "stores", "uh1", "uh2"]:
+            array = getattr(group, name)
+            array[row] = array[last]
+            setattr(group, name, array[:last])
+        moved = group.ids.pop()
+        if moved != catchment:
+            group.ids[row] = moved
+            group.rows[moved] = row
+
+    def get_states(self, catchment: str) -> Dict[str, Any]:
+        """Return the states of a catchment : stores filling rates [-] and unit hydrographs.
+
+        Args:
+            catchment (str): Catchment identifier.
+
+        Returns:
+            Dict[str, Any]: States of the catchment, with the same keys as the model states.
+        """
+        with self._lock:
+            group = self._groups[self._model_name(catchment)]
+            row = group.rows[catchment]
+            Model = group.Model
+            states = {
+                name: float(
+                    group.stores[row, i]
+                    / group.parameters[row, Model.parameters_names.index(capacity)]
+                )
+                for i, (name, (capacity, _)) in enumerate(Model.stores.items())
+            }
+            states["uh1"] = group.uh1[row].copy()
+            states["uh2"] = group.uh2[row].copy()
+        return states
+
+    def _model_name(self, catchment: str) -> str:
+        if catchment not in self._models:
+            raise KeyError("Unknown catchment {}".format(catchment))
+        return self._models[catchment]
+
+    def run(
+        self,
+        requests: Iterable[Tuple[str, ndarray, ndarray]],
+        update_states: Union[bool, Iterable[bool]] = False,
+        precision: str = "reference",
+    ) -> List[ndarray]:
+        """Run catchments from their current states. Requests of the same model and forcing length are run by a
+        single call of the batch kernel. A catchment should appear once. The states are updated once all the requests
+        have run, none are updated if a run fails.
+
+        Args:
+            requests (Iterable[Tuple[str, ndarray, ndarray]]): Catchment identifier, precipitation [mm] and
+                evapotranspiration [mm] of each request.
+            update_states (Union[bool, Iterable[bool]]): Replace the catchment states by the final states of the
+                run, for all the requests or for each request.
+            precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+        Returns:
+            List[ndarray]: Flow [mm] of each request.
+        """
+        requests = list(requests)
+        if isinstance(update_states, bool):
+            update_states = [update_states] * len(requests)
+        update_states = list(update_states)
+        catchments = [catchment for catchment, _, _ in requests]
+        if len(set(catchments)) != len(catchments):
+            raise ValueError("A catchment should appear once in a batch of requests")
+
+        batches = {}
+        for k, (catchment, precipitation, evapotranspiration) in enumerate(requests):
+            precipitation = np.asarray(precipitation, dtype=float)
+            evapotranspiration = np.asarray(evapotranspiration, dtype=float)
+            if (
+                precipitation.ndim != 1
+                or precipitation.shape != evapotranspiration.shape
+            ):
+                raise ValueError(
+                    "Forcing of catchment {} should be 1D arrays of the same length! Shapes : {}, {}".format(
+                        catchment, precipitation.shape, evapotranspiration.shape
+                    )
+                )
+            key = (self._model_name(catchment), precipitation.size)
+            batches.setdefault(key, []).append((k, precipitation, evapotranspiration))
+
+        flows = [None] * len(requests)
+        results = []
+        for (model_name, _), batch in batches.items():
+            with self._lock:
+                group = self._groups[model_name]
+                rows = np.array([group.rows[catchments[k]] for k, _, _ in batch])
+                parameters = group.parameters[rows]
+                stores = group.stores[rows]
+                uh1 = group.uh1[rows]
+                uh2 = group.uh2[rows]
+            with profiling.phase(group.Model.name, "copy") as phase:
+                precipitation = np.stack([p for _, p, _ in batch])
+                evapotranspiration = np.stack([e for _, _, e in batch])
+                phase.add(bytes_copied=precipitation.nbytes + evapotranspiration.nbytes)
+            stores, uh1, uh2, flow = _run_levels(
+                group.Model,
+                parameters,
+                precipitation,
+                evapotranspiration,
+                stores,
+                uh1,
+                uh2,
+                precision,
+            )
+            results.append((model_name, batch, stores, uh1, uh2))
+            for j, (k, _, _) in enumerate(batch):
+                flows[k] = flow[j]
+
+        with self._lock:
+            for model_name, batch, stores, uh1, uh2 in results:
+                group = self._groups.get(model_name)
+                for j, (k, _, _) in enumerate(batch):
+                    # The catchment may have been removed or moved to another model meanwhile, its parameters may
+                    # have been registered again : only its states are replaced
+                    if (
+                        update_states[k]
+                        and self._models.get(catchments[k]) == model_name
+                    ):
+                        group.set_states(catchments[k], stores[j], uh1[j], uh2[j])
+        return flows
+
+    def save(self, path: Union[str, Path]):
+        """Checkpoint the registry to a .npz file. The file is written next to the destination then renamed, so that
+        an interrupted checkpoint never leaves a partial file.
+
+        Args:
+            path (Union[str, Path]): Destination file.
+        """
+        path = Path(path)
+        arrays = {}
+        with self._lock:
+            for name, group in self._groups.items():
+                arrays[name + "/ids"] = np.array(group.ids, dtype=str)
+                for field in ["parameters", "stores", "uh1", "uh2"]:
+                    arrays[name + "/" + field] = getattr(group, field).copy()
+        temporary = path.with_name(path.name + ".tmp")
+        with open(temporary, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, path)
+
+    def load(self, path: Union[str, Path]):
+        """Replace the registry by the content of a checkpoint file written by save().
+
+        Args:
+            path (Union[str, Path]): Checkpoint file.
+        """
+        groups = {}
+        models = {}
+        with np.load(path) as data:
+            for name in {key.split("/")[0] for key in data.files}:
+                if name not in MODELS:
+                    raise ValueError("Unknown model {} in checkpoint".format(name))
+                group = _Group(MODELS[name])
+                ids = [str(catchment) for catchment in data[name + "/ids"]]
+                group.ids = ids
+                group.rows = {catchment: row for row, catchment in enumerate(ids)}
+                for field in ["parameters", "stores", "uh1", "uh2"]:
+                    setattr(
+                        group, field, np.array(data[name + "/" + field], dtype=float)
+                    )
+                groups[name] = group
+                models.update({catchment: name for catchment in ids})
+        with self._lock:
+            self._groups = groups
+            self._models = models
+
+
+class MicroBatcher(object):
+    """Gather the requests of concurrent callers in batches run by a single thread : a batch is run when max_batch
+    requests are waiting or max_delay seconds after its first request. Requests on a catchment already in the batch
+    are deferred to the next batch, so that the states are updated in order.
+
+    Args:
+        registry (StateRegistry): Catchments registry.
+        max_batch (int): Maximum number of requests per batch.
+        max_delay (float): Maximum waiting time [s] of the first request of a batch.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Methods:
+        submit(catchment, precipitation, evapotranspiration, update_states):
+            Queue a request and return a future of its flow.
+        close():
+            Stop the batching thread, after the queued requests.
+    """
+
+    def __init__(
+        self,
+        registry: StateRegistry,
+        max_batch: int = 256,
+        max_delay: float = 0.002,
+        precision: str = "reference",
+    ):
+        if max_batch < 1 or max_delay < 0.0:
+            raise ValueError(
+                "Batch size should be positive and delay non negative, got {}, {}".format(
+                    max_batch, max_delay
+                )
+            )
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.precision = precision
+        self._queue = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._loop, name="hydrogr-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        catchment: str,
+        precipitation: ndarray,
+        evapotranspiration: ndarray,
+        update_states: bool = False,
+    ) -> Future:
+        """Queue a request.
+
+        Args:
+            catchment (str): Catchment identifier.
+            precipitation (ndarray): Precipitation [mm].
+            evapotranspiration (ndarray): Evapotranspiration [mm].
+            update_states (bool): Replace the catchment states by the final states of the run.
+
+        Returns:
+            Future: Future of the flow [mm], see concurrent.futures.
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Batcher is closed")
+            self._queue.append(
+                (catchment, precipitation, evapotranspiration, update_states, future)
+            )
+            self._condition.notify()
+        return future
+
+    def _next_batch(self) -> list:
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            deadline = time.monotonic() + self.max_delay
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    break
+                self._condition.wait(remaining)
+            batch, deferred, catchments = [], [], set()
+            for request in self._queue:
+                if len(batch) < self.max_batch and request[0] not in catchments:
+                    catchments.add(request[0])
+                    batch.append(request)
+                else:
+                    deferred.append(request)
+            self._queue = deferred
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            batch = [
+                request
+                for request in batch
+                if request[4].set_running_or_notify_cancel()
+            ]
+            # Requests on unknown catchments fail alone
+            valid = []
+            for request in batch:
+                if request[0] in self.registry:
+                    valid.append(request)
+                else:
+                    request[4].set_exception(
+                        KeyError("Unknown catchment {}".format(request[0]))
+                    )
+            try:
+                flows = self.registry.run(
+                    [(catchment, p, e) for catchment, p, e, _, _ in valid],
+                    update_states=[update for _, _, _, update, _ in valid],
+                    precision=self.precision,
+                )
+            except BaseException:
+                # Run the requests one by one, so that only the invalid ones fail. The panics of the kernels are
+                # BaseException : they fail their request instead of stopping the batching thread.
+                for catchment, p, e, update, future in valid:
+                    try:
+                        future.set_result(
+                            self.registry.run(
+                                [(catchment, p, e)], update, self.precision
+                            )[0]
+                        )
+                    except BaseException as error:
+                        future.set_exception(error)
+                continue
+            for request, flow in zip(valid, flows):
+                request[4].set_result(flow)
+
+    def close(self):
+        """Stop the batching thread, after the queued requests."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # JSON requests handler of ForecastServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, document: Any):
+        body = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/catchments":
+            self._send(200, self.server.registry.catchments)
+        elif self.path == "/health":
+            self._send(200, {"status": "ok", "catchments": len(self.server.registry)})
+        else:
+            self._send(404, {"error": "Unknown path {}".format(self.path)})
+
+    def do_POST(self):
+        if self.path != "/forecast":
+            self._send(404, {"error": "Unknown path {}".format(self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            document = json.loads(self.rfile.read(length))
+            catchment = str(document["catchment"])
+            precipitation = np.asarray(document["precipitation"], dtype=float)
+            evapotranspiration = np.asarray(document["evapotranspiration"], dtype=float)
+            update_states = bool(document.get("update_states", False))
+        except KeyError as error:
+            self._send(400, {"error": "Missing field {}".format(error)})
+            return
+        except (ValueError, TypeError) as error:
+            self._send(400, {"error": str(error)})
+            return
+        if catchment not in self.server.registry:
+            self._send(404, {"error": "Unknown catchment {}".format(catchment)})
+            return
+        try:
+            future = self.server.batcher.submit(
+                catchment, precipitation, evapotranspiration, update_states
+            )
+        except RuntimeError as error:
+            # Batcher closed, the server is shutting down
+            self._send(503, {"error": str(error)})
+            return
+        try:
+            flow = future.result()
+        except KeyError as error:
+            # Catchment removed or reloaded since the check
+            self._send(404, {"error": str(error.args[0]) if error.args else ""})
+            return
+        except (ValueError, TypeError) as error:
+            self._send(400, {"error": str(error)})
+            return
+        except Exception as error:
+            self._send(500, {"error": "{}: {}".format(type(error).__name__, error)})
+            return
+        # NaN flows are returned as null, JSON having no NaN
+        self._send(
+            200,
+            {
+                "catchment": catchment,
+                "flow": [None if np.isnan(q) else q for q in flow.tolist()],
+            },
+        )
+
+
+class ForecastServer(ThreadingHTTPServer):
+    """HTTP server of forecasts, see the module documentation for the requests. Each connection is served by a
+    thread, the runs being gathered by a MicroBatcher.
+
+    Args:
+        registry (StateRegistry): Catchments registry.
+        host (str): Address of the server, local only by default.
+        port (int): Port of the server, any free port if 0 (see server_address).
+        max_batch (int): Maximum number of requests per batch, see MicroBatcher.
+        max_delay (float): Maximum waiting time [s] of the first request of a batch, see MicroBatcher.
+        checkpoint_path (Union[str, Path], optional): File where the registry is checkpointed.
+        checkpoint_interval (float): Time [s] between two checkpoints.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Methods:
+        serve_forever():
+            Handle requests until shutdown() (see socketserver.BaseServer).
+        shutdown():
+            Stop serve_forever().
+        server_close():
+            Stop the batcher, write a last checkpoint and close the socket.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        registry: StateRegistry,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_batch: int = 256,
+        max_delay: float = 0.002,
+        checkpoint_path: Optional[Union[str, Path]] = None,
+        checkpoint_interval: float = 300.0,
+        precision: str = "reference",
+    ):
+        self.registry = registry
+        self.batcher = MicroBatcher(registry, max_batch, max_delay, precision)
+        self.checkpoint_path = checkpoint_path
+        self._stop_checkpoints = threading.Event()
+        self._checkpoints = None
+        if checkpoint_path is not None:
+            self._checkpoints = threading.Thread(
+                target=self._checkpoint_loop,
+                args=(checkpoint_interval,),
+                name="hydrogr-checkpoint",
+                daemon=True,
+            )
+            self._checkpoints.start()
+        super().__init__((host, port), _Handler)
+
+    def _checkpoint_loop(self, interval: float):
+        while not self._stop_checkpoints.wait(interval):
+            self.registry.save(self.checkpoint_path)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if self._checkpoints is not None:
+            self._stop_checkpoints.set()
+            self._checkpoints.join()
+            self.registry.save(self.checkpoint_path)
@@ -0,0 +1,111 @@
+from typing import Any, Dict, Iterable, Optional
+import numpy as np
+from numpy import ndarray
+from hydrogr import columnar
+from hydrogr._hydrogr import flow_signatures as _flow_signatures
+
+"""
+Hydrological signatures of simulated or observed flow series, computed by the Rust extension over (n_series, n_steps)
+arrays, the series being processed in parallel. Percentiles are obtained by selection instead of a full sort of each
+series. Time steps where the flow is NaN are ignored.
+
+Available signatures :
+    - "mean" : mean flow,
+    - "q5", "q95" : flows exceeded 5 % and 95 % of the time (high and low flows),
+    - "fdc_slope" : slope of the flow duration curve between the 33 % and 66 % exceedance flows, in log space
+      (Sawicz et al., 2011),
+    - "baseflow_index" : ratio of the baseflow to the flow, the baseflow being separated by the Lyne and Hollick
+      filter in three passes (Ladson et al., 2013), missing values being removed from the series before filtering,
+    - "runoff_ratio" : ratio of the flow to the precipitation, over the time steps where both are available,
+    - "recession_constant" : median ratio of the flow to the flow of the previous time step, over the periods of
+      at least 5 consecutive decreasing time steps.
+
+Example:
+
+    >>> from hydrogr.batch import run_batch
+    >>> from hydrogr.signatures import compute
+    >>> flow, _ = run_batch(ModelGr4j, parameters, precipitation, evapotranspiration)  # (n, n_steps)
+    >>> values = compute(flow, exceedance=np.linspace(0.01, 0.99, 99))
+"""
+
+SIGNATURES = [
+    "mean",
+    "q5",
+    "q95",
+    "fdc_slope",
+    "baseflow_index",
+    "runoff_ratio",
+    "recession_constant",
+]
+
+
+def _flow_array(flow: Any) -> ndarray:
+    # Flow column of a model output (dataframe, Arrow table, mapping of arrays), or array of series
+    if columnar.is_columnar(flow) or hasattr(flow, "columns"):
+        flow = columnar.to_float_array(columnar.get_column(flow, "flow"))
+    return np.asarray(flow, dtype=float)
+
+
+def compute(
+    flow: Any,
+    signatures: Iterable[str] = (
+        "mean",
+        "q5",
+        "q95",
+        "fdc_slope",
+        "baseflow_index",
+        "recession_constant",
+    ),
+    precipitation: Optional[ndarray] = None,
+    exceedance: Optional[Iterable[float]] = None,
+    warmup: int = 0,
+    alpha: float = 0.925,
+) -> Dict[str, Any]:
+    """Compute hydrological signatures of one or several flow series.
+
+    Args:
+        flow (Any): Flow [mm] : output of a model run (with a "flow" column), (n_steps,) series or (n_series, n_steps)
+            array, such as the flow of batch.run_batch().
+        signatures (Iterable[str]): Names of the signatures, among SIGNATURES.
+        precipitation (ndarray, optional): Precipitation [mm], (n_steps,) shared by all the series or
+            (n_series, n_steps). Required by "runoff_ratio".
+        exceedance (Iterable[float], optional): Exceedance probabilities of the flow duration curve, in [0, 1].
+        warmup (int): Number of time steps at the beginning of the series excluded from the signatures.
+        alpha (float): Parameter of the baseflow filter.
+
+    Returns:
+        Dict[str, Any]: Values of each signature, (n_series,) arrays or floats for a single series, and under "fdc"
+            the flows at the exceedance probabilities, (n_series, n_probabilities) or (n_probabilities,).
+    """
+    signatures = list(signatures)
+    for name in signatures:
+        if name not in SIGNATURES:
+            raise ValueError(
+                "Unknown signature {}, should be one of : {}".format(name, SIGNATURES)
+            )
+    exceedance = [] if exceedance is None else [float(p) for p in exceedance]
+    flow = _flow_array(flow)
+    single = flow.ndim == 1
+    flow = np.ascontiguousarray(np.atleast_2d(flow))
+    if precipitation is not None:
+        precipitation = np.ascontiguousarray(np.atleast_2d(precipitation), dtype=float)
+    elif "runoff_ratio" in signatures:
+        raise ValueError("Runoff ratio requires the precipitation")
+
+    values = _flow_signatures(
+        flow,
+        signatures,
+        precipitation=precipitation,
+        exceedance=exceedance,
+        warmup=warmup,
+        alpha=alpha,
+    )
+
+    if single:
+        values = values[0]
+    result = {name: values[..., k] for k, name in enumerate(signatures)}
+    if single:
+        result = {name: float(value) for name, value in result.items()}
+    if exceedance:
+        result["fdc"] = values[..., len(signatures) :]
+    return result
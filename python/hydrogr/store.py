@@ -0,0 +1,310 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+from pathlib import Path
+import json
+import sqlite3
+import time
+import numpy as np
+from numpy import ndarray
+from hydrogr.batch import _check_model, _member_states, parameters_array
+
+"""
+Embedded store of the parameters, states and metadata of many catchments, in a SQLite database (standard library,
+single file). Each catchment has one record per model structure, the arrays being stored as float64 blobs.
+
+Records of a model are read in a single query and hydrated into contiguous batch arrays, in the layout of
+batch.run_batch() (parameters as a (n, n_parameters) array, stores filling rates as (n,) arrays, unit hydrographs as
+(n, length) arrays), and written back in a single transaction.
+
+Example:
+
+    >>> from hydrogr.store import CatchmentStore
+    >>> store = CatchmentStore("catchments.sqlite")
+    >>> catchments, parameters, states = store.get_batch(ModelGr4j)
+    >>> flow, final_states = run_batch(ModelGr4j, parameters, precipitation, evapotranspiration, states)
+    >>> store.put_states(ModelGr4j, catchments, final_states)
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catchments (
+    catchment TEXT NOT NULL,
+    model TEXT NOT NULL,
+    parameters BLOB NOT NULL,
+    stores BLOB NOT NULL,
+    uh1 BLOB NOT NULL,
+    uh2 BLOB NOT NULL,
+    metadata TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (catchment, model)
+) WITHOUT ROWID
+"""
+
+# Maximum number of catchments per "IN" query, under the SQLite limit on the number of variables.
+_QUERY_SIZE = 500
+
+
+def _blob(values: ndarray) -> bytes:
+    return np.ascontiguousarray(values, dtype="<f8").tobytes()
+
+
+def _hydrate(blobs: List[bytes], n_columns: int) -> ndarray:
+    # Records concatenated into a single writable (n, n_columns) array, with a single copy
+    buffer = bytearray().join(blobs)
+    return np.frombuffer(buffer, dtype="<f8").reshape(len(blobs), n_columns)
+
+
+class CatchmentStore(object):
+    """Parameters, states and metadata of catchments in a SQLite database.
+
+    States are stored as the model states : stores filling rates [-] and unit hydrographs. As the SQLite connection,
+    a store should be used by the thread that created it.
+
+    Args:
+        path (Union[str, Path]): Database file, created if needed. ":memory:" for an in-memory database.
+
+    Methods:
+        put_batch(Model, catchments, parameters, states, metadata):
+            Write the records of several catchments.
+        get_batch(Model, catchments):
+            Read the records of several catchments as batch arrays.
+        put_states(Model, catchments, states):
+            Write back the states of several catchments.
+        put_model(catchment, model, metadata):
+            Write the parameters and states of a model instance.
+        get_model(catchment, Model):
+            Create a model instance from its record.
+        get_metadata(catchment, Model):
+            Return the metadata of a catchment.
+        catchments(Model):
+            Return the identifiers of the catchments of a model.
+        delete(catchment, Model):
+            Remove a record.
+        close():
+            Close the database.
+    """
+
+    def __init__(self, path: Union[str, Path] = ":memory:"):
+        self.path = path
+        self._connection = sqlite3.connect(str(path))
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def __enter__(self) -> "CatchmentStore":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        self._connection.close()
+
+    def put_batch(
+        self,
+        Model,
+        catchments: Iterable[str],
+        parameters: Union[Mapping[str, Any], ndarray],
+        states: Optional[Mapping[str, Any]] = None,
+        metadata: Optional[Iterable[Optional[Mapping[str, Any]]]] = None,
+    ):
+        """Write the records of several catchments in a single transaction, replacing the existing records of the
+        same model.
+
+        Args:
+            Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+            catchments (Iterable[str]): Catchment identifiers.
+            parameters (Union[Mapping[str, Any], ndarray]): Parameters, one row per catchment, see
+                batch.parameters_array().
+            states (Mapping[str, Any], optional): States, see batch.run_batch(). Default states by default.
+            metadata (Iterable[Mapping[str, Any]], optional): JSON serialisable metadata of each catchment. Existing
+                metadata are kept where None.
+        """
+        _check_model(Model)
+        catchments = [str(catchment) for catchment in catchments]
+        n = len(catchments)
+        parameters = parameters_array(Model, parameters, n)
+        if parameters.shape[0] != n:
+            raise ValueError(
+                "Parameters should have one row per catchment ({}), got {}".format(
+                    n, parameters.shape[0]
+                )
+            )
+        states = _member_states(Model, n, states)
+        stores = np.column_stack([states[name] for name in Model.stores])
+        metadata = [None] * n if metadata is None else list(metadata)
+        updated = time.time()
+        records = [
+            {
+                "catchment": catchment,
+                "model": Model.name,
+                "parameters": _blob(parameters[i]),
+                "stores": _blob(stores[i]),
+                "uh1": _blob(states["uh1"][i]),
+                "uh2": _blob(states["uh2"][i]),
+                "metadata": None if metadata[i] is None else json.dumps(metadata[i]),
+                "updated": updated,
+            }
+            for i, catchment in enumerate(catchments)
+        ]
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO catchments VALUES (:catchment, :model, :parameters, :stores, :uh1, :uh2, "
+                "COALESCE(:metadata, '{}'), :updated) "
+                "ON CONFLICT (catchment, model) DO UPDATE SET parameters = excluded.parameters, "
+                "stores = excluded.stores, uh1 = excluded.uh1, uh2 = excluded.uh2, "
+                "metadata = COALESCE(:metadata, catchments.metadata), updated = excluded.updated",
+                records,
+            )
+
+    def get_batch(
+        self, Model, catchments: Optional[Iterable[str]] = None
+    ) -> Tuple[List[str], ndarray, Dict[str, ndarray]]:
+        """Read the records of several catchments into batch arrays, one row per catchment.
+
+        Args:
+            Model (ModelGrInterface): Model class.
+            catchments (Iterable[str], optional): Catchment identifiers, all the catchments of the model (sorted by
+                identifier) by default.
+
+        Returns:
+            Tuple[List[str], ndarray, Dict[str, ndarray]]: Catchment identifiers, (n, n_parameters) parameters and
+                states, in the layout of batch.run_batch().
+        """
+        _check_model(Model)
+        columns = "catchment, parameters, stores, uh1, uh2"
+        if catchments is None:
+            rows = self._connection.execute(
+                "SELECT {} FROM catchments WHERE model = ? ORDER BY catchment".format(
+                    columns
+                ),
+                (Model.name,),
+            ).fetchall()
+        else:
+            catchments = [str(catchment) for catchment in catchments]
+            found = {}
+            for start in range(0, len(catchments), _QUERY_SIZE):
+                chunk = catchments[start : start + _QUERY_SIZE]
+                query = "SELECT {} FROM catchments WHERE model = ? AND catchment IN ({})".format(
+                    columns, ", ".join("?" * len(chunk))
+                )
+                for row in self._connection.execute(query, [Model.name] + chunk):
+                    found[row[0]] = row
+            missing = [catchment for catchment in catchments if catchment not in found]
+            if missing:
+                raise KeyError(
+                    "Catchments not found for model {} : {}".format(Model.name, missing)
+                )
+            rows = [found[catchment] for catchment in catchments]
+
+        identifiers = [row[0] for row in rows]
+        parameters = _hydrate([row[1] for row in rows], len(Model.parameters_names))
+        stores = _hydrate([row[2] for row in rows], len(Model.stores))
+        states = {name: stores[:, i] for i, name in enumerate(Model.stores)}
+        states["uh1"] = _hydrate([row[3] for row in rows], Model.uh_lengths[0])
+        states["uh2"] = _hydrate([row[4] for row in rows], Model.uh_lengths[1])
+        return identifiers, parameters, states
+
+    def put_states(self, Model, catchments: Iterable[str], states: Mapping[str, Any]):
+        """Write back the states of several catchments, after a batch run for example, in a single transaction.
+
+        Args:
+            Model (ModelGrInterface): Model class.
+            catchments (Iterable[str]): Catchment identifiers, in the order of the states rows.
+            states (Mapping[str, Any]): States, see batch.run_batch().
+        """
+        _check_model(Model)
+        catchments = [str(catchment) for catchment in catchments]
+        states = _member_states(Model, len(catchments), states)
+        stores = np.column_stack([states[name] for name in Model.stores])
+        updated = time.time()
+        with self._connection:
+            cursor = self._connection.executemany(
+                "UPDATE catchments SET stores = ?, uh1 = ?, uh2 = ?, updated = ? "
+                "WHERE catchment = ? AND model = ?",
+                [
+                    (
+                        _blob(stores[i]),
+                        _blob(states["uh1"][i]),
+                        _blob(states["uh2"][i]),
+                        updated,
+                        catchment,
+                        Model.name,
+                    )
+                    for i, catchment in enumerate(catchments)
+                ],
+            )
+            if cursor.rowcount != len(catchments):
+                # Rolled back by the context manager
+                raise KeyError(
+                    "Some catchments are not stored for model {}".format(Model.name)
+                )
+
+    def put_model(
+        self, catchment: str, model: Any, metadata: Optional[Mapping[str, Any]] = None
+    ):
+        """Write the parameters and states of a model instance.
+
+        Args:
+            catchment (str): Catchment identifier.
+            model (ModelGrInterface): Model instance, of a model supported by batch runs.
+            metadata (Mapping[str, Any], optional): JSON serialisable metadata, existing metadata are kept if None.
+        """
+        states = model.get_states()
+        self.put_batch(
+            type(model),
+            [catchment],
+            {name: model.parameters[name] for name in model.parameters_names},
+            {name: np.asarray(states[name])[None] for name in type(model).stores}
+            | {"uh1": states["uh1"][None], "uh2": states["uh2"][None]},
+            [metadata],
+        )
+
+    def get_model(self, catchment: str, Model, **kwargs) -> Any:
+        """Create a model instance from the record of a catchment.
+
+        Args:
+            catchment (str): Catchment identifier.
+            Model (ModelGrInterface): Model class.
+            kwargs: Other arguments of the model constructor (precision, gaps).
+
+        Returns:
+            ModelGrInterface: Model with the stored parameters and states.
+        """
+        _, parameters, states = self.get_batch(Model, [catchment])
+        model = Model(
+            dict(zip(Model.parameters_names, parameters[0].tolist())), **kwargs
+        )
+        model.set_states(
+            {name: float(states[name][0]) for name in Model.stores}
+            | {"uh1": states["uh1"][0].copy(), "uh2": states["uh2"][0].copy()}
+        )
+        return model
+
+    def get_metadata(self, catchment: str, Model) -> Dict[str, Any]:
+        """Return the metadata of a catchment."""
+        row = self._connection.execute(
+            "SELECT metadata FROM catchments WHERE catchment = ? AND model = ?",
+            (str(catchment), Model.name),
+        ).fetchone()
+        if row is None:
+            raise KeyError(
+                "Catchment {} not found for model {}".format(catchment, Model.name)
+            )
+        return json.loads(row[0])
+
+    def catchments(self, Model) -> List[str]:
+        """Return the identifiers of the catchments stored for a model, sorted."""
+        return [
+            row[0]
+            for row in self._connection.execute(
+                "SELECT catchment FROM catchments WHERE model = ? ORDER BY catchment",
+                (Model.name,),
+            )
+        ]
+
+    def delete(self, catchment: str, Model):
+        """Remove the record of a catchment for a model."""
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM catchments WHERE catchment = ? AND model = ?",
+                (str(catchment), Model.name),
+            )
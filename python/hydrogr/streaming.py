@@ -0,0 +1,192 @@
+from typing import Iterable, Optional
+import numpy as np
+from numpy import ndarray
+
+"""
+Streaming statistics of ensembles of time series : the members are added by batches and only per time step
+accumulators are kept, so that memory does not depend on the number of members.
+"""
+
+
+class StreamingQuantiles(object):
+    """Weighted quantiles per time step of an ensemble of time series, estimated from histograms.
+
+    Each time step has a histogram of the member values over fixed logarithmic bins between low and high (values
+    outside are counted in the first and last bins), with the exact minimum and maximum. Quantiles are interpolated
+    within the bins, the relative error is bounded by the bin width ratio (high / low) ** (1 / n_bins), about 2.3 %
+    with the defaults. Memory is n_steps * n_bins floats, whatever the number of members.
+
+    Args:
+        n_steps (int): Length of the time series.
+        low (float): Lower edge of the histograms, values below (including zeros) fall in the first bin.
+        high (float): Upper edge of the histograms, values above fall in the last bin.
+        n_bins (int): Number of bins.
+
+    Methods:
+        update(values, weights):
+            Add a batch of members.
+        quantiles(q):
+            Estimate the weighted quantiles for each time step.
+        mean():
+            Return the weighted mean for each time step.
+    """
+
+    def __init__(
+        self, n_steps: int, low: float = 1e-4, high: float = 1e4, n_bins: int = 400
+    ):
+        if not 0.0 < low < high:
+            raise ValueError(
+                "Histogram edges should verify 0 < low < high, got {}, {}".format(
+                    low, high
+                )
+            )
+        self.n_steps = n_steps
+        self.n_bins = n_bins
+        self.log_low = np.log(low)
+        self.log_width = (np.log(high) - self.log_low) / n_bins
+        self.histograms = np.zeros((n_steps, n_bins))
+        self.minimum = np.full(n_steps, np.inf)
+        self.maximum = np.full(n_steps, -np.inf)
+        self.weighted_sum = np.zeros(n_steps)
+        self.total_weight = 0.0
+        self.n_members = 0
+
+    def update(self, values: ndarray, weights: Optional[ndarray] = None):
+        """Add a batch of members.
+
+        Args:
+            values (ndarray): (n_members, n_steps) values, NaN values are ignored.
+            weights (ndarray, optional): (n_members,) non negative weights, 1 by default.
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim != 2 or values.shape[1] != self.n_steps:
+            raise ValueError(
+                "Values should be a (n_members, {}) array, got shape {}".format(
+                    self.n_steps, values.shape
+                )
+            )
+        if weights is None:
+            weights = np.ones(values.shape[0])
+        weights = np.asarray(weights, dtype=float)
+        if values.shape[0] == 0:
+            return
+
+        valid = ~np.isnan(values)
+        with np.errstate(divide="ignore"):
+            bins = np.floor((np.log(values) - self.log_low) / self.log_width)
+        bins = np.clip(np.nan_to_num(bins, nan=0.0, neginf=0.0), 0, self.n_bins - 1)
+        flat = (np.arange(self.n_steps) * self.n_bins + bins.astype(np.int64))[valid]
+        member_weights = np.broadcast_to(weights[:, None], values.shape)[valid]
+        self.histograms += np.bincount(
+            flat, weights=member_weights, minlength=self.histograms.size
+        ).reshape(self.histograms.shape)
+
+        self.minimum = np.minimum(
+            self.minimum, np.where(valid, values, np.inf).min(axis=0)
+        )
+        self.maximum = np.maximum(
+            self.maximum, np.where(valid, values, -np.inf).max(axis=0)
+        )
+        self.weighted_sum += np.nansum(values * weights[:, None], axis=0)
+        self.total_weight += weights.sum()
+        self.n_members += values.shape[0]
+
+    def quantiles(self, q: Iterable[float]) -> ndarray:
+        """Estimate the weighted quantiles for each time step.
+
+        Args:
+            q (Iterable[float]): Probabilities, between 0 and 1.
+
+        Returns:
+            ndarray: (len(q), n_steps) quantiles, NaN for the time steps without values.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        cumulated = np.cumsum(self.histograms, axis=1)
+        totals = cumulated[:, -1]
+        result = np.full((q.size, self.n_steps), np.nan)
+        steps = np.arange(self.n_steps)
+        for i, probability in enumerate(q):
+            target = probability * totals
+            # First bin where the cumulated weight reaches the target, and position of the target within the bin
+            bins = (cumulated < target[:, None]).sum(axis=1).clip(0, self.n_bins - 1)
+            below = np.where(bins > 0, cumulated[steps, bins - 1], 0.0)
+            in_bin = self.histograms[steps, bins]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                fraction = np.where(in_bin > 0.0, (target - below) / in_bin, 0.0)
+            values = np.exp(self.log_low + (bins + fraction) * self.log_width)
+            result[i] = np.clip(values, self.minimum, self.maximum)
+        result[:, totals <= 0.0] = np.nan
+        return result
+
+    def mean(self) -> ndarray:
+        """Return the weighted mean for each time step."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.weighted_sum / self.histograms.sum(axis=1)
+
+
+class QuantisedArray(object):
+    """Array of floats stored as 16 bits codes, with a linear scale per row : value = offset + scale * code.
+
+    The absolute error is at most scale / 2, that is (maximum - minimum) / 131070 of each row. NaN values are kept
+    (code 65535). Memory is a quarter of the float64 array.
+
+    Args:
+        codes (ndarray): uint16 codes, (n_rows, n_columns) or (n_columns,).
+        offset (ndarray): Offset of each row.
+        scale (ndarray): Scale of each row.
+
+    Methods:
+        encode(values):
+            Quantise an array (class method).
+        decode():
+            Return the float64 values.
+    """
+
+    NAN_CODE = 65535
+
+    def __init__(self, codes: ndarray, offset: ndarray, scale: ndarray):
+        self.codes = codes
+        self.offset = offset
+        self.scale = scale
+
+    @classmethod
+    def encode(cls, values: ndarray) -> "QuantisedArray":
+        """Quantise an array, row by row for a 2D array."""
+        values = np.asarray(values, dtype=float)
+        rows = np.atleast_2d(values)
+        valid = ~np.isnan(rows)
+        with np.errstate(invalid="ignore"):
+            offset = np.where(valid, rows, np.inf).min(axis=1)
+            span = np.where(valid, rows, -np.inf).max(axis=1) - offset
+        offset[~np.isfinite(offset)] = 0.0
+        scale = np.where(np.isfinite(span) & (span > 0.0), span, 1.0) / (
+            cls.NAN_CODE - 1
+        )
+        codes = np.full(rows.shape, cls.NAN_CODE, dtype=np.uint16)
+        codes[valid] = np.rint(
+            ((rows - offset[:, None]) / scale[:, None])[valid]
+        ).astype(np.uint16)
+        if values.ndim == 1:
+            return cls(codes[0], offset[0], scale[0])
+        return cls(codes, offset, scale)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.codes.nbytes
+            + np.asarray(self.offset).nbytes
+            + np.asarray(self.scale).nbytes
+        )
+
+    def decode(self) -> ndarray:
+        """Return the values as a float64 array, of the same shape as the codes."""
+        offset = np.asarray(self.offset, dtype=float)
+        scale = np.asarray(self.scale, dtype=float)
+        if self.codes.ndim == 2:
+            offset, scale = offset[:, None], scale[:, None]
+        values = offset + scale * self.codes
+        return np.where(self.codes == self.NAN_CODE, np.nan, values)
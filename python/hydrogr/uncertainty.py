@@ -0,0 +1,160 @@
+from typing import Any, Iterable, Mapping, Optional, Tuple, Union
+import numpy as np
+from numpy import ndarray
+from hydrogr import columnar
+from hydrogr.batch import CRITERIA, _check_model, evaluate_batch, run_batch
+from hydrogr.calibration import bounds_array
+from hydrogr.streaming import StreamingQuantiles
+
+"""
+Monte Carlo uncertainty analysis with GLUE (Beven and Binley, 1992), in bounded memory.
+
+Parameter sets are sampled uniformly within the model ranges and evaluated by batches. The likelihood of each set is
+computed by the batch evaluation kernel without storing the simulation, then only the behavioural sets (likelihood
+above the threshold) are simulated again and their flows are added to streaming quantile estimators. Memory is
+O(n_steps) for the prediction bounds, plus one batch of behavioural flows, whatever the number of samples.
+"""
+
+
+class GlueResult(object):
+    """Results of a GLUE analysis.
+
+    Attributes:
+        probabilities (ndarray) : Probabilities of the prediction quantiles.
+        quantiles (ndarray) : (len(probabilities), n_steps) weighted quantiles of the behavioural flows [mm].
+        mean (ndarray) : (n_steps,) weighted mean of the behavioural flows [mm].
+        parameters (ndarray) : (n_behavioural, n_parameters) behavioural parameter sets.
+        likelihoods (ndarray) : (n_behavioural,) likelihood of the behavioural parameter sets.
+        n_samples (int) : Number of sampled parameter sets.
+    """
+
+    def __init__(
+        self,
+        probabilities: ndarray,
+        quantiles: ndarray,
+        mean: ndarray,
+        parameters: ndarray,
+        likelihoods: ndarray,
+        n_samples: int,
+    ):
+        self.probabilities = probabilities
+        self.quantiles = quantiles
+        self.mean = mean
+        self.parameters = parameters
+        self.likelihoods = likelihoods
+        self.n_samples = n_samples
+
+    @property
+    def behavioural_fraction(self) -> float:
+        return self.likelihoods.size / self.n_samples if self.n_samples else 0.0
+
+
+def glue(
+    Model,
+    inputs: Any,
+    observed: Union[str, ndarray],
+    n_samples: int = 10000,
+    likelihood: str = "nse",
+    threshold: float = 0.5,
+    probabilities: Iterable[float] = (0.05, 0.5, 0.95),
+    bounds: Optional[Mapping[str, Tuple[float, float]]] = None,
+    batch_size: int = 1000,
+    warmup: int = 0,
+    flow_range: Tuple[float, float] = (1e-4, 1e4),
+    n_bins: int = 400,
+    seed: Optional[int] = None,
+    precision: str = "reference",
+) -> GlueResult:
+    """Estimate prediction bounds of the flow with GLUE.
+
+    The weight of a behavioural parameter set is its likelihood minus the threshold, so that the weights vanish at
+    the behavioural limit.
+
+    Args:
+        Model (ModelGrInterface): Model class, one of ModelGr4j, ModelGr5j, ModelGr6j or ModelGr4h.
+        inputs (Any): Input time series (precipitation, evapotranspiration) : dataframe, columnar data or mapping of
+            arrays.
+        observed (Union[str, ndarray]): Observed flow [mm], or name of the observed flow column of the inputs. NaN
+            values are ignored.
+        n_samples (int): Number of parameter sets sampled.
+        likelihood (str): Likelihood measure, one of "nse", "nse_log" or "kge".
+        threshold (float): Behavioural threshold of the likelihood.
+        probabilities (Iterable[float]): Probabilities of the prediction quantiles.
+        bounds (Mapping[str, Tuple[float, float]], optional): Parameter ranges overriding the model defaults.
+        batch_size (int): Number of parameter sets evaluated per kernel call.
+        warmup (int): Number of time steps at the beginning of the series excluded from the likelihood. The
+            quantiles cover the whole series.
+        flow_range (Tuple[float, float]): Range of the quantile histograms [mm], see StreamingQuantiles.
+        n_bins (int): Number of bins of the quantile histograms.
+        seed (int, optional): Seed of the random generator.
+        precision (str): "reference" (default) or "fast", see ModelGrInterface.
+
+    Returns:
+        GlueResult: Prediction quantiles and behavioural parameter sets.
+    """
+    _check_model(Model, precision)
+    if likelihood not in ("nse", "nse_log", "kge"):
+        raise ValueError(
+            "Likelihood should be one of : {}".format(
+                [name for name in CRITERIA if name in ("nse", "nse_log", "kge")]
+            )
+        )
+    bounds = bounds_array(Model, bounds)
+    arrays = columnar.get_float_columns(
+        inputs, [requirement.name for requirement in Model.input_requirements]
+    )
+    if isinstance(observed, str):
+        observed = columnar.to_float_array(columnar.get_column(inputs, observed))
+    observed = np.asarray(observed, dtype=float)
+    n_steps = observed.size
+    probabilities = np.atleast_1d(np.asarray(probabilities, dtype=float))
+
+    rng = np.random.default_rng(seed)
+    estimator = StreamingQuantiles(n_steps, flow_range[0], flow_range[1], n_bins)
+    behavioural_parameters = []
+    behavioural_likelihoods = []
+    for start in range(0, n_samples, batch_size):
+        size = min(batch_size, n_samples - start)
+        parameters = bounds[:, 0] + rng.random((size, bounds.shape[0])) * (
+            bounds[:, 1] - bounds[:, 0]
+        )
+        values = evaluate_batch(
+            Model,
+            parameters,
+            arrays["precipitation"],
+            arrays["evapotranspiration"],
+            observed,
+            [likelihood],
+            warmup=warmup,
+            precision=precision,
+        )[:, 0]
+        behavioural = values > threshold
+        if not behavioural.any():
+            continue
+
+        parameters, values = parameters[behavioural], values[behavioural]
+        flow, _ = run_batch(
+            Model,
+            parameters,
+            np.broadcast_to(arrays["precipitation"], (values.size, n_steps)),
+            np.broadcast_to(arrays["evapotranspiration"], (values.size, n_steps)),
+            precision=precision,
+        )
+        estimator.update(flow, values - threshold)
+        behavioural_parameters.append(parameters)
+        behavioural_likelihoods.append(values)
+
+    if behavioural_parameters:
+        parameters = np.concatenate(behavioural_parameters)
+        likelihoods = np.concatenate(behavioural_likelihoods)
+    else:
+        parameters = np.empty((0, bounds.shape[0]))
+        likelihoods = np.empty(0)
+    return GlueResult(
+        probabilities,
+        estimator.quantiles(probabilities),
+        estimator.mean(),
+        parameters,
+        likelihoods,
+        n_samples,
+    )
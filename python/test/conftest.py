@@ -1,4 +1,5 @@
 from pathlib import Path
+import numpy as np
 import pytest
 from pandas import read_pickle
 
@@ -24,3 +25,23 @@ def dataset_l0123003(data_folder_path):
     df.index = df['date']
     return df
 
+
+@pytest.fixture
+def gr4j_parameter_sets():
+    # GR4J parameters (X1, X2, X3, X4) of three members : calibrated on L0123001, then a smaller and a larger catchment
+    return np.array(
+        [
+            [257.238, 1.012, 88.235, 2.208],
+            [150.0, -0.5, 40.0, 1.2],
+            [600.0, 0.2, 150.0, 3.4],
+        ]
+    )
+
+
+@pytest.fixture(scope="module")
+def batch_forcing(dataset_l0123001):
+    # Two years of daily precipitation and evapotranspiration of L0123001 [mm]
+    return (
+        dataset_l0123001['precipitation'].values[:730],
+        dataset_l0123001['evapotranspiration'].values[:730],
+    )
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from hydrogr.aggregation import aggregate, periods
+from hydrogr.gr2m import ModelGr2m
+from hydrogr.gr4h import ModelGr4h
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.input_data import InputDataHandler
+
+PARAMETERS_GR4H = {"X1": 521.113, "X2": -2.918, "X3": 218.009, "X4": 4.124}
+
+
+def test_aggregate_matches_resample(dataset_l0123001):
+    data = dataset_l0123001.iloc[20:800]
+    values, labels = aggregate(
+        {
+            "precipitation": data["precipitation"].values,
+            "temperature": data["temperature"].values,
+        },
+        data.index,
+        "MS",
+        how={"precipitation": "sum", "temperature": "mean"},
+    )
+    # The months partially covered by the data are dropped
+    expected = data.resample("MS").agg({"precipitation": "sum", "temperature": "mean"})
+    expected = expected.iloc[1:-1]
+    np.testing.assert_array_equal(labels, expected.index.values)
+    np.testing.assert_allclose(
+        values["precipitation"], expected["precipitation"], rtol=1e-12
+    )
+    np.testing.assert_allclose(
+        values["temperature"], expected["temperature"], rtol=1e-12
+    )
+
+    bounds, labels = periods(data.index, "YS", complete=False)
+    assert bounds[0] == 0 and bounds[-1] == len(data)
+    assert len(labels) == len(bounds) - 1 == 3
+    with pytest.raises(ValueError):
+        periods(data.index, "W")
+    with pytest.raises(ValueError):
+        aggregate(
+            {"precipitation": data["precipitation"].values}, data.index, "MS", how="max"
+        )
+
+
+def test_aggregated_run(dataset_l0123003):
+    inputs = dataset_l0123003.iloc[5:2000]
+    reference = ModelGr4h(PARAMETERS_GR4H)
+    flow = reference.run(inputs)["flow"]
+    model = ModelGr4h(PARAMETERS_GR4H)
+    daily = model.run(inputs, aggregation="D")
+    expected = flow.resample("D").sum().iloc[1:-1]
+    np.testing.assert_array_equal(daily.index.values, expected.index.values)
+    np.testing.assert_allclose(daily["flow"], expected, rtol=1e-12)
+    # The states are those of the whole run
+    for name, value in reference.get_states().items():
+        np.testing.assert_array_equal(model.get_states()[name], value)
+
+    means = ModelGr4h(PARAMETERS_GR4H).run(
+        inputs, output="numpy", aggregation="D", how="mean"
+    )
+    np.testing.assert_allclose(means["flow"], expected.values / 24.0, rtol=1e-12)
+    with pytest.raises(ValueError):
+        ModelGr4h(PARAMETERS_GR4H).run(inputs, aggregation="D", how="max")
+
+
+def test_input_handler_aggregated(dataset_l0123001, dataset_l0123003):
+    daily = InputDataHandler.aggregated(ModelGr4j, dataset_l0123003.iloc[: 24 * 30])
+    expected = dataset_l0123003.iloc[: 24 * 30][["precipitation", "evapotranspiration"]]
+    expected = expected.resample("D").sum()
+    np.testing.assert_allclose(
+        daily.data["precipitation"], expected["precipitation"], rtol=1e-12
+    )
+    np.testing.assert_allclose(
+        daily.data["evapotranspiration"], expected["evapotranspiration"], rtol=1e-12
+    )
+
+    # Columnar data keeps its time column, other columns are aggregated when named
+    columns = {
+        name: dataset_l0123001[name].values
+        for name in ["date", "precipitation", "evapotranspiration", "temperature"]
+    }
+    monthly = InputDataHandler.aggregated(
+        ModelGr2m, columns, how={"temperature": "mean"}
+    )
+    expected = dataset_l0123001.resample("MS").agg(
+        {"precipitation": "sum", "evapotranspiration": "sum", "temperature": "mean"}
+    )
+    expected = expected[expected.index >= dataset_l0123001.index[0]]
+    n = len(monthly.data["precipitation"])
+    np.testing.assert_array_equal(monthly.index.values, expected.index.values[:n])
+    for name in ["precipitation", "evapotranspiration", "temperature"]:
+        np.testing.assert_allclose(
+            monthly.data[name], expected[name].values[:n], rtol=1e-12
+        )
+    ModelGr2m({"X1": 265.072, "X2": 1.040}).run(monthly.data)
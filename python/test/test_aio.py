@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from hydrogr.aio import WorkerPool, arun_batch
+from hydrogr.batch import run_batch
+from hydrogr.gr4j import ModelGr4j
+
+PARAMETERS = {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208}
+
+
+def test_arun(dataset_l0123001):
+    inputs = dataset_l0123001.iloc[:1000]
+    expected = ModelGr4j(PARAMETERS).run(inputs)
+
+    async def main():
+        pool = WorkerPool(max_workers=2)
+        models = [ModelGr4j(PARAMETERS) for _ in range(8)]
+        results = await asyncio.gather(
+            *[model.arun(inputs, pool=pool) for model in models]
+        )
+        pool.shutdown()
+        return results
+
+    for result in asyncio.run(main()):
+        np.testing.assert_array_equal(result["flow"].values, expected["flow"].values)
+
+
+def test_arun_batch(batch_forcing):
+    n = 10
+    precipitation, evapotranspiration = (
+        np.tile(values, (n, 1)) for values in batch_forcing
+    )
+    parameters = np.column_stack(
+        [
+            np.linspace(100.0, 1000.0, n),
+            np.full(n, 0.5),
+            np.full(n, 80.0),
+            np.full(n, 2.0),
+        ]
+    )
+    # Per member store, then a unit hydrograph shared by all the members and a length 1 store array
+    for states in [
+        {"production_store": np.linspace(0.1, 0.9, n)},
+        {
+            "uh1": np.linspace(0.0, 1.0, ModelGr4j.uh_lengths[0]),
+            "routing_store": np.array([0.7]),
+        },
+    ]:
+        expected, expected_states = run_batch(
+            ModelGr4j, parameters, precipitation, evapotranspiration, states
+        )
+
+        flow, final_states = asyncio.run(
+            arun_batch(
+                ModelGr4j,
+                parameters,
+                precipitation,
+                evapotranspiration,
+                states,
+                pool=WorkerPool(max_workers=2),
+                chunk_size=3,
+            )
+        )
+        np.testing.assert_array_equal(flow, expected)
+        for name, value in expected_states.items():
+            np.testing.assert_array_equal(final_states[name], value)
+
+
+def test_pool_back_pressure_and_cancellation():
+    release = threading.Event()
+    started = []
+    highest = [0]
+
+    def work(i):
+        started.append(i)
+        release.wait(5.0)
+        return i
+
+    async def main():
+        pool = WorkerPool(max_workers=1, max_pending=2)
+
+        async def submit(i):
+            result = await pool.submit(work, i)
+            highest[0] = max(highest[0], pool.pending)
+            return result
+
+        tasks = [asyncio.ensure_future(submit(i)) for i in range(5)]
+        await asyncio.sleep(0.05)
+        # One call running, one queued, the others waiting for a slot
+        assert pool.pending == 2
+        assert started == [0]
+        # The event loop stays responsive while the pool is busy
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        assert time.perf_counter() - start < 1.0
+
+        # Cancel the queued call and one of the waiting calls
+        tasks[1].cancel()
+        tasks[3].cancel()
+        await asyncio.sleep(0.05)
+        # The slot of the cancelled queued call went to the next waiting call
+        assert pool.pending == 2
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        pool.shutdown()
+        return results
+
+    results = asyncio.run(main())
+    assert results[0] == 0 and results[2] == 2 and results[4] == 4
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert isinstance(results[3], asyncio.CancelledError)
+    assert 1 not in started and 3 not in started
+    assert highest[0] <= 2
+
+
+def test_pool_validation():
+    with pytest.raises(ValueError):
+        WorkerPool(max_workers=0)
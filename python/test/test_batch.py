@@ -0,0 +1,234 @@
+import pytest
+import numpy as np
+from hydrogr.batch import (
+    climatological_year,
+    evaluate_batch,
+    parameters_array,
+    run_batch,
+    spin_up,
+    summarise_batch,
+)
+from hydrogr.gr1a import ModelGr1a
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.gr5j import ModelGr5j
+from hydrogr.gr6j import ModelGr6j
+
+
+@pytest.mark.parametrize(
+    "Model, parameters",
+    [
+        (ModelGr4j, [[257.238, 1.012, 88.235, 2.208], [150.0, -0.5, 40.0, 1.2]]),
+        (
+            ModelGr5j,
+            [[245.918, 1.027, 90.017, 2.198, 0.434], [150.0, -0.5, 40.0, 1.2, 0.1]],
+        ),
+        (
+            ModelGr6j,
+            [
+                [242.257, 0.637, 53.517, 2.218, 0.424, 4.759],
+                [150.0, -0.5, 40.0, 1.2, 0.1, 8.0],
+            ],
+        ),
+    ],
+)
+def test_run_batch_matches_model_runs(batch_forcing, Model, parameters):
+    precipitation, evapotranspiration = batch_forcing
+    n = len(parameters)
+    flow, states = run_batch(
+        Model,
+        np.array(parameters),
+        np.tile(precipitation, (n, 1)),
+        np.tile(evapotranspiration, (n, 1)),
+    )
+    assert flow.shape == (n, precipitation.size)
+
+    for i in range(n):
+        model = Model(dict(zip(Model.parameters_names, parameters[i])))
+        outputs = model.run_arrays(
+            {"precipitation": precipitation, "evapotranspiration": evapotranspiration}
+        )
+        np.testing.assert_array_equal(flow[i], outputs["flow"])
+        model_states = model.get_states()
+        for name in Model.stores:
+            assert states[name][i] == pytest.approx(model_states[name], rel=1e-14)
+        np.testing.assert_array_equal(states["uh2"][i], model_states["uh2"])
+
+
+def test_run_batch_carries_states(batch_forcing):
+    precipitation, evapotranspiration = batch_forcing
+    parameters = {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208}
+
+    flow, _ = run_batch(
+        ModelGr4j, parameters, precipitation[None, :], evapotranspiration[None, :]
+    )
+    flow_start, states = run_batch(
+        ModelGr4j, parameters, precipitation[None, :365], evapotranspiration[None, :365]
+    )
+    flow_end, _ = run_batch(
+        ModelGr4j,
+        parameters,
+        precipitation[None, 365:],
+        evapotranspiration[None, 365:],
+        states,
+    )
+    np.testing.assert_allclose(
+        np.concatenate([flow_start, flow_end], axis=1), flow, rtol=1e-12
+    )
+
+
+def test_spin_up(dataset_l0123001):
+    parameters = np.array(
+        [
+            [257.238, 1.012, 88.235, 2.208],
+            [1500.0, -0.5, 40.0, 1.2],
+            [50.0, 0.5, 300.0, 3.0],
+        ]
+    )
+    year = {
+        name: climatological_year(dataset_l0123001[name].values)
+        for name in ("precipitation", "evapotranspiration")
+    }
+    assert year["precipitation"].shape == (365,)
+    states, cycles = spin_up(
+        ModelGr4j,
+        parameters,
+        year["precipitation"],
+        year["evapotranspiration"],
+        tolerance=1e-4,
+    )
+    assert (cycles > 1).all() and (cycles < 50).all()
+
+    # Equilibrium : one more cycle leaves the stores unchanged
+    _, next_states = run_batch(
+        ModelGr4j,
+        parameters,
+        np.tile(year["precipitation"], (3, 1)),
+        np.tile(year["evapotranspiration"], (3, 1)),
+        states,
+    )
+    for name in ModelGr4j.stores:
+        np.testing.assert_allclose(next_states[name], states[name], atol=1e-4)
+
+    # Starting from the equilibrium states is close to a long warm-up, closer than the default states
+    data = dataset_l0123001.loc[:"1994-12-31"]
+    start = data.index.get_loc("1990-01-01")
+    arguments = [
+        data[name].values for name in ("precipitation", "evapotranspiration", "flow_mm")
+    ]
+    warmed_up = evaluate_batch(ModelGr4j, parameters, *arguments, warmup=start)
+    arguments = [values[start:] for values in arguments]
+    spun_up = evaluate_batch(ModelGr4j, parameters, *arguments, states=states)
+    default = evaluate_batch(ModelGr4j, parameters, *arguments)
+    assert (np.abs(spun_up - warmed_up) < 0.02).all()
+    assert (np.abs(spun_up - warmed_up) < np.abs(default - warmed_up)).all()
+
+    with pytest.warns(UserWarning):
+        spin_up(
+            ModelGr4j,
+            parameters,
+            year["precipitation"],
+            year["evapotranspiration"],
+            tolerance=0.0,
+            max_cycles=2,
+        )
+
+
+def test_parameters_array_thresholds():
+    with pytest.warns(UserWarning):
+        parameters = parameters_array(
+            ModelGr4j, {"X1": [0.0, 100.0], "X2": 0.0, "X3": 50.0, "X4": [2.0, 0.1]}
+        )
+    np.testing.assert_array_equal(
+        parameters, [[0.01, 0.0, 50.0, 2.0], [100.0, 0.0, 50.0, 0.5]]
+    )
+
+
+def test_run_batch_unsupported_model():
+    with pytest.raises(ValueError):
+        run_batch(ModelGr1a, [[0.5]], np.zeros((1, 10)), np.zeros((1, 10)))
+
+
+def test_summarise_batch(batch_forcing):
+    precipitation, evapotranspiration = batch_forcing
+    rng = np.random.default_rng(0)
+    n = 50
+    parameters = np.column_stack(
+        [
+            rng.uniform(100.0, 1000.0, n),
+            rng.uniform(-2.0, 2.0, n),
+            rng.uniform(20.0, 200.0, n),
+            rng.uniform(1.1, 3.0, n),
+        ]
+    )
+    flow, _ = run_batch(
+        ModelGr4j,
+        parameters,
+        np.tile(precipitation, (n, 1)),
+        np.tile(evapotranspiration, (n, 1)),
+    )
+
+    # Inputs shared by the members, or one row per member
+    for inputs in [
+        (precipitation, evapotranspiration),
+        (np.tile(precipitation, (n, 1)), np.tile(evapotranspiration, (n, 1))),
+    ]:
+        summary = summarise_batch(
+            ModelGr4j, parameters, *inputs, probabilities=[0.1, 0.5, 0.9]
+        )
+        np.testing.assert_array_equal(summary["count"], n)
+        np.testing.assert_allclose(summary["mean"], flow.mean(axis=0), rtol=1e-12)
+        np.testing.assert_allclose(
+            summary["variance"], flow.var(axis=0), rtol=1e-9, atol=1e-14
+        )
+        assert summary["quantiles"].shape == (3, precipitation.size)
+        # Exact quantiles with n <= n_bins / 2
+        np.testing.assert_allclose(
+            summary["quantiles"],
+            np.quantile(flow, [0.1, 0.5, 0.9], axis=0),
+            rtol=1e-12,
+            atol=1e-14,
+        )
+
+        # Histogram estimates lie between the order statistics around the probability, within one bin
+        summary = summarise_batch(
+            ModelGr4j, parameters, *inputs, probabilities=[0.1, 0.5, 0.9], n_bins=64
+        )
+        ratio = 1e8 ** (1 / 64)
+        lower = np.quantile(flow, [0.1, 0.5, 0.9], axis=0, method="lower")
+        higher = np.quantile(flow, [0.1, 0.5, 0.9], axis=0, method="higher")
+        checked = lower > 1e-4
+        assert checked.mean() > 0.9
+        assert (summary["quantiles"][checked] >= lower[checked] / ratio).all()
+        assert (summary["quantiles"][checked] <= higher[checked] * ratio).all()
+
+
+def test_summarise_batch_dtypes(batch_forcing, gr4j_parameter_sets):
+    precipitation, evapotranspiration = batch_forcing
+    parameters = gr4j_parameter_sets[:2]
+    reference = summarise_batch(
+        ModelGr4j, parameters, precipitation, evapotranspiration
+    )
+    for dtype in ["float32", "float16"]:
+        summary = summarise_batch(
+            ModelGr4j, parameters, precipitation, evapotranspiration, dtype=dtype
+        )
+        assert summary["mean"].dtype == np.dtype(dtype)
+        np.testing.assert_allclose(
+            summary["quantiles"], reference["quantiles"], rtol=1e-3, atol=1e-6
+        )
+
+    quantised = summarise_batch(
+        ModelGr4j, parameters, precipitation, evapotranspiration, dtype="quantised"
+    )
+    codes = quantised["quantiles"]
+    assert codes.codes.dtype == np.uint16
+    assert codes.nbytes < reference["quantiles"].nbytes / 3
+    span = np.ptp(reference["quantiles"], axis=1)[:, None]
+    assert (
+        np.abs(codes.decode() - reference["quantiles"]) <= span / 131070 * 1.001
+    ).all()
+
+    with pytest.raises(ValueError):
+        summarise_batch(
+            ModelGr4j, parameters, precipitation, evapotranspiration, dtype="int8"
+        )
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from hydrogr._hydrogr import gr4h
+from hydrogr.gr2m import ModelGr2m
+from hydrogr.gr4h import ModelGr4h
+from hydrogr.gr5j import ModelGr5j
+
+PARAMETERS_GR4H = {"X1": 521.113, "X2": -2.918, "X3": 218.009, "X4": 4.124}
+PARAMETERS_GR5J = {"X1": 245.918, "X2": 1.027, "X3": 90.017, "X4": 2.198, "X5": 0.434}
+
+
+def test_run_arrays_out(dataset_l0123001):
+    years = [
+        {
+            "precipitation": dataset_l0123001["precipitation"].values[k : k + 365],
+            "evapotranspiration": dataset_l0123001["evapotranspiration"].values[
+                k : k + 365
+            ],
+        }
+        for k in range(0, 3 * 365, 365)
+    ]
+    reference = ModelGr5j(dict(PARAMETERS_GR5J))
+    expected = [reference.run_arrays(inputs)["flow"] for inputs in years]
+
+    # The flow of each year is written in a row of the buffer, the unit hydrographs are reused
+    model = ModelGr5j(dict(PARAMETERS_GR5J))
+    uh2 = model.uh2
+    flows = np.zeros((3, 365))
+    for k, inputs in enumerate(years):
+        states = model.get_states()
+        outputs = model.run_arrays(inputs, out=flows[k])
+        assert np.shares_memory(outputs["flow"], flows)
+        # States taken before a run are not modified by it
+        assert not np.array_equal(states["uh2"], model.uh2)
+    np.testing.assert_array_equal(flows, np.array(expected))
+    assert model.uh2 is uh2
+    for name, value in reference.get_states().items():
+        np.testing.assert_array_equal(model.get_states()[name], value)
+
+    with pytest.raises(ValueError):
+        model.run_arrays(years[0], out=np.zeros(364))
+    with pytest.raises(ValueError):
+        model.run_arrays(years[0], out=np.zeros(365, dtype=np.float32))
+    with pytest.raises(ValueError):
+        ModelGr2m({"X1": 265.072, "X2": 1.040}).run_arrays(years[0], out=np.zeros(365))
+
+
+def test_kernel_in_place(dataset_l0123003):
+    rainfall = dataset_l0123003["precipitation"].values[:2000]
+    evapotranspiration = dataset_l0123003["evapotranspiration"].values[:2000]
+    parameters = list(PARAMETERS_GR4H.values())
+    initial = np.array([0.3 * 521.113, 0.5 * 218.009])
+    states, uh1, uh2, flow, _ = gr4h(
+        parameters,
+        rainfall,
+        evapotranspiration,
+        initial.copy(),
+        np.zeros(480),
+        np.zeros(960),
+    )
+
+    # States in a column of a larger buffer, flow in a row
+    levels = np.zeros((2, 4))
+    levels[:, 1] = initial
+    hydrographs = np.zeros((2, 960))
+    flows = np.zeros((2, 2000))
+    results = gr4h(
+        parameters,
+        rainfall,
+        evapotranspiration,
+        levels[:, 1],
+        hydrographs[0, :480],
+        hydrographs[1],
+        out=flows[1],
+        inplace=True,
+    )
+    assert all(
+        np.shares_memory(a, b)
+        for a, b in zip(results[:3], [levels, hydrographs, hydrographs])
+    )
+    np.testing.assert_array_equal(flows[1], flow)
+    np.testing.assert_array_equal(levels[:, 1], states)
+    np.testing.assert_array_equal(hydrographs[0, :480], uh1)
+    np.testing.assert_array_equal(hydrographs[1], uh2)
+    assert not flows[0].any() and not levels[:, 0].any()
+
+    read_only = initial.copy()
+    read_only.flags.writeable = False
+    with pytest.raises(ValueError):
+        gr4h(
+            parameters,
+            rainfall,
+            evapotranspiration,
+            read_only,
+            np.zeros(480),
+            np.zeros(960),
+            inplace=True,
+        )
+    # Without inplace, the given states are left unchanged
+    gr4h(parameters, rainfall, evapotranspiration, read_only, uh1, uh2)
+    np.testing.assert_array_equal(read_only, initial)
@@ -0,0 +1,205 @@
+import pytest
+import numpy as np
+from hydrogr.batch import (
+    climatological_year,
+    evaluate,
+    evaluate_batch,
+    run_batch,
+    spin_up,
+)
+from hydrogr.calibration import nsga2, non_dominated_sort, crowding_distance
+from hydrogr import profiling
+from hydrogr.gr4j import ModelGr4j
+
+
+@pytest.fixture(scope="module")
+def period(dataset_l0123001):
+    data = dataset_l0123001.loc["1989-01-01":"1994-12-31"]
+    return {
+        "precipitation": data["precipitation"].values,
+        "evapotranspiration": data["evapotranspiration"].values,
+        "flow_mm": data["flow_mm"].values,
+    }
+
+
+def test_evaluate_batch(period, gr4j_parameter_sets):
+    parameters = gr4j_parameter_sets[:2]
+    criteria = ["nse", "nse_log", "kge", "bias", "rmse"]
+    values = evaluate_batch(
+        ModelGr4j,
+        parameters,
+        period["precipitation"],
+        period["evapotranspiration"],
+        period["flow_mm"],
+        criteria,
+        warmup=365,
+    )
+    assert values.shape == (2, 5)
+
+    n = parameters.shape[0]
+    flow, _ = run_batch(
+        ModelGr4j,
+        parameters,
+        np.tile(period["precipitation"], (n, 1)),
+        np.tile(period["evapotranspiration"], (n, 1)),
+    )
+    observed = period["flow_mm"][365:]
+    valid = ~np.isnan(observed)
+    for i in range(n):
+        simulated = flow[i, 365:][valid]
+        o = observed[valid]
+        nse = 1.0 - ((simulated - o) ** 2).sum() / ((o - o.mean()) ** 2).sum()
+        rmse = np.sqrt(((simulated - o) ** 2).mean())
+        assert values[i, 0] == pytest.approx(nse, rel=1e-10)
+        assert values[i, 3] == pytest.approx(simulated.sum() / o.sum() - 1.0, abs=1e-12)
+        assert values[i, 4] == pytest.approx(rmse, rel=1e-10)
+        # Same criteria from the simulated flow
+        np.testing.assert_allclose(
+            evaluate(flow[i], period["flow_mm"], criteria, warmup=365),
+            values[i],
+            rtol=1e-10,
+        )
+    assert values[0, 0] > values[1, 0]
+
+    with pytest.raises(ValueError):
+        evaluate_batch(
+            ModelGr4j,
+            parameters,
+            period["precipitation"],
+            period["evapotranspiration"],
+            period["flow_mm"],
+            ["r2"],
+        )
+    with pytest.raises(ValueError):
+        evaluate(flow[0], period["flow_mm"], ["r2"])
+
+
+def test_evaluate_batch_pruning(period, gr4j_parameter_sets):
+    # Two plausible parameter sets and a poor one
+    parameters = np.vstack([gr4j_parameter_sets[:2], [20.0, -5.0, 5.0, 0.6]])
+    arguments = (
+        ModelGr4j,
+        parameters,
+        period["precipitation"],
+        period["evapotranspiration"],
+        period["flow_mm"],
+    )
+    full = evaluate_batch(*arguments, ["nse", "kge"], warmup=365)
+    threshold = full[0, 0] - 0.01
+    values, pruned, steps = evaluate_batch(
+        *arguments,
+        ["nse", "kge"],
+        warmup=365,
+        threshold=threshold,
+        return_pruning=True,
+    )
+    n_steps = len(period["precipitation"])
+    # Candidates that can beat the threshold are fully evaluated, the others are stopped early with a bound
+    assert not pruned[0] and steps[0] == n_steps
+    np.testing.assert_array_equal(values[0], full[0])
+    assert pruned[1:].all() and (steps[1:] < n_steps).all()
+    assert (values[1:, 0] < threshold).all() and (values[1:, 0] >= full[1:, 0]).all()
+    assert np.isnan(values[1:, 1]).all()
+
+    # Lower bound of the RMSE
+    rmse = evaluate_batch(*arguments, ["rmse"], warmup=365)
+    values, pruned, _ = evaluate_batch(
+        *arguments, ["rmse"], warmup=365, threshold=rmse[0, 0], return_pruning=True
+    )
+    assert not pruned[0] and pruned[2]
+    assert rmse[0, 0] < values[2, 0] <= rmse[2, 0]
+
+    with pytest.raises(ValueError):
+        evaluate_batch(*arguments, ["kge", "nse"], threshold=0.5)
+
+
+def test_non_dominated_sort():
+    losses = np.array([[0.0, 1.0], [1.0, 0.0], [0.5, 0.5], [1.0, 1.0], [2.0, 2.0]])
+    np.testing.assert_array_equal(non_dominated_sort(losses), [0, 0, 0, 1, 2])
+    distances = crowding_distance(losses, non_dominated_sort(losses))
+    assert np.isinf(distances[[0, 1]]).all()
+    assert distances[2] == pytest.approx(2.0)
+
+
+def test_nsga2(period):
+    parameters, objectives = nsga2(
+        ModelGr4j,
+        period,
+        "flow_mm",
+        objectives=("nse", "nse_log"),
+        population_size=40,
+        n_generations=15,
+        warmup=365,
+        seed=42,
+    )
+    assert parameters.shape[1] == 4
+    assert objectives.shape == (parameters.shape[0], 2)
+    assert objectives[0, 0] > 0.7
+
+    # The returned sets are non-dominated and within the bounds
+    assert (non_dominated_sort(1.0 - objectives) == 0).all()
+    for j, name in enumerate(ModelGr4j.parameters_names):
+        lower, upper = ModelGr4j.parameters_bounds[name]
+        assert (parameters[:, j] >= lower).all() and (parameters[:, j] <= upper).all()
+
+    # Objectives match an evaluation of the returned sets
+    values = evaluate_batch(
+        ModelGr4j,
+        parameters,
+        period["precipitation"],
+        period["evapotranspiration"],
+        period["flow_mm"],
+        ("nse", "nse_log"),
+        warmup=365,
+    )
+    np.testing.assert_allclose(values, objectives)
+
+
+def test_nsga2_pruning(period):
+    kwargs = dict(
+        objectives=("nse",), population_size=20, n_generations=10, warmup=365, seed=3
+    )
+    expected = nsga2(ModelGr4j, period, "flow_mm", **kwargs)
+    with profiling.profile() as profiler:
+        parameters, objectives = nsga2(
+            ModelGr4j, period, "flow_mm", prune=True, **kwargs
+        )
+    # Pruned children could not be selected : same result in fewer simulated time steps
+    np.testing.assert_array_equal(parameters, expected[0])
+    np.testing.assert_array_equal(objectives, expected[1])
+    steps = profiler.as_dict()["phases"]["gr4j"]["kernel"]["steps"]
+    assert steps < 11 * 20 * len(period["precipitation"])
+
+    with pytest.raises(ValueError):
+        nsga2(ModelGr4j, period, "flow_mm", objectives=("nse", "kge"), prune=True)
+
+
+def test_nsga2_spin_up(period):
+    # Equilibrium initial states : the whole record is evaluated, without warm-up
+    parameters, objectives = nsga2(
+        ModelGr4j,
+        period,
+        "flow_mm",
+        objectives=("nse",),
+        population_size=20,
+        n_generations=5,
+        seed=1,
+        spin_up=True,
+    )
+    year = {
+        name: climatological_year(period[name])
+        for name in ("precipitation", "evapotranspiration")
+    }
+    states, _ = spin_up(
+        ModelGr4j, parameters, year["precipitation"], year["evapotranspiration"]
+    )
+    values = evaluate_batch(
+        ModelGr4j,
+        parameters,
+        period["precipitation"],
+        period["evapotranspiration"],
+        period["flow_mm"],
+        ("nse",),
+        states=states,
+    )
+    np.testing.assert_allclose(values, objectives)
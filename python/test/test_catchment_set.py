@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from hydrogr.batch import run_batch
+from hydrogr.catchment_set import CatchmentSet
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.gr6j import ModelGr6j
+
+IDS = ["L0123001", "L0123002", "L0123003"]
+
+
+@pytest.fixture
+def forcing(batch_forcing):
+    precipitation, evapotranspiration = batch_forcing
+    return np.tile(precipitation, (3, 1)), np.tile(evapotranspiration, (3, 1))
+
+
+def test_run_matches_models(forcing, gr4j_parameter_sets):
+    precipitation, evapotranspiration = forcing
+    catchments = CatchmentSet(
+        ModelGr4j, IDS, gr4j_parameter_sets, {"production_store": [0.1, 0.5, 0.9]}
+    )
+    assert catchments.parameters.flags.c_contiguous
+    models = catchments.to_models()
+
+    first = catchments.run(precipitation[:, :365], evapotranspiration[:, :365])
+    second = catchments.run(precipitation[:, 365:], evapotranspiration[:, 365:])
+    flow = np.concatenate([first, second], axis=1)
+    for i, model in enumerate(models):
+        outputs = model.run_arrays(
+            {
+                "precipitation": precipitation[i],
+                "evapotranspiration": evapotranspiration[i],
+            }
+        )
+        np.testing.assert_allclose(flow[i], outputs["flow"], rtol=1e-12)
+        assert catchments.stores[i, 0] == pytest.approx(
+            model.get_states()["production_store"], rel=1e-12
+        )
+        np.testing.assert_array_equal(catchments.uh2[i], model.get_states()["uh2"])
+
+    # Round trip through model instances
+    restored = CatchmentSet.from_models(IDS, catchments.to_models())
+    np.testing.assert_array_equal(restored.parameters, catchments.parameters)
+    np.testing.assert_array_equal(restored.stores, catchments.stores)
+    np.testing.assert_array_equal(restored.uh1, catchments.uh1)
+
+    # States are in the layout of run_batch
+    expected, _ = run_batch(
+        ModelGr4j,
+        catchments.parameters,
+        precipitation,
+        evapotranspiration,
+        catchments.get_states(),
+    )
+    np.testing.assert_array_equal(
+        catchments.run(precipitation, evapotranspiration), expected
+    )
+
+
+def test_validation(gr4j_parameter_sets):
+    with pytest.warns(UserWarning):
+        catchments = CatchmentSet(
+            ModelGr4j,
+            IDS,
+            {"X1": [0.0, 100.0, 200.0], "X2": 0.0, "X3": 50.0, "X4": 0.1},
+        )
+    np.testing.assert_array_equal(catchments.parameters[:, 0], [0.01, 100.0, 200.0])
+    np.testing.assert_array_equal(catchments.parameters[:, 3], 0.5)
+
+    with pytest.raises(ValueError):
+        catchments.set_states({"routing_store": [0.5, 1.5, 0.5]})
+    with pytest.raises(ValueError):
+        catchments.set_states({"production_store": np.nan})
+    with pytest.raises(ValueError):
+        catchments.set_parameters(gr4j_parameter_sets[:2])
+    with pytest.raises(ValueError):
+        CatchmentSet(ModelGr4j, ["a", "a", "b"], gr4j_parameter_sets)
+
+
+def test_subsets():
+    parameters = (
+        np.array([[242.257, 0.637, 53.517, 2.218, 0.424, 4.759]] * 4)
+        * np.arange(1, 5)[:, None]
+    )
+    catchments = CatchmentSet(ModelGr6j, ["a", "b", "c", "d"], parameters)
+    subset = catchments[["d", "b"]]
+    assert subset.ids == ["d", "b"]
+    np.testing.assert_array_equal(subset.parameters, parameters[[3, 1]])
+    assert catchments["c"].ids == ["c"]
+    assert catchments[1:3].ids == ["b", "c"]
+    assert catchments[[True, False, False, True]].ids == ["a", "d"]
+    assert catchments.rows("c") == 2
+    # Subsets are copies
+    subset.stores[:] = 1.0
+    np.testing.assert_array_equal(catchments.stores[:, 0], 0.3)
+
+
+def test_spin_up(forcing, gr4j_parameter_sets):
+    precipitation, evapotranspiration = forcing
+    catchments = CatchmentSet(ModelGr4j, IDS, gr4j_parameter_sets)
+    cycles = catchments.spin_up(
+        precipitation[:, :365], evapotranspiration[:, :365], tolerance=1e-6
+    )
+    assert (cycles > 1).all()
+    stores = catchments.stores.copy()
+    catchments.run(precipitation[:, :365], evapotranspiration[:, :365])
+    np.testing.assert_allclose(catchments.stores, stores, atol=1e-6)
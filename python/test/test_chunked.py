@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+from hydrogr.chunked import run_chunked
+from hydrogr.grid import create_grid, open_grid
+from hydrogr.gr4h import ModelGr4h
+from hydrogr.gr6j import ModelGr6j
+
+GR6J_PARAMETERS = {
+    "X1": 242.257,
+    "X2": 0.637,
+    "X3": 53.517,
+    "X4": 2.218,
+    "X5": 0.424,
+    "X6": 4.759,
+}
+
+
+@pytest.fixture(scope="module")
+def arrays(dataset_l0123001):
+    return {
+        "precipitation": dataset_l0123001["precipitation"].values[:3000],
+        "evapotranspiration": dataset_l0123001["evapotranspiration"].values[:3000],
+    }
+
+
+def test_run_chunked_matches_run(arrays):
+    model = ModelGr6j(dict(GR6J_PARAMETERS))
+    expected = model.run_arrays(arrays)["flow"]
+    expected_states = model.get_states()
+
+    model = ModelGr6j(dict(GR6J_PARAMETERS))
+    flow = run_chunked(model, arrays, block_size=365)
+    np.testing.assert_array_equal(flow, expected)
+
+    states = model.get_states()
+    for name in ["production_store", "routing_store", "exponential_store"]:
+        assert states[name] == pytest.approx(expected_states[name], rel=1e-14)
+    np.testing.assert_array_equal(states["uh2"], expected_states["uh2"])
+
+
+def test_run_chunked_iterator_into_memmap(tmp_path, arrays):
+    parameters = {"X1": 521.113, "X2": -2.918, "X3": 218.009, "X4": 4.124}
+    expected = ModelGr4h(dict(parameters)).run_arrays(arrays)["flow"]
+
+    def blocks():
+        for start, stop in [(0, 1), (1, 1000), (1000, 1001), (1001, 3000)]:
+            yield {name: values[start:stop] for name, values in arrays.items()}
+
+    out = create_grid(tmp_path / "flow.npy", (3000,))
+    flow = run_chunked(ModelGr4h(dict(parameters)), blocks(), out=out)
+    assert flow is out
+    del out, flow
+    np.testing.assert_array_equal(open_grid(tmp_path / "flow.npy"), expected)
+
+    # Non float64 outputs go through a block buffer
+    out = np.zeros(3000, dtype=np.float32)
+    run_chunked(ModelGr4h(dict(parameters)), arrays, out=out, block_size=512)
+    np.testing.assert_array_equal(out, expected.astype(np.float32))
+
+    with pytest.raises(ValueError):
+        run_chunked(ModelGr4h(dict(parameters)), arrays, out=np.zeros(10))
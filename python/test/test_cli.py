@@ -0,0 +1,120 @@
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from hydrogr.cli import main, read_forcing
+from hydrogr.gr4j import ModelGr4j
+
+pytest.importorskip("pyarrow")
+
+CATCHMENTS = ["L0123001", "L0123002", "L0123003"]
+
+
+@pytest.fixture
+def catchment_parameters(gr4j_parameter_sets):
+    return dict(zip(CATCHMENTS, gr4j_parameter_sets))
+
+
+@pytest.fixture
+def forcing(tmp_path, data_folder_path):
+    directory = tmp_path / "forcing"
+    directory.mkdir()
+    for catchment in CATCHMENTS:
+        shutil.copy(data_folder_path / (catchment + ".csv"), directory)
+    return directory
+
+
+def parameters_file(path, catchment_parameters, catchments):
+    table = pd.DataFrame(
+        [catchment_parameters[catchment] for catchment in catchments],
+        index=pd.Index(catchments, name="catchment"),
+        columns=ModelGr4j.parameters_names,
+    )
+    table.to_csv(path)
+    return path
+
+
+def test_run(forcing, catchment_parameters, tmp_path, capsys):
+    output = tmp_path / "results"
+    parameters = parameters_file(
+        tmp_path / "parameters.csv", catchment_parameters, ["L0123001", "L0123003"]
+    )
+    # L0123003 is hourly : it fails the frequency check of GR4J, the other catchment is written
+    status = main(
+        [
+            "run",
+            str(forcing),
+            str(parameters),
+            "--model",
+            "gr4j",
+            "--output",
+            str(output),
+            "--workers",
+            "2",
+        ]
+    )
+    assert status == 1
+    out, err = capsys.readouterr()
+    assert "L0123001 : 10593 steps" in out and "steps/s" in out
+    assert "L0123003 : failed" in err and "L0123002" in err
+
+    scores = pd.read_parquet(output / "scores")
+    assert scores["catchment"].tolist() == ["L0123001"]
+    flows = pd.read_parquet(output / "flows")
+    forcing_data = read_forcing(forcing / "L0123001.csv")
+    model = ModelGr4j(
+        dict(zip(ModelGr4j.parameters_names, catchment_parameters["L0123001"]))
+    )
+    expected = model.run(forcing_data)
+    np.testing.assert_array_equal(flows["flow"].values, expected["flow"].values)
+    np.testing.assert_array_equal(flows["date"].values, forcing_data.index.values)
+    states = pd.read_parquet(output / "states")
+    assert states["production_store"][0] == model.get_states()["production_store"]
+    np.testing.assert_array_equal(states["uh2"][0], model.get_states()["uh2"])
+    assert 0.5 < scores["nse"][0] < 1.0
+
+
+def test_resume(forcing, catchment_parameters, tmp_path, capsys):
+    output = tmp_path / "results"
+    arguments = [
+        "-m",
+        "gr4j",
+        "-o",
+        str(output),
+        "--format",
+        "arrow",
+        "--part-size",
+        "1",
+    ]
+    first = parameters_file(tmp_path / "first.csv", catchment_parameters, ["L0123001"])
+    assert (
+        main(
+            ["run", str(forcing), str(first), "--pattern", "L012300[12].csv"]
+            + arguments
+        )
+        == 0
+    )
+    # An interrupted part is removed
+    (output / "flows" / "part-00001.arrow").write_bytes(b"partial")
+
+    both = parameters_file(
+        tmp_path / "both.csv", catchment_parameters, ["L0123001", "L0123002"]
+    )
+    capsys.readouterr()
+    assert (
+        main(
+            ["run", str(forcing), str(both), "--pattern", "L012300[12].csv", "-q"]
+            + arguments
+        )
+        == 0
+    )
+    out, _ = capsys.readouterr()
+    assert "1 catchments to run, 1 already done" in out
+    assert not (output / "flows" / "part-00001.tmp").exists()
+
+    import pyarrow.dataset as ds
+
+    scores = ds.dataset(output / "scores", format="arrow").to_table().to_pandas()
+    assert sorted(scores["catchment"]) == ["L0123001", "L0123002"]
+    flows = ds.dataset(output / "flows", format="arrow").to_table().to_pandas()
+    assert (flows.groupby("catchment").size() == 10593).all()
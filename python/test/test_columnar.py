@@ -0,0 +1,97 @@
+import pytest
+import datetime
+import numpy as np
+from hydrogr import columnar
+from hydrogr.input_data import InputDataHandler
+from hydrogr.gr4j import ModelGr4j
+
+PARAMETERS = {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208}
+
+
+@pytest.fixture(scope="module")
+def reference_flow(dataset_l0123001):
+    return ModelGr4j(dict(PARAMETERS)).run(dataset_l0123001)["flow"].values
+
+
+def test_mapping_inputs(dataset_l0123001, reference_flow):
+    data = {
+        "date": dataset_l0123001.index.values,
+        "precipitation": dataset_l0123001["precipitation"].values,
+        "evapotranspiration": dataset_l0123001["evapotranspiration"].values,
+    }
+    outputs = ModelGr4j(dict(PARAMETERS)).run(data, output="numpy")
+    np.testing.assert_array_equal(outputs["flow"], reference_flow)
+
+    inputs = InputDataHandler(ModelGr4j, data)
+    assert inputs.start_date == datetime.datetime(1984, 1, 1)
+    sub_inputs = inputs.get_sub_period(datetime.datetime(1989, 1, 1), datetime.datetime(1989, 12, 31))
+    assert sub_inputs.n_inputs == 365
+
+
+def test_mapping_inputs_without_time_column():
+    data = {"precipitation": np.ones(10), "evapotranspiration": np.ones(10)}
+    inputs = InputDataHandler(ModelGr4j, data)
+    assert inputs.index is None
+    assert inputs.get_arrays()["precipitation"] is data["precipitation"]
+    with pytest.raises(ValueError):
+        _ = inputs.get_sub_period(datetime.datetime(1989, 1, 1), datetime.datetime(1989, 12, 31))
+
+
+def test_mapping_inputs_checked_and_converted_once():
+    with pytest.raises(ValueError):
+        InputDataHandler(ModelGr4j, {"precipitation": np.ones(10), "evapotranspiration": np.ones(9)})
+    with pytest.raises(ValueError):
+        InputDataHandler(ModelGr4j, {"precipitation": np.ones((2, 5)), "evapotranspiration": np.ones(10)})
+
+    # Integer columns are converted when the handler is created, then reused by each run
+    data = {"precipitation": np.arange(10), "evapotranspiration": np.ones(10)}
+    inputs = InputDataHandler(ModelGr4j, data)
+    assert inputs.get_arrays()["precipitation"] is inputs.get_arrays()["precipitation"]
+    assert inputs.get_rows(2, 6).get_arrays()["precipitation"].base is inputs.get_arrays()["precipitation"]
+
+
+def test_arrow_inputs_are_borrowed(dataset_l0123001, reference_flow):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table(
+        {
+            "date": dataset_l0123001.index.values,
+            "precipitation": dataset_l0123001["precipitation"].values,
+            "evapotranspiration": dataset_l0123001["evapotranspiration"].values,
+        }
+    )
+    arrays = InputDataHandler(ModelGr4j, table).get_arrays()
+    buffer_address = table.column("precipitation").chunk(0).buffers()[1].address
+    assert arrays["precipitation"].ctypes.data == buffer_address
+
+    results = ModelGr4j(dict(PARAMETERS)).run(table, output="arrow")
+    assert results.column_names == ["date", "flow"]
+    np.testing.assert_array_equal(results.column("flow").to_numpy(), reference_flow)
+
+
+def test_arrow_inputs_with_nulls():
+    pa = pytest.importorskip("pyarrow")
+    values = columnar.to_float_array(pa.chunked_array([[1.0, None], [3.0]]))
+    np.testing.assert_array_equal(values, [1.0, np.nan, 3.0])
+
+
+def test_polars_inputs(dataset_l0123001, reference_flow):
+    pl = pytest.importorskip("polars")
+    frame = pl.DataFrame(
+        {
+            "date": dataset_l0123001.index.values,
+            "precipitation": dataset_l0123001["precipitation"].values,
+            "evapotranspiration": dataset_l0123001["evapotranspiration"].values,
+        }
+    )
+    outputs = ModelGr4j(dict(PARAMETERS)).run_arrays(frame)
+    np.testing.assert_array_equal(outputs["flow"], reference_flow)
+
+    inputs = InputDataHandler(ModelGr4j, frame).get_sub_period(
+        datetime.datetime(1989, 1, 1), datetime.datetime(1989, 12, 31)
+    )
+    assert inputs.n_inputs == 365
+
+
+def test_unknown_output_format(dataset_l0123001):
+    with pytest.raises(ValueError):
+        _ = ModelGr4j(dict(PARAMETERS)).run(dataset_l0123001, output="excel")
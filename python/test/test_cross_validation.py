@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from hydrogr.batch import evaluate_batch
+from hydrogr.cross_validation import cross_validate, k_fold, split_sample
+from hydrogr.gr4j import ModelGr4j
+
+
+@pytest.fixture(scope="module")
+def period(dataset_l0123001):
+    return dataset_l0123001.loc["1989-01-01":"1994-12-31"]
+
+
+def test_folds(period):
+    folds = k_fold(period.index, k=4, warmup=365)
+    assert len(folds) == 4
+    validation = np.stack([fold.validation for fold in folds])
+    assert (validation.sum(axis=0)[365:] == 1).all()
+    assert not validation[:, :365].any()
+    for fold in folds:
+        assert not (fold.calibration & fold.validation).any()
+        assert (fold.calibration | fold.validation)[365:].all()
+
+    first, second = split_sample(period.index, "1992-01-01", warmup=365)
+    assert period.index[first.validation][0] == np.datetime64("1992-01-01")
+    assert (first.calibration == second.validation).all()
+    assert first.calibration.sum() == 2 * 365
+    with pytest.raises(ValueError):
+        split_sample(len(period), "1992-01-01")
+
+
+def test_cross_validate(period):
+    folds = k_fold(period.index, k=3, warmup=365)
+    table = cross_validate(
+        ModelGr4j,
+        period,
+        "flow_mm",
+        folds,
+        scores=("nse", "bias"),
+        population_size=16,
+        n_generations=5,
+        seed=2,
+    )
+    assert list(table["fold"]) == [0, 1, 2]
+    assert table["validation_start"].iloc[0] == period.index[365]
+    assert table["validation_end"].iloc[-1] == period.index[-1]
+    assert (table["calibration_nse"] > 0.0).all()
+
+    # Scores of the calibrated parameters, against the observations of each period
+    parameters = table[ModelGr4j.parameters_names].values
+    observed = period["flow_mm"].values
+    for f, fold in enumerate(folds):
+        for name, mask in [
+            ("calibration", fold.calibration),
+            ("validation", fold.validation),
+        ]:
+            values = evaluate_batch(
+                ModelGr4j,
+                parameters[f : f + 1],
+                period["precipitation"].values,
+                period["evapotranspiration"].values,
+                np.where(mask, observed, np.nan),
+                ["nse", "bias"],
+            )
+            assert table[name + "_nse"].iloc[f] == pytest.approx(
+                values[0, 0], rel=1e-12
+            )
+            assert table[name + "_bias"].iloc[f] == pytest.approx(
+                values[0, 1], abs=1e-12
+            )
+
+    again = cross_validate(
+        ModelGr4j,
+        {name: period[name].values for name in period},
+        "flow_mm",
+        folds,
+        scores=("nse", "bias"),
+        population_size=16,
+        n_generations=5,
+        seed=2,
+        output="numpy",
+    )
+    np.testing.assert_array_equal(again["X1"], table["X1"].values)
+    np.testing.assert_array_equal(
+        again["validation_start"], table["validation_start"].values
+    )
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from hydrogr import events
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.input_data import InputDataHandler
+
+
+def test_detection():
+    flow = np.array([0.0, 5.0, 6.0, 1.0, 7.0, np.nan, 8.0, 9.0, 1.0, 1.0, 1.0, 6.0])
+    np.testing.assert_array_equal(
+        events.flood_events(flow, 4.0), [[1, 3], [4, 5], [6, 8], [11, 12]]
+    )
+    # Events are not merged across a NaN time step
+    np.testing.assert_array_equal(
+        events.flood_events(flow, 4.0, min_duration=2, min_separation=2),
+        [[1, 5], [6, 8]],
+    )
+    np.testing.assert_array_equal(
+        events.flood_events(
+            [0.0, 5.0, 6.0, 0.0, 0.0, 7.0, np.nan, 8.0, 8.0, 0.0], 1.0, min_separation=3
+        ),
+        [[1, 6], [7, 9]],
+    )
+    np.testing.assert_array_equal(
+        events.low_flow_spells(flow, 2.0, min_duration=2), [[8, 11]]
+    )
+
+    precipitation = np.array([0.0, 2.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.5, 0.0, 3.0])
+    storms = events.storm_events(precipitation, min_separation=2)
+    np.testing.assert_array_equal(storms, [[1, 4], [7, 10]])
+    np.testing.assert_array_equal(
+        events.storm_events(precipitation, min_separation=2, min_depth=3.2),
+        [[7, 10]],
+    )
+
+    masked = events.mask(flow, [[1, 3], [11, 12]])
+    np.testing.assert_array_equal(np.flatnonzero(~np.isnan(masked)), [1, 2, 11])
+    assert events.runs(np.zeros(3, dtype=bool)).shape == (0, 2)
+    with pytest.raises(ValueError):
+        events.flood_events(flow, 4.0, min_duration=0)
+
+
+def test_sub_period_and_events(dataset_l0123001):
+    data = dataset_l0123001[["precipitation", "evapotranspiration", "flow_mm"]]
+    handler = InputDataHandler(ModelGr4j, data)
+    sub_period = handler.get_sub_period(data.index[100], data.index[465])
+    assert handler.get_period_bounds(data.index[100], data.index[465]) == (100, 466)
+    assert sub_period.n_inputs == 366
+    assert sub_period.start_date == data.index[100]
+    np.testing.assert_array_equal(
+        sub_period.data["precipitation"], data["precipitation"].values[100:466]
+    )
+
+    # Columnar data is sliced without copy
+    columns = {"date": data.index.values} | {
+        name: data[name].values for name in data.columns
+    }
+    columnar_handler = InputDataHandler(ModelGr4j, columns)
+    rows = columnar_handler.get_sub_period(data.index[100], data.index[465])
+    assert np.shares_memory(rows.data["precipitation"], columns["precipitation"])
+    with pytest.raises(ValueError):
+        handler.get_rows(10, 10)
+
+    flow = data["flow_mm"].values
+    threshold = np.nanquantile(flow, 0.95)
+    floods = events.flood_events(flow, threshold, min_duration=2, min_separation=3)
+    assert len(floods) > 0
+    assert all(min(flow[start], flow[stop - 1]) > threshold for start, stop in floods)
+    handlers = handler.get_events(floods, warmup=30)
+    for (start, stop), event in zip(floods, handlers):
+        assert event.n_inputs == stop - max(start - 30, 0)
+        assert event.end_date == data.index[stop - 1]
+    observed = events.mask(flow, floods)
+    assert np.count_nonzero(~np.isnan(observed)) <= (floods[:, 1] - floods[:, 0]).sum()
@@ -0,0 +1,49 @@
+import pytest
+import datetime
+import numpy as np
+from hydrogr.input_data import InputDataHandler
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.gr5j import ModelGr5j
+from hydrogr.gr6j import ModelGr6j
+from hydrogr.gr4h import ModelGr4h
+
+
+def nse(simulated, observed):
+    mask = np.isfinite(observed)
+    simulated, observed = simulated[mask], observed[mask]
+    return 1.0 - np.sum((simulated - observed) ** 2.0) / np.sum(
+        (observed - np.mean(observed)) ** 2.0
+    )
+
+
+@pytest.mark.parametrize(
+    "Model, parameters, dataset, start, end",
+    [
+        (ModelGr4j, {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208}, "dataset_l0123001", 1989, 1999),
+        (ModelGr5j, {"X1": 245.918, "X2": 1.027, "X3": 90.017, "X4": 2.198, "X5": 0.434}, "dataset_l0123001", 1989, 1999),
+        (ModelGr6j, {"X1": 242.257, "X2": 0.637, "X3": 53.517, "X4": 2.218, "X5": 0.424, "X6": 4.759}, "dataset_l0123001", 1989, 1999),
+        (ModelGr4h, {"X1": 521.113, "X2": -2.918, "X3": 218.009, "X4": 4.124}, "dataset_l0123003", 2004, 2008),
+    ],
+)
+def test_fast_precision_deviation(Model, parameters, dataset, start, end, request, record_property):
+    data = request.getfixturevalue(dataset)
+    inputs = InputDataHandler(Model, data).get_sub_period(
+        datetime.datetime(start, 1, 1, 0, 0), datetime.datetime(end, 12, 31, 0, 0)
+    )
+    observed = inputs.data["flow_mm"].values
+
+    reference = Model(dict(parameters)).run(inputs.data)["flow"].values
+    fast = Model(dict(parameters), precision="fast").run(inputs.data)["flow"].values
+
+    max_flow_deviation = np.max(np.abs(fast - reference))
+    nse_deviation = abs(nse(fast, observed) - nse(reference, observed))
+    record_property("max_flow_deviation", max_flow_deviation)
+    record_property("nse_deviation", nse_deviation)
+
+    assert max_flow_deviation < 1e-9
+    assert nse_deviation < 1e-12
+
+
+def test_unknown_precision():
+    with pytest.raises(ValueError):
+        _ = ModelGr4j({"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208}, precision="single")
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from hydrogr import ModelGr1a, ModelGr4j
+from hydrogr.input_data import InputDataHandler
+from hydrogr.model_interface import seasons
+
+PARAMETERS = {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208}
+
+
+@pytest.fixture(scope="module")
+def inputs_with_gaps(dataset_l0123001):
+    df = dataset_l0123001[["precipitation", "evapotranspiration"]].iloc[:3000].copy()
+    df.iloc[[10, 500, 501, 502, 2999], 0] = np.nan
+    df.iloc[[1000, 1001], 1] = np.nan
+    return df
+
+
+def test_na_warning(inputs_with_gaps):
+    with pytest.warns(UserWarning, match="NA detected") as record:
+        InputDataHandler(ModelGr4j, inputs_with_gaps)
+    assert [str(warning.message) for warning in record] == [
+        "NA detected in precipitation time series!",
+        "NA detected in evapotranspiration time series!",
+    ]
+
+
+def test_gap_policy_validation():
+    with pytest.raises(ValueError):
+        ModelGr4j(dict(PARAMETERS), gaps="unknown")
+    assert ModelGr1a.gap_policies == ["propagate"]
+
+
+@pytest.mark.parametrize("gaps", ["zero", "linear"])
+def test_gap_filling(inputs_with_gaps, gaps):
+    model = ModelGr4j(dict(PARAMETERS), gaps=gaps)
+    flow = model.run(inputs_with_gaps)["flow"].values
+
+    if gaps == "zero":
+        filled = inputs_with_gaps.fillna(0.0)
+    else:
+        filled = inputs_with_gaps.interpolate(limit_direction="both")
+    expected = ModelGr4j(dict(PARAMETERS)).run(filled)["flow"].values
+    np.testing.assert_array_equal(flow, expected)
+    assert model.gaps_report == {
+        "precipitation": 5,
+        "evapotranspiration": 2,
+        "skipped": 0,
+    }
+
+
+def test_gap_skip(inputs_with_gaps):
+    model = ModelGr4j(dict(PARAMETERS), gaps="skip")
+    flow = model.run_arrays(
+        {name: inputs_with_gaps[name].values for name in inputs_with_gaps}
+    )["flow"]
+
+    gaps = inputs_with_gaps.isnull().any(axis=1).values
+    assert np.isnan(flow[gaps]).all()
+    assert not np.isnan(flow[~gaps]).any()
+    assert model.gaps_report["skipped"] == 7
+
+    # The states are held over the skipped steps
+    reference = ModelGr4j(dict(PARAMETERS))
+    reference.run(inputs_with_gaps.iloc[:10])
+    expected = reference.run(inputs_with_gaps.iloc[11:500])["flow"].values
+    np.testing.assert_array_equal(flow[11:500], expected)
+
+
+def test_gap_climatology(inputs_with_gaps):
+    model = ModelGr4j(dict(PARAMETERS), gaps="climatology")
+    with pytest.raises(ValueError):
+        model.run_arrays(
+            {name: inputs_with_gaps[name].values for name in inputs_with_gaps}
+        )
+    flow = model.run(inputs_with_gaps)["flow"].values
+
+    day_of_year = seasons(inputs_with_gaps.index)
+    assert day_of_year[0] == inputs_with_gaps.index[0].dayofyear - 1
+    filled = inputs_with_gaps.copy()
+    for name in filled:
+        climatology = filled[name].groupby(day_of_year).transform("mean")
+        filled[name] = filled[name].fillna(climatology)
+    expected = ModelGr4j(dict(PARAMETERS)).run(filled)["flow"].values
+    np.testing.assert_allclose(flow, expected, rtol=1e-12)
+
+
+def test_gaps_report_unfillable(inputs_with_gaps):
+    # An input without valid value is not filled, its gaps are passed to the model
+    data = inputs_with_gaps.iloc[:100].copy()
+    data["evapotranspiration"] = np.nan
+    model = ModelGr4j(dict(PARAMETERS), gaps="linear")
+    flow = model.run_arrays({name: data[name].values for name in data})["flow"]
+    assert np.isnan(flow).all()
+    assert model.gaps_report == {
+        "precipitation": 1,
+        "evapotranspiration": 0,
+        "skipped": 0,
+    }
+
+    # Over a single year, the day of the gap has no other value : it takes the overall mean
+    model = ModelGr4j(dict(PARAMETERS), gaps="climatology")
+    flow = model.run(inputs_with_gaps.iloc[:365])["flow"].values
+    assert not np.isnan(flow).any()
+    assert model.gaps_report["precipitation"] == 1
@@ -0,0 +1,92 @@
+import pytest
+import numpy as np
+from hydrogr.batch import run_batch
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.grid import create_grid, open_grid, run_grid
+
+
+@pytest.fixture(scope="module")
+def forcing(dataset_l0123001):
+    # Small (time, y, x) cube built from the catchment series, scaled per cell
+    n_steps, ny, nx = 400, 5, 7
+    scale = np.linspace(0.5, 1.5, ny * nx).reshape(ny, nx)
+    precipitation = (
+        dataset_l0123001["precipitation"].values[:n_steps, None, None] * scale
+    )
+    evapotranspiration = np.broadcast_to(
+        dataset_l0123001["evapotranspiration"].values[:n_steps, None, None],
+        (n_steps, ny, nx),
+    ).copy()
+    return precipitation, evapotranspiration
+
+
+@pytest.fixture(scope="module")
+def parameter_maps():
+    ny, nx = 5, 7
+    maps = {
+        "X1": np.linspace(100.0, 400.0, ny * nx).reshape(ny, nx),
+        "X2": 0.5,
+        "X3": np.linspace(30.0, 120.0, ny * nx).reshape(ny, nx),
+        "X4": 2.2,
+    }
+    maps["X1"][0, 0] = np.nan
+    return maps
+
+
+def test_run_grid(forcing, parameter_maps):
+    precipitation, evapotranspiration = forcing
+    mask = np.zeros(precipitation.shape[1:], dtype=bool)
+    mask[4, :] = True
+
+    flow = run_grid(
+        ModelGr4j,
+        parameter_maps,
+        precipitation,
+        evapotranspiration,
+        mask=mask,
+        chunk_shape=(2, 3),
+        time_chunk=90,
+    )
+    assert flow.shape == precipitation.shape
+    assert np.isnan(flow[:, 4, :]).all()
+    assert np.isnan(flow[:, 0, 0]).all()
+
+    # Same results as a single batch over the whole period
+    y, x = 2, 5
+    reference, _ = run_batch(
+        ModelGr4j,
+        {
+            name: np.broadcast_to(value, (5, 7))[y, x]
+            for name, value in parameter_maps.items()
+        },
+        precipitation[None, :, y, x],
+        evapotranspiration[None, :, y, x],
+    )
+    np.testing.assert_array_equal(flow[:, y, x], reference[0])
+    assert not np.isnan(flow[:, :4, 1:]).any()
+
+
+def test_run_grid_file_backend(tmp_path, forcing, parameter_maps):
+    precipitation, evapotranspiration = forcing
+    for name, values in [
+        ("precipitation", precipitation),
+        ("evapotranspiration", evapotranspiration),
+    ]:
+        grid = create_grid(tmp_path / "{}.npy".format(name), values.shape)
+        grid[:] = values
+        grid.flush()
+        del grid
+
+    out = run_grid(
+        ModelGr4j,
+        parameter_maps,
+        open_grid(tmp_path / "precipitation.npy"),
+        open_grid(tmp_path / "evapotranspiration.npy"),
+        out=tmp_path / "flow.npy",
+        chunk_shape=(3, 3),
+        time_chunk=100,
+        n_workers=3,
+    )
+    del out
+    expected = run_grid(ModelGr4j, parameter_maps, precipitation, evapotranspiration)
+    np.testing.assert_array_equal(open_grid(tmp_path / "flow.npy"), expected)
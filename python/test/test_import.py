@@ -0,0 +1,44 @@
+import subprocess
+import sys
+import numpy as np
+from hydrogr.gr4j import ModelGr4j
+
+
+def run_python(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def test_import_does_not_import_pandas():
+    code = "import sys, hydrogr; print('pandas' in sys.modules)"
+    assert run_python(code) == "False"
+
+
+def test_numpy_only_run_does_not_import_pandas():
+    code = (
+        "import sys, numpy as np\n"
+        "from hydrogr import ModelGr4j\n"
+        "model = ModelGr4j({'X1': 257.238, 'X2': 1.012, 'X3': 88.235, 'X4': 2.208})\n"
+        "outputs = model.run_arrays({'precipitation': np.ones(10), 'evapotranspiration': np.ones(10)})\n"
+        "print(len(outputs['flow']), 'pandas' in sys.modules)"
+    )
+    assert run_python(code) == "10 False"
+
+
+def test_lazy_attributes():
+    code = "import hydrogr; print(hydrogr.InputDataHandler.__name__, 'ModelGr6j' in dir(hydrogr))"
+    assert run_python(code) == "InputDataHandler True"
+
+
+def test_run_arrays_matches_run(dataset_l0123001):
+    parameters = {"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208}
+    outputs = ModelGr4j(dict(parameters)).run(dataset_l0123001)
+    arrays = ModelGr4j(dict(parameters)).run_arrays(
+        {
+            "precipitation": dataset_l0123001["precipitation"].values,
+            "evapotranspiration": dataset_l0123001["evapotranspiration"].values,
+        }
+    )
+    np.testing.assert_array_equal(outputs["flow"].values, arrays["flow"])
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from hydrogr import pet
+from hydrogr.batch import run_batch
+from hydrogr.gr4j import ModelGr4j
+
+
+def test_oudin_matches_dataset(dataset_l0123001):
+    # The evapotranspiration of the dataset is the Oudin formula (rounded to 0.1 mm) at about 45°N
+    values = pet.compute(
+        dataset_l0123001["temperature"].values, 45.0, dataset_l0123001.index
+    )
+    observed = dataset_l0123001["evapotranspiration"].values
+    valid = ~np.isnan(observed)
+    assert np.abs(values[valid] - observed[valid]).max() < 0.2
+    assert np.abs(values[valid] - observed[valid]).mean() < 0.05
+
+
+def test_many_catchments(dataset_l0123001):
+    dates = dataset_l0123001.index[:730]
+    temperature = dataset_l0123001["temperature"].values[:730]
+    latitudes = np.array([45.0, 60.0, -30.0])
+    values = pet.compute(np.tile(temperature, (3, 1)), latitudes, dates)
+    assert values.shape == (3, 730)
+    for i, latitude in enumerate(latitudes):
+        np.testing.assert_array_equal(
+            values[i], pet.compute(temperature, latitude, dates)
+        )
+    # Southern hemisphere : higher in January than in July at the same temperature
+    constant = pet.compute(np.full((3, 730), 15.0), latitudes, dates)
+    assert constant[2, :31].mean() > constant[2, 181:212].mean()
+    assert constant[0, :31].mean() < constant[0, 181:212].mean()
+
+    hamon = pet.compute(temperature, 45.0, dates, formula="hamon")
+    assert np.corrcoef(hamon, values[0])[0, 1] > 0.9
+
+    # Fed directly to the kernels
+    precipitation = dataset_l0123001["precipitation"].values[:730]
+    flow, _ = run_batch(
+        ModelGr4j,
+        np.array([[257.238, 1.012, 88.235, 2.208]] * 3),
+        np.tile(precipitation, (3, 1)),
+        values,
+    )
+    assert np.isfinite(flow).all()
+
+
+def test_sub_daily_and_validation():
+    dates = pd.date_range("2020-06-01", periods=48, freq="h")
+    hourly = pet.compute(np.full(48, 15.0), 45.0, dates)
+    daily = pet.compute(np.full(2, 15.0), 45.0, dates[::24])
+    np.testing.assert_allclose(hourly[:24].sum(), daily[0], rtol=1e-12)
+
+    with pytest.raises(ValueError):
+        pet.compute(np.full(48, 15.0), 45.0, dates, formula="penman")
+    with pytest.raises(ValueError):
+        pet.compute(np.full(47, 15.0), 45.0, dates)
+    with pytest.raises(ValueError):
+        pet.compute(np.full(3, 15.0), 45.0, pd.date_range("2020", periods=3, freq="MS"))
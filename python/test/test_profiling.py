@@ -0,0 +1,43 @@
+import json
+import datetime
+from hydrogr import profiling
+from hydrogr.input_data import InputDataHandler
+from hydrogr.gr4j import ModelGr4j
+
+
+def test_profiling_disabled_by_default(dataset_l0123001):
+    assert not profiling.is_enabled()
+    assert profiling.get_profiler() is None
+
+    model = ModelGr4j({"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208})
+    _ = model.run(dataset_l0123001)
+    assert profiling.get_profiler() is None
+
+
+def test_profiling_records_phases(dataset_l0123001):
+    inputs = InputDataHandler(ModelGr4j, dataset_l0123001)
+    start_date = datetime.datetime(1989, 1, 1, 0, 0)
+    end_date = datetime.datetime(1999, 12, 31, 0, 0)
+    inputs = inputs.get_sub_period(start_date, end_date)
+
+    model = ModelGr4j({"X1": 257.238, "X2": 1.012, "X3": 88.235, "X4": 2.208})
+    with profiling.profile() as profiler:
+        _ = model.run(inputs.data)
+        _ = model.run(inputs.data)
+    assert not profiling.is_enabled()
+
+    statistics = profiler.as_dict()
+    phases = statistics["phases"]["gr4j"]
+    assert set(phases) == {"validation", "copy", "kernel", "output"}
+    for phase in phases.values():
+        assert phase["calls"] == 2
+        assert phase["wall_time"] >= 0.0
+    assert phases["copy"]["bytes_copied"] <= 2 * 2 * 8 * inputs.n_inputs
+    assert phases["kernel"]["steps"] == 2 * inputs.n_inputs
+    assert phases["kernel"]["bytes_allocated"] == 2 * 8 * inputs.n_inputs
+
+    kernel = statistics["kernels"]["gr4j"]
+    assert kernel["calls"] == 2
+    assert kernel["steps"] == 2 * inputs.n_inputs
+
+    assert json.loads(profiler.to_json()) == json.loads(json.dumps(statistics))
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from hydrogr.batch import evaluate_batch, run_batch
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.regionalisation import regionalise
+
+
+@pytest.fixture(scope="module")
+def receivers(dataset_l0123001, dataset_l0123003):
+    # Two receivers, one per dataset, over the same number of steps
+    data = [dataset.iloc[:1500] for dataset in (dataset_l0123001, dataset_l0123003)]
+    return {
+        name: np.stack([d[name].values for d in data])
+        for name in ["precipitation", "evapotranspiration", "flow_mm"]
+    }
+
+
+def test_regionalise(receivers, gr4j_parameter_sets):
+    donors = gr4j_parameter_sets
+    n, m = donors.shape[0], 2
+    flow = regionalise(
+        ModelGr4j,
+        donors,
+        receivers["precipitation"],
+        receivers["evapotranspiration"],
+        reduction="flow",
+    )
+    assert flow.shape == (n, m, receivers["precipitation"].shape[1])
+    for j in range(m):
+        expected, _ = run_batch(
+            ModelGr4j,
+            donors,
+            np.tile(receivers["precipitation"][j], (n, 1)),
+            np.tile(receivers["evapotranspiration"][j], (n, 1)),
+        )
+        np.testing.assert_allclose(flow[:, j], expected, rtol=1e-12)
+
+    weights = np.array([[1.0, 0.0], [2.0, 1.0], [1.0, 3.0]])
+    mean = regionalise(
+        ModelGr4j,
+        donors,
+        receivers["precipitation"],
+        receivers["evapotranspiration"],
+        weights=weights,
+    )
+    np.testing.assert_allclose(
+        mean, (flow * weights[:, :, None]).sum(axis=0) / weights.sum(axis=0)[:, None]
+    )
+
+    scores = regionalise(
+        ModelGr4j,
+        donors,
+        receivers["precipitation"],
+        receivers["evapotranspiration"],
+        reduction="criteria",
+        observed=receivers["flow_mm"],
+        criteria=["nse", "bias"],
+        warmup=365,
+    )
+    assert scores.shape == (n, m, 2)
+    for j in range(m):
+        expected = evaluate_batch(
+            ModelGr4j,
+            donors,
+            receivers["precipitation"][j],
+            receivers["evapotranspiration"][j],
+            receivers["flow_mm"][j],
+            ["nse", "bias"],
+            warmup=365,
+        )
+        np.testing.assert_allclose(scores[:, j], expected, rtol=1e-10, atol=1e-12)
+
+    with pytest.raises(ValueError):
+        regionalise(
+            ModelGr4j,
+            donors,
+            receivers["precipitation"],
+            receivers["evapotranspiration"],
+            reduction="criteria",
+        )
+    # A receiver without any weighted donor would get a NaN flow
+    with pytest.raises(ValueError):
+        regionalise(
+            ModelGr4j,
+            donors,
+            receivers["precipitation"],
+            receivers["evapotranspiration"],
+            weights=np.array([[1.0, 0.0], [2.0, 0.0], [1.0, 0.0]]),
+        )
@@ -0,0 +1,233 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+from hydrogr import profiling, serving
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.gr5j import ModelGr5j
+from hydrogr.serving import ForecastServer, MicroBatcher, StateRegistry
+
+
+@pytest.fixture
+def registry(gr4j_parameter_sets):
+    registry = StateRegistry()
+    for i, parameters in enumerate(gr4j_parameter_sets):
+        registry.register("c{}".format(i), ModelGr4j, parameters)
+    registry.register("c5", ModelGr5j, [245.918, 1.027, 90.017, 2.198, 0.434])
+    return registry
+
+
+def _model_flow(Model, parameters, precipitation, evapotranspiration):
+    model = Model(dict(zip(Model.parameters_names, parameters)))
+    outputs = model.run_arrays(
+        {"precipitation": precipitation, "evapotranspiration": evapotranspiration}
+    )
+    return outputs["flow"], model.get_states()
+
+
+def test_registry_run(registry, batch_forcing, gr4j_parameter_sets):
+    precipitation, evapotranspiration = batch_forcing
+    requests = [("c{}".format(i), precipitation, evapotranspiration) for i in range(3)]
+    flows = registry.run(requests + [("c5", precipitation, evapotranspiration)])
+    for i, parameters in enumerate(gr4j_parameter_sets):
+        expected, _ = _model_flow(
+            ModelGr4j, parameters, precipitation, evapotranspiration
+        )
+        np.testing.assert_allclose(flows[i], expected, rtol=1e-12)
+
+    # Forecasts leave the states unchanged, runs with update_states carry them over
+    np.testing.assert_array_equal(registry.get_states("c0")["uh2"], 0.0)
+    first = registry.run(
+        [("c0", precipitation[:365], evapotranspiration[:365])], update_states=True
+    )[0]
+    second = registry.run(
+        [("c0", precipitation[365:], evapotranspiration[365:])], update_states=True
+    )[0]
+    np.testing.assert_allclose(np.concatenate([first, second]), flows[0], rtol=1e-12)
+    _, states = _model_flow(
+        ModelGr4j, gr4j_parameter_sets[0], precipitation, evapotranspiration
+    )
+    assert registry.get_states("c0")["production_store"] == pytest.approx(
+        states["production_store"], rel=1e-12
+    )
+
+    with pytest.raises(ValueError):
+        registry.run(requests[:1] * 2)
+    with pytest.raises(KeyError):
+        registry.run([("unknown", precipitation, evapotranspiration)])
+
+
+class _Panic(BaseException):
+    # Stand-in of the PanicException of the extension, not an Exception
+    pass
+
+
+def test_registry_failed_batch(
+    registry, batch_forcing, gr4j_parameter_sets, monkeypatch
+):
+    precipitation, evapotranspiration = batch_forcing
+    run_levels = serving._run_levels
+
+    def failing_run_levels(Model, *args):
+        if Model is ModelGr5j:
+            raise _Panic("kernel panic")
+        return run_levels(Model, *args)
+
+    monkeypatch.setattr(serving, "_run_levels", failing_run_levels)
+    requests = [
+        ("c0", precipitation, evapotranspiration),
+        ("c5", precipitation, evapotranspiration),
+    ]
+    # The states of the first group are not committed when a later group fails
+    with pytest.raises(_Panic):
+        registry.run(requests, update_states=True)
+    np.testing.assert_array_equal(registry.get_states("c0")["uh2"], 0.0)
+
+    # A panic fails its own request, the batcher keeps running and the others states advance once
+    batcher = MicroBatcher(registry, max_batch=64, max_delay=0.2)
+    futures = [batcher.submit(*request, update_states=True) for request in requests]
+    flow = futures[0].result(timeout=10.0)
+    with pytest.raises(_Panic):
+        futures[1].result(timeout=10.0)
+    assert (
+        batcher.submit("c1", precipitation, evapotranspiration).result(10.0) is not None
+    )
+    batcher.close()
+    expected, states = _model_flow(
+        ModelGr4j, gr4j_parameter_sets[0], precipitation, evapotranspiration
+    )
+    np.testing.assert_allclose(flow, expected, rtol=1e-12)
+    assert registry.get_states("c0")["production_store"] == pytest.approx(
+        states["production_store"], rel=1e-12
+    )
+
+    # The unit hydrographs of the batch kernel are 20 days long
+    with pytest.raises(ValueError):
+        registry.register("c6", ModelGr4j, [350.0, 0.0, 90.0, 20.5])
+    assert "c6" not in registry
+
+
+def test_registry_checkpoint(registry, batch_forcing, tmp_path):
+    precipitation, evapotranspiration = batch_forcing
+    registry.run(
+        [("c1", precipitation, evapotranspiration)],
+        update_states=True,
+    )
+    # A catchment registered again with another model moves to the other group
+    registry.register("c0", ModelGr5j, [245.918, 1.027, 90.017, 2.198, 0.434])
+    registry.save(tmp_path / "registry.npz")
+
+    loaded = StateRegistry(tmp_path / "registry.npz")
+    assert loaded.catchments == registry.catchments
+    for catchment in registry.catchments:
+        expected = registry.get_states(catchment)
+        states = loaded.get_states(catchment)
+        for name in expected:
+            np.testing.assert_array_equal(states[name], expected[name])
+    requests = [
+        (catchment, precipitation, evapotranspiration)
+        for catchment in registry.catchments
+    ]
+    for flow, expected in zip(loaded.run(requests), registry.run(requests)):
+        np.testing.assert_array_equal(flow, expected)
+
+
+def test_micro_batching(registry, batch_forcing):
+    precipitation, evapotranspiration = batch_forcing
+    batcher = MicroBatcher(registry, max_batch=64, max_delay=0.2)
+    with profiling.profile() as profiler:
+        futures = [
+            batcher.submit("c{}".format(i % 3), precipitation, evapotranspiration)
+            for i in range(6)
+        ]
+        flows = [future.result(timeout=10.0) for future in futures]
+    batcher.close()
+    # Requests on the same catchment are split across batches : two kernel calls
+    assert profiler.as_dict()["phases"]["gr4j"]["kernel"]["calls"] == 2
+    for i, flow in enumerate(flows):
+        np.testing.assert_array_equal(flow, flows[i % 3])
+
+    with pytest.raises(RuntimeError):
+        batcher.submit("c0", precipitation, evapotranspiration)
+
+
+def test_forecast_server(registry, batch_forcing, gr4j_parameter_sets, tmp_path):
+    precipitation, evapotranspiration = batch_forcing
+    server = ForecastServer(
+        registry,
+        max_delay=0.01,
+        checkpoint_path=tmp_path / "registry.npz",
+        checkpoint_interval=3600.0,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://{}:{}".format(*server.server_address)
+
+    def post(document):
+        request = urllib.request.Request(
+            url + "/forecast",
+            data=json.dumps(document).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=10.0) as response:
+            return json.loads(response.read())
+
+    results = {}
+
+    def client(i):
+        results[i] = post(
+            {
+                "catchment": "c{}".format(i),
+                "precipitation": precipitation.tolist(),
+                "evapotranspiration": evapotranspiration.tolist(),
+            }
+        )
+
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(3)]
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    try:
+        for i, parameters in enumerate(gr4j_parameter_sets):
+            expected, _ = _model_flow(
+                ModelGr4j, parameters, precipitation, evapotranspiration
+            )
+            assert results[i]["catchment"] == "c{}".format(i)
+            np.testing.assert_allclose(results[i]["flow"], expected, rtol=1e-12)
+
+        with urllib.request.urlopen(url + "/catchments", timeout=10.0) as response:
+            assert json.loads(response.read()) == registry.catchments
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(
+                {"catchment": "unknown", "precipitation": [], "evapotranspiration": []}
+            )
+        assert error.value.code == 404
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post({"catchment": "c0", "precipitation": [1.0, 2.0]})
+        assert error.value.code == 400
+
+        # Catchment removed between the check and the run, then batcher closed
+        document = {
+            "catchment": "c0",
+            "precipitation": [1.0, 2.0],
+            "evapotranspiration": [0.5, 0.5],
+        }
+        batcher = server.batcher
+        server.batcher = MicroBatcher(StateRegistry(), max_delay=0.01)
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(document)
+        assert error.value.code == 404
+        server.batcher.close()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(document)
+        assert error.value.code == 503
+        assert "closed" in json.loads(error.value.read())["error"]
+        server.batcher = batcher
+    finally:
+        server.shutdown()
+        server.server_close()
+    # Last checkpoint written on close
+    assert StateRegistry(tmp_path / "registry.npz").catchments == registry.catchments
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from hydrogr.batch import run_batch
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.signatures import SIGNATURES, compute
+
+
+@pytest.fixture(scope="module")
+def period(dataset_l0123001):
+    return dataset_l0123001.iloc[:3000]
+
+
+def test_signatures(period):
+    observed = period["flow_mm"].values.copy()
+    observed[[100, 2000]] = np.nan
+    values = compute(
+        observed,
+        SIGNATURES,
+        precipitation=period["precipitation"].values,
+        exceedance=[0.1, 0.5, 0.9],
+        warmup=365,
+    )
+
+    valid = observed[365:][~np.isnan(observed[365:])]
+    assert values["mean"] == pytest.approx(valid.mean(), rel=1e-12)
+    assert values["q5"] == pytest.approx(np.quantile(valid, 0.95), rel=1e-12)
+    assert values["q95"] == pytest.approx(np.quantile(valid, 0.05), rel=1e-12)
+    np.testing.assert_allclose(
+        values["fdc"], np.quantile(valid, [0.9, 0.5, 0.1]), rtol=1e-12
+    )
+    precipitation = period["precipitation"].values[365:]
+    kept = ~np.isnan(observed[365:])
+    assert values["runoff_ratio"] == pytest.approx(
+        valid.sum() / precipitation[kept].sum(), rel=1e-12
+    )
+    assert 0.0 < values["baseflow_index"] < 1.0
+    assert 0.0 < values["recession_constant"] < 1.0
+
+
+def test_recession_constant():
+    # Exponential recessions, separated by flood peaks
+    recession = 10.0 * 0.9 ** np.arange(12)
+    flow = np.tile(np.concatenate([[0.5], recession]), 8)
+    values = compute(flow, ["recession_constant", "baseflow_index"])
+    assert values["recession_constant"] == pytest.approx(0.9, rel=1e-12)
+    assert compute(np.full(50, 2.0), ["baseflow_index"])[
+        "baseflow_index"
+    ] == pytest.approx(1.0)
+
+
+def test_batch_signatures(period, gr4j_parameter_sets):
+    flow, _ = run_batch(
+        ModelGr4j,
+        gr4j_parameter_sets,
+        np.tile(period["precipitation"].values, (3, 1)),
+        np.tile(period["evapotranspiration"].values, (3, 1)),
+    )
+    values = compute(flow, exceedance=np.linspace(0.05, 0.95, 19), warmup=365)
+    assert values["mean"].shape == (3,)
+    assert values["fdc"].shape == (3, 19)
+    # Flow duration curves are decreasing
+    assert (np.diff(values["fdc"], axis=1) <= 0.0).all()
+
+    # Each row matches the signatures of the single series, and of the model output
+    for i in range(3):
+        single = compute(flow[i], exceedance=np.linspace(0.05, 0.95, 19), warmup=365)
+        for name in single:
+            np.testing.assert_allclose(values[name][i], single[name], rtol=1e-12)
+    model = ModelGr4j(dict(zip(ModelGr4j.parameters_names, gr4j_parameter_sets[0])))
+    output = model.run(period[["precipitation", "evapotranspiration"]])
+    from_output = compute(output, ["mean", "q95"], warmup=365)
+    assert from_output["mean"] == pytest.approx(values["mean"][0], rel=1e-12)
+
+
+def test_signatures_validation():
+    with pytest.raises(ValueError):
+        compute(np.ones(10), ["unknown"])
+    with pytest.raises(ValueError):
+        compute(np.ones(10), ["runoff_ratio"])
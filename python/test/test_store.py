@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from hydrogr.batch import run_batch
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.gr6j import ModelGr6j
+from hydrogr.store import CatchmentStore
+
+CATCHMENTS = ["L0123003", "L0123001", "L0123002"]
+
+
+@pytest.fixture
+def store(tmp_path, gr4j_parameter_sets):
+    with CatchmentStore(tmp_path / "catchments.sqlite") as store:
+        store.put_batch(
+            ModelGr4j,
+            CATCHMENTS,
+            gr4j_parameter_sets,
+            {"production_store": [0.1, 0.2, 0.3]},
+            metadata=[{"area": 100.0}, None, {"area": 3.5}],
+        )
+        yield store
+
+
+def test_batch_round_trip(store, tmp_path, gr4j_parameter_sets):
+    catchments, parameters, states = store.get_batch(ModelGr4j)
+    assert catchments == sorted(CATCHMENTS)
+    order = [CATCHMENTS.index(catchment) for catchment in catchments]
+    np.testing.assert_array_equal(parameters, gr4j_parameter_sets[order])
+    np.testing.assert_array_equal(
+        states["production_store"], np.array([0.1, 0.2, 0.3])[order]
+    )
+    np.testing.assert_array_equal(states["routing_store"], 0.5)
+    assert states["uh1"].shape == (3, 20) and states["uh2"].shape == (3, 40)
+
+    # Selection keeps the requested order, and the arrays are writable
+    catchments, parameters, _ = store.get_batch(ModelGr4j, ["L0123002", "L0123003"])
+    assert catchments == ["L0123002", "L0123003"]
+    np.testing.assert_array_equal(parameters, gr4j_parameter_sets[[2, 0]])
+    parameters[0, 0] = 1.0
+    with pytest.raises(KeyError):
+        store.get_batch(ModelGr4j, ["L0123002", "unknown"])
+
+    assert store.get_metadata("L0123003", ModelGr4j) == {"area": 100.0}
+    assert store.get_metadata("L0123001", ModelGr4j) == {}
+    assert store.catchments(ModelGr6j) == []
+
+    # Records persist in the file and metadata are kept when not given
+    store.put_batch(ModelGr4j, ["L0123003"], gr4j_parameter_sets[:1])
+    with CatchmentStore(tmp_path / "catchments.sqlite") as other:
+        assert other.catchments(ModelGr4j) == sorted(CATCHMENTS)
+        assert other.get_metadata("L0123003", ModelGr4j) == {"area": 100.0}
+
+
+def test_write_back_after_run(store, batch_forcing):
+    precipitation, evapotranspiration = batch_forcing
+    catchments, parameters, states = store.get_batch(ModelGr4j)
+    n = len(catchments)
+    _, final_states = run_batch(
+        ModelGr4j,
+        parameters,
+        np.tile(precipitation, (n, 1)),
+        np.tile(evapotranspiration, (n, 1)),
+        states,
+    )
+    store.put_states(ModelGr4j, catchments, final_states)
+
+    _, _, stored = store.get_batch(ModelGr4j)
+    for name in final_states:
+        np.testing.assert_array_equal(stored[name], final_states[name])
+
+    # Unknown catchments roll the whole write back
+    with pytest.raises(KeyError):
+        store.put_states(
+            ModelGr4j, [catchments[0], "unknown"], {"production_store": 0.9}
+        )
+    _, _, stored = store.get_batch(ModelGr4j)
+    np.testing.assert_array_equal(
+        stored["production_store"], final_states["production_store"]
+    )
+
+
+def test_models(store, dataset_l0123001):
+    inputs = dataset_l0123001.iloc[:730]
+    model = store.get_model("L0123001", ModelGr4j)
+    assert model.get_states()["production_store"] == pytest.approx(0.2)
+    model.run(inputs)
+    store.put_model("L0123001", model, {"calibrated": True})
+
+    restored = store.get_model("L0123001", ModelGr4j)
+    for name, value in model.get_states().items():
+        np.testing.assert_array_equal(restored.get_states()[name], value)
+    assert store.get_metadata("L0123001", ModelGr4j) == {"calibrated": True}
+
+    store.delete("L0123001", ModelGr4j)
+    with pytest.raises(KeyError):
+        store.get_model("L0123001", ModelGr4j)
@@ -0,0 +1,65 @@
+import pytest
+import numpy as np
+from hydrogr.gr4j import ModelGr4j
+from hydrogr.streaming import StreamingQuantiles
+from hydrogr.uncertainty import glue
+
+
+def _weighted_quantile(values, weights, probability):
+    order = np.argsort(values)
+    cumulated = np.cumsum(weights[order])
+    return values[order][np.searchsorted(cumulated, probability * cumulated[-1])]
+
+
+def test_streaming_quantiles():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(0.0, 1.0, (2000, 30))
+    values[:, 0] = 0.0
+    values[5, 1] = np.nan
+    weights = rng.random(2000)
+
+    estimator = StreamingQuantiles(30)
+    for start in range(0, 2000, 300):
+        estimator.update(values[start : start + 300], weights[start : start + 300])
+    assert estimator.n_members == 2000
+
+    quantiles = estimator.quantiles([0.05, 0.5, 0.95])
+    assert quantiles.shape == (3, 30)
+    np.testing.assert_array_equal(quantiles[:, 0], 0.0)
+    for t in range(1, 30):
+        valid = ~np.isnan(values[:, t])
+        for i, probability in enumerate([0.05, 0.5, 0.95]):
+            expected = _weighted_quantile(values[valid, t], weights[valid], probability)
+            assert quantiles[i, t] == pytest.approx(expected, rel=0.03)
+        expected_mean = np.average(values[valid, t], weights=weights[valid])
+        assert estimator.mean()[t] == pytest.approx(expected_mean, rel=1e-12)
+
+
+def test_glue(dataset_l0123001):
+    data = dataset_l0123001.loc["1989-01-01":"1992-12-31"]
+    result = glue(
+        ModelGr4j,
+        data,
+        "flow_mm",
+        n_samples=600,
+        threshold=0.6,
+        batch_size=128,
+        warmup=365,
+        seed=1,
+    )
+    n_steps = len(data)
+    assert result.quantiles.shape == (3, n_steps)
+    assert result.mean.shape == (n_steps,)
+    assert 0.0 < result.behavioural_fraction < 1.0
+    assert (result.likelihoods > 0.6).all()
+    assert result.parameters.shape == (result.likelihoods.size, 4)
+    assert (result.quantiles[0] <= result.quantiles[1]).all()
+    assert (result.quantiles[1] <= result.quantiles[2]).all()
+
+    # Most observations fall within the 90 % bounds of a reasonable ensemble
+    observed = data["flow_mm"].values[365:]
+    valid = ~np.isnan(observed)
+    inside = (observed >= result.quantiles[0, 365:] * 0.5) & (
+        observed <= result.quantiles[2, 365:] * 2.0
+    )
+    assert inside[valid].mean() > 0.5
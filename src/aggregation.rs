@@ -0,0 +1,123 @@
+use super::parallel;
+use ndarray::{Array1, Array2, ArrayView1, ArrayView2};
+
+// Aggregation of a time series over consecutive periods (days, months or years of a finer series), in a single pass
+// over the series : period k covers the time steps offsets[k]..offsets[k + 1], the time steps before the first
+// period or after the last one are ignored. A missing value (NaN) makes the period missing. The flow of a model run
+// is aggregated as it is computed (see engine::run_into), without storing the series at the model time step.
+
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub enum Reduction {
+    Sum,
+    Mean,
+}
+
+impl Reduction {
+    pub fn from_name(name: &str) -> Option<Reduction> {
+        match name {
+            "sum" => Some(Reduction::Sum),
+            "mean" => Some(Reduction::Mean),
+            _ => None,
+        }
+    }
+}
+
+/// Totals or means over the periods, accumulated one time step at a time in increasing time order.
+pub struct Periods<'a> {
+    offsets: &'a [usize],
+    reduction: Reduction,
+    period: usize,
+    values: Vec<f64>,
+}
+
+impl<'a> Periods<'a> {
+    /// offsets are the non decreasing bounds of the periods, at least one.
+    pub fn new(offsets: &'a [usize], reduction: Reduction) -> Periods<'a> {
+        Periods {
+            offsets,
+            reduction,
+            period: 0,
+            values: vec![0.0; offsets.len().saturating_sub(1)],
+        }
+    }
+
+    #[inline(always)]
+    pub fn push(&mut self, t: usize, value: f64) {
+        while self.period < self.values.len() && t >= self.offsets[self.period + 1] {
+            self.period += 1;
+        }
+        if self.period < self.values.len() && t >= self.offsets[self.period] {
+            self.values[self.period] += value;
+        }
+    }
+
+    pub fn len(&self) -> usize {
+        self.values.len()
+    }
+
+    /// Values of the periods. The mean of an empty period is NaN.
+    pub fn finish(self) -> Array1<f64> {
+        let mut values = self.values;
+        if self.reduction == Reduction::Mean {
+            for (k, value) in values.iter_mut().enumerate() {
+                *value /= (self.offsets[k + 1] - self.offsets[k]) as f64;
+            }
+        }
+        Array1::from_vec(values)
+    }
+}
+
+/// Aggregate a time series over the periods.
+pub fn aggregate(
+    values: ArrayView1<'_, f64>,
+    offsets: &[usize],
+    reduction: Reduction,
+) -> Array1<f64> {
+    let mut periods = Periods::new(offsets, reduction);
+    for (t, value) in values.iter().enumerate() {
+        periods.push(t, *value);
+    }
+    periods.finish()
+}
+
+/// Aggregate each row of values (one row per series) over the periods, with the reduction of each row.
+pub fn aggregate_all(
+    values: ArrayView2<'_, f64>,
+    offsets: &[usize],
+    reductions: &[Reduction],
+) -> Array2<f64> {
+    let rows = parallel::map(values.nrows(), |i| {
+        aggregate(values.row(i), offsets, reductions[i])
+    });
+
+    let mut out = Array2::zeros((rows.len(), offsets.len().saturating_sub(1)));
+    for (i, row) in rows.iter().enumerate() {
+        for (k, value) in row.iter().enumerate() {
+            out[[i, k]] = *value;
+        }
+    }
+    out
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_aggregate() {
+        let values: Vec<f64> = (0..10).map(|t| t as f64).collect();
+        let offsets = [1, 4, 4, 9];
+        let sums = aggregate(ArrayView1::from(&values), &offsets, Reduction::Sum);
+        assert_eq!(sums.to_vec(), vec![6.0, 0.0, 30.0]);
+        let means = aggregate(ArrayView1::from(&values), &offsets, Reduction::Mean);
+        assert_eq!(means[0], 2.0);
+        assert!(means[1].is_nan());
+        assert_eq!(means[2], 6.0);
+
+        let mut missing = values.clone();
+        missing[5] = f64::NAN;
+        let sums = aggregate(ArrayView1::from(&missing), &offsets, Reduction::Sum);
+        assert_eq!(sums[0], 6.0);
+        assert!(sums[2].is_nan());
+    }
+}
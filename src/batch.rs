@@ -0,0 +1,481 @@
+use super::criteria::{self, Accumulator, Criterion, Observed};
+use super::engine::{self, Model, Stepper};
+use super::gaps::Gaps;
+use super::math::{Fast, Reference};
+use super::parallel;
+use super::{gr4h, gr4j, gr5j, gr6j};
+use ndarray::{s, Array1, Array2, ArrayView1, ArrayView2, ArrayViewMut1};
+
+// Batched simulation of several members (catchments, grid cells or parameter sets) of the same model structure.
+// Each member has its own parameters, states and forcing, members are simulated in parallel.
+
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub enum Structure {
+    Gr4j,
+    Gr5j,
+    Gr6j,
+    Gr4h,
+}
+
+impl Structure {
+    pub fn from_name(name: &str) -> Option<Structure> {
+        match name {
+            "gr4j" => Some(Structure::Gr4j),
+            "gr5j" => Some(Structure::Gr5j),
+            "gr6j" => Some(Structure::Gr6j),
+            "gr4h" => Some(Structure::Gr4h),
+            _ => None,
+        }
+    }
+
+    pub fn n_parameters(&self) -> usize {
+        match self {
+            Structure::Gr4j | Structure::Gr4h => 4,
+            Structure::Gr5j => 5,
+            Structure::Gr6j => 6,
+        }
+    }
+
+    pub fn n_states(&self) -> usize {
+        match self {
+            Structure::Gr6j => 3,
+            _ => 2,
+        }
+    }
+
+    /// Column of the parameter giving the capacity of each store, in the order of the states.
+    pub fn capacity_columns(&self) -> &'static [usize] {
+        match self {
+            Structure::Gr6j => &[0, 2, 5],
+            _ => &[0, 2],
+        }
+    }
+}
+
+/// Simulate one member. For GR5J, uh1 is not used and returned unchanged.
+pub fn run_member(
+    structure: Structure,
+    parameters: &Vec<f64>,
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    states: ArrayView1<'_, f64>,
+    uh1: ArrayView1<'_, f64>,
+    uh2: ArrayView1<'_, f64>,
+    fast: bool,
+) -> (Array1<f64>, Array1<f64>, Array1<f64>, Array1<f64>) {
+    match structure {
+        Structure::Gr4j => gr4j::gr4j(
+            parameters,
+            rainfall,
+            evapotranspiration,
+            states,
+            uh1,
+            uh2,
+            fast,
+            &Gaps::none(),
+        ),
+        Structure::Gr5j => {
+            let (states, uh2, flow) = gr5j::gr5j(
+                parameters,
+                rainfall,
+                evapotranspiration,
+                states,
+                uh2,
+                fast,
+                &Gaps::none(),
+            );
+            (states, uh1.to_owned(), uh2, flow)
+        }
+        Structure::Gr6j => gr6j::gr6j(
+            parameters,
+            rainfall,
+            evapotranspiration,
+            states,
+            uh1,
+            uh2,
+            fast,
+            &Gaps::none(),
+        ),
+        Structure::Gr4h => gr4h::gr4h(
+            parameters,
+            rainfall,
+            evapotranspiration,
+            states,
+            uh1,
+            uh2,
+            fast,
+            &Gaps::none(),
+        ),
+    }
+}
+
+/// Simulate one member on caller owned arrays, see engine::run_into : the states and unit hydrographs are updated in
+/// place and the flow is written into flow. For GR5J, uh1 is not used and left unchanged.
+pub fn run_member_into(
+    structure: Structure,
+    parameters: &[f64],
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    states: ArrayViewMut1<'_, f64>,
+    uh1: ArrayViewMut1<'_, f64>,
+    uh2: ArrayViewMut1<'_, f64>,
+    fast: bool,
+    flow: ArrayViewMut1<'_, f64>,
+) {
+    let run = match structure {
+        Structure::Gr4j => engine::run_into::<gr4j::Gr4j>,
+        Structure::Gr5j => engine::run_into::<gr5j::Gr5j>,
+        Structure::Gr6j => engine::run_into::<gr6j::Gr6j>,
+        Structure::Gr4h => engine::run_into::<gr4h::Gr4h>,
+    };
+    run(
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        &Gaps::none(),
+        None,
+        flow,
+    );
+}
+
+/// Simulate n members in parallel. All arrays have one row per member.
+///
+/// Returns the final states, uh1 and uh2 and the flow, one row per member.
+pub fn run_batch(
+    structure: Structure,
+    parameters: ArrayView2<'_, f64>,
+    rainfall: ArrayView2<'_, f64>,
+    evapotranspiration: ArrayView2<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView2<'_, f64>,
+    uh2: ArrayView2<'_, f64>,
+    fast: bool,
+) -> (Array2<f64>, Array2<f64>, Array2<f64>, Array2<f64>) {
+    let n = parameters.nrows();
+    // The members are simulated in place in the rows of the outputs
+    let mut out_states = states.to_owned();
+    let mut out_uh1 = uh1.to_owned();
+    let mut out_uh2 = uh2.to_owned();
+    let mut out_flow = Array2::zeros((n, rainfall.ncols()));
+
+    let mut rows: Vec<_> = out_states
+        .outer_iter_mut()
+        .zip(out_uh1.outer_iter_mut())
+        .zip(out_uh2.outer_iter_mut())
+        .zip(out_flow.outer_iter_mut())
+        .map(|(((states, uh1), uh2), flow)| (states, uh1, uh2, flow))
+        .collect();
+
+    parallel::for_each_mut(&mut rows, |i, (row_states, row_uh1, row_uh2, row_flow)| {
+        run_member_into(
+            structure,
+            &parameters.row(i).to_vec(),
+            rainfall.row(i),
+            evapotranspiration.row(i),
+            row_states.view_mut(),
+            row_uh1.view_mut(),
+            row_uh2.view_mut(),
+            fast,
+            row_flow.view_mut(),
+        );
+    });
+    drop(rows);
+
+    (out_states, out_uh1, out_uh2, out_flow)
+}
+
+/// Number of time steps simulated between two pruning tests of evaluate_batch().
+pub const PRUNING_BLOCK: usize = 365;
+
+/// Evaluate n parameter sets against observations, in parallel.
+///
+/// All the members share the forcing, the stores levels are given per member and the initial unit hydrographs have one
+/// row per member or a single row shared by all the members (uh1.nrows() == 1). Each
+/// member is evaluated against the observations of its group, so that several calibration problems on the same
+/// forcing (cross-validation folds for example) share a single call. The simulated flows are not kept, only the
+/// criteria, computed in the same pass.
+///
+/// With a threshold, members are simulated by blocks of PRUNING_BLOCK time steps and their simulation stops as soon
+/// as the first criterion (NSE, NSE on log flows or RMSE) can not reach the threshold anymore : the first criterion
+/// is then the bound reached by the partial simulation, the other criteria are NaN.
+///
+/// Returns one row of criteria per member and the number of time steps simulated per member.
+pub fn evaluate_batch(
+    structure: Structure,
+    parameters: ArrayView2<'_, f64>,
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView2<'_, f64>,
+    uh2: ArrayView2<'_, f64>,
+    observed: &[Observed],
+    groups: &[usize],
+    criteria: &[Criterion],
+    threshold: Option<f64>,
+    fast: bool,
+) -> (Array2<f64>, Vec<usize>) {
+    let n = parameters.nrows();
+    let n_steps = rainfall.len();
+    let block = match threshold {
+        Some(_) => PRUNING_BLOCK,
+        None => n_steps.max(1),
+    };
+    let uh_row = |i: usize| if uh1.nrows() == 1 { 0 } else { i };
+    let evaluate = match structure {
+        Structure::Gr4j => evaluate_member::<gr4j::Gr4j>,
+        Structure::Gr5j => evaluate_member::<gr5j::Gr5j>,
+        Structure::Gr6j => evaluate_member::<gr6j::Gr6j>,
+        Structure::Gr4h => evaluate_member::<gr4h::Gr4h>,
+    };
+    let results = parallel::map(n, |i| {
+        evaluate(
+            &parameters.row(i).to_vec(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.row(i).to_vec(),
+            uh1.row(uh_row(i)).to_vec(),
+            uh2.row(uh_row(i)).to_vec(),
+            &observed[groups[i]],
+            criteria,
+            threshold,
+            block,
+            fast,
+        )
+    });
+
+    let mut out = Array2::zeros((n, criteria.len()));
+    let mut steps = Vec::with_capacity(n);
+    for (i, (row, member_steps)) in results.iter().enumerate() {
+        out.row_mut(i).assign(&Array1::from_vec(row.clone()));
+        steps.push(*member_steps);
+    }
+    (out, steps)
+}
+
+/// Evaluate one member of evaluate_batch(), simulated by blocks of block time steps with a single model instance.
+fn evaluate_member<M: Model>(
+    parameters: &[f64],
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    mut levels: Vec<f64>,
+    mut uh1: Vec<f64>,
+    mut uh2: Vec<f64>,
+    observed: &Observed,
+    criteria: &[Criterion],
+    threshold: Option<f64>,
+    block: usize,
+    fast: bool,
+) -> (Vec<f64>, usize) {
+    let n_steps = rainfall.len();
+    let mut stepper = Stepper::<M>::new(parameters);
+    let mut accumulator = Accumulator::new(criteria);
+    let mut flow = vec![0.0; block.min(n_steps)];
+    let mut start = 0;
+    let mut result = None;
+    while start < n_steps {
+        let end = (start + block).min(n_steps);
+        let block_flow = &mut flow[..end - start];
+        let (rain, evap) = (
+            rainfall.slice(s![start..end]),
+            evapotranspiration.slice(s![start..end]),
+        );
+        if fast {
+            stepper.run::<Fast>(rain, evap, &mut levels, &mut uh1, &mut uh2, block_flow);
+        } else {
+            stepper.run::<Reference>(rain, evap, &mut levels, &mut uh1, &mut uh2, block_flow);
+        }
+        accumulator.add(observed, block_flow, start);
+        start = end;
+        if let Some(threshold) = threshold {
+            if start < n_steps && accumulator.cannot_reach(criteria[0], observed, threshold) {
+                let mut values = vec![f64::NAN; criteria.len()];
+                values[0] = accumulator.bound(criteria[0], observed).unwrap();
+                result = Some((values, start));
+                break;
+            }
+        }
+    }
+    stepper.finish();
+    result.unwrap_or_else(|| (accumulator.values(criteria, observed), n_steps))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use ndarray::Array2;
+
+    #[test]
+    fn test_run_batch_matches_single_runs() {
+        let parameters = Array2::from_shape_vec(
+            (3, 4),
+            vec![
+                257.238, 1.012, 88.235, 2.208, 300.0, -1.0, 50.0, 1.5, 100.0, 0.0, 120.0, 3.2,
+            ],
+        )
+        .unwrap();
+        let n_steps = 50;
+        let mut rainfall = Array2::zeros((3, n_steps));
+        let mut evapotranspiration = Array2::zeros((3, n_steps));
+        for i in 0..3 {
+            for t in 0..n_steps {
+                rainfall[[i, t]] = ((t * (i + 3)) % 7) as f64 * 2.5;
+                evapotranspiration[[i, t]] = 0.5 + 0.1 * i as f64;
+            }
+        }
+        let mut states = Array2::zeros((3, 2));
+        for i in 0..3 {
+            states[[i, 0]] = 0.3 * parameters[[i, 0]];
+            states[[i, 1]] = 0.5 * parameters[[i, 2]];
+        }
+        let uh1 = Array2::zeros((3, 20));
+        let uh2 = Array2::zeros((3, 40));
+
+        let (out_states, _out_uh1, out_uh2, out_flow) = run_batch(
+            Structure::Gr4j,
+            parameters.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            false,
+        );
+
+        for i in 0..3 {
+            let (ref_states, _ref_uh1, ref_uh2, ref_flow) = gr4j::gr4j(
+                &parameters.row(i).to_vec(),
+                rainfall.row(i),
+                evapotranspiration.row(i),
+                states.row(i),
+                uh1.row(i),
+                uh2.row(i),
+                false,
+                &Gaps::none(),
+            );
+            assert_eq!(out_flow.row(i).to_vec(), ref_flow.to_vec());
+            assert_eq!(out_states.row(i).to_vec(), ref_states.to_vec());
+            assert_eq!(out_uh2.row(i).to_vec(), ref_uh2.to_vec());
+        }
+    }
+
+    #[test]
+    fn test_evaluate_batch() {
+        let parameters = Array2::from_shape_vec(
+            (2, 4),
+            vec![257.238, 1.012, 88.235, 2.208, 300.0, -1.0, 50.0, 1.5],
+        )
+        .unwrap();
+        let n_steps = 200;
+        let rainfall: Vec<f64> = (0..n_steps).map(|t| ((t * 3) % 7) as f64 * 2.5).collect();
+        let evapotranspiration = vec![0.8; n_steps];
+        let observed: Vec<f64> = (0..n_steps).map(|t| 0.5 + (t % 5) as f64 * 0.2).collect();
+        let mut states = Array2::zeros((2, 2));
+        for i in 0..2 {
+            states[[i, 0]] = 0.3 * parameters[[i, 0]];
+            states[[i, 1]] = 0.5 * parameters[[i, 2]];
+        }
+        let uh1 = Array2::zeros((1, 20));
+        let uh2 = Array2::zeros((1, 40));
+        let criteria = [Criterion::Nse, Criterion::Kge];
+        // Second group : observations of the first half only
+        let mut first_half = observed.clone();
+        for value in first_half.iter_mut().skip(n_steps / 2) {
+            *value = f64::NAN;
+        }
+        let references = [Observed::new(observed, 10), Observed::new(first_half, 10)];
+        let groups = [0, 1];
+
+        let (values, steps) = evaluate_batch(
+            Structure::Gr4j,
+            parameters.view(),
+            ArrayView1::from(&rainfall),
+            ArrayView1::from(&evapotranspiration),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            &references,
+            &groups,
+            &criteria,
+            None,
+            false,
+        );
+        assert_eq!(steps, vec![n_steps, n_steps]);
+        for i in 0..2 {
+            let (_, _, _, flow) = gr4j::gr4j(
+                &parameters.row(i).to_vec(),
+                ArrayView1::from(&rainfall),
+                ArrayView1::from(&evapotranspiration),
+                states.row(i),
+                uh1.row(0),
+                uh2.row(0),
+                false,
+                &Gaps::none(),
+            );
+            let expected = criteria::evaluate(&criteria, &references[groups[i]], &flow.to_vec());
+            assert_eq!(values.row(i).to_vec(), expected);
+        }
+    }
+
+    #[test]
+    fn test_evaluate_batch_pruning() {
+        // The first parameter set is good, the second one is clearly bad
+        let parameters = Array2::from_shape_vec(
+            (2, 4),
+            vec![257.238, 1.012, 88.235, 2.208, 20.0, -5.0, 5.0, 0.6],
+        )
+        .unwrap();
+        let n_steps = 4 * PRUNING_BLOCK;
+        let rainfall: Vec<f64> = (0..n_steps).map(|t| ((t * 3) % 7) as f64 * 2.5).collect();
+        let evapotranspiration = vec![0.8; n_steps];
+        let mut states = Array2::zeros((2, 2));
+        for i in 0..2 {
+            states[[i, 0]] = 0.3 * parameters[[i, 0]];
+            states[[i, 1]] = 0.5 * parameters[[i, 2]];
+        }
+        let uh1 = Array2::zeros((1, 20));
+        let uh2 = Array2::zeros((1, 40));
+        // Observations : simulation of the first parameter set
+        let (_, _, _, flow) = gr4j::gr4j(
+            &parameters.row(0).to_vec(),
+            ArrayView1::from(&rainfall),
+            ArrayView1::from(&evapotranspiration),
+            states.row(0),
+            uh1.row(0),
+            uh2.row(0),
+            false,
+            &Gaps::none(),
+        );
+        let references = [Observed::new(flow.to_vec(), 10)];
+        let criteria = [Criterion::Nse, Criterion::Kge];
+        let evaluate = |threshold| {
+            evaluate_batch(
+                Structure::Gr4j,
+                parameters.view(),
+                ArrayView1::from(&rainfall),
+                ArrayView1::from(&evapotranspiration),
+                states.view(),
+                uh1.view(),
+                uh2.view(),
+                &references,
+                &[0, 0],
+                &criteria,
+                threshold,
+                false,
+            )
+        };
+        let (full, _) = evaluate(None);
+        let (pruned, steps) = evaluate(Some(0.5));
+        assert!(full[[1, 0]] < 0.5);
+
+        // Member simulated by blocks gives the same criteria, the bad member is stopped with a bound of its NSE
+        assert_eq!(steps[0], n_steps);
+        assert_eq!(pruned.row(0).to_vec(), full.row(0).to_vec());
+        assert!(steps[1] < n_steps);
+        assert!(pruned[[1, 0]] < 0.5 && pruned[[1, 0]] >= full[[1, 0]]);
+        assert!(pruned[[1, 1]].is_nan());
+    }
+}
@@ -0,0 +1,104 @@
+use super::batch::{run_member_into, Structure};
+use ndarray::{Array1, ArrayView1, ArrayViewMut1};
+
+// Simulation of a long series by consecutive blocks. The stores levels and unit hydrographs are kept here between
+// blocks, so that the results are the same as those of a single run over the whole series.
+
+pub struct ChunkedRun {
+    pub structure: Structure,
+    pub parameters: Vec<f64>,
+    pub states: Array1<f64>,
+    pub uh1: Array1<f64>,
+    pub uh2: Array1<f64>,
+    pub fast: bool,
+    pub steps: usize,
+}
+
+impl ChunkedRun {
+    pub fn new(
+        structure: Structure,
+        parameters: Vec<f64>,
+        states: Array1<f64>,
+        uh1: Array1<f64>,
+        uh2: Array1<f64>,
+        fast: bool,
+    ) -> ChunkedRun {
+        ChunkedRun {
+            structure,
+            parameters,
+            states,
+            uh1,
+            uh2,
+            fast,
+            steps: 0,
+        }
+    }
+
+    /// Simulate the next block of the series and write the flow in out, that has the length of the block.
+    pub fn run_block(
+        &mut self,
+        rainfall: ArrayView1<'_, f64>,
+        evapotranspiration: ArrayView1<'_, f64>,
+        out: ArrayViewMut1<'_, f64>,
+    ) {
+        let n_steps = rainfall.len();
+        run_member_into(
+            self.structure,
+            &self.parameters,
+            rainfall,
+            evapotranspiration,
+            self.states.view_mut(),
+            self.uh1.view_mut(),
+            self.uh2.view_mut(),
+            self.fast,
+            out,
+        );
+        self.steps += n_steps;
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::gaps::Gaps;
+    use crate::gr4h;
+
+    #[test]
+    fn test_chunked_run_matches_single_run() {
+        let parameters = vec![521.113, -2.918, 218.009, 4.124];
+        let n_steps = 1000;
+        let rainfall: Vec<f64> = (0..n_steps).map(|t| ((t * 7) % 13) as f64 * 0.4).collect();
+        let evapotranspiration: Vec<f64> =
+            (0..n_steps).map(|t| 0.1 + (t % 24) as f64 * 0.01).collect();
+        let states = Array1::from_vec(vec![0.3 * 521.113, 0.5 * 218.009]);
+        let uh1 = Array1::zeros(480);
+        let uh2 = Array1::zeros(960);
+
+        let (ref_states, _, _, ref_flow) = gr4h::gr4h(
+            &parameters,
+            ArrayView1::from(&rainfall[..]),
+            ArrayView1::from(&evapotranspiration[..]),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            false,
+            &Gaps::none(),
+        );
+
+        let mut run = ChunkedRun::new(Structure::Gr4h, parameters, states, uh1, uh2, false);
+        let mut flow = vec![0.0; n_steps];
+        let mut start = 0;
+        for block_size in [1, 299, 300, 400].iter() {
+            let stop = start + block_size;
+            run.run_block(
+                ArrayView1::from(&rainfall[start..stop]),
+                ArrayView1::from(&evapotranspiration[start..stop]),
+                ArrayViewMut1::from(&mut flow[start..stop]),
+            );
+            start = stop;
+        }
+        assert_eq!(run.steps, n_steps);
+        assert_eq!(flow, ref_flow.to_vec());
+        assert_eq!(run.states.to_vec(), ref_states.to_vec());
+    }
+}
@@ -0,0 +1,266 @@
+// Goodness of fit criteria of a simulated flow against observations, all computed in a single pass over the
+// simulation. Time steps where the observation is NaN are ignored. The statistics of the observations are computed
+// once and shared by all the simulations evaluated against them.
+
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub enum Criterion {
+    Nse,
+    NseLog,
+    Kge,
+    Bias,
+    Rmse,
+}
+
+impl Criterion {
+    pub fn from_name(name: &str) -> Option<Criterion> {
+        match name {
+            "nse" => Some(Criterion::Nse),
+            "nse_log" => Some(Criterion::NseLog),
+            "kge" => Some(Criterion::Kge),
+            "bias" => Some(Criterion::Bias),
+            "rmse" => Some(Criterion::Rmse),
+            _ => None,
+        }
+    }
+}
+
+/// Observations and their statistics over the valid time steps.
+pub struct Observed {
+    pub values: Vec<f64>,
+    pub start: usize,
+    pub n: usize,
+    pub mean: f64,
+    pub sum_squares: f64,
+    pub epsilon: f64,
+    pub log_mean: f64,
+    pub log_sum_squares: f64,
+}
+
+impl Observed {
+    /// Observed values, the first start time steps being excluded from the evaluation (warm up period).
+    pub fn new(values: Vec<f64>, start: usize) -> Observed {
+        let valid = || values.iter().skip(start).filter(|o| !o.is_nan());
+        let n = valid().count();
+        let mean = valid().sum::<f64>() / n as f64;
+        let sum_squares = valid().map(|o| (o - mean) * (o - mean)).sum();
+        // Offset of the log transformation, to deal with zero flows (mean flow / 100 as in airGR)
+        let epsilon = mean / 100.0;
+        let log_mean = valid().map(|o| (o + epsilon).ln()).sum::<f64>() / n as f64;
+        let log_sum_squares = valid()
+            .map(|o| ((o + epsilon).ln() - log_mean) * ((o + epsilon).ln() - log_mean))
+            .sum();
+        Observed {
+            values,
+            start,
+            n,
+            mean,
+            sum_squares,
+            epsilon,
+            log_mean,
+            log_sum_squares,
+        }
+    }
+}
+
+/// Sums of a simulation evaluation, accumulated block by block in time order.
+///
+/// Sums of the simulation deviations from the observed mean (d), of their squares and of their products with the
+/// observation deviations (e), and sum of the squared errors. Deviations from the observed mean keep the sums small,
+/// which avoids cancellation when deriving the simulation variance.
+pub struct Accumulator {
+    with_log: bool,
+    sum_d: f64,
+    sum_dd: f64,
+    sum_de: f64,
+    sum_errors: f64,
+    sum_log_errors: f64,
+}
+
+impl Accumulator {
+    pub fn new(criteria: &[Criterion]) -> Accumulator {
+        Accumulator {
+            with_log: criteria.contains(&Criterion::NseLog),
+            sum_d: 0.0,
+            sum_dd: 0.0,
+            sum_de: 0.0,
+            sum_errors: 0.0,
+            sum_log_errors: 0.0,
+        }
+    }
+
+    /// Add the simulated values of the time steps offset..offset + simulated.len().
+    pub fn add(&mut self, observed: &Observed, simulated: &[f64], offset: usize) {
+        let skip = observed.start.saturating_sub(offset).min(simulated.len());
+        for (s, o) in simulated[skip..]
+            .iter()
+            .zip(observed.values[offset + skip..].iter())
+        {
+            if o.is_nan() {
+                continue;
+            }
+            let d = s - observed.mean;
+            let e = o - observed.mean;
+            self.sum_d += d;
+            self.sum_dd += d * d;
+            self.sum_de += d * e;
+            self.sum_errors += (s - o) * (s - o);
+            if self.with_log {
+                let log_error = (s + observed.epsilon).ln() - (o + observed.epsilon).ln();
+                self.sum_log_errors += log_error * log_error;
+            }
+        }
+    }
+
+    /// Best value of the criterion that the whole simulation can still reach, for the criteria computed from sums
+    /// of squared errors, which can only grow : upper bound of NSE and NSE on log flows, lower bound of RMSE.
+    pub fn bound(&self, criterion: Criterion, observed: &Observed) -> Option<f64> {
+        match criterion {
+            Criterion::Nse => Some(1.0 - self.sum_errors / observed.sum_squares),
+            Criterion::NseLog => Some(1.0 - self.sum_log_errors / observed.log_sum_squares),
+            Criterion::Rmse => Some((self.sum_errors / observed.n as f64).sqrt()),
+            Criterion::Kge | Criterion::Bias => None,
+        }
+    }
+
+    /// True if the whole simulation can not reach the threshold value of the criterion anymore.
+    pub fn cannot_reach(&self, criterion: Criterion, observed: &Observed, threshold: f64) -> bool {
+        match (criterion, self.bound(criterion, observed)) {
+            (Criterion::Rmse, Some(bound)) => bound > threshold,
+            (_, Some(bound)) => bound < threshold,
+            (_, None) => false,
+        }
+    }
+
+    /// Criteria of the whole simulation, in the order of the criteria.
+    pub fn values(&self, criteria: &[Criterion], observed: &Observed) -> Vec<f64> {
+        let n = observed.n as f64;
+        criteria
+            .iter()
+            .map(|criterion| match criterion {
+                Criterion::Nse => 1.0 - self.sum_errors / observed.sum_squares,
+                Criterion::NseLog => 1.0 - self.sum_log_errors / observed.log_sum_squares,
+                Criterion::Rmse => (self.sum_errors / n).sqrt(),
+                Criterion::Bias => self.sum_d / (n * observed.mean),
+                Criterion::Kge => {
+                    let mean_d = self.sum_d / n;
+                    let variance_s = self.sum_dd / n - mean_d * mean_d;
+                    let variance_o = observed.sum_squares / n;
+                    let covariance = self.sum_de / n;
+                    let r = covariance / (variance_s * variance_o).sqrt();
+                    let alpha = (variance_s / variance_o).sqrt();
+                    let beta = (observed.mean + mean_d) / observed.mean;
+                    1.0 - ((r - 1.0).powi(2) + (alpha - 1.0).powi(2) + (beta - 1.0).powi(2)).sqrt()
+                }
+            })
+            .collect()
+    }
+}
+
+/// Evaluate the criteria of a simulation, in the order of the criteria.
+pub fn evaluate(criteria: &[Criterion], observed: &Observed, simulated: &[f64]) -> Vec<f64> {
+    let mut accumulator = Accumulator::new(criteria);
+    accumulator.add(observed, simulated, 0);
+    accumulator.values(criteria, observed)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn two_pass(simulated: &[f64], observed: &[f64]) -> (f64, f64, f64, f64, f64) {
+        let pairs: Vec<(f64, f64)> = simulated
+            .iter()
+            .zip(observed.iter())
+            .filter(|(_, o)| !o.is_nan())
+            .map(|(s, o)| (*s, *o))
+            .collect();
+        let n = pairs.len() as f64;
+        let mean_o = pairs.iter().map(|p| p.1).sum::<f64>() / n;
+        let mean_s = pairs.iter().map(|p| p.0).sum::<f64>() / n;
+        let sse = pairs.iter().map(|p| (p.0 - p.1).powi(2)).sum::<f64>();
+        let sso = pairs.iter().map(|p| (p.1 - mean_o).powi(2)).sum::<f64>();
+        let sss = pairs.iter().map(|p| (p.0 - mean_s).powi(2)).sum::<f64>();
+        let sso_s = pairs
+            .iter()
+            .map(|p| (p.0 - mean_s) * (p.1 - mean_o))
+            .sum::<f64>();
+        let r = sso_s / (sss * sso).sqrt();
+        let alpha = (sss / sso).sqrt();
+        let beta = mean_s / mean_o;
+        let kge = 1.0 - ((r - 1.0).powi(2) + (alpha - 1.0).powi(2) + (beta - 1.0).powi(2)).sqrt();
+
+        let epsilon = mean_o / 100.0;
+        let log_o: Vec<f64> = pairs.iter().map(|p| (p.1 + epsilon).ln()).collect();
+        let log_mean = log_o.iter().sum::<f64>() / n;
+        let log_sso = log_o.iter().map(|l| (l - log_mean).powi(2)).sum::<f64>();
+        let log_sse = pairs
+            .iter()
+            .map(|p| ((p.0 + epsilon).ln() - (p.1 + epsilon).ln()).powi(2))
+            .sum::<f64>();
+
+        (
+            1.0 - sse / sso,
+            1.0 - log_sse / log_sso,
+            kge,
+            mean_s / mean_o - 1.0,
+            (sse / n).sqrt(),
+        )
+    }
+
+    #[test]
+    fn test_evaluate() {
+        let observed: Vec<f64> = (0..500)
+            .map(|t| {
+                if t % 17 == 0 {
+                    f64::NAN
+                } else {
+                    1.0 + ((t as f64) * 0.1).sin().abs() * 5.0
+                }
+            })
+            .collect();
+        let simulated: Vec<f64> = (0..500)
+            .map(|t| 1.2 + ((t as f64) * 0.1 + 0.2).sin().abs() * 4.0)
+            .collect();
+
+        let criteria = [
+            Criterion::Nse,
+            Criterion::NseLog,
+            Criterion::Kge,
+            Criterion::Bias,
+            Criterion::Rmse,
+        ];
+        let values = evaluate(&criteria, &Observed::new(observed.clone(), 50), &simulated);
+        let (nse, nse_log, kge, bias, rmse) = two_pass(&simulated[50..], &observed[50..]);
+        for (value, expected) in values.iter().zip([nse, nse_log, kge, bias, rmse].iter()) {
+            assert!(
+                (value - expected).abs() < 1e-12,
+                "{} != {}",
+                value,
+                expected
+            );
+        }
+
+        // Blocks give the same sums, and the bounds of the partial sums bound the final values
+        let reference = Observed::new(observed.clone(), 50);
+        let mut accumulator = Accumulator::new(&criteria);
+        for start in (0..500).step_by(64) {
+            let end = (start + 64).min(500);
+            accumulator.add(&reference, &simulated[start..end], start);
+            if end < 500 {
+                assert!(accumulator.bound(Criterion::Nse, &reference).unwrap() >= nse);
+                assert!(accumulator.bound(Criterion::NseLog, &reference).unwrap() >= nse_log);
+                assert!(accumulator.bound(Criterion::Rmse, &reference).unwrap() <= rmse);
+                assert!(accumulator.bound(Criterion::Kge, &reference).is_none());
+            }
+        }
+        assert_eq!(accumulator.values(&criteria, &reference), values);
+        assert!(accumulator.cannot_reach(Criterion::Nse, &reference, nse + 1e-9));
+        assert!(!accumulator.cannot_reach(Criterion::Nse, &reference, nse));
+        assert!(accumulator.cannot_reach(Criterion::Rmse, &reference, rmse - 1e-9));
+
+        let perfect = evaluate(&criteria, &Observed::new(observed.clone(), 0), &observed);
+        assert!((perfect[0] - 1.0).abs() < 1e-15);
+        assert!((perfect[2] - 1.0).abs() < 1e-12);
+        assert!(perfect[3].abs() < 1e-15);
+    }
+}
@@ -0,0 +1,845 @@
+use super::aggregation::{Periods, Reduction};
+use super::gaps::{Forcing, GapCounts, Gaps};
+use super::math::{Fast, Precision, Reference};
+use super::profiling::{KernelCounters, Timer};
+use super::s_curves::{s_curves1, s_curves2};
+use ndarray::{Array1, ArrayView1, ArrayViewMut1};
+
+// Kernel engine of the GR models. Each structure is assembled from the components below (production store, unit
+// hydrographs, exchange function, routing and exponential stores) into a `Model`, and the main loop is generic over
+// the model and the precision : every (structure, precision) pair is compiled into its own specialised loop, the
+// components being inlined without any dynamic dispatch.
+
+/// Fraction of the effective rainfall routed by UH1 through the routing store, the remainder being routed by UH2.
+pub const STORAGE_FRACTION: f64 = 0.9;
+
+/// Production (soil moisture) store of capacity x1, with percolation.
+pub struct ProductionStore {
+    x1: f64,
+    percolation: f64,
+}
+
+impl ProductionStore {
+    /// percolation is the constant (9/4)^4 of the percolation function, scaled by the time step of the model.
+    pub fn new(x1: f64, percolation: f64) -> ProductionStore {
+        ProductionStore { x1, percolation }
+    }
+
+    /// Update the store level for one time step and return the effective rainfall to the unit hydrographs.
+    #[inline(always)]
+    pub fn step<P: Precision>(&self, level: &mut f64, rain: f64, evap: f64) -> f64 {
+        let x1 = self.x1;
+        let mut rout_input = 0.0;
+        let psf = *level / x1; // production store filling percentage
+        if rain <= evap {
+            let mut scaled_net_rain: f64 = (evap - rain) / x1;
+            if scaled_net_rain > 13.0 {
+                scaled_net_rain = 13.0;
+            }
+            scaled_net_rain = P::tanh(scaled_net_rain);
+            let prod_evap =
+                *level * (2. - psf) * scaled_net_rain / (1. + (1. - psf) * scaled_net_rain); // evap from production store
+
+            *level -= prod_evap;
+        } else {
+            let net_rainfall = rain - evap;
+            let mut scaled_net_rain: f64 = net_rainfall / x1;
+            if scaled_net_rain > 13.0 {
+                scaled_net_rain = 13.0;
+            }
+            scaled_net_rain = P::tanh(scaled_net_rain);
+            let prod_rainfall =
+                x1 * (1. - psf * psf) * scaled_net_rain / (1. + psf * scaled_net_rain); // rainfall to production store
+
+            rout_input = net_rainfall - prod_rainfall;
+            *level += prod_rainfall;
+        }
+        if *level < 0. {
+            *level = 0.;
+        }
+
+        // Production store percolation :
+        let psf_p4 = P::pow4(*level / x1);
+        let percolation = *level * (1.0 - 1.0 / P::root4(1.0 + psf_p4 / self.percolation));
+
+        *level -= percolation;
+        rout_input + percolation
+    }
+}
+
+/// Unit hydrograph of base time x4 (UH1) or 2 x4 (UH2), derived from the S-curves of exponent exp.
+pub struct UnitHydrograph {
+    ordinates: Vec<f64>,
+}
+
+impl UnitHydrograph {
+    pub fn uh1(x4: f64, exp: f64) -> UnitHydrograph {
+        let n = x4.ceil() as usize;
+        let mut ordinates = vec![0.; n];
+        for i in 1..n + 1 {
+            ordinates[i - 1] = s_curves1(i, x4, exp) - s_curves1(i - 1, x4, exp);
+        }
+        UnitHydrograph { ordinates }
+    }
+
+    pub fn uh2(x4: f64, exp: f64) -> UnitHydrograph {
+        let n = (2.0 * x4).ceil() as usize;
+        let mut ordinates = vec![0.; n];
+        for i in 1..n + 1 {
+            ordinates[i - 1] = s_curves2(i, x4, exp) - s_curves2(i - 1, x4, exp);
+        }
+        UnitHydrograph { ordinates }
+    }
+
+    pub fn len(&self) -> usize {
+        self.ordinates.len()
+    }
+
+    /// Convolve the input with the hydrograph, states holding the pending outputs, and return the current output.
+    #[inline(always)]
+    pub fn convolve(&self, states: &mut [f64], input: f64) -> f64 {
+        let n = self.ordinates.len();
+        for i in 0..n - 1 {
+            states[i] = states[i + 1] + self.ordinates[i] * input;
+        }
+        states[n - 1] = self.ordinates[n - 1] * input;
+        states[0]
+    }
+}
+
+/// Potential inter catchment groundwater exchange, function of the routing store level.
+pub trait Exchange {
+    fn exchange<P: Precision>(&self, level: f64) -> f64;
+}
+
+/// GR4J / GR4H exchange : x2 (R / x3)^3.5.
+pub struct PowerExchange {
+    x2: f64,
+    x3: f64,
+}
+
+impl PowerExchange {
+    pub fn new(x2: f64, x3: f64) -> PowerExchange {
+        PowerExchange { x2, x3 }
+    }
+}
+
+impl Exchange for PowerExchange {
+    #[inline(always)]
+    fn exchange<P: Precision>(&self, level: f64) -> f64 {
+        self.x2 * P::pow3_5(level / self.x3)
+    }
+}
+
+/// GR5J / GR6J exchange : x2 (R / x3 - x5), x5 being the threshold filling rate.
+pub struct ThresholdExchange {
+    x2: f64,
+    x3: f64,
+    x5: f64,
+}
+
+impl ThresholdExchange {
+    pub fn new(x2: f64, x3: f64, x5: f64) -> ThresholdExchange {
+        ThresholdExchange { x2, x3, x5 }
+    }
+}
+
+impl Exchange for ThresholdExchange {
+    #[inline(always)]
+    fn exchange<P: Precision>(&self, level: f64) -> f64 {
+        self.x2 * (level / self.x3 - self.x5)
+    }
+}
+
+/// Non linear routing store of capacity x3.
+pub struct RoutingStore {
+    x3: f64,
+}
+
+impl RoutingStore {
+    pub fn new(x3: f64) -> RoutingStore {
+        RoutingStore { x3 }
+    }
+
+    /// Add the inflow and the exchange to the store and return its outflow.
+    #[inline(always)]
+    pub fn step<P: Precision>(&self, level: &mut f64, inflow: f64, exchange: f64) -> f64 {
+        *level += inflow + exchange;
+        if *level < 0. {
+            *level = 0.;
+        }
+        let rsf_p4 = P::pow4(*level / self.x3);
+        let rout_flow = *level * (1. - 1. / P::root4(1. + rsf_p4));
+        *level -= rout_flow;
+        rout_flow
+    }
+}
+
+/// Exponential store of the GR6J model, of scale x6. Its level may be negative.
+pub struct ExponentialStore {
+    x6: f64,
+}
+
+impl ExponentialStore {
+    pub fn new(x6: f64) -> ExponentialStore {
+        ExponentialStore { x6 }
+    }
+
+    /// Add the inflow and the exchange to the store and return its outflow.
+    #[inline(always)]
+    pub fn step(&self, level: &mut f64, inflow: f64, exchange: f64) -> f64 {
+        let x6 = self.x6;
+        *level += inflow + exchange;
+        let mut ar: f64 = *level / x6;
+        if ar > 33. {
+            ar = 33.;
+        }
+        if ar < -33. {
+            ar = -33.;
+        }
+
+        let exp_flow: f64;
+        if ar > 7. {
+            exp_flow = *level + x6 / ar.exp();
+        } else if ar < -7. {
+            exp_flow = x6 * ar.exp();
+        } else {
+            exp_flow = x6 * (ar.exp() + 1.).ln();
+        }
+        *level -= exp_flow;
+        exp_flow
+    }
+}
+
+/// Direct flow of the UH2 branch, with the exchange, bounded to zero.
+#[inline(always)]
+pub fn direct_flow(inflow: f64, exchange: f64) -> f64 {
+    let direct_flow = inflow + exchange;
+    if direct_flow < 0. {
+        0.
+    } else {
+        direct_flow
+    }
+}
+
+/// Model structure assembled from the components.
+pub trait Model: Sized {
+    /// Build the model components from the parameters.
+    fn new(parameters: &[f64]) -> Self;
+
+    /// Profiling counters of the structure.
+    fn counters() -> &'static KernelCounters;
+
+    /// Total number of unit hydrograph ordinates.
+    fn ordinates(&self) -> usize;
+
+    /// Run one time step : update the store levels and the unit hydrograph states, and return the flow.
+    fn step<P: Precision>(
+        &self,
+        levels: &mut [f64],
+        uh1: &mut [f64],
+        uh2: &mut [f64],
+        rain: f64,
+        evap: f64,
+    ) -> f64;
+}
+
+/// Run the model M over the forcing, returning the final states, unit hydrograph states and the flow.
+pub fn run<M: Model>(
+    parameters: &[f64],
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    states: ArrayView1<'_, f64>,
+    uh1: ArrayView1<'_, f64>,
+    uh2: ArrayView1<'_, f64>,
+    fast: bool,
+    gaps: &Gaps<'_>,
+) -> (Array1<f64>, Array1<f64>, Array1<f64>, Array1<f64>) {
+    let mut levels = states.to_owned();
+    let mut uh1 = uh1.to_owned();
+    let mut uh2 = uh2.to_owned();
+    let mut flow = Array1::zeros(rainfall.len());
+    let allocated = 8 * (levels.len() + uh1.len() + uh2.len() + flow.len());
+    run_in_place::<M>(
+        parameters,
+        rainfall,
+        evapotranspiration,
+        levels.view_mut(),
+        uh1.view_mut(),
+        uh2.view_mut(),
+        fast,
+        gaps,
+        None,
+        flow.view_mut(),
+        allocated,
+    );
+    (levels, uh1, uh2, flow)
+}
+
+/// Run the model M over the forcing on caller owned arrays : the states and unit hydrograph states are updated in
+/// place and the flow is written into flow, that has one element per time step, or one per period when periods gives
+/// the offsets and the reduction of an aggregated run (see aggregation.rs), the flow at the model time step being
+/// then never stored. The arrays may be strided, rows or columns of larger buffers for example. Returns the number of
+/// filled and skipped time steps of the gap policy.
+pub fn run_into<M: Model>(
+    parameters: &[f64],
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    states: ArrayViewMut1<'_, f64>,
+    uh1: ArrayViewMut1<'_, f64>,
+    uh2: ArrayViewMut1<'_, f64>,
+    fast: bool,
+    gaps: &Gaps<'_>,
+    periods: Option<(&[usize], Reduction)>,
+    flow: ArrayViewMut1<'_, f64>,
+) -> GapCounts {
+    run_in_place::<M>(
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        gaps,
+        periods,
+        flow,
+        0,
+    )
+}
+
+/// Contiguous views are used as they are, the others through a copy written back by write_back().
+fn contiguous<'a>(view: &'a mut ArrayViewMut1<'_, f64>, copy: &'a mut Vec<f64>) -> &'a mut [f64] {
+    if view.is_standard_layout() {
+        view.as_slice_mut().unwrap()
+    } else {
+        *copy = view.to_vec();
+        copy
+    }
+}
+
+fn write_back(view: &mut ArrayViewMut1<'_, f64>, copy: &[f64]) {
+    if !view.is_standard_layout() {
+        for (value, copied) in view.iter_mut().zip(copy.iter()) {
+            *value = *copied;
+        }
+    }
+}
+
+/// run_into(), allocated being the bytes allocated by the caller for the run, for the profiling counters.
+fn run_in_place<M: Model>(
+    parameters: &[f64],
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    mut states: ArrayViewMut1<'_, f64>,
+    mut uh1: ArrayViewMut1<'_, f64>,
+    mut uh2: ArrayViewMut1<'_, f64>,
+    fast: bool,
+    gaps: &Gaps<'_>,
+    periods: Option<(&[usize], Reduction)>,
+    mut flow: ArrayViewMut1<'_, f64>,
+    allocated: usize,
+) -> GapCounts {
+    let copied: usize = [states.view(), uh1.view(), uh2.view()]
+        .iter()
+        .filter(|view| !view.is_standard_layout())
+        .map(|view| view.len())
+        .sum();
+    let allocated = allocated + 8 * copied;
+    let (mut levels_copy, mut uh1_copy, mut uh2_copy) = (Vec::new(), Vec::new(), Vec::new());
+    let counts = {
+        let levels = contiguous(&mut states, &mut levels_copy);
+        let uh1 = contiguous(&mut uh1, &mut uh1_copy);
+        let uh2 = contiguous(&mut uh2, &mut uh2_copy);
+        match periods {
+            None => {
+                let emit = |t: usize, value: f64| flow[t] = value;
+                if fast {
+                    run_loop::<M, Fast, _>(
+                        parameters,
+                        rainfall,
+                        evapotranspiration,
+                        levels,
+                        uh1,
+                        uh2,
+                        gaps,
+                        allocated,
+                        emit,
+                    )
+                } else {
+                    run_loop::<M, Reference, _>(
+                        parameters,
+                        rainfall,
+                        evapotranspiration,
+                        levels,
+                        uh1,
+                        uh2,
+                        gaps,
+                        allocated,
+                        emit,
+                    )
+                }
+            }
+            Some((offsets, reduction)) => {
+                let mut periods = Periods::new(offsets, reduction);
+                let allocated = allocated + 8 * periods.len();
+                let emit = |t: usize, value: f64| periods.push(t, value);
+                let counts = if fast {
+                    run_loop::<M, Fast, _>(
+                        parameters,
+                        rainfall,
+                        evapotranspiration,
+                        levels,
+                        uh1,
+                        uh2,
+                        gaps,
+                        allocated,
+                        emit,
+                    )
+                } else {
+                    run_loop::<M, Reference, _>(
+                        parameters,
+                        rainfall,
+                        evapotranspiration,
+                        levels,
+                        uh1,
+                        uh2,
+                        gaps,
+                        allocated,
+                        emit,
+                    )
+                };
+                flow.assign(&periods.finish());
+                counts
+            }
+        }
+    };
+    write_back(&mut states, &levels_copy);
+    write_back(&mut uh1, &uh1_copy);
+    write_back(&mut uh2, &uh2_copy);
+    counts
+}
+
+/// Main loop, emit(t, flow) receiving the flow of each time step. allocated is the number of bytes allocated for the
+/// run, for the profiling counters. Returns the number of filled and skipped time steps.
+fn run_loop<M: Model, P: Precision, F: FnMut(usize, f64)>(
+    parameters: &[f64],
+    rainfall: ArrayView1<'_, f64>,
+    evapotranspiration: ArrayView1<'_, f64>,
+    levels: &mut [f64],
+    uh1: &mut [f64],
+    uh2: &mut [f64],
+    gaps: &Gaps<'_>,
+    allocated: usize,
+    mut emit: F,
+) -> GapCounts {
+    // Initialize hydrograph :
+    let uh_init_timer = Timer::start();
+    let model = M::new(parameters);
+    let uh_init_ns = uh_init_timer.elapsed_ns();
+
+    // Main loop :
+    let loop_timer = Timer::start();
+    let mut forcing = Forcing::new(rainfall.view(), evapotranspiration.view(), gaps);
+    for t in 0..rainfall.len() {
+        emit(
+            t,
+            match forcing.get(t) {
+                Some((rain, evap)) => model.step::<P>(levels, uh1, uh2, rain, evap),
+                // Skipped time step : the states are held
+                None => f64::NAN,
+            },
+        );
+    }
+
+    M::counters().record(
+        uh_init_ns,
+        loop_timer.elapsed_ns(),
+        rainfall.len(),
+        allocated + 8 * model.ordinates(),
+    );
+    forcing.counts()
+}
+
+/// Model M built once and run over successive blocks of the forcing, the caller carrying the states from one block to
+/// the next : the unit hydrograph ordinates are computed once, and finish() records a single kernel call for all the
+/// blocks. Used by the evaluations that stop a simulation early (see batch::evaluate_batch).
+pub struct Stepper<M: Model> {
+    model: M,
+    uh_init_ns: Option<u64>,
+    loop_ns: Option<u64>,
+    steps: usize,
+}
+
+impl<M: Model> Stepper<M> {
+    pub fn new(parameters: &[f64]) -> Stepper<M> {
+        let uh_init_timer = Timer::start();
+        let model = M::new(parameters);
+        Stepper {
+            model,
+            uh_init_ns: uh_init_timer.elapsed_ns(),
+            loop_ns: None,
+            steps: 0,
+        }
+    }
+
+    /// Run the next block of the forcing, without gap policy, writing the flow of each time step into flow.
+    pub fn run<P: Precision>(
+        &mut self,
+        rainfall: ArrayView1<'_, f64>,
+        evapotranspiration: ArrayView1<'_, f64>,
+        levels: &mut [f64],
+        uh1: &mut [f64],
+        uh2: &mut [f64],
+        flow: &mut [f64],
+    ) {
+        let loop_timer = Timer::start();
+        for (t, (rain, evap)) in rainfall.iter().zip(evapotranspiration.iter()).enumerate() {
+            flow[t] = self.model.step::<P>(levels, uh1, uh2, *rain, *evap);
+        }
+        if let Some(ns) = loop_timer.elapsed_ns() {
+            self.loop_ns = Some(self.loop_ns.unwrap_or(0) + ns);
+        }
+        self.steps += rainfall.len();
+    }
+
+    /// Record the blocks run as one kernel call in the profiling counters.
+    pub fn finish(self) {
+        M::counters().record(
+            self.uh_init_ns,
+            self.loop_ns,
+            self.steps,
+            8 * self.model.ordinates(),
+        );
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::super::{gr4h, gr4j, gr5j, gr6j};
+    use super::*;
+    use ndarray::Array2;
+
+    // Reference outputs of the kernels before they were assembled from the engine components : the flow at a few
+    // time steps and the final store levels must be reproduced bit for bit.
+    const STEPS: [usize; 4] = [20, 100, 250, 399];
+
+    fn forcing(n: usize) -> (Array1<f64>, Array1<f64>) {
+        let mut seed: u64 = 42;
+        let mut rainfall = Vec::with_capacity(n);
+        let mut evapotranspiration = Vec::with_capacity(n);
+        for t in 0..n {
+            seed = seed
+                .wrapping_mul(6364136223846793005)
+                .wrapping_add(1442695040888963407);
+            let r = (seed >> 11) as f64 / (1u64 << 53) as f64;
+            rainfall.push(if r < 0.55 {
+                0.0
+            } else {
+                120.0 * (r - 0.55) * (r - 0.55)
+            });
+            evapotranspiration.push(1.0 + 0.01 * (t % 180) as f64);
+        }
+        (
+            Array1::from_vec(rainfall),
+            Array1::from_vec(evapotranspiration),
+        )
+    }
+
+    fn check(flow: &Array1<f64>, states: &Array1<f64>, ref_flow: &[f64], ref_states: &[f64]) {
+        for (i, t) in STEPS.iter().enumerate() {
+            assert_eq!(flow[*t], ref_flow[i]);
+        }
+        assert_eq!(states.to_vec(), ref_states.to_vec());
+    }
+
+    #[test]
+    fn test_regression() {
+        let (rainfall, evapotranspiration) = forcing(400);
+        let states = Array1::from_vec(vec![100.0, 40.0]);
+        let states_gr6j = Array1::from_vec(vec![100.0, 40.0, -2.0]);
+        let uh1 = Array1::zeros(20);
+        let uh2 = Array1::zeros(40);
+        let gaps = Gaps::none();
+
+        for fast in [false, true] {
+            let (states_out, _, _, flow) = gr4j::gr4j(
+                &vec![257.238, 1.012, 88.235, 2.208],
+                rainfall.view(),
+                evapotranspiration.view(),
+                states.view(),
+                uh1.view(),
+                uh2.view(),
+                fast,
+                &gaps,
+            );
+            if fast {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.44192951761290733,
+                        2.0744827698309978,
+                        3.9395905611284876,
+                        1.8444167834905223,
+                    ],
+                    &[187.90857039335987, 51.29526917481729],
+                );
+            } else {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.44192951761290633,
+                        2.0744827698310018,
+                        3.9395905611284876,
+                        1.844416783490523,
+                    ],
+                    &[187.9085703933598, 51.29526917481729],
+                );
+            }
+
+            let (states_out, _, _, flow) = gr4h::gr4h(
+                &vec![350.0, -0.5, 90.0, 7.3],
+                rainfall.view(),
+                evapotranspiration.view(),
+                states.view(),
+                uh1.view(),
+                uh2.view(),
+                fast,
+                &gaps,
+            );
+            if fast {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.23611003220216126,
+                        1.2964721168079334,
+                        5.076460780269875,
+                        1.5294029225185382,
+                    ],
+                    &[285.41829142001046, 50.996250031569616],
+                );
+            } else {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.23611003220216142,
+                        1.2964721168079345,
+                        5.076460780269875,
+                        1.529402922518539,
+                    ],
+                    &[285.4182914200103, 50.996250031569645],
+                );
+            }
+
+            let (states_out, _, flow) = gr5j::gr5j(
+                &vec![245.918, 1.027, 90.017, 2.198, 0.434],
+                rainfall.view(),
+                evapotranspiration.view(),
+                states.view(),
+                uh2.view(),
+                fast,
+                &gaps,
+            );
+            if fast {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.34171758578871164,
+                        2.243302293133992,
+                        4.276031441584768,
+                        1.8457936074837615,
+                    ],
+                    &[180.30215024188132, 52.12351899144702],
+                );
+            } else {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.3417175857887026,
+                        2.2433022931340068,
+                        4.276031441584771,
+                        1.8457936074837602,
+                    ],
+                    &[180.3021502418813, 52.12351899144699],
+                );
+            }
+
+            let (states_out, _, _, flow) = gr6j::gr6j(
+                &vec![242.257, 0.637, 53.517, 2.218, 0.424, 4.759],
+                rainfall.view(),
+                evapotranspiration.view(),
+                states_gr6j.view(),
+                uh1.view(),
+                uh2.view(),
+                fast,
+                &gaps,
+            );
+            if fast {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.857344328742118,
+                        2.122855962217712,
+                        3.8658852353848943,
+                        1.8467920600084868,
+                    ],
+                    &[177.83059996305636, 31.093611970388437, -9.598058567892592],
+                );
+            } else {
+                check(
+                    &flow,
+                    &states_out,
+                    &[
+                        0.8573443287421181,
+                        2.1228559622177157,
+                        3.865885235384895,
+                        1.8467920600084948,
+                    ],
+                    &[177.83059996305622, 31.09361197038847, -9.59805856789258],
+                );
+            }
+        }
+    }
+
+    #[test]
+    fn test_run_periods() {
+        // Periods of the flow aggregated in the loop match the aggregation of the flow series, with the same states
+        let (rainfall, evapotranspiration) = forcing(400);
+        let states = Array1::from_vec(vec![100.0, 40.0]);
+        let uh1 = Array1::zeros(20);
+        let uh2 = Array1::zeros(40);
+        let parameters = vec![257.238, 1.012, 88.235, 2.208];
+        let offsets = [3, 31, 59, 90, 365];
+        let (states_out, uh1_out, _, flow) = run::<gr4j::Gr4j>(
+            &parameters,
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            false,
+            &Gaps::none(),
+        );
+        for reduction in [Reduction::Sum, Reduction::Mean] {
+            let mut periods_states = states.clone();
+            let mut periods_uh1 = uh1.clone();
+            let mut periods_uh2 = uh2.clone();
+            let mut periods = Array1::zeros(offsets.len() - 1);
+            run_into::<gr4j::Gr4j>(
+                &parameters,
+                rainfall.view(),
+                evapotranspiration.view(),
+                periods_states.view_mut(),
+                periods_uh1.view_mut(),
+                periods_uh2.view_mut(),
+                false,
+                &Gaps::none(),
+                Some((&offsets, reduction)),
+                periods.view_mut(),
+            );
+            assert_eq!(periods_states.to_vec(), states_out.to_vec());
+            assert_eq!(periods_uh1.to_vec(), uh1_out.to_vec());
+            let expected = super::super::aggregation::aggregate(flow.view(), &offsets, reduction);
+            assert_eq!(periods.to_vec(), expected.to_vec());
+        }
+    }
+
+    #[test]
+    fn test_run_into() {
+        // Runs on rows and columns of larger buffers match the allocating run
+        let (rainfall, evapotranspiration) = forcing(400);
+        let parameters = vec![257.238, 1.012, 88.235, 2.208];
+        let (states_out, uh1_out, uh2_out, flow) = run::<gr4j::Gr4j>(
+            &parameters,
+            rainfall.view(),
+            evapotranspiration.view(),
+            Array1::from_vec(vec![100.0, 40.0]).view(),
+            Array1::zeros(20).view(),
+            Array1::zeros(40).view(),
+            true,
+            &Gaps::none(),
+        );
+
+        let mut states = Array2::zeros((2, 3));
+        states[[0, 1]] = 100.0;
+        states[[1, 1]] = 40.0;
+        let mut uh1 = Array2::zeros((2, 20));
+        let mut uh2 = Array2::zeros((40, 3));
+        let mut flows = Array2::zeros((3, 400));
+        run_into::<gr4j::Gr4j>(
+            &parameters,
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.column_mut(1),
+            uh1.row_mut(1),
+            uh2.column_mut(2),
+            true,
+            &Gaps::none(),
+            None,
+            flows.row_mut(2),
+        );
+        assert_eq!(flows.row(2).to_vec(), flow.to_vec());
+        assert_eq!(states.column(1).to_vec(), states_out.to_vec());
+        assert_eq!(uh1.row(1).to_vec(), uh1_out.to_vec());
+        assert_eq!(uh2.column(2).to_vec(), uh2_out.to_vec());
+        assert_eq!(states.column(0).to_vec(), vec![0.0, 0.0]);
+    }
+
+    #[test]
+    fn test_stepper() {
+        // Blocks run by a single model instance match a run over the whole forcing
+        let (rainfall, evapotranspiration) = forcing(400);
+        let parameters = vec![257.238, 1.012, 88.235, 2.208];
+        let (states_out, uh1_out, uh2_out, flow) = run::<gr4j::Gr4j>(
+            &parameters,
+            rainfall.view(),
+            evapotranspiration.view(),
+            Array1::from_vec(vec![100.0, 40.0]).view(),
+            Array1::zeros(20).view(),
+            Array1::zeros(40).view(),
+            false,
+            &Gaps::none(),
+        );
+
+        let mut stepper = Stepper::<gr4j::Gr4j>::new(&parameters);
+        let (mut levels, mut uh1, mut uh2) = (vec![100.0, 40.0], vec![0.0; 20], vec![0.0; 40]);
+        let mut flows = vec![0.0; 400];
+        for (start, end) in [(0, 150), (150, 300), (300, 400)] {
+            stepper.run::<Reference>(
+                rainfall.slice(ndarray::s![start..end]),
+                evapotranspiration.slice(ndarray::s![start..end]),
+                &mut levels,
+                &mut uh1,
+                &mut uh2,
+                &mut flows[start..end],
+            );
+        }
+        stepper.finish();
+        assert_eq!(flows, flow.to_vec());
+        assert_eq!(levels, states_out.to_vec());
+        assert_eq!(uh1, uh1_out.to_vec());
+        assert_eq!(uh2, uh2_out.to_vec());
+    }
+
+    #[test]
+    fn test_unit_hydrographs() {
+        // Ordinates sum to one and the convolution conserves the input volume
+        for x4 in [0.6, 2.208, 7.3] {
+            for uh in [UnitHydrograph::uh1(x4, 2.5), UnitHydrograph::uh2(x4, 2.5)] {
+                let mut states = vec![0.0; uh.len()];
+                let mut total = 0.0;
+                for t in 0..2 * uh.len() {
+                    total += uh.convolve(&mut states, if t == 0 { 10.0 } else { 0.0 });
+                }
+                assert!((total - 10.0).abs() < 1e-12);
+            }
+        }
+    }
+}
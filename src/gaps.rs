@@ -0,0 +1,280 @@
+use ndarray::ArrayView1;
+
+// Missing values (NaN) in the input time series, filled while stepping through the series, without copy :
+//     - propagate : NaN are passed to the model (default, the stores are NaN for the rest of the run),
+//     - zero : NaN are replaced by 0,
+//     - linear : NaN are linearly interpolated between the surrounding values, the nearest value is held at the
+//       edges of the series,
+//     - climatology : NaN are replaced by the mean of the valid values of the same season (day of the year for
+//       example), the overall mean if the season has no valid value,
+//     - skip : time steps with a NaN input are skipped, the states are held and the flow is NaN.
+// The linear and climatology policies can not fill a series without any valid value : its NaN are passed to the
+// model. The filled and skipped time steps are counted while stepping through the series, and returned with the
+// outputs of the run.
+
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub enum GapPolicy {
+    Propagate,
+    Zero,
+    Linear,
+    Climatology,
+    Skip,
+}
+
+impl GapPolicy {
+    pub fn from_name(name: &str) -> Option<GapPolicy> {
+        match name {
+            "propagate" => Some(GapPolicy::Propagate),
+            "zero" => Some(GapPolicy::Zero),
+            "linear" => Some(GapPolicy::Linear),
+            "climatology" => Some(GapPolicy::Climatology),
+            "skip" => Some(GapPolicy::Skip),
+            _ => None,
+        }
+    }
+}
+
+/// Number of time steps filled in each input of a run, and number of time steps skipped.
+#[derive(Clone, Copy, Debug, Default, PartialEq)]
+pub struct GapCounts {
+    pub rainfall: usize,
+    pub evapotranspiration: usize,
+    pub skipped: usize,
+}
+
+/// Gap policy, with the season index of each time step for the climatology policy.
+pub struct Gaps<'a> {
+    pub policy: GapPolicy,
+    pub seasons: Option<ArrayView1<'a, i64>>,
+}
+
+impl Gaps<'static> {
+    pub fn none() -> Gaps<'static> {
+        Gaps {
+            policy: GapPolicy::Propagate,
+            seasons: None,
+        }
+    }
+}
+
+// One input series, read in increasing time order.
+struct Filler<'a> {
+    values: ArrayView1<'a, f64>,
+    policy: GapPolicy,
+    seasons: Option<ArrayView1<'a, i64>>,
+    climatology: Vec<f64>,
+    previous: Option<(usize, f64)>,
+    next: Option<(usize, f64)>,
+    searched: usize,
+    filled: usize,
+}
+
+impl<'a> Filler<'a> {
+    fn new(values: ArrayView1<'a, f64>, gaps: &Gaps<'a>) -> Filler<'a> {
+        let mut climatology = Vec::new();
+        if gaps.policy == GapPolicy::Climatology {
+            let n_seasons = match &gaps.seasons {
+                Some(seasons) => seasons.iter().map(|s| *s as usize + 1).max().unwrap_or(1),
+                None => 1,
+            };
+            let mut sums = vec![0.0; n_seasons];
+            let mut counts = vec![0usize; n_seasons];
+            for (t, value) in values.iter().enumerate() {
+                if !value.is_nan() {
+                    let season = match &gaps.seasons {
+                        Some(seasons) => seasons[t] as usize,
+                        None => 0,
+                    };
+                    sums[season] += value;
+                    counts[season] += 1;
+                }
+            }
+            let total: usize = counts.iter().sum();
+            let mean = if total > 0 {
+                sums.iter().sum::<f64>() / total as f64
+            } else {
+                f64::NAN
+            };
+            climatology = sums
+                .iter()
+                .zip(counts.iter())
+                .map(|(sum, count)| {
+                    if *count > 0 {
+                        sum / *count as f64
+                    } else {
+                        mean
+                    }
+                })
+                .collect();
+        }
+        Filler {
+            values,
+            policy: gaps.policy,
+            seasons: gaps.seasons.clone(),
+            climatology,
+            previous: None,
+            next: None,
+            searched: 0,
+            filled: 0,
+        }
+    }
+
+    #[inline]
+    fn value(&mut self, t: usize) -> f64 {
+        let value = self.values[t];
+        if !value.is_nan() {
+            if self.policy == GapPolicy::Linear {
+                self.previous = Some((t, value));
+            }
+            return value;
+        }
+        let filled = match self.policy {
+            GapPolicy::Propagate | GapPolicy::Skip => value,
+            GapPolicy::Zero => 0.0,
+            GapPolicy::Climatology => match &self.seasons {
+                Some(seasons) => self.climatology[seasons[t] as usize],
+                None => self.climatology[0],
+            },
+            GapPolicy::Linear => self.interpolate(t),
+        };
+        if !filled.is_nan() {
+            self.filled += 1;
+        }
+        filled
+    }
+
+    fn interpolate(&mut self, t: usize) -> f64 {
+        // The next valid value is searched once per gap
+        if self.searched <= t {
+            let n = self.values.len();
+            self.next = (t + 1..n)
+                .find(|i| !self.values[*i].is_nan())
+                .map(|i| (i, self.values[i]));
+            self.searched = self.next.map(|(i, _)| i).unwrap_or(n);
+        }
+        match (self.previous, self.next) {
+            (Some((t0, v0)), Some((t1, v1))) => v0 + (v1 - v0) * (t - t0) as f64 / (t1 - t0) as f64,
+            (Some((_, v0)), None) => v0,
+            (None, Some((_, v1))) => v1,
+            (None, None) => f64::NAN,
+        }
+    }
+}
+
+/// Rainfall and evapotranspiration of a model run, with gaps filled according to the policy.
+pub struct Forcing<'a> {
+    rainfall: Filler<'a>,
+    evapotranspiration: Filler<'a>,
+    skip: bool,
+    skipped: usize,
+}
+
+impl<'a> Forcing<'a> {
+    pub fn new(
+        rainfall: ArrayView1<'a, f64>,
+        evapotranspiration: ArrayView1<'a, f64>,
+        gaps: &Gaps<'a>,
+    ) -> Forcing<'a> {
+        Forcing {
+            rainfall: Filler::new(rainfall, gaps),
+            evapotranspiration: Filler::new(evapotranspiration, gaps),
+            skip: gaps.policy == GapPolicy::Skip,
+            skipped: 0,
+        }
+    }
+
+    /// Return the rainfall and evapotranspiration of time step t, None if the step is skipped.
+    #[inline]
+    pub fn get(&mut self, t: usize) -> Option<(f64, f64)> {
+        let rain = self.rainfall.value(t);
+        let evap = self.evapotranspiration.value(t);
+        if self.skip && (rain.is_nan() || evap.is_nan()) {
+            self.skipped += 1;
+            return None;
+        }
+        Some((rain, evap))
+    }
+
+    /// Filled and skipped time steps so far.
+    pub fn counts(&self) -> GapCounts {
+        GapCounts {
+            rainfall: self.rainfall.filled,
+            evapotranspiration: self.evapotranspiration.filled,
+            skipped: self.skipped,
+        }
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use ndarray::Array1;
+
+    fn fill(values: &Vec<f64>, gaps: &Gaps) -> Vec<f64> {
+        fill_counts(values, gaps).0
+    }
+
+    fn fill_counts(values: &Vec<f64>, gaps: &Gaps) -> (Vec<f64>, GapCounts) {
+        let values = Array1::from_vec(values.clone());
+        let evapotranspiration = Array1::from_vec(vec![1.0; values.len()]);
+        let mut forcing = Forcing::new(values.view(), evapotranspiration.view(), gaps);
+        let filled = (0..values.len())
+            .map(|t| match forcing.get(t) {
+                Some((rain, _)) => rain,
+                None => -1.0,
+            })
+            .collect();
+        (filled, forcing.counts())
+    }
+
+    #[test]
+    fn test_gap_policies() {
+        let nan = f64::NAN;
+        let values = vec![nan, 1.0, nan, nan, 4.0, 2.0, nan];
+        let gaps = |policy| Gaps {
+            policy,
+            seasons: None,
+        };
+
+        assert_eq!(
+            fill(&values, &gaps(GapPolicy::Zero)),
+            vec![0.0, 1.0, 0.0, 0.0, 4.0, 2.0, 0.0]
+        );
+        assert_eq!(
+            fill(&values, &gaps(GapPolicy::Linear)),
+            vec![1.0, 1.0, 2.0, 3.0, 4.0, 2.0, 2.0]
+        );
+        assert_eq!(
+            fill(&values, &gaps(GapPolicy::Skip)),
+            vec![-1.0, 1.0, -1.0, -1.0, 4.0, 2.0, -1.0]
+        );
+        assert!(fill(&values, &gaps(GapPolicy::Propagate))[0].is_nan());
+
+        // Filled and skipped time steps
+        let counts = |policy| fill_counts(&values, &gaps(policy)).1;
+        assert_eq!(counts(GapPolicy::Propagate), GapCounts::default());
+        assert_eq!(counts(GapPolicy::Linear).rainfall, 4);
+        assert_eq!(counts(GapPolicy::Linear).evapotranspiration, 0);
+        assert_eq!(counts(GapPolicy::Skip).skipped, 4);
+        assert_eq!(counts(GapPolicy::Skip).rainfall, 0);
+
+        // A series without valid value is not filled
+        let missing = vec![f64::NAN; 3];
+        for policy in [GapPolicy::Linear, GapPolicy::Climatology] {
+            let (filled, counts) = fill_counts(&missing, &gaps(policy));
+            assert!(filled.iter().all(|value| value.is_nan()));
+            assert_eq!(counts.rainfall, 0);
+        }
+        assert_eq!(fill_counts(&missing, &gaps(GapPolicy::Zero)).1.rainfall, 3);
+
+        let seasons = Array1::from_vec(vec![0i64, 1, 0, 1, 0, 1, 2]);
+        let climatology = Gaps {
+            policy: GapPolicy::Climatology,
+            seasons: Some(seasons.view()),
+        };
+        assert_eq!(
+            fill(&values, &climatology),
+            vec![4.0, 1.0, 4.0, 1.5, 4.0, 2.0, 7.0 / 3.0]
+        );
+    }
+}
@@ -1,3 +1,4 @@
+use super::profiling::{self, Timer};
 use ndarray::{Array1, ArrayView1};
 
 pub fn gr1a(
@@ -9,11 +10,19 @@ pub fn gr1a(
     let mut flow = Array1::zeros(rainfall.len());
 
     // Main loop :
+    let loop_timer = Timer::start();
     for t in 1..rainfall.len() {
         // start at 1 here
         let tt = (0.7 * rainfall[t] + 0.3 * rainfall[t - 1]) / x1 / evapotranspiration[t];
         flow[t] = rainfall[t] * (1. - 1. / (1. + tt * tt).sqrt());
     }
 
+    profiling::GR1A.record(
+        None,
+        loop_timer.elapsed_ns(),
+        rainfall.len(),
+        8 * flow.len(),
+    );
+
     flow
 }
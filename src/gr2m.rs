@@ -1,3 +1,5 @@
+use super::gaps::{Forcing, GapCounts, Gaps};
+use super::profiling::{self, Timer};
 use ndarray::{Array1, ArrayView1};
 
 pub fn gr2m(
@@ -5,15 +7,25 @@ pub fn gr2m(
     rainfall: ArrayView1<'_, f64>,
     evapotranspiration: ArrayView1<'_, f64>,
     states: ArrayView1<'_, f64>,
-) -> (Array1<f64>, Array1<f64>) {
+    gaps: &Gaps<'_>,
+) -> (Array1<f64>, Array1<f64>, GapCounts) {
     let mut states = states.to_owned();
     let mut flow = Array1::zeros(rainfall.len());
 
     let x1 = parameters[0];
     let x2 = parameters[1];
 
-    let iter = rainfall.iter().zip(evapotranspiration.iter());
-    for (t, (rain, evap)) in iter.enumerate() {
+    let loop_timer = Timer::start();
+    let mut forcing = Forcing::new(rainfall.view(), evapotranspiration.view(), gaps);
+    for t in 0..rainfall.len() {
+        let (rain, evap) = match forcing.get(t) {
+            Some(values) => values,
+            None => {
+                // Skipped time step : the states are held
+                flow[t] = f64::NAN;
+                continue;
+            }
+        };
         // Production store
         let mut scaled_rain: f64 = rain / x1;
         if scaled_rain > 13.0 {
@@ -44,5 +56,12 @@ pub fn gr2m(
         states[1] = routing - flow[t];
     }
 
-    (states, flow)
+    profiling::GR2M.record(
+        None,
+        loop_timer.elapsed_ns(),
+        rainfall.len(),
+        8 * (states.len() + flow.len()),
+    );
+
+    (states, flow, forcing.counts())
 }
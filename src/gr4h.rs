@@ -1,4 +1,10 @@
-use super::s_curves::{s_curves1, s_curves2};
+use super::engine::{
+    self, direct_flow, Exchange, Model, PowerExchange, ProductionStore, RoutingStore,
+    UnitHydrograph, STORAGE_FRACTION,
+};
+use super::gaps::Gaps;
+use super::math::Precision;
+use super::profiling::{self, KernelCounters};
 use ndarray::{Array1, ArrayView1};
 
 // https://wiki.ewater.org.au/display/SD50/GR4H
@@ -10,102 +16,75 @@ pub fn gr4h(
     states: ArrayView1<'_, f64>,
     uh1: ArrayView1<'_, f64>,
     uh2: ArrayView1<'_, f64>,
+    fast: bool,
+    gaps: &Gaps<'_>,
 ) -> (Array1<f64>, Array1<f64>, Array1<f64>, Array1<f64>) {
-    let mut states = states.to_owned();
-    let mut uh1 = uh1.to_owned();
-    let mut uh2 = uh2.to_owned();
-    let mut flow = Array1::zeros(rainfall.len());
-
-    let storage_fraction = 0.9;
+    engine::run::<Gr4h>(
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        gaps,
+    )
+}
 
-    // Get parameters :
-    let x1 = parameters[0];
-    let x2 = parameters[1];
-    let x3 = parameters[2];
-    let x4 = parameters[3];
+/// GR4H : production store, UH1 and UH2, routing store and power exchange.
+pub struct Gr4h {
+    production: ProductionStore,
+    uh1: UnitHydrograph,
+    uh2: UnitHydrograph,
+    exchange: PowerExchange,
+    routing: RoutingStore,
+}
 
-    // Initialize hydrograph :
-    let nuh1 = x4.ceil() as usize;
-    let nuh2 = (2.0 * x4).ceil() as usize;
-    let mut o_uh1 = vec![0.; nuh1];
-    let mut o_uh2 = vec![0.; nuh2];
-    let exp: f64 = 1.25;
-    for i in 1..nuh1 + 1 {
-        o_uh1[i - 1] = s_curves1(i, x4, exp) - s_curves1(i - 1, x4, exp);
-    }
-    for i in 1..nuh2 + 1 {
-        o_uh2[i - 1] = s_curves2(i, x4, exp) - s_curves2(i - 1, x4, exp);
+impl Model for Gr4h {
+    fn new(parameters: &[f64]) -> Gr4h {
+        let x1 = parameters[0];
+        let x2 = parameters[1];
+        let x3 = parameters[2];
+        let x4 = parameters[3];
+        Gr4h {
+            production: ProductionStore::new(x1, 759.69140625),
+            uh1: UnitHydrograph::uh1(x4, 1.25),
+            uh2: UnitHydrograph::uh2(x4, 1.25),
+            exchange: PowerExchange::new(x2, x3),
+            routing: RoutingStore::new(x3),
+        }
     }
 
-    // Main loop :
-    let iter = rainfall.iter().zip(evapotranspiration.iter());
-    for (t, (rain, evap)) in iter.enumerate() {
-        let mut rout_input = 0.0;
-
-        let psf = states[0] / x1; // production store filling percentage
-        if rain <= evap {
-            let mut scaled_net_rain: f64 = (evap - rain) / x1;
-            if scaled_net_rain > 13.0 {
-                scaled_net_rain = 13.0;
-            }
-            scaled_net_rain = scaled_net_rain.tanh();
-
-            let prod_evap =
-                states[0] * (2. - psf) * scaled_net_rain / (1. + (1. - psf) * scaled_net_rain); // evap from production store
-            states[0] -= prod_evap;
-        } else {
-            let net_rainfall = rain - evap;
-            let mut scaled_net_rain: f64 = net_rainfall / x1;
-            if scaled_net_rain > 13.0 {
-                scaled_net_rain = 13.0;
-            }
-            scaled_net_rain = scaled_net_rain.tanh();
-            let prod_rainfall =
-                x1 * (1. - psf * psf) * scaled_net_rain / (1. + psf * scaled_net_rain); // rainfall to production store
-
-            rout_input = net_rainfall - prod_rainfall;
-            states[0] += prod_rainfall;
-        }
-        if states[0] < 0. {
-            states[0] = 0.;
-        }
+    fn counters() -> &'static KernelCounters {
+        &profiling::GR4H
+    }
 
-        // Production store percolation :
-        let psf_p4 = (states[0] / x1).powf(4.0);
-        let percolation = states[0] * (1.0 - 1.0 / (1.0 + psf_p4 / 759.69140625).powf(0.25));
-        states[0] -= percolation;
-        rout_input += percolation;
+    fn ordinates(&self) -> usize {
+        self.uh1.len() + self.uh2.len()
+    }
 
-        for i in 0..nuh1 - 1 {
-            uh1[i] = uh1[i + 1] + o_uh1[i] * rout_input;
-        }
-        uh1[nuh1 - 1] = o_uh1[nuh1 - 1] * rout_input;
-        for i in 0..nuh2 - 1 {
-            uh2[i] = uh2[i + 1] + o_uh2[i] * rout_input;
-        }
-        uh2[nuh2 - 1] = o_uh2[nuh2 - 1] * rout_input;
+    #[inline(always)]
+    fn step<P: Precision>(
+        &self,
+        levels: &mut [f64],
+        uh1: &mut [f64],
+        uh2: &mut [f64],
+        rain: f64,
+        evap: f64,
+    ) -> f64 {
+        let rout_input = self.production.step::<P>(&mut levels[0], rain, evap);
+        let q9 = self.uh1.convolve(uh1, rout_input);
+        let q1 = self.uh2.convolve(uh2, rout_input);
 
         // Potential inter catchment semi-exchange :
-        let groundwater_exchange = x2 * (states[1] / x3).powf(3.5);
-        states[1] += uh1[0] * storage_fraction + groundwater_exchange;
-        if states[1] < 0. {
-            states[1] = 0.;
-        }
+        let exchange = self.exchange.exchange::<P>(levels[1]);
 
         // Flow :
-        let rsf_p4 = (states[1] / x3).powf(4.0);
-        let rout_flow = states[1] * (1. - 1. / (1. + rsf_p4).powf(0.25));
-        states[1] -= rout_flow;
-
-        let mut direct_flow = uh2[0] * (1.0 - storage_fraction) + groundwater_exchange;
-        if direct_flow < 0. {
-            direct_flow = 0.
-        };
-
-        flow[t] = rout_flow + direct_flow;
+        let rout_flow = self
+            .routing
+            .step::<P>(&mut levels[1], q9 * STORAGE_FRACTION, exchange);
+        rout_flow + direct_flow(q1 * (1.0 - STORAGE_FRACTION), exchange)
     }
-
-    (states, uh1, uh2, flow)
 }
 
 #[cfg(test)]
@@ -133,6 +112,8 @@ mod tests {
             states.view(),
             uh1.view(),
             uh2.view(),
+            false,
+            &Gaps::none(),
         );
 
         let ref_flow = vec![
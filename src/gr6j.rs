@@ -1,6 +1,15 @@
-use super::s_curves::{s_curves1, s_curves2};
+use super::engine::{
+    self, direct_flow, Exchange, ExponentialStore, Model, ProductionStore, RoutingStore,
+    ThresholdExchange, UnitHydrograph, STORAGE_FRACTION,
+};
+use super::gaps::Gaps;
+use super::math::Precision;
+use super::profiling::{self, KernelCounters};
 use ndarray::{Array1, ArrayView1};
 
+/// Fraction of the UH1 output routed through the exponential store.
+const EXP_FRACTION: f64 = 0.4;
+
 pub fn gr6j(
     parameters: &Vec<f64>,
     rainfall: ArrayView1<'_, f64>,
@@ -8,123 +17,83 @@ pub fn gr6j(
     states: ArrayView1<'_, f64>,
     uh1: ArrayView1<'_, f64>,
     uh2: ArrayView1<'_, f64>,
+    fast: bool,
+    gaps: &Gaps<'_>,
 ) -> (Array1<f64>, Array1<f64>, Array1<f64>, Array1<f64>) {
-    let mut states = states.to_owned();
-    let mut uh1 = uh1.to_owned();
-    let mut uh2 = uh2.to_owned();
-    let mut flow = Array1::zeros(rainfall.len());
-
-    let storage_fraction = 0.9;
-    let exp_fraction = 0.4;
-
-    // Get parameters :
-    let x1 = parameters[0];
-    let x2 = parameters[1];
-    let x3 = parameters[2];
-    let x4 = parameters[3];
-    let x5 = parameters[4];
-    let x6 = parameters[5];
-
-    // Initialize hydrograph :
-    let nuh1 = x4.ceil() as usize;
-    let nuh2 = (2.0 * x4).ceil() as usize;
-    let mut o_uh1 = vec![0.; nuh1];
-    let mut o_uh2 = vec![0.; nuh2];
-    let exp: f64 = 2.5;
-    for i in 1..nuh1 + 1 {
-        o_uh1[i - 1] = s_curves1(i, x4, exp) - s_curves1(i - 1, x4, exp);
-    }
-    for i in 1..nuh2 + 1 {
-        o_uh2[i - 1] = s_curves2(i, x4, exp) - s_curves2(i - 1, x4, exp);
-    }
-
-    // Main loop :
-    let iter = rainfall.iter().zip(evapotranspiration.iter());
-    for (t, (rain, evap)) in iter.enumerate() {
-        let mut rout_input = 0.0;
-        let psf = states[0] / x1; // production store filling percentage
-        if rain <= evap {
-            let mut scaled_net_rain: f64 = (evap - rain) / x1;
-            if scaled_net_rain > 13.0 {
-                scaled_net_rain = 13.0;
-            }
-            scaled_net_rain = scaled_net_rain.tanh();
-            let prod_evap =
-                states[0] * (2. - psf) * scaled_net_rain / (1. + (1. - psf) * scaled_net_rain); // evap from production store
+    engine::run::<Gr6j>(
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        gaps,
+    )
+}
 
-            states[0] -= prod_evap;
-        } else {
-            let net_rainfall = rain - evap;
-            let mut scaled_net_rain: f64 = net_rainfall / x1;
-            if scaled_net_rain > 13.0 {
-                scaled_net_rain = 13.0;
-            }
-            scaled_net_rain = scaled_net_rain.tanh();
-            let prod_rainfall =
-                x1 * (1. - psf * psf) * scaled_net_rain / (1. + psf * scaled_net_rain); // rainfall to production store
+/// GR6J : production store, UH1 and UH2, routing and exponential stores and threshold exchange.
+pub struct Gr6j {
+    production: ProductionStore,
+    uh1: UnitHydrograph,
+    uh2: UnitHydrograph,
+    exchange: ThresholdExchange,
+    routing: RoutingStore,
+    exponential: ExponentialStore,
+}
 
-            rout_input = net_rainfall - prod_rainfall;
-            states[0] += prod_rainfall;
-        }
-        if states[0] < 0. {
-            states[0] = 0.;
+impl Model for Gr6j {
+    fn new(parameters: &[f64]) -> Gr6j {
+        let x1 = parameters[0];
+        let x2 = parameters[1];
+        let x3 = parameters[2];
+        let x4 = parameters[3];
+        let x5 = parameters[4];
+        let x6 = parameters[5];
+        Gr6j {
+            production: ProductionStore::new(x1, 25.62890625),
+            uh1: UnitHydrograph::uh1(x4, 2.5),
+            uh2: UnitHydrograph::uh2(x4, 2.5),
+            exchange: ThresholdExchange::new(x2, x3, x5),
+            routing: RoutingStore::new(x3),
+            exponential: ExponentialStore::new(x6),
         }
+    }
 
-        // Production store percolation :
-        let psf_p4 = (states[0] / x1).powf(4.0);
-        let percolation = states[0] * (1.0 - 1.0 / (1.0 + psf_p4 / 25.62890625).powf(0.25));
+    fn counters() -> &'static KernelCounters {
+        &profiling::GR6J
+    }
 
-        states[0] -= percolation;
-        rout_input += percolation;
+    fn ordinates(&self) -> usize {
+        self.uh1.len() + self.uh2.len()
+    }
 
-        for i in 0..nuh1 - 1 {
-            uh1[i] = uh1[i + 1] + o_uh1[i] * rout_input;
-        }
-        uh1[nuh1 - 1] = o_uh1[nuh1 - 1] * rout_input;
-        for i in 0..nuh2 - 1 {
-            uh2[i] = uh2[i + 1] + o_uh2[i] * rout_input;
-        }
-        uh2[nuh2 - 1] = o_uh2[nuh2 - 1] * rout_input;
+    #[inline(always)]
+    fn step<P: Precision>(
+        &self,
+        levels: &mut [f64],
+        uh1: &mut [f64],
+        uh2: &mut [f64],
+        rain: f64,
+        evap: f64,
+    ) -> f64 {
+        let rout_input = self.production.step::<P>(&mut levels[0], rain, evap);
+        let q9 = self.uh1.convolve(uh1, rout_input) * STORAGE_FRACTION;
+        let q1 = self.uh2.convolve(uh2, rout_input);
 
         // Potential inter catchment semi-exchange :
-        let groundwater_exchange = x2 * (states[1] / x3 - x5);
-        states[1] += uh1[0] * storage_fraction * (1.0 - exp_fraction) + groundwater_exchange;
-        if states[1] < 0. {
-            states[1] = 0.;
-        }
+        let exchange = self.exchange.exchange::<P>(levels[1]);
 
         // Flow :
-        let rsf_p4 = (states[1] / x3).powf(4.0);
-        let rout_flow = states[1] * (1. - 1. / (1. + rsf_p4).powf(0.25));
-        states[1] -= rout_flow;
+        let rout_flow = self
+            .routing
+            .step::<P>(&mut levels[1], q9 * (1.0 - EXP_FRACTION), exchange);
 
         // Exponential store :
-        states[2] += uh1[0] * storage_fraction * exp_fraction + groundwater_exchange;
-        let mut ar: f64 = states[2] / x6;
-        if ar > 33. {
-            ar = 33.;
-        }
-        if ar < -33. {
-            ar = -33.;
-        }
-
-        let exp_flow: f64;
-        if ar > 7. {
-            exp_flow = states[2] + x6 / ar.exp();
-        } else if ar < -7. {
-            exp_flow = x6 * ar.exp();
-        } else {
-            exp_flow = x6 * (ar.exp() + 1.).ln();
-        }
-        states[2] -= exp_flow;
+        let exp_flow = self
+            .exponential
+            .step(&mut levels[2], q9 * EXP_FRACTION, exchange);
 
-        let mut direct_flow = uh2[0] * (1.0 - storage_fraction) + groundwater_exchange;
-        if direct_flow < 0. {
-            direct_flow = 0.
-        };
-
-        flow[t] = rout_flow + direct_flow + exp_flow;
+        rout_flow + direct_flow(q1 * (1.0 - STORAGE_FRACTION), exchange) + exp_flow
     }
-
-    (states, uh1, uh2, flow)
 }
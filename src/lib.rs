@@ -1,14 +1,97 @@
-use numpy::{IntoPyArray, PyArray1, PyReadonlyArray1};
+use numpy::{
+    IntoPyArray, PyArray1, PyArray2, PyReadonlyArray1, PyReadonlyArray2, PyReadwriteArray1,
+};
+use pyo3::exceptions::PyValueError;
 use pyo3::prelude::*;
-use pyo3::types::PyList;
+use pyo3::types::{PyDict, PyList};
+use std::sync::atomic::Ordering;
 
+use aggregation::Reduction;
+use gaps::{GapCounts, GapPolicy, Gaps};
+
+mod aggregation;
+mod batch;
+mod chunked;
+mod criteria;
+mod engine;
+mod gaps;
 mod gr1a;
 mod gr2m;
 mod gr4h;
 mod gr4j;
 mod gr5j;
 mod gr6j;
+mod math;
+mod parallel;
+mod pet;
+mod profiling;
+mod regionalisation;
 mod s_curves;
+mod signatures;
+mod spin_up;
+mod summary;
+
+// Gap policy of a single run, with the season index of each time step for the climatology policy (see gaps.rs).
+fn gap_policy<'a>(
+    gaps: &str,
+    seasons: &'a Option<PyReadonlyArray1<i64>>,
+    n_steps: usize,
+) -> PyResult<Gaps<'a>> {
+    let policy = GapPolicy::from_name(gaps)
+        .ok_or_else(|| PyValueError::new_err(format!("Unknown gap policy {}", gaps)))?;
+    let seasons = seasons.as_ref().map(|seasons| seasons.as_array());
+    match &seasons {
+        Some(seasons) => {
+            if seasons.len() != n_steps || seasons.iter().any(|s| *s < 0) {
+                return Err(PyValueError::new_err(
+                    "Seasons should be non negative, one per time step",
+                ));
+            }
+        }
+        None => {
+            if policy == GapPolicy::Climatology {
+                return Err(PyValueError::new_err(
+                    "Climatology gap filling requires the season of each time step",
+                ));
+            }
+        }
+    }
+    Ok(Gaps { policy, seasons })
+}
+
+// Number of filled time steps of the rainfall and of the evapotranspiration, and number of skipped time steps.
+fn gap_counts(counts: GapCounts) -> (usize, usize, usize) {
+    (counts.rainfall, counts.evapotranspiration, counts.skipped)
+}
+
+// Periods of an aggregated run : bounds of the periods over the time steps (see aggregation.rs) and reduction.
+fn period_bounds(
+    periods: &Option<PyReadonlyArray1<i64>>,
+    reduction: &str,
+    n_steps: usize,
+) -> PyResult<Option<(Vec<usize>, Reduction)>> {
+    let reduction = Reduction::from_name(reduction)
+        .ok_or_else(|| PyValueError::new_err(format!("Unknown reduction {}", reduction)))?;
+    let periods = match periods {
+        Some(periods) => periods.as_array(),
+        None => return Ok(None),
+    };
+    if periods.is_empty()
+        || periods.iter().any(|k| *k < 0 || *k as usize > n_steps)
+        || periods
+            .iter()
+            .zip(periods.iter().skip(1))
+            .any(|(a, b)| b < a)
+    {
+        return Err(PyValueError::new_err(
+            "Periods should be non decreasing time step bounds, between 0 and the number of time steps",
+        ));
+    }
+    Ok(Some((
+        periods.iter().map(|k| *k as usize).collect(),
+        reduction,
+    )))
+}
 
 #[pyfunction]
 #[pyo3(name = "gr1a")]
@@ -22,146 +105,959 @@ fn gr1a_py<'py>(
     let n_rainfall = rainfall.as_array();
     let n_evap = evapotranspiration.as_array();
 
-    let flow = gr1a::gr1a(&v_param, n_rainfall, n_evap);
+    let flow = py.allow_threads(|| gr1a::gr1a(&v_param, n_rainfall, n_evap));
     flow.into_pyarray(py)
 }
 
 #[pyfunction]
 #[pyo3(name = "gr2m")]
+#[pyo3(signature = (parameters, rainfall, evapotranspiration, states, gaps = "propagate", seasons = None))]
 fn gr2m_py<'py>(
     py: Python<'py>,
     parameters: &PyList,
     rainfall: PyReadonlyArray1<f64>,
     evapotranspiration: PyReadonlyArray1<f64>,
     states: PyReadonlyArray1<f64>,
-) -> (&'py PyArray1<f64>, &'py PyArray1<f64>) {
+    gaps: &str,
+    seasons: Option<PyReadonlyArray1<i64>>,
+) -> PyResult<(
+    &'py PyArray1<f64>,
+    &'py PyArray1<f64>,
+    (usize, usize, usize),
+)> {
     let v_param = parameters.extract::<Vec<f64>>().unwrap();
     let n_rainfall = rainfall.as_array(); // Convert to ndarray type
     let n_evap = evapotranspiration.as_array();
+    let gaps = gap_policy(gaps, &seasons, n_rainfall.len())?;
     let n_states = states.as_array();
 
-    let (states, flow) = gr2m::gr2m(&v_param, n_rainfall, n_evap, n_states);
-    (states.into_pyarray(py), flow.into_pyarray(py))
+    let (states, flow, counts) =
+        py.allow_threads(|| gr2m::gr2m(&v_param, n_rainfall, n_evap, n_states, &gaps));
+    Ok((
+        states.into_pyarray(py),
+        flow.into_pyarray(py),
+        gap_counts(counts),
+    ))
 }
 
-#[pyfunction]
-#[pyo3(name = "gr4j")]
-fn gr4j_py<'py>(
+// Single run of a GR model. The states and unit hydrographs are updated in place when inplace is set (they are copied
+// otherwise) and the flow is written into out when it is given (allocated otherwise), so that loops over many runs
+// reuse their buffers, that may be rows or columns of larger arrays. The arrays are returned, with the gap counts.
+fn run_model<'py, M: engine::Model>(
     py: Python<'py>,
     parameters: &PyList,
     rainfall: PyReadonlyArray1<f64>,
     evapotranspiration: PyReadonlyArray1<f64>,
-    states: PyReadonlyArray1<f64>,
-    uh1: PyReadonlyArray1<f64>,
-    uh2: PyReadonlyArray1<f64>,
-) -> (
+    states: &'py PyArray1<f64>,
+    uh1: &'py PyArray1<f64>,
+    uh2: &'py PyArray1<f64>,
+    fast: bool,
+    gaps: &str,
+    seasons: Option<PyReadonlyArray1<i64>>,
+    periods: Option<PyReadonlyArray1<i64>>,
+    reduction: &str,
+    out: Option<&'py PyArray1<f64>>,
+    inplace: bool,
+) -> PyResult<(
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
-) {
+    (usize, usize, usize),
+)> {
     let v_param = parameters.extract::<Vec<f64>>().unwrap();
     let n_rainfall = rainfall.as_array(); // Convert to ndarray type
     let n_evap = evapotranspiration.as_array();
-    let n_states = states.as_array();
-    let n_uh1 = uh1.as_array();
-    let n_uh2 = uh2.as_array();
+    let gaps = gap_policy(gaps, &seasons, n_rainfall.len())?;
+    let periods = period_bounds(&periods, reduction, n_rainfall.len())?;
+    let n_outputs = match &periods {
+        Some((offsets, _)) => offsets.len() - 1,
+        None => n_rainfall.len(),
+    };
+    let out = match out {
+        Some(out) => {
+            if out.len() != n_outputs {
+                return Err(PyValueError::new_err(format!(
+                    "Output should have {} elements, one per time step or per period",
+                    n_outputs
+                )));
+            }
+            out
+        }
+        None => PyArray1::zeros(py, n_outputs, false),
+    };
+    let (states, uh1, uh2) = if inplace {
+        (states, uh1, uh2)
+    } else {
+        (
+            states.to_owned_array().into_pyarray(py),
+            uh1.to_owned_array().into_pyarray(py),
+            uh2.to_owned_array().into_pyarray(py),
+        )
+    };
 
-    let (states, uh1, uh2, flow) = gr4j::gr4j(&v_param, n_rainfall, n_evap, n_states, n_uh1, n_uh2);
-    (
-        states.into_pyarray(py),
-        uh1.into_pyarray(py),
-        uh2.into_pyarray(py),
-        flow.into_pyarray(py),
+    let writable = |array: &'py PyArray1<f64>| {
+        array.try_readwrite().map_err(|_| {
+            PyValueError::new_err(
+                "States, unit hydrographs and output should be writable arrays, distinct from each other and from the forcing",
+            )
+        })
+    };
+    let mut w_states = writable(states)?;
+    let mut w_uh1 = writable(uh1)?;
+    let mut w_uh2 = writable(uh2)?;
+    let mut w_out = writable(out)?;
+    let n_states = w_states.as_array_mut();
+    let n_uh1 = w_uh1.as_array_mut();
+    let n_uh2 = w_uh2.as_array_mut();
+    let n_out = w_out.as_array_mut();
+    let counts = py.allow_threads(|| {
+        engine::run_into::<M>(
+            &v_param,
+            n_rainfall,
+            n_evap,
+            n_states,
+            n_uh1,
+            n_uh2,
+            fast,
+            &gaps,
+            periods
+                .as_ref()
+                .map(|(offsets, reduction)| (&offsets[..], *reduction)),
+            n_out,
+        )
+    });
+    Ok((states, uh1, uh2, out, gap_counts(counts)))
+}
+
+#[pyfunction]
+#[pyo3(name = "gr4j")]
+#[pyo3(signature = (parameters, rainfall, evapotranspiration, states, uh1, uh2, fast = false, gaps = "propagate", seasons = None, periods = None, reduction = "sum", out = None, inplace = false))]
+fn gr4j_py<'py>(
+    py: Python<'py>,
+    parameters: &PyList,
+    rainfall: PyReadonlyArray1<f64>,
+    evapotranspiration: PyReadonlyArray1<f64>,
+    states: &'py PyArray1<f64>,
+    uh1: &'py PyArray1<f64>,
+    uh2: &'py PyArray1<f64>,
+    fast: bool,
+    gaps: &str,
+    seasons: Option<PyReadonlyArray1<i64>>,
+    periods: Option<PyReadonlyArray1<i64>>,
+    reduction: &str,
+    out: Option<&'py PyArray1<f64>>,
+    inplace: bool,
+) -> PyResult<(
+    &'py PyArray1<f64>,
+    &'py PyArray1<f64>,
+    &'py PyArray1<f64>,
+    &'py PyArray1<f64>,
+    (usize, usize, usize),
+)> {
+    run_model::<gr4j::Gr4j>(
+        py,
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        gaps,
+        seasons,
+        periods,
+        reduction,
+        out,
+        inplace,
     )
 }
 
 #[pyfunction]
 #[pyo3(name = "gr5j")]
+#[pyo3(signature = (parameters, rainfall, evapotranspiration, states, uh2, fast = false, gaps = "propagate", seasons = None, periods = None, reduction = "sum", out = None, inplace = false))]
 fn gr5j_py<'py>(
     py: Python<'py>,
     parameters: &PyList,
     rainfall: PyReadonlyArray1<f64>,
     evapotranspiration: PyReadonlyArray1<f64>,
-    states: PyReadonlyArray1<f64>,
-    uh2: PyReadonlyArray1<f64>,
-) -> (&'py PyArray1<f64>, &'py PyArray1<f64>, &'py PyArray1<f64>) {
-    let v_param = parameters.extract::<Vec<f64>>().unwrap();
-
-    let n_rainfall = rainfall.as_array(); // Convert to ndarray type
-    let n_evap = evapotranspiration.as_array();
-    let n_states = states.as_array();
-    let n_uh2 = uh2.as_array();
-    let (states, uh2, flow) = gr5j::gr5j(&v_param, n_rainfall, n_evap, n_states, n_uh2);
-    (
-        states.into_pyarray(py),
-        uh2.into_pyarray(py),
-        flow.into_pyarray(py),
-    )
+    states: &'py PyArray1<f64>,
+    uh2: &'py PyArray1<f64>,
+    fast: bool,
+    gaps: &str,
+    seasons: Option<PyReadonlyArray1<i64>>,
+    periods: Option<PyReadonlyArray1<i64>>,
+    reduction: &str,
+    out: Option<&'py PyArray1<f64>>,
+    inplace: bool,
+) -> PyResult<(
+    &'py PyArray1<f64>,
+    &'py PyArray1<f64>,
+    &'py PyArray1<f64>,
+    (usize, usize, usize),
+)> {
+    // GR5J has no UH1 : its state is empty
+    let uh1 = PyArray1::zeros(py, 0, false);
+    let (states, _uh1, uh2, flow, counts) = run_model::<gr5j::Gr5j>(
+        py,
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        gaps,
+        seasons,
+        periods,
+        reduction,
+        out,
+        inplace,
+    )?;
+    Ok((states, uh2, flow, counts))
 }
 
 #[pyfunction]
 #[pyo3(name = "gr6j")]
+#[pyo3(signature = (parameters, rainfall, evapotranspiration, states, uh1, uh2, fast = false, gaps = "propagate", seasons = None, periods = None, reduction = "sum", out = None, inplace = false))]
 fn gr6j_py<'py>(
     py: Python<'py>,
     parameters: &PyList,
     rainfall: PyReadonlyArray1<f64>,
     evapotranspiration: PyReadonlyArray1<f64>,
-    states: PyReadonlyArray1<f64>,
-    uh1: PyReadonlyArray1<f64>,
-    uh2: PyReadonlyArray1<f64>,
-) -> (
+    states: &'py PyArray1<f64>,
+    uh1: &'py PyArray1<f64>,
+    uh2: &'py PyArray1<f64>,
+    fast: bool,
+    gaps: &str,
+    seasons: Option<PyReadonlyArray1<i64>>,
+    periods: Option<PyReadonlyArray1<i64>>,
+    reduction: &str,
+    out: Option<&'py PyArray1<f64>>,
+    inplace: bool,
+) -> PyResult<(
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
-) {
-    let v_param = parameters.extract::<Vec<f64>>().unwrap();
-
-    let n_rainfall = rainfall.as_array(); // Convert to ndarray type
-    let n_evap = evapotranspiration.as_array();
-    let n_states = states.as_array();
-    let n_uh1 = uh1.as_array();
-    let n_uh2 = uh2.as_array();
-    let (states, uh1, uh2, flow) = gr6j::gr6j(&v_param, n_rainfall, n_evap, n_states, n_uh1, n_uh2);
-    (
-        states.into_pyarray(py),
-        uh1.into_pyarray(py),
-        uh2.into_pyarray(py),
-        flow.into_pyarray(py),
+    (usize, usize, usize),
+)> {
+    run_model::<gr6j::Gr6j>(
+        py,
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        gaps,
+        seasons,
+        periods,
+        reduction,
+        out,
+        inplace,
     )
 }
 
 #[pyfunction]
 #[pyo3(name = "gr4h")]
+#[pyo3(signature = (parameters, rainfall, evapotranspiration, states, uh1, uh2, fast = false, gaps = "propagate", seasons = None, periods = None, reduction = "sum", out = None, inplace = false))]
 fn gr4h_py<'py>(
     py: Python<'py>,
     parameters: &PyList,
     rainfall: PyReadonlyArray1<f64>,
     evapotranspiration: PyReadonlyArray1<f64>,
-    states: PyReadonlyArray1<f64>,
-    uh1: PyReadonlyArray1<f64>,
-    uh2: PyReadonlyArray1<f64>,
-) -> (
+    states: &'py PyArray1<f64>,
+    uh1: &'py PyArray1<f64>,
+    uh2: &'py PyArray1<f64>,
+    fast: bool,
+    gaps: &str,
+    seasons: Option<PyReadonlyArray1<i64>>,
+    periods: Option<PyReadonlyArray1<i64>>,
+    reduction: &str,
+    out: Option<&'py PyArray1<f64>>,
+    inplace: bool,
+) -> PyResult<(
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
     &'py PyArray1<f64>,
-) {
-    let v_param = parameters.extract::<Vec<f64>>().unwrap();
+    (usize, usize, usize),
+)> {
+    run_model::<gr4h::Gr4h>(
+        py,
+        parameters,
+        rainfall,
+        evapotranspiration,
+        states,
+        uh1,
+        uh2,
+        fast,
+        gaps,
+        seasons,
+        periods,
+        reduction,
+        out,
+        inplace,
+    )
+}
 
-    let n_rainfall = rainfall.as_array(); // Convert to ndarray type
+fn batch_structure(model: &str) -> PyResult<batch::Structure> {
+    batch::Structure::from_name(model).ok_or_else(|| {
+        PyValueError::new_err(format!("Batch runs are not available for model {}", model))
+    })
+}
+
+fn criteria_list(names: &[String]) -> PyResult<Vec<criteria::Criterion>> {
+    names
+        .iter()
+        .map(|name| {
+            criteria::Criterion::from_name(name)
+                .ok_or_else(|| PyValueError::new_err(format!("Unknown criterion {}", name)))
+        })
+        .collect()
+}
+
+#[pyfunction]
+#[pyo3(signature = (model, parameters, rainfall, evapotranspiration, states, uh1, uh2, fast = false))]
+fn run_batch<'py>(
+    py: Python<'py>,
+    model: &str,
+    parameters: PyReadonlyArray2<f64>,
+    rainfall: PyReadonlyArray2<f64>,
+    evapotranspiration: PyReadonlyArray2<f64>,
+    states: PyReadonlyArray2<f64>,
+    uh1: PyReadonlyArray2<f64>,
+    uh2: PyReadonlyArray2<f64>,
+    fast: bool,
+) -> PyResult<(
+    &'py PyArray2<f64>,
+    &'py PyArray2<f64>,
+    &'py PyArray2<f64>,
+    &'py PyArray2<f64>,
+)> {
+    let structure = batch_structure(model)?;
+    let n_parameters = parameters.as_array();
+    let n_rainfall = rainfall.as_array();
     let n_evap = evapotranspiration.as_array();
     let n_states = states.as_array();
     let n_uh1 = uh1.as_array();
     let n_uh2 = uh2.as_array();
-    let (states, uh1, uh2, flow) = gr4h::gr4h(&v_param, n_rainfall, n_evap, n_states, n_uh1, n_uh2);
-    (
+
+    let n = n_parameters.nrows();
+    if n_parameters.ncols() != structure.n_parameters()
+        || n_states.ncols() != structure.n_states()
+        || n_rainfall.dim() != n_evap.dim()
+        || n_rainfall.nrows() != n
+        || n_states.nrows() != n
+        || n_uh1.nrows() != n
+        || n_uh2.nrows() != n
+    {
+        return Err(PyValueError::new_err(
+            "Inconsistent shapes of batch parameters, inputs and states",
+        ));
+    }
+
+    let (states, uh1, uh2, flow) = py.allow_threads(|| {
+        batch::run_batch(
+            structure,
+            n_parameters,
+            n_rainfall,
+            n_evap,
+            n_states,
+            n_uh1,
+            n_uh2,
+            fast,
+        )
+    });
+    Ok((
         states.into_pyarray(py),
         uh1.into_pyarray(py),
         uh2.into_pyarray(py),
         flow.into_pyarray(py),
-    )
+    ))
+}
+
+/// Statistics per time step of the flow of n members (count, mean, variance, then the quantiles at the
+/// probabilities), accumulated while the members are simulated. rainfall and evapotranspiration have one row per
+/// member, or a single row shared by all the members.
+#[pyfunction]
+#[pyo3(signature = (model, parameters, rainfall, evapotranspiration, states, uh1, uh2, probabilities = Vec::new(), low = 1e-4, high = 1e4, n_bins = 400, fast = false))]
+fn summarise_batch<'py>(
+    py: Python<'py>,
+    model: &str,
+    parameters: PyReadonlyArray2<f64>,
+    rainfall: PyReadonlyArray2<f64>,
+    evapotranspiration: PyReadonlyArray2<f64>,
+    states: PyReadonlyArray2<f64>,
+    uh1: PyReadonlyArray2<f64>,
+    uh2: PyReadonlyArray2<f64>,
+    probabilities: Vec<f64>,
+    low: f64,
+    high: f64,
+    n_bins: usize,
+    fast: bool,
+) -> PyResult<&'py PyArray2<f64>> {
+    let structure = batch_structure(model)?;
+    let n_parameters = parameters.as_array();
+    let n_rainfall = rainfall.as_array();
+    let n_evap = evapotranspiration.as_array();
+    let n_states = states.as_array();
+    let n_uh1 = uh1.as_array();
+    let n_uh2 = uh2.as_array();
+
+    let n = n_parameters.nrows();
+    if n_parameters.ncols() != structure.n_parameters()
+        || n_states.ncols() != structure.n_states()
+        || n_rainfall.dim() != n_evap.dim()
+        || (n_rainfall.nrows() != n && n_rainfall.nrows() != 1)
+        || n_states.nrows() != n
+        || n_uh1.nrows() != n
+        || n_uh2.nrows() != n
+    {
+        return Err(PyValueError::new_err(
+            "Inconsistent shapes of batch parameters, inputs and states",
+        ));
+    }
+    if probabilities.iter().any(|p| !(0.0..=1.0).contains(p)) {
+        return Err(PyValueError::new_err("Probabilities should be in [0, 1]"));
+    }
+    if !(low > 0.0 && low < high) || n_bins == 0 {
+        return Err(PyValueError::new_err(
+            "Histogram should verify 0 < low < high and n_bins > 0",
+        ));
+    }
+
+    let values = py.allow_threads(|| {
+        summary::summarise_batch(
+            structure,
+            n_parameters,
+            n_rainfall,
+            n_evap,
+            n_states,
+            n_uh1,
+            n_uh2,
+            &probabilities,
+            summary::Bins::new(low, high, n_bins),
+            fast,
+        )
+    });
+    Ok(values.into_pyarray(py))
+}
+
+/// Equilibrium states of n members : the forcing (one row per member, or a single row shared by all the members) is
+/// simulated in cycles until the stores converge. Returns the states, uh1 and uh2, the number of cycles and the last
+/// relative change of the stores of each member.
+#[pyfunction]
+#[pyo3(signature = (model, parameters, rainfall, evapotranspiration, states, uh1, uh2, tolerance = 1e-3, max_cycles = 50, fast = false))]
+fn spin_up<'py>(
+    py: Python<'py>,
+    model: &str,
+    parameters: PyReadonlyArray2<f64>,
+    rainfall: PyReadonlyArray2<f64>,
+    evapotranspiration: PyReadonlyArray2<f64>,
+    states: PyReadonlyArray2<f64>,
+    uh1: PyReadonlyArray2<f64>,
+    uh2: PyReadonlyArray2<f64>,
+    tolerance: f64,
+    max_cycles: usize,
+    fast: bool,
+) -> PyResult<(
+    &'py PyArray2<f64>,
+    &'py PyArray2<f64>,
+    &'py PyArray2<f64>,
+    &'py PyArray1<i64>,
+    &'py PyArray1<f64>,
+)> {
+    let structure = batch_structure(model)?;
+    let n_parameters = parameters.as_array();
+    let n_rainfall = rainfall.as_array();
+    let n_evap = evapotranspiration.as_array();
+    let n_states = states.as_array();
+    let n_uh1 = uh1.as_array();
+    let n_uh2 = uh2.as_array();
+
+    let n = n_parameters.nrows();
+    if n_parameters.ncols() != structure.n_parameters()
+        || n_states.ncols() != structure.n_states()
+        || n_rainfall.dim() != n_evap.dim()
+        || (n_rainfall.nrows() != n && n_rainfall.nrows() != 1)
+        || n_states.nrows() != n
+        || n_uh1.nrows() != n
+        || n_uh2.nrows() != n
+    {
+        return Err(PyValueError::new_err(
+            "Inconsistent shapes of batch parameters, inputs and states",
+        ));
+    }
+    if !(tolerance >= 0.0) || max_cycles == 0 {
+        return Err(PyValueError::new_err(
+            "Spin-up should verify tolerance >= 0 and max_cycles > 0",
+        ));
+    }
+
+    let (states, uh1, uh2, cycles, changes) = py.allow_threads(|| {
+        spin_up::spin_up(
+            structure,
+            n_parameters,
+            n_rainfall,
+            n_evap,
+            n_states,
+            n_uh1,
+            n_uh2,
+            tolerance,
+            max_cycles,
+            fast,
+        )
+    });
+    let cycles: Vec<i64> = cycles.iter().map(|c| *c as i64).collect();
+    Ok((
+        states.into_pyarray(py),
+        uh1.into_pyarray(py),
+        uh2.into_pyarray(py),
+        cycles.into_pyarray(py),
+        changes.into_pyarray(py),
+    ))
+}
+
+/// Criteria of each parameter set and number of time steps simulated. With a threshold, the simulation of a
+/// parameter set stops as soon as its first criterion can not reach the threshold (see batch::evaluate_batch).
+#[pyfunction]
+#[pyo3(signature = (model, parameters, rainfall, evapotranspiration, observed, states, uh1, uh2, criteria, groups = None, warmup = 0, threshold = None, fast = false))]
+fn evaluate_batch<'py>(
+    py: Python<'py>,
+    model: &str,
+    parameters: PyReadonlyArray2<f64>,
+    rainfall: PyReadonlyArray1<f64>,
+    evapotranspiration: PyReadonlyArray1<f64>,
+    observed: PyReadonlyArray2<f64>,
+    states: PyReadonlyArray2<f64>,
+    uh1: PyReadonlyArray2<f64>,
+    uh2: PyReadonlyArray2<f64>,
+    criteria: Vec<String>,
+    groups: Option<PyReadonlyArray1<i64>>,
+    warmup: usize,
+    threshold: Option<f64>,
+    fast: bool,
+) -> PyResult<(&'py PyArray2<f64>, &'py PyArray1<i64>)> {
+    let structure = batch_structure(model)?;
+    let v_criteria = criteria_list(&criteria)?;
+    if threshold.is_some()
+        && !matches!(
+            v_criteria.first(),
+            Some(
+                criteria::Criterion::Nse | criteria::Criterion::NseLog | criteria::Criterion::Rmse
+            )
+        )
+    {
+        return Err(PyValueError::new_err(
+            "Pruning requires nse, nse_log or rmse as first criterion",
+        ));
+    }
+    let n_parameters = parameters.as_array();
+    let n_rainfall = rainfall.as_array();
+    let n_evap = evapotranspiration.as_array();
+    let n_states = states.as_array();
+    let n_uh1 = uh1.as_array();
+    let n_uh2 = uh2.as_array();
+    let n_observed = observed.as_array();
+    if n_parameters.ncols() != structure.n_parameters()
+        || n_states.ncols() != structure.n_states()
+        || n_states.nrows() != n_parameters.nrows()
+        || (n_uh1.nrows() != n_parameters.nrows() && n_uh1.nrows() != 1)
+        || n_uh2.nrows() != n_uh1.nrows()
+        || n_rainfall.len() != n_evap.len()
+        || n_rainfall.len() != n_observed.ncols()
+    {
+        return Err(PyValueError::new_err(
+            "Inconsistent shapes of batch parameters, inputs, observations and states",
+        ));
+    }
+    // Group of observations of each member, the first one by default
+    let v_groups: Vec<usize> = match &groups {
+        Some(groups) => groups.as_array().iter().map(|g| *g as usize).collect(),
+        None => vec![0; n_parameters.nrows()],
+    };
+    if v_groups.len() != n_parameters.nrows() || v_groups.iter().any(|g| *g >= n_observed.nrows()) {
+        return Err(PyValueError::new_err(
+            "Groups should give the row of the observations of each parameter set",
+        ));
+    }
+    let references: Vec<criteria::Observed> = n_observed
+        .outer_iter()
+        .map(|row| criteria::Observed::new(row.to_vec(), warmup))
+        .collect();
+
+    let (values, steps) = py.allow_threads(|| {
+        batch::evaluate_batch(
+            structure,
+            n_parameters,
+            n_rainfall,
+            n_evap,
+            n_states,
+            n_uh1,
+            n_uh2,
+            &references,
+            &v_groups,
+            &v_criteria,
+            threshold,
+            fast,
+        )
+    });
+    let steps: Vec<i64> = steps.iter().map(|s| *s as i64).collect();
+    Ok((values.into_pyarray(py), steps.into_pyarray(py)))
+}
+
+/// Criteria of a simulated flow against the observations, computed in a single pass (see criteria::evaluate).
+#[pyfunction]
+#[pyo3(signature = (simulated, observed, criteria, warmup = 0))]
+fn evaluate<'py>(
+    py: Python<'py>,
+    simulated: PyReadonlyArray1<f64>,
+    observed: PyReadonlyArray1<f64>,
+    criteria: Vec<String>,
+    warmup: usize,
+) -> PyResult<&'py PyArray1<f64>> {
+    let v_criteria = criteria_list(&criteria)?;
+    let n_simulated = simulated.as_array();
+    let n_observed = observed.as_array();
+    if n_simulated.len() != n_observed.len() {
+        return Err(PyValueError::new_err(
+            "Simulated and observed flows should have the same length",
+        ));
+    }
+    let reference = criteria::Observed::new(n_observed.to_vec(), warmup);
+    let v_simulated = n_simulated.to_vec();
+    let values = criteria::evaluate(&v_criteria, &reference, &v_simulated);
+    Ok(values.into_pyarray(py))
+}
+
+/// Simulation of every donor parameter set on the forcing of every receiver, reduced according to reduction :
+/// "flow" (one row per pair), "criteria" against the receiver observations (one row per pair) or weighted "mean"
+/// over the donors (one row per receiver).
+#[pyfunction]
+#[pyo3(signature = (model, donors, rainfall, evapotranspiration, states, uh1, uh2, reduction, observed = None, criteria = Vec::new(), weights = None, warmup = 0, fast = false))]
+fn regionalise<'py>(
+    py: Python<'py>,
+    model: &str,
+    donors: PyReadonlyArray2<f64>,
+    rainfall: PyReadonlyArray2<f64>,
+    evapotranspiration: PyReadonlyArray2<f64>,
+    states: PyReadonlyArray2<f64>,
+    uh1: PyReadonlyArray1<f64>,
+    uh2: PyReadonlyArray1<f64>,
+    reduction: &str,
+    observed: Option<PyReadonlyArray2<f64>>,
+    criteria: Vec<String>,
+    weights: Option<PyReadonlyArray2<f64>>,
+    warmup: usize,
+    fast: bool,
+) -> PyResult<&'py PyArray2<f64>> {
+    let structure = batch_structure(model)?;
+    let n_donors = donors.as_array();
+    let n_rainfall = rainfall.as_array();
+    let n_evap = evapotranspiration.as_array();
+    let n_states = states.as_array();
+    let n_uh1 = uh1.as_array();
+    let n_uh2 = uh2.as_array();
+    if n_donors.ncols() != structure.n_parameters()
+        || n_states.ncols() != structure.n_states()
+        || n_states.nrows() != n_donors.nrows()
+        || n_rainfall.dim() != n_evap.dim()
+    {
+        return Err(PyValueError::new_err(
+            "Inconsistent shapes of donor parameters, receiver inputs and states",
+        ));
+    }
+
+    let values = match reduction {
+        "flow" => py.allow_threads(|| {
+            regionalisation::regionalise_flow(
+                structure, n_donors, n_rainfall, n_evap, n_states, n_uh1, n_uh2, fast,
+            )
+        }),
+        "criteria" => {
+            let v_criteria = criteria_list(&criteria)?;
+            let observed = observed.ok_or_else(|| {
+                PyValueError::new_err("Criteria reduction requires the receiver observations")
+            })?;
+            let n_observed = observed.as_array();
+            if n_observed.dim() != n_rainfall.dim() {
+                return Err(PyValueError::new_err(
+                    "Observations should have the shape of the receiver inputs",
+                ));
+            }
+            let references: Vec<criteria::Observed> = n_observed
+                .outer_iter()
+                .map(|row| criteria::Observed::new(row.to_vec(), warmup))
+                .collect();
+            py.allow_threads(|| {
+                regionalisation::regionalise_criteria(
+                    structure,
+                    n_donors,
+                    n_rainfall,
+                    n_evap,
+                    n_states,
+                    n_uh1,
+                    n_uh2,
+                    &references,
+                    &v_criteria,
+                    fast,
+                )
+            })
+        }
+        "mean" => {
+            let weights = weights.ok_or_else(|| {
+                PyValueError::new_err("Mean reduction requires the donor weights")
+            })?;
+            let n_weights = weights.as_array();
+            if n_weights.dim() != (n_donors.nrows(), n_rainfall.nrows()) {
+                return Err(PyValueError::new_err(
+                    "Weights should have one row per donor and one column per receiver",
+                ));
+            }
+            py.allow_threads(|| {
+                regionalisation::regionalise_mean(
+                    structure, n_donors, n_rainfall, n_evap, n_states, n_uh1, n_uh2, n_weights,
+                    fast,
+                )
+            })
+        }
+        _ => {
+            return Err(PyValueError::new_err(format!(
+                "Unknown reduction {}",
+                reduction
+            )))
+        }
+    };
+    Ok(values.into_pyarray(py))
+}
+
+/// Hydrological signatures of each flow series (one row per series), followed by the flow duration curve at the
+/// exceedance probabilities.
+#[pyfunction]
+#[pyo3(signature = (flow, signatures, precipitation = None, exceedance = Vec::new(), warmup = 0, alpha = 0.925))]
+fn flow_signatures<'py>(
+    py: Python<'py>,
+    flow: PyReadonlyArray2<f64>,
+    signatures: Vec<String>,
+    precipitation: Option<PyReadonlyArray2<f64>>,
+    exceedance: Vec<f64>,
+    warmup: usize,
+    alpha: f64,
+) -> PyResult<&'py PyArray2<f64>> {
+    let v_signatures = signatures
+        .iter()
+        .map(|name| {
+            signatures::Signature::from_name(name)
+                .ok_or_else(|| PyValueError::new_err(format!("Unknown signature {}", name)))
+        })
+        .collect::<PyResult<Vec<_>>>()?;
+    if exceedance.iter().any(|p| !(0.0..=1.0).contains(p)) {
+        return Err(PyValueError::new_err(
+            "Exceedance probabilities should be in [0, 1]",
+        ));
+    }
+    let n_flow = flow.as_array();
+    let n_precipitation = precipitation.as_ref().map(|p| p.as_array());
+    if let Some(p) = &n_precipitation {
+        if p.ncols() != n_flow.ncols() || (p.nrows() != 1 && p.nrows() != n_flow.nrows()) {
+            return Err(PyValueError::new_err(
+                "Precipitation should have one row, or one row per flow series, of the flow length",
+            ));
+        }
+    } else if v_signatures.contains(&signatures::Signature::RunoffRatio) {
+        return Err(PyValueError::new_err(
+            "Runoff ratio requires the precipitation",
+        ));
+    }
+    let values = py.allow_threads(|| {
+        signatures::compute_all(
+            &v_signatures,
+            n_flow,
+            n_precipitation,
+            &exceedance,
+            warmup,
+            alpha,
+        )
+    });
+    Ok(values.into_pyarray(py))
+}
+
+/// Aggregation of time series (one row per series) over periods, with the reduction ("sum" or "mean") of each
+/// series, see aggregation.rs.
+#[pyfunction]
+fn aggregate<'py>(
+    py: Python<'py>,
+    values: PyReadonlyArray2<f64>,
+    periods: PyReadonlyArray1<i64>,
+    reductions: Vec<String>,
+) -> PyResult<&'py PyArray2<f64>> {
+    let n_values = values.as_array();
+    let (offsets, _) = period_bounds(&Some(periods), "sum", n_values.ncols())?.unwrap();
+    if reductions.len() != n_values.nrows() {
+        return Err(PyValueError::new_err(
+            "Reductions should be given for each series",
+        ));
+    }
+    let v_reductions = reductions
+        .iter()
+        .map(|name| {
+            Reduction::from_name(name)
+                .ok_or_else(|| PyValueError::new_err(format!("Unknown reduction {}", name)))
+        })
+        .collect::<PyResult<Vec<_>>>()?;
+    let out = py.allow_threads(|| aggregation::aggregate_all(n_values, &offsets, &v_reductions));
+    Ok(out.into_pyarray(py))
+}
+
+/// Potential evapotranspiration of each row of temperature (one row per catchment), see pet.rs. days is the day of
+/// the year (1 to 366) of each time step.
+#[pyfunction]
+#[pyo3(signature = (temperature, latitudes, days, formula = "oudin", scale = 1.0))]
+fn evapotranspiration<'py>(
+    py: Python<'py>,
+    temperature: PyReadonlyArray2<f64>,
+    latitudes: Vec<f64>,
+    days: PyReadonlyArray1<i64>,
+    formula: &str,
+    scale: f64,
+) -> PyResult<&'py PyArray2<f64>> {
+    let v_formula = pet::Formula::from_name(formula).ok_or_else(|| {
+        PyValueError::new_err(format!("Unknown evapotranspiration formula {}", formula))
+    })?;
+    let n_temperature = temperature.as_array();
+    if latitudes.len() != n_temperature.nrows()
+        || latitudes.iter().any(|l| !(-90.0..=90.0).contains(l))
+    {
+        return Err(PyValueError::new_err(
+            "Latitudes should be given in [-90, 90] degrees for each temperature series",
+        ));
+    }
+    let n_days = days.as_array();
+    if n_days.len() != n_temperature.ncols() || n_days.iter().any(|d| *d < 1 || *d > 366) {
+        return Err(PyValueError::new_err(
+            "Days of the year should be in [1, 366], one per time step",
+        ));
+    }
+    let v_days: Vec<usize> = n_days.iter().map(|d| (*d - 1) as usize).collect();
+    let values =
+        py.allow_threads(|| pet::compute_all(v_formula, n_temperature, &latitudes, &v_days, scale));
+    Ok(values.into_pyarray(py))
+}
+
+/// Simulation of a long series by consecutive blocks, the states being kept in the extension between blocks.
+#[pyclass(name = "ChunkedRun")]
+struct ChunkedRunPy {
+    inner: chunked::ChunkedRun,
+}
+
+#[pymethods]
+impl ChunkedRunPy {
+    #[new]
+    #[pyo3(signature = (model, parameters, states, uh1, uh2, fast = false))]
+    fn new(
+        model: &str,
+        parameters: &PyList,
+        states: PyReadonlyArray1<f64>,
+        uh1: PyReadonlyArray1<f64>,
+        uh2: PyReadonlyArray1<f64>,
+        fast: bool,
+    ) -> PyResult<Self> {
+        let structure = match batch::Structure::from_name(model) {
+            Some(structure) => structure,
+            None => {
+                return Err(PyValueError::new_err(format!(
+                    "Chunked runs are not available for model {}",
+                    model
+                )))
+            }
+        };
+        let v_param = parameters.extract::<Vec<f64>>()?;
+        if v_param.len() != structure.n_parameters() || states.len() != structure.n_states() {
+            return Err(PyValueError::new_err(
+                "Inconsistent number of parameters or states",
+            ));
+        }
+        Ok(ChunkedRunPy {
+            inner: chunked::ChunkedRun::new(
+                structure,
+                v_param,
+                states.as_array().to_owned(),
+                uh1.as_array().to_owned(),
+                uh2.as_array().to_owned(),
+                fast,
+            ),
+        })
+    }
+
+    /// Simulate the next block and write the flow in out, of the same length as the inputs.
+    fn run_block(
+        &mut self,
+        py: Python<'_>,
+        rainfall: PyReadonlyArray1<f64>,
+        evapotranspiration: PyReadonlyArray1<f64>,
+        mut out: PyReadwriteArray1<f64>,
+    ) -> PyResult<()> {
+        if rainfall.len() != evapotranspiration.len() || rainfall.len() != out.len() {
+            return Err(PyValueError::new_err(
+                "Inputs and output blocks should have the same length",
+            ));
+        }
+        let n_rainfall = rainfall.as_array();
+        let n_evap = evapotranspiration.as_array();
+        let n_out = out.as_array_mut();
+        let inner = &mut self.inner;
+        py.allow_threads(|| inner.run_block(n_rainfall, n_evap, n_out));
+        Ok(())
+    }
+
+    /// Return the current stores levels and unit hydrographs.
+    fn get_states<'py>(
+        &self,
+        py: Python<'py>,
+    ) -> (&'py PyArray1<f64>, &'py PyArray1<f64>, &'py PyArray1<f64>) {
+        (
+            self.inner.states.clone().into_pyarray(py),
+            self.inner.uh1.clone().into_pyarray(py),
+            self.inner.uh2.clone().into_pyarray(py),
+        )
+    }
+
+    /// Number of steps simulated so far.
+    #[getter]
+    fn steps(&self) -> usize {
+        self.inner.steps
+    }
+}
+
+#[pyfunction]
+fn profiling_enable(enabled: bool) {
+    profiling::set_enabled(enabled);
+}
+
+#[pyfunction]
+fn profiling_reset() {
+    profiling::reset();
+}
+
+#[pyfunction]
+fn profiling_counters(py: Python<'_>) -> PyResult<&PyDict> {
+    let counters = PyDict::new(py);
+    for (name, kernel) in profiling::kernels().iter() {
+        let entry = PyDict::new(py);
+        entry.set_item("calls", kernel.calls.load(Ordering::Relaxed))?;
+        entry.set_item("steps", kernel.steps.load(Ordering::Relaxed))?;
+        entry.set_item("uh_init_ns", kernel.uh_init_ns.load(Ordering::Relaxed))?;
+        entry.set_item("loop_ns", kernel.loop_ns.load(Ordering::Relaxed))?;
+        entry.set_item(
+            "bytes_allocated",
+            kernel.bytes_allocated.load(Ordering::Relaxed),
+        )?;
+        counters.set_item(*name, entry)?;
+    }
+    Ok(counters)
 }
 
 /// A Python module implemented in Rust.
@@ -173,5 +1069,18 @@ fn _hydrogr(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(gr5j_py, m)?)?;
     m.add_function(wrap_pyfunction!(gr6j_py, m)?)?;
     m.add_function(wrap_pyfunction!(gr4h_py, m)?)?;
+    m.add_function(wrap_pyfunction!(run_batch, m)?)?;
+    m.add_function(wrap_pyfunction!(summarise_batch, m)?)?;
+    m.add_function(wrap_pyfunction!(spin_up, m)?)?;
+    m.add_function(wrap_pyfunction!(evaluate_batch, m)?)?;
+    m.add_function(wrap_pyfunction!(evaluate, m)?)?;
+    m.add_function(wrap_pyfunction!(regionalise, m)?)?;
+    m.add_function(wrap_pyfunction!(flow_signatures, m)?)?;
+    m.add_function(wrap_pyfunction!(aggregate, m)?)?;
+    m.add_function(wrap_pyfunction!(evapotranspiration, m)?)?;
+    m.add_class::<ChunkedRunPy>()?;
+    m.add_function(wrap_pyfunction!(profiling_enable, m)?)?;
+    m.add_function(wrap_pyfunction!(profiling_reset, m)?)?;
+    m.add_function(wrap_pyfunction!(profiling_counters, m)?)?;
     Ok(())
 }
@@ -0,0 +1,100 @@
+// Elementary functions used in the model loops. Kernels are generic over the precision so that each variant is
+// compiled into its own specialised loop, without any runtime branching.
+
+pub trait Precision {
+    fn tanh(x: f64) -> f64;
+    // x^4
+    fn pow4(x: f64) -> f64;
+    // x^0.25
+    fn root4(x: f64) -> f64;
+    // x^3.5, for x >= 0
+    fn pow3_5(x: f64) -> f64;
+}
+
+/// Reference implementation, based on the standard library functions.
+pub struct Reference;
+
+impl Precision for Reference {
+    #[inline(always)]
+    fn tanh(x: f64) -> f64 {
+        x.tanh()
+    }
+
+    #[inline(always)]
+    fn pow4(x: f64) -> f64 {
+        x.powf(4.0)
+    }
+
+    #[inline(always)]
+    fn root4(x: f64) -> f64 {
+        x.powf(0.25)
+    }
+
+    #[inline(always)]
+    fn pow3_5(x: f64) -> f64 {
+        x.powf(3.5)
+    }
+}
+
+/// Fast implementation, replacing the generic power functions by multiplications and square roots and the
+/// hyperbolic tangent by a single exponential. Relative error stays within a few ulps of the reference.
+pub struct Fast;
+
+impl Precision for Fast {
+    #[inline(always)]
+    fn tanh(x: f64) -> f64 {
+        let e = (2.0 * x).exp_m1();
+        e / (e + 2.0)
+    }
+
+    #[inline(always)]
+    fn pow4(x: f64) -> f64 {
+        let x2 = x * x;
+        x2 * x2
+    }
+
+    #[inline(always)]
+    fn root4(x: f64) -> f64 {
+        x.sqrt().sqrt()
+    }
+
+    #[inline(always)]
+    fn pow3_5(x: f64) -> f64 {
+        x * x * x * x.sqrt()
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn relative_error(fast: f64, reference: f64) -> f64 {
+        if reference == 0.0 {
+            fast.abs()
+        } else {
+            ((fast - reference) / reference).abs()
+        }
+    }
+
+    #[test]
+    fn test_fast_precision_bounded_error() {
+        let mut max_error: f64 = 0.0;
+        for i in 0..=10000 {
+            // Range of the scaled rainfall and of the store filling rates :
+            let x = 13.0 * (i as f64) / 10000.0;
+            max_error = max_error.max(relative_error(Fast::tanh(x), Reference::tanh(x)));
+            let x = 2.0 * (i as f64) / 10000.0;
+            max_error = max_error.max(relative_error(Fast::pow4(x), Reference::pow4(x)));
+            max_error = max_error.max(relative_error(Fast::pow3_5(x), Reference::pow3_5(x)));
+            let x = 1.0 + 100.0 * (i as f64) / 10000.0;
+            max_error = max_error.max(relative_error(Fast::root4(x), Reference::root4(x)));
+        }
+        assert!(max_error < 1e-14, "max relative error : {}", max_error);
+    }
+
+    #[test]
+    fn test_fast_tanh_limits() {
+        assert_eq!(Fast::tanh(0.0), 0.0);
+        assert_eq!(Fast::tanh(13.0), Reference::tanh(13.0));
+    }
+}
@@ -0,0 +1,81 @@
+use std::thread;
+
+// Minimal data parallelism on top of scoped threads : items are split in contiguous chunks, one per thread.
+// The number of threads is given by the HYDROGR_NUM_THREADS environment variable, or by the available parallelism.
+
+pub fn num_threads() -> usize {
+    if let Ok(value) = std::env::var("HYDROGR_NUM_THREADS") {
+        if let Ok(n) = value.trim().parse::<usize>() {
+            if n > 0 {
+                return n;
+            }
+        }
+    }
+    thread::available_parallelism()
+        .map(|n| n.get())
+        .unwrap_or(1)
+}
+
+/// Call f(index, item) for each item, in parallel.
+pub fn for_each_mut<T, F>(items: &mut [T], f: F)
+where
+    T: Send,
+    F: Fn(usize, &mut T) + Sync,
+{
+    let n = items.len();
+    let n_threads = num_threads().min(n);
+    if n_threads <= 1 {
+        for (i, item) in items.iter_mut().enumerate() {
+            f(i, item);
+        }
+        return;
+    }
+
+    let chunk_size = (n + n_threads - 1) / n_threads;
+    let f = &f;
+    thread::scope(|scope| {
+        for (c, chunk) in items.chunks_mut(chunk_size).enumerate() {
+            scope.spawn(move || {
+                for (j, item) in chunk.iter_mut().enumerate() {
+                    f(c * chunk_size + j, item);
+                }
+            });
+        }
+    });
+}
+
+/// Return [f(0), f(1), ..., f(n - 1)], computed in parallel.
+pub fn map<R, F>(n: usize, f: F) -> Vec<R>
+where
+    R: Send,
+    F: Fn(usize) -> R + Sync,
+{
+    let mut results: Vec<Option<R>> = (0..n).map(|_| None).collect();
+    for_each_mut(&mut results, |i, result| *result = Some(f(i)));
+    results.into_iter().map(|result| result.unwrap()).collect()
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_map() {
+        let results = map(1000, |i| 2 * i);
+        assert_eq!(results.len(), 1000);
+        for (i, result) in results.iter().enumerate() {
+            assert_eq!(*result, 2 * i);
+        }
+    }
+
+    #[test]
+    fn test_for_each_mut() {
+        let mut items = vec![0usize; 17];
+        for_each_mut(&mut items, |i, item| *item = i);
+        assert_eq!(items, (0..17).collect::<Vec<usize>>());
+
+        let mut empty: Vec<usize> = vec![];
+        for_each_mut(&mut empty, |i, item| *item = i);
+        assert!(empty.is_empty());
+    }
+}
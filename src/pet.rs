@@ -0,0 +1,181 @@
+use super::parallel;
+use ndarray::{Array2, ArrayView2};
+use std::collections::BTreeMap;
+use std::f64::consts::PI;
+use std::sync::{Arc, Mutex};
+
+// Potential evapotranspiration from the air temperature, for many catchments at once. The extraterrestrial radiation
+// and the day length only depend on the latitude and the day of the year : they are tabulated once per latitude for
+// the 366 days of the year, and the tables are cached for the lifetime of the process, so that repeated jobs on the
+// same catchments only look them up.
+
+/// Solar constant [MJ m-2 min-1].
+const SOLAR_CONSTANT: f64 = 0.0820;
+/// Latent heat of vaporisation [MJ kg-1] and water density [kg m-3] (FAO-56).
+const LATENT_HEAT: f64 = 2.45;
+const WATER_DENSITY: f64 = 1000.0;
+
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub enum Formula {
+    Oudin,
+    Hamon,
+}
+
+impl Formula {
+    pub fn from_name(name: &str) -> Option<Formula> {
+        match name {
+            "oudin" => Some(Formula::Oudin),
+            "hamon" => Some(Formula::Hamon),
+            _ => None,
+        }
+    }
+}
+
+/// Extraterrestrial radiation [MJ m-2 d-1] and day length [h] of each day of the year (index 0 for the 1st of
+/// January, 365 for the 31st of December of a leap year), at a latitude (FAO-56, equations 21 to 25 and 34).
+pub struct Table {
+    pub radiation: Vec<f64>,
+    pub day_length: Vec<f64>,
+}
+
+impl Table {
+    pub fn new(latitude: f64) -> Table {
+        let phi = latitude.to_radians();
+        let mut radiation = Vec::with_capacity(366);
+        let mut day_length = Vec::with_capacity(366);
+        for day in 1..367 {
+            let angle = 2.0 * PI * day as f64 / 365.0;
+            let distance = 1.0 + 0.033 * angle.cos();
+            let declination = 0.409 * (angle - 1.39).sin();
+            // Sunset hour angle, polar days and nights included
+            let omega = (-phi.tan() * declination.tan()).clamp(-1.0, 1.0).acos();
+            radiation.push(
+                24.0 * 60.0 / PI
+                    * SOLAR_CONSTANT
+                    * distance
+                    * (omega * phi.sin() * declination.sin()
+                        + phi.cos() * declination.cos() * omega.sin()),
+            );
+            day_length.push(24.0 / PI * omega);
+        }
+        Table {
+            radiation,
+            day_length,
+        }
+    }
+}
+
+static TABLES: Mutex<BTreeMap<u64, Arc<Table>>> = Mutex::new(BTreeMap::new());
+
+/// Table of a latitude, computed on first use.
+pub fn table(latitude: f64) -> Arc<Table> {
+    let mut tables = TABLES.lock().unwrap();
+    tables
+        .entry(latitude.to_bits())
+        .or_insert_with(|| Arc::new(Table::new(latitude)))
+        .clone()
+}
+
+/// Number of cached tables.
+pub fn cached_tables() -> usize {
+    TABLES.lock().unwrap().len()
+}
+
+/// Daily potential evapotranspiration [mm d-1] at a temperature [°C], on a day of the table.
+#[inline(always)]
+pub fn evapotranspiration(formula: Formula, table: &Table, day: usize, temperature: f64) -> f64 {
+    match formula {
+        // Oudin et al. (2005) : Re / (lambda rho) (T + 5) / 100 [m d-1], zero below -5 °C
+        Formula::Oudin => {
+            if temperature + 5.0 > 0.0 {
+                1000.0 * table.radiation[day] / (LATENT_HEAT * WATER_DENSITY) * (temperature + 5.0)
+                    / 100.0
+            } else if temperature.is_nan() {
+                f64::NAN
+            } else {
+                0.0
+            }
+        }
+        // Hamon (1961), as in Lu et al. (2005) : 0.1651 Ld rho_sat, Ld being the day length in units of 12 hours
+        // and rho_sat the saturated vapour density [g m-3]
+        Formula::Hamon => {
+            let saturation = 6.108 * (17.26939 * temperature / (temperature + 237.3)).exp();
+            let density = 216.7 * saturation / (temperature + 273.3);
+            0.1651 * table.day_length[day] / 12.0 * density
+        }
+    }
+}
+
+/// Potential evapotranspiration of each row of temperature (one row per catchment, at the latitude of the row), days
+/// being the day of the year of each time step (0 for the 1st of January), shared by all the rows. The daily values
+/// are multiplied by scale (length of the time step in days, for sub-daily series).
+pub fn compute_all(
+    formula: Formula,
+    temperature: ArrayView2<'_, f64>,
+    latitudes: &[f64],
+    days: &[usize],
+    scale: f64,
+) -> Array2<f64> {
+    let rows = parallel::map(temperature.nrows(), |i| {
+        let table = table(latitudes[i]);
+        temperature
+            .row(i)
+            .iter()
+            .zip(days.iter())
+            .map(|(t, day)| evapotranspiration(formula, &table, *day, *t) * scale)
+            .collect::<Vec<f64>>()
+    });
+
+    let mut out = Array2::zeros((rows.len(), days.len()));
+    for (i, row) in rows.iter().enumerate() {
+        for (k, value) in row.iter().enumerate() {
+            out[[i, k]] = *value;
+        }
+    }
+    out
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_radiation() {
+        // FAO-56 example 8 : 20°S, 3rd of September (day 246), Ra = 32.2 MJ m-2 d-1
+        let table = Table::new(-20.0);
+        assert!((table.radiation[245] - 32.2).abs() < 0.05);
+        // Equinox day length close to 12 hours, polar night and day
+        assert!((Table::new(45.0).day_length[79] - 12.0).abs() < 0.1);
+        assert_eq!(Table::new(80.0).radiation[0], 0.0);
+        assert_eq!(Table::new(80.0).day_length[171], 24.0);
+    }
+
+    #[test]
+    fn test_evapotranspiration() {
+        let reference = Table::new(48.0);
+        let oudin = evapotranspiration(Formula::Oudin, &reference, 180, 20.0);
+        assert!((oudin - reference.radiation[180] / 2.45 * 0.25).abs() < 1e-12);
+        assert_eq!(
+            evapotranspiration(Formula::Oudin, &reference, 10, -6.0),
+            0.0
+        );
+        assert!(evapotranspiration(Formula::Oudin, &reference, 10, f64::NAN).is_nan());
+        // Hamon : about 4 mm/d at 20 °C with 16 hours of daylight
+        let hamon = evapotranspiration(Formula::Hamon, &reference, 171, 20.0);
+        assert!(hamon > 3.5 && hamon < 4.5, "{}", hamon);
+
+        // Cached tables are shared
+        let temperature =
+            Array2::from_shape_vec((2, 3), vec![10.0, 12.0, 14.0, 10.0, 12.0, 14.0]).unwrap();
+        let values = compute_all(
+            Formula::Oudin,
+            temperature.view(),
+            &[48.0, 48.0],
+            &[0, 1, 2],
+            1.0,
+        );
+        assert_eq!(values.row(0).to_vec(), values.row(1).to_vec());
+        assert!(Arc::ptr_eq(&table(48.0), &table(48.0)));
+        assert!(cached_tables() >= 1);
+    }
+}
@@ -0,0 +1,133 @@
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
+use std::time::Instant;
+
+// Opt-in instrumentation of the kernels. When disabled, the cost is a single relaxed atomic load per
+// timer, no clock is read and no counter is touched.
+static ENABLED: AtomicBool = AtomicBool::new(false);
+
+pub fn set_enabled(enabled: bool) {
+    ENABLED.store(enabled, Ordering::Relaxed);
+}
+
+#[inline]
+pub fn is_enabled() -> bool {
+    ENABLED.load(Ordering::Relaxed)
+}
+
+pub struct Timer(Option<Instant>);
+
+impl Timer {
+    #[inline]
+    pub fn start() -> Timer {
+        if is_enabled() {
+            Timer(Some(Instant::now()))
+        } else {
+            Timer(None)
+        }
+    }
+
+    #[inline]
+    pub fn elapsed_ns(&self) -> Option<u64> {
+        self.0.map(|start| start.elapsed().as_nanos() as u64)
+    }
+}
+
+pub struct KernelCounters {
+    pub calls: AtomicU64,
+    pub steps: AtomicU64,
+    pub uh_init_ns: AtomicU64,
+    pub loop_ns: AtomicU64,
+    pub bytes_allocated: AtomicU64,
+}
+
+impl KernelCounters {
+    const fn new() -> KernelCounters {
+        KernelCounters {
+            calls: AtomicU64::new(0),
+            steps: AtomicU64::new(0),
+            uh_init_ns: AtomicU64::new(0),
+            loop_ns: AtomicU64::new(0),
+            bytes_allocated: AtomicU64::new(0),
+        }
+    }
+
+    /// Record one kernel call. Nothing is recorded if the main loop timer was started while disabled.
+    #[inline]
+    pub fn record(
+        &self,
+        uh_init_ns: Option<u64>,
+        loop_ns: Option<u64>,
+        steps: usize,
+        bytes_allocated: usize,
+    ) {
+        if let Some(loop_ns) = loop_ns {
+            self.calls.fetch_add(1, Ordering::Relaxed);
+            self.steps.fetch_add(steps as u64, Ordering::Relaxed);
+            self.uh_init_ns
+                .fetch_add(uh_init_ns.unwrap_or(0), Ordering::Relaxed);
+            self.loop_ns.fetch_add(loop_ns, Ordering::Relaxed);
+            self.bytes_allocated
+                .fetch_add(bytes_allocated as u64, Ordering::Relaxed);
+        }
+    }
+
+    fn reset(&self) {
+        self.calls.store(0, Ordering::Relaxed);
+        self.steps.store(0, Ordering::Relaxed);
+        self.uh_init_ns.store(0, Ordering::Relaxed);
+        self.loop_ns.store(0, Ordering::Relaxed);
+        self.bytes_allocated.store(0, Ordering::Relaxed);
+    }
+}
+
+pub static GR1A: KernelCounters = KernelCounters::new();
+pub static GR2M: KernelCounters = KernelCounters::new();
+pub static GR4J: KernelCounters = KernelCounters::new();
+pub static GR5J: KernelCounters = KernelCounters::new();
+pub static GR6J: KernelCounters = KernelCounters::new();
+pub static GR4H: KernelCounters = KernelCounters::new();
+
+pub fn kernels() -> [(&'static str, &'static KernelCounters); 6] {
+    [
+        ("gr1a", &GR1A),
+        ("gr2m", &GR2M),
+        ("gr4j", &GR4J),
+        ("gr5j", &GR5J),
+        ("gr6j", &GR6J),
+        ("gr4h", &GR4H),
+    ]
+}
+
+pub fn reset() {
+    for (_name, counters) in kernels().iter() {
+        counters.reset();
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_disabled_timer_records_nothing() {
+        let counters = KernelCounters::new();
+        let timer = Timer(None);
+        counters.record(None, timer.elapsed_ns(), 10, 80);
+        assert_eq!(counters.calls.load(Ordering::Relaxed), 0);
+        assert_eq!(counters.steps.load(Ordering::Relaxed), 0);
+    }
+
+    #[test]
+    fn test_enabled_timer_records() {
+        let counters = KernelCounters::new();
+        let timer = Timer(Some(Instant::now()));
+        counters.record(Some(5), timer.elapsed_ns(), 10, 80);
+        counters.record(None, timer.elapsed_ns(), 10, 80);
+        assert_eq!(counters.calls.load(Ordering::Relaxed), 2);
+        assert_eq!(counters.steps.load(Ordering::Relaxed), 20);
+        assert_eq!(counters.uh_init_ns.load(Ordering::Relaxed), 5);
+        assert_eq!(counters.bytes_allocated.load(Ordering::Relaxed), 160);
+        counters.reset();
+        assert_eq!(counters.calls.load(Ordering::Relaxed), 0);
+    }
+}
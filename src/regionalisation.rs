@@ -0,0 +1,279 @@
+use super::batch::{run_member, Structure};
+use super::criteria::{self, Criterion, Observed};
+use super::parallel;
+use ndarray::{Array2, ArrayView1, ArrayView2};
+
+// Regionalisation by parameter transfer : the parameters of n donor catchments are run on the forcing of m receiver
+// catchments. The n × m simulations are run in parallel and reduced as soon as they are computed (criteria against
+// the receiver observations, or weighted mean over the donors), so that the n × m × T flow tensor is only built when
+// it is explicitly requested.
+
+/// Simulate the donor i on the forcing of the receiver j.
+fn run_pair(
+    structure: Structure,
+    donors: ArrayView2<'_, f64>,
+    rainfall: ArrayView2<'_, f64>,
+    evapotranspiration: ArrayView2<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView1<'_, f64>,
+    uh2: ArrayView1<'_, f64>,
+    i: usize,
+    j: usize,
+    fast: bool,
+) -> Vec<f64> {
+    let (_, _, _, flow) = run_member(
+        structure,
+        &donors.row(i).to_vec(),
+        rainfall.row(j),
+        evapotranspiration.row(j),
+        states.row(i),
+        uh1.view(),
+        uh2.view(),
+        fast,
+    );
+    flow.to_vec()
+}
+
+/// Flow of every donor × receiver pair, one row per pair (donor i, receiver j at row i * m + j).
+pub fn regionalise_flow(
+    structure: Structure,
+    donors: ArrayView2<'_, f64>,
+    rainfall: ArrayView2<'_, f64>,
+    evapotranspiration: ArrayView2<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView1<'_, f64>,
+    uh2: ArrayView1<'_, f64>,
+    fast: bool,
+) -> Array2<f64> {
+    let m = rainfall.nrows();
+    let mut out = Array2::zeros((donors.nrows() * m, rainfall.ncols()));
+    let mut rows: Vec<_> = out.outer_iter_mut().collect();
+    parallel::for_each_mut(&mut rows, |p, row| {
+        let flow = run_pair(
+            structure,
+            donors.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            p / m,
+            p % m,
+            fast,
+        );
+        for (value, simulated) in row.iter_mut().zip(flow.iter()) {
+            *value = *simulated;
+        }
+    });
+    drop(rows);
+    out
+}
+
+/// Criteria of every donor × receiver pair against the receiver observations, one row per pair (donor i, receiver j
+/// at row i * m + j).
+pub fn regionalise_criteria(
+    structure: Structure,
+    donors: ArrayView2<'_, f64>,
+    rainfall: ArrayView2<'_, f64>,
+    evapotranspiration: ArrayView2<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView1<'_, f64>,
+    uh2: ArrayView1<'_, f64>,
+    observed: &[Observed],
+    criteria: &[Criterion],
+    fast: bool,
+) -> Array2<f64> {
+    let m = rainfall.nrows();
+    let values = parallel::map(donors.nrows() * m, |p| {
+        let flow = run_pair(
+            structure,
+            donors.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            p / m,
+            p % m,
+            fast,
+        );
+        criteria::evaluate(criteria, &observed[p % m], &flow)
+    });
+
+    let mut out = Array2::zeros((values.len(), criteria.len()));
+    for (p, row) in values.iter().enumerate() {
+        for (k, value) in row.iter().enumerate() {
+            out[[p, k]] = *value;
+        }
+    }
+    out
+}
+
+/// Weighted mean over the donors of the flow of each receiver, one row per receiver. weights is (n, m), donors with
+/// a zero weight are not simulated. The weights of each receiver should have a positive sum.
+pub fn regionalise_mean(
+    structure: Structure,
+    donors: ArrayView2<'_, f64>,
+    rainfall: ArrayView2<'_, f64>,
+    evapotranspiration: ArrayView2<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView1<'_, f64>,
+    uh2: ArrayView1<'_, f64>,
+    weights: ArrayView2<'_, f64>,
+    fast: bool,
+) -> Array2<f64> {
+    let n = donors.nrows();
+    let m = rainfall.nrows();
+    let n_steps = rainfall.ncols();
+    // Donors are split in chunks so that there are enough tasks for the threads when there are few receivers, each
+    // task accumulating the weighted flow of its chunk.
+    let n_chunks = ((parallel::num_threads() + m - 1) / m.max(1))
+        .max(1)
+        .min(n.max(1));
+    let chunk_size = (n + n_chunks - 1) / n_chunks;
+    let sums = parallel::map(m * n_chunks, |task| {
+        let j = task / n_chunks;
+        let start = (task % n_chunks) * chunk_size;
+        let mut sum = vec![0.0; n_steps];
+        for i in start..(start + chunk_size).min(n) {
+            let weight = weights[[i, j]];
+            if weight == 0.0 {
+                continue;
+            }
+            let flow = run_pair(
+                structure,
+                donors.view(),
+                rainfall.view(),
+                evapotranspiration.view(),
+                states.view(),
+                uh1.view(),
+                uh2.view(),
+                i,
+                j,
+                fast,
+            );
+            for (total, value) in sum.iter_mut().zip(flow.iter()) {
+                *total += weight * value;
+            }
+        }
+        sum
+    });
+
+    let mut out = Array2::zeros((m, n_steps));
+    for j in 0..m {
+        let total_weight: f64 = (0..n).map(|i| weights[[i, j]]).sum();
+        for c in 0..n_chunks {
+            for (t, value) in sums[j * n_chunks + c].iter().enumerate() {
+                out[[j, t]] += value / total_weight;
+            }
+        }
+    }
+    out
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_regionalise() {
+        let donors = Array2::from_shape_vec(
+            (3, 4),
+            vec![
+                257.238, 1.012, 88.235, 2.208, 300.0, -1.0, 50.0, 1.5, 150.0, 0.5, 120.0, 3.1,
+            ],
+        )
+        .unwrap();
+        let n_steps = 120;
+        let mut rainfall = Array2::zeros((2, n_steps));
+        let mut evapotranspiration = Array2::zeros((2, n_steps));
+        for j in 0..2 {
+            for t in 0..n_steps {
+                rainfall[[j, t]] = ((t * (j + 3)) % 7) as f64 * 2.5;
+                evapotranspiration[[j, t]] = 0.5 + 0.2 * j as f64;
+            }
+        }
+        let mut states = Array2::zeros((3, 2));
+        for i in 0..3 {
+            states[[i, 0]] = 0.3 * donors[[i, 0]];
+            states[[i, 1]] = 0.5 * donors[[i, 2]];
+        }
+        let uh1 = Array2::zeros((1, 20));
+        let uh2 = Array2::zeros((1, 40));
+        let pair = |i: usize, j: usize| {
+            run_pair(
+                Structure::Gr4j,
+                donors.view(),
+                rainfall.view(),
+                evapotranspiration.view(),
+                states.view(),
+                uh1.row(0),
+                uh2.row(0),
+                i,
+                j,
+                false,
+            )
+        };
+
+        let flow = regionalise_flow(
+            Structure::Gr4j,
+            donors.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.row(0),
+            uh2.row(0),
+            false,
+        );
+        for i in 0..3 {
+            for j in 0..2 {
+                assert_eq!(flow.row(i * 2 + j).to_vec(), pair(i, j));
+            }
+        }
+
+        let observed: Vec<Observed> = (0..2)
+            .map(|j| Observed::new(pair(0, j).iter().map(|q| q * 1.1).collect(), 10))
+            .collect();
+        let criteria = [Criterion::Nse, Criterion::Bias];
+        let values = regionalise_criteria(
+            Structure::Gr4j,
+            donors.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.row(0),
+            uh2.row(0),
+            &observed,
+            &criteria,
+            false,
+        );
+        for i in 0..3 {
+            for j in 0..2 {
+                let expected = criteria::evaluate(&criteria, &observed[j], &pair(i, j));
+                assert_eq!(values.row(i * 2 + j).to_vec(), expected);
+            }
+        }
+
+        let weights = Array2::from_shape_vec((3, 2), vec![1.0, 0.0, 2.0, 1.0, 1.0, 1.0]).unwrap();
+        let mean = regionalise_mean(
+            Structure::Gr4j,
+            donors.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.row(0),
+            uh2.row(0),
+            weights.view(),
+            false,
+        );
+        for j in 0..2 {
+            let total: f64 = (0..3).map(|i| weights[[i, j]]).sum();
+            for t in 0..n_steps {
+                let expected: f64 = (0..3)
+                    .map(|i| weights[[i, j]] * pair(i, j)[t] / total)
+                    .sum();
+                assert!((mean[[j, t]] - expected).abs() < 1e-12 * expected.abs().max(1.0));
+            }
+        }
+    }
+}
@@ -0,0 +1,301 @@
+use super::parallel;
+use ndarray::{Array2, ArrayView2};
+use std::cmp::Ordering;
+
+// Hydrological signatures of flow series, computed row by row in parallel. Percentiles are obtained by successive
+// selections (quickselect) on a single copy of the valid values, instead of a full sort per percentile. Time steps
+// where the flow is NaN are ignored.
+
+/// Number of consecutive decreasing time steps from which a period is considered as a recession.
+const RECESSION_LENGTH: usize = 5;
+
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub enum Signature {
+    Mean,
+    Q5,
+    Q95,
+    FdcSlope,
+    BaseflowIndex,
+    RunoffRatio,
+    RecessionConstant,
+}
+
+impl Signature {
+    pub fn from_name(name: &str) -> Option<Signature> {
+        match name {
+            "mean" => Some(Signature::Mean),
+            "q5" => Some(Signature::Q5),
+            "q95" => Some(Signature::Q95),
+            "fdc_slope" => Some(Signature::FdcSlope),
+            "baseflow_index" => Some(Signature::BaseflowIndex),
+            "runoff_ratio" => Some(Signature::RunoffRatio),
+            "recession_constant" => Some(Signature::RecessionConstant),
+            _ => None,
+        }
+    }
+
+    /// Non exceedance probabilities of the flow percentiles required by the signature.
+    fn probabilities(&self) -> &'static [f64] {
+        match self {
+            // Flow exceeded 5 % and 95 % of the time
+            Signature::Q5 => &[0.95],
+            Signature::Q95 => &[0.05],
+            // Slope of the flow duration curve between the 33 % and 66 % exceedance flows (Sawicz et al., 2011)
+            Signature::FdcSlope => &[0.67, 0.34],
+            _ => &[],
+        }
+    }
+}
+
+/// Percentiles of the values at the non exceedance probabilities, with linear interpolation between the order
+/// statistics (as numpy.quantile). The values are reordered in place.
+pub fn quantiles(values: &mut [f64], probabilities: &[f64]) -> Vec<f64> {
+    let n = values.len();
+    let mut out = vec![f64::NAN; probabilities.len()];
+    if n == 0 {
+        return out;
+    }
+    let cmp = |a: &f64, b: &f64| a.partial_cmp(b).unwrap_or(Ordering::Equal);
+    // Percentiles are selected from the highest, each selection leaving the values below it in values[..hi], so that
+    // the next selection only scans that range.
+    let mut order: Vec<usize> = (0..probabilities.len()).collect();
+    order.sort_by(|a, b| cmp(&probabilities[*b], &probabilities[*a]));
+    let mut hi = n;
+    let mut last: Option<(usize, f64, f64)> = None;
+    for k in order {
+        let position = (n - 1) as f64 * probabilities[k];
+        let lo = (position.floor() as usize).min(n - 1);
+        let fraction = position - lo as f64;
+        let (lower, upper) = match last {
+            Some((last_lo, lower, upper)) if last_lo == lo => (lower, upper),
+            _ => {
+                let (lower, right_min) = {
+                    let (_, lower, right) = values[..hi].select_nth_unstable_by(lo, cmp);
+                    let right_min = right.iter().cloned().reduce(f64::min);
+                    (*lower, right_min)
+                };
+                // Next order statistic : minimum of the values above the selected one, or the previous selection
+                let upper = match right_min {
+                    Some(upper) => upper,
+                    None if hi < n => values[hi],
+                    None => lower,
+                };
+                hi = lo;
+                (lower, upper)
+            }
+        };
+        last = Some((lo, lower, upper));
+        out[k] = lower + fraction * (upper - lower);
+    }
+    out
+}
+
+/// One pass of the Lyne and Hollick digital filter, forward or backward, returning the baseflow.
+fn filter_pass(input: &[f64], alpha: f64, backward: bool) -> Vec<f64> {
+    let n = input.len();
+    let index = |i: usize| if backward { n - 1 - i } else { i };
+    let mut baseflow = vec![0.0; n];
+    if n == 0 {
+        return baseflow;
+    }
+    baseflow[index(0)] = input[index(0)];
+    let mut quickflow = 0.0;
+    for i in 1..n {
+        let (t, previous) = (index(i), index(i - 1));
+        quickflow = alpha * quickflow + 0.5 * (1.0 + alpha) * (input[t] - input[previous]);
+        quickflow = quickflow.max(0.0).min(input[t]);
+        baseflow[t] = input[t] - quickflow;
+    }
+    baseflow
+}
+
+/// Baseflow separated by the Lyne and Hollick filter, in three passes (forward, backward, forward) as in Ladson et
+/// al. (2013).
+pub fn baseflow(flow: &[f64], alpha: f64) -> Vec<f64> {
+    let baseflow = filter_pass(flow, alpha, false);
+    let baseflow = filter_pass(&baseflow, alpha, true);
+    filter_pass(&baseflow, alpha, false)
+}
+
+/// Median ratio of the flow to the flow of the previous time step, over the recession periods (flow strictly
+/// decreasing during at least RECESSION_LENGTH time steps).
+fn recession_constant(flow: &[f64]) -> f64 {
+    let mut ratios = Vec::new();
+    let mut period = Vec::new();
+    for t in 1..flow.len() + 1 {
+        let decreasing = t < flow.len() && flow[t] > 0.0 && flow[t] < flow[t - 1];
+        if decreasing {
+            period.push(flow[t] / flow[t - 1]);
+        } else {
+            // NaN flows also end the recession period
+            if period.len() >= RECESSION_LENGTH {
+                ratios.extend_from_slice(&period);
+            }
+            period.clear();
+        }
+    }
+    quantiles(&mut ratios, &[0.5])[0]
+}
+
+/// Signatures of a flow series followed by its flow duration curve at the exceedance probabilities. The first start
+/// time steps are excluded (warm up period).
+pub fn compute(
+    signatures: &[Signature],
+    flow: &[f64],
+    precipitation: Option<&[f64]>,
+    exceedance: &[f64],
+    start: usize,
+    alpha: f64,
+) -> Vec<f64> {
+    let start = start.min(flow.len());
+    let flow = &flow[start..];
+    let mut valid: Vec<f64> = flow.iter().cloned().filter(|q| !q.is_nan()).collect();
+    let total: f64 = valid.iter().sum();
+    let mean = total / valid.len() as f64;
+
+    // All the percentiles in a single multiple selection
+    let mut probabilities: Vec<f64> = signatures
+        .iter()
+        .flat_map(|signature| signature.probabilities().iter().cloned())
+        .collect();
+    probabilities.extend(exceedance.iter().map(|p| 1.0 - p));
+    let percentiles = if probabilities.is_empty() {
+        Vec::new()
+    } else {
+        quantiles(&mut valid, &probabilities)
+    };
+
+    let mut out = Vec::with_capacity(signatures.len() + exceedance.len());
+    let mut next = 0;
+    for signature in signatures {
+        let value = match signature {
+            Signature::Mean => mean,
+            Signature::Q5 | Signature::Q95 => percentiles[next],
+            Signature::FdcSlope => {
+                (percentiles[next].ln() - percentiles[next + 1].ln()) / (0.66 - 0.33)
+            }
+            Signature::BaseflowIndex => {
+                // Missing values are removed from the series before filtering
+                let series: Vec<f64> = flow.iter().cloned().filter(|q| !q.is_nan()).collect();
+                baseflow(&series, alpha).iter().sum::<f64>() / total
+            }
+            Signature::RunoffRatio => {
+                let precipitation = precipitation.and_then(|p| p.get(start..)).unwrap_or(&[]);
+                let (sum_flow, sum_precipitation) = flow
+                    .iter()
+                    .zip(precipitation.iter())
+                    .filter(|(q, p)| !q.is_nan() && !p.is_nan())
+                    .fold((0.0, 0.0), |(sq, sp), (q, p)| (sq + q, sp + p));
+                sum_flow / sum_precipitation
+            }
+            Signature::RecessionConstant => recession_constant(flow),
+        };
+        next += signature.probabilities().len();
+        out.push(value);
+    }
+    out.extend_from_slice(&percentiles[next..]);
+    out
+}
+
+/// Signatures of each row of flow, one row per series. precipitation has one row shared by all the series, or one
+/// row per series.
+pub fn compute_all(
+    signatures: &[Signature],
+    flow: ArrayView2<'_, f64>,
+    precipitation: Option<ArrayView2<'_, f64>>,
+    exceedance: &[f64],
+    start: usize,
+    alpha: f64,
+) -> Array2<f64> {
+    let values = parallel::map(flow.nrows(), |i| {
+        let series = flow.row(i).to_vec();
+        let precipitation = precipitation
+            .as_ref()
+            .map(|p| p.row(if p.nrows() == 1 { 0 } else { i }).to_vec());
+        compute(
+            signatures,
+            &series,
+            precipitation.as_deref(),
+            exceedance,
+            start,
+            alpha,
+        )
+    });
+
+    let mut out = Array2::zeros((values.len(), signatures.len() + exceedance.len()));
+    for (i, row) in values.iter().enumerate() {
+        for (k, value) in row.iter().enumerate() {
+            out[[i, k]] = *value;
+        }
+    }
+    out
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_quantiles() {
+        let values: Vec<f64> = (0..101).map(|i| ((i * 37) % 101) as f64).collect();
+        let probabilities = [0.5, 0.05, 0.95, 0.333, 1.0, 0.0, 0.333];
+        let result = quantiles(&mut values.clone(), &probabilities);
+        let mut sorted = values.clone();
+        sorted.sort_by(|a, b| a.partial_cmp(b).unwrap());
+        for (p, value) in probabilities.iter().zip(result.iter()) {
+            let position = 100.0 * p;
+            let lo = position.floor() as usize;
+            let hi = (lo + 1).min(100);
+            let expected = sorted[lo] + (position - lo as f64) * (sorted[hi] - sorted[lo]);
+            assert!((value - expected).abs() < 1e-12);
+        }
+        assert!(quantiles(&mut [], &[0.5])[0].is_nan());
+        assert_eq!(quantiles(&mut [3.0, 1.0], &[0.5])[0], 2.0);
+    }
+
+    #[test]
+    fn test_signatures() {
+        // Recessions of 8 steps at a constant rate after each peak
+        let mut flow = Vec::new();
+        for _ in 0..10 {
+            flow.push(1.0);
+            flow.push(10.0);
+            for k in 1..9 {
+                flow.push(10.0 * 0.8f64.powi(k));
+            }
+        }
+        let precipitation = vec![2.0; flow.len()];
+        let signatures = [
+            Signature::Mean,
+            Signature::Q95,
+            Signature::BaseflowIndex,
+            Signature::RunoffRatio,
+            Signature::RecessionConstant,
+        ];
+        let values = compute(
+            &signatures,
+            &flow,
+            Some(&precipitation),
+            &[0.0, 1.0],
+            0,
+            0.925,
+        );
+        let mean = flow.iter().sum::<f64>() / flow.len() as f64;
+        assert_eq!(values.len(), 7);
+        assert!((values[0] - mean).abs() < 1e-12);
+        assert!(values[2] > 0.0 && values[2] < 1.0);
+        assert!((values[3] - mean / 2.0).abs() < 1e-12);
+        assert!((values[4] - 0.8).abs() < 1e-12);
+        assert_eq!(values[5], 10.0);
+        let min = flow.iter().cloned().fold(f64::INFINITY, f64::min);
+        assert_eq!(values[6], min);
+
+        // Baseflow is bounded by the flow and a constant flow is all baseflow
+        let separated = baseflow(&flow, 0.925);
+        assert!(separated
+            .iter()
+            .zip(flow.iter())
+            .all(|(b, q)| *b >= 0.0 && b <= q));
+        assert_eq!(baseflow(&[2.0; 10], 0.925), vec![2.0; 10]);
+    }
+}
@@ -0,0 +1,164 @@
+use super::batch::{run_member_into, Structure};
+use super::parallel;
+use ndarray::{Array2, ArrayView2, ArrayViewMut1};
+
+// Spin-up of the model states : a forcing period (a climatological or a repeated year) is simulated again and again,
+// starting each cycle from the states at the end of the previous one, until the stores converge. The equilibrium
+// states replace the arbitrary default states, so that the warm-up period no longer has to be simulated and discarded
+// before each evaluation.
+
+/// Spin up n members. rainfall and evapotranspiration have one row per member, or a single row shared by all the
+/// members. Cycles stop when the largest change of the stores levels over a cycle, relative to the stores capacities,
+/// is below the tolerance, or after max_cycles cycles.
+///
+/// Returns the final states, uh1 and uh2, one row per member, and for each member the number of cycles simulated and
+/// the relative change of its stores over the last cycle.
+pub fn spin_up(
+    structure: Structure,
+    parameters: ArrayView2<'_, f64>,
+    rainfall: ArrayView2<'_, f64>,
+    evapotranspiration: ArrayView2<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView2<'_, f64>,
+    uh2: ArrayView2<'_, f64>,
+    tolerance: f64,
+    max_cycles: usize,
+    fast: bool,
+) -> (Array2<f64>, Array2<f64>, Array2<f64>, Vec<usize>, Vec<f64>) {
+    let n = parameters.nrows();
+    let forcing_row = |i: usize| if rainfall.nrows() == 1 { 0 } else { i };
+    // The members are spun up in place in the rows of the outputs, with one flow buffer per member reused by the cycles
+    let mut out_states = states.to_owned();
+    let mut out_uh1 = uh1.to_owned();
+    let mut out_uh2 = uh2.to_owned();
+    let mut cycles = vec![0; n];
+    let mut changes = vec![f64::INFINITY; n];
+
+    let mut rows: Vec<_> = out_states
+        .outer_iter_mut()
+        .zip(out_uh1.outer_iter_mut())
+        .zip(out_uh2.outer_iter_mut())
+        .zip(cycles.iter_mut().zip(changes.iter_mut()))
+        .map(|(((states, uh1), uh2), (cycles, change))| (states, uh1, uh2, cycles, change))
+        .collect();
+
+    parallel::for_each_mut(
+        &mut rows,
+        |i, (row_states, row_uh1, row_uh2, cycles, change)| {
+            let member = parameters.row(i).to_vec();
+            let capacities: Vec<f64> = structure
+                .capacity_columns()
+                .iter()
+                .map(|column| member[*column])
+                .collect();
+            let mut previous = vec![0.0; row_states.len()];
+            let mut flow = vec![0.0; rainfall.ncols()];
+            while **cycles < max_cycles && !(**change <= tolerance) {
+                for (k, value) in previous.iter_mut().enumerate() {
+                    *value = row_states[k];
+                }
+                run_member_into(
+                    structure,
+                    &member,
+                    rainfall.row(forcing_row(i)),
+                    evapotranspiration.row(forcing_row(i)),
+                    row_states.view_mut(),
+                    row_uh1.view_mut(),
+                    row_uh2.view_mut(),
+                    fast,
+                    ArrayViewMut1::from(&mut flow[..]),
+                );
+                **change = previous
+                    .iter()
+                    .enumerate()
+                    .zip(capacities.iter())
+                    .map(|((k, previous), capacity)| (row_states[k] - previous).abs() / capacity)
+                    .fold(0.0, f64::max);
+                **cycles += 1;
+            }
+        },
+    );
+    drop(rows);
+
+    (out_states, out_uh1, out_uh2, cycles, changes)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_spin_up() {
+        let parameters = Array2::from_shape_vec(
+            (2, 4),
+            vec![257.238, 1.012, 88.235, 2.208, 600.0, -1.0, 150.0, 1.5],
+        )
+        .unwrap();
+        let n_steps = 365;
+        let mut rainfall = Array2::zeros((1, n_steps));
+        let mut evapotranspiration = Array2::zeros((1, n_steps));
+        for t in 0..n_steps {
+            rainfall[[0, t]] = ((t * 3) % 7) as f64 * 1.5;
+            evapotranspiration[[0, t]] = 1.5 + (t as f64 / 58.0).sin();
+        }
+        let mut states = Array2::zeros((2, 2));
+        for i in 0..2 {
+            states[[i, 0]] = 0.3 * parameters[[i, 0]];
+            states[[i, 1]] = 0.5 * parameters[[i, 2]];
+        }
+        let uh1 = Array2::zeros((2, 20));
+        let uh2 = Array2::zeros((2, 40));
+        let (out_states, out_uh1, out_uh2, cycles, changes) = spin_up(
+            Structure::Gr4j,
+            parameters.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            1e-6,
+            200,
+            false,
+        );
+
+        for i in 0..2 {
+            assert!(cycles[i] > 1 && cycles[i] < 200);
+            assert!(changes[i] <= 1e-6);
+            // One more cycle from the equilibrium states leaves them unchanged
+            let mut next_states = out_states.row(i).to_owned();
+            let mut next_uh1 = out_uh1.row(i).to_owned();
+            let mut next_uh2 = out_uh2.row(i).to_owned();
+            let mut flow = vec![0.0; n_steps];
+            run_member_into(
+                Structure::Gr4j,
+                &parameters.row(i).to_vec(),
+                rainfall.row(0),
+                evapotranspiration.row(0),
+                next_states.view_mut(),
+                next_uh1.view_mut(),
+                next_uh2.view_mut(),
+                false,
+                ArrayViewMut1::from(&mut flow[..]),
+            );
+            for k in 0..2 {
+                let capacity = parameters[[i, [0, 2][k]]];
+                assert!((next_states[k] - out_states[[i, k]]).abs() / capacity <= 1e-6);
+            }
+        }
+
+        // A single cycle
+        let (_, _, _, cycles, _) = spin_up(
+            Structure::Gr4j,
+            parameters.view(),
+            rainfall.view(),
+            evapotranspiration.view(),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            0.0,
+            1,
+            false,
+        );
+        assert_eq!(cycles, vec![1, 1]);
+    }
+}
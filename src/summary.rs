@@ -0,0 +1,345 @@
+use super::batch::{run_member_into, Structure};
+use super::parallel;
+use ndarray::{Array1, Array2, ArrayView2, ArrayViewMut1};
+
+// Summary statistics per time step of the flow of a batch (count, mean, variance and quantiles across the members),
+// accumulated as the members are simulated, so that the (n, n_steps) flow matrix is never stored. Members are
+// simulated in parallel by groups, then each group is added to the accumulators, which are split in blocks of time
+// steps, one per thread, so that the threads never update the same accumulator.
+//
+// Quantiles are estimated from histograms over fixed logarithmic bins, as hydrogr.streaming.StreamingQuantiles : the
+// relative error is bounded by the bin width ratio (high / low) ^ (1 / n_bins). The histograms take n_bins u32
+// counts per time step, while the flows of the members take n f64 values : up to n_bins / 2 members, the flows are
+// kept instead and the quantiles are exact (linear interpolation between the order statistics, as numpy.quantile).
+
+/// Number of members simulated per thread between two updates of the accumulators.
+const MEMBERS_PER_THREAD: usize = 4;
+
+/// Logarithmic histogram bins between low and high, values outside falling in the first and last bins.
+#[derive(Clone, Copy)]
+pub struct Bins {
+    log_low: f64,
+    log_width: f64,
+    n_bins: usize,
+}
+
+impl Bins {
+    pub fn new(low: f64, high: f64, n_bins: usize) -> Bins {
+        let log_low = low.ln();
+        Bins {
+            log_low,
+            log_width: (high.ln() - log_low) / n_bins as f64,
+            n_bins,
+        }
+    }
+
+    #[inline]
+    fn index(&self, value: f64) -> usize {
+        let bin = ((value.ln() - self.log_low) / self.log_width).floor();
+        // Zero and negative values (infinite or NaN logarithm) fall in the first bin
+        if bin.is_nan() || bin < 0.0 {
+            0
+        } else {
+            (bin as usize).min(self.n_bins - 1)
+        }
+    }
+}
+
+/// Accumulators of the quantiles of the time steps of a block.
+enum Quantiles {
+    None,
+    /// Histograms of the time steps, n_bins counts each.
+    Histograms(Bins, Vec<u32>),
+    /// Flows of the members at each time step, n_members values each, sorted once all the members are added.
+    Exact(usize, Vec<f64>),
+}
+
+/// Accumulators of a block of time steps.
+struct Block {
+    start: usize,
+    count: Vec<f64>,
+    mean: Vec<f64>,
+    m2: Vec<f64>,
+    minimum: Vec<f64>,
+    maximum: Vec<f64>,
+    quantiles: Quantiles,
+}
+
+impl Block {
+    fn new(start: usize, end: usize, quantiles: &Quantiles) -> Block {
+        let n = end - start;
+        Block {
+            start,
+            count: vec![0.0; n],
+            mean: vec![0.0; n],
+            m2: vec![0.0; n],
+            minimum: vec![f64::INFINITY; n],
+            maximum: vec![f64::NEG_INFINITY; n],
+            quantiles: match quantiles {
+                Quantiles::None => Quantiles::None,
+                Quantiles::Histograms(bins, _) => {
+                    Quantiles::Histograms(*bins, vec![0; n * bins.n_bins])
+                }
+                Quantiles::Exact(n_members, _) => {
+                    Quantiles::Exact(*n_members, vec![f64::NAN; n * n_members])
+                }
+            },
+        }
+    }
+
+    /// Add the flows of a group of members (Welford's update of the mean and of the sum of squared deviations).
+    fn add(&mut self, flows: &[&[f64]]) {
+        for flow in flows {
+            for (k, value) in flow[self.start..self.start + self.count.len()]
+                .iter()
+                .enumerate()
+            {
+                if value.is_nan() {
+                    continue;
+                }
+                self.count[k] += 1.0;
+                let delta = value - self.mean[k];
+                self.mean[k] += delta / self.count[k];
+                self.m2[k] += delta * (value - self.mean[k]);
+                self.minimum[k] = self.minimum[k].min(*value);
+                self.maximum[k] = self.maximum[k].max(*value);
+                match &mut self.quantiles {
+                    Quantiles::None => {}
+                    Quantiles::Histograms(bins, histograms) => {
+                        histograms[k * bins.n_bins + bins.index(*value)] += 1;
+                    }
+                    Quantiles::Exact(n_members, values) => {
+                        values[k * *n_members + self.count[k] as usize - 1] = *value;
+                    }
+                }
+            }
+        }
+    }
+
+    /// Sort the member flows of each time step, before the exact quantiles.
+    fn sort(&mut self) {
+        if let Quantiles::Exact(n_members, values) = &mut self.quantiles {
+            for (k, count) in self.count.iter().enumerate() {
+                values[k * *n_members..k * *n_members + *count as usize]
+                    .sort_unstable_by(|a, b| a.partial_cmp(b).unwrap());
+            }
+        }
+    }
+
+    /// Quantile of the time step k of the block, interpolated within the histogram bins or between the sorted
+    /// member flows.
+    fn quantile(&self, k: usize, probability: f64) -> f64 {
+        if self.count[k] == 0.0 {
+            return f64::NAN;
+        }
+        match &self.quantiles {
+            Quantiles::None => f64::NAN,
+            Quantiles::Histograms(bins, histograms) => {
+                let histogram = &histograms[k * bins.n_bins..(k + 1) * bins.n_bins];
+                let target = probability * self.count[k];
+                // First bin where the cumulated count reaches the target, and position of the target within the bin
+                let mut below = 0.0;
+                let mut bin = 0;
+                while bin < bins.n_bins - 1 && below + (histogram[bin] as f64) < target {
+                    below += histogram[bin] as f64;
+                    bin += 1;
+                }
+                let fraction = if histogram[bin] > 0 {
+                    (target - below) / histogram[bin] as f64
+                } else {
+                    0.0
+                };
+                let value = (bins.log_low + (bin as f64 + fraction) * bins.log_width).exp();
+                value.max(self.minimum[k]).min(self.maximum[k])
+            }
+            Quantiles::Exact(n_members, values) => {
+                let sorted = &values[k * n_members..k * n_members + self.count[k] as usize];
+                let position = probability * (sorted.len() - 1) as f64;
+                let below = position.floor() as usize;
+                let above = (below + 1).min(sorted.len() - 1);
+                sorted[below] + (position - below as f64) * (sorted[above] - sorted[below])
+            }
+        }
+    }
+}
+
+/// Simulate n members and return the statistics of their flow per time step, one row per statistic : count, mean,
+/// variance (population variance), then the quantiles at the probabilities. rainfall and evapotranspiration have
+/// one row per member, or a single row shared by all the members.
+pub fn summarise_batch(
+    structure: Structure,
+    parameters: ArrayView2<'_, f64>,
+    rainfall: ArrayView2<'_, f64>,
+    evapotranspiration: ArrayView2<'_, f64>,
+    states: ArrayView2<'_, f64>,
+    uh1: ArrayView2<'_, f64>,
+    uh2: ArrayView2<'_, f64>,
+    probabilities: &[f64],
+    bins: Bins,
+    fast: bool,
+) -> Array2<f64> {
+    let n = parameters.nrows();
+    let n_steps = rainfall.ncols();
+    let n_threads = parallel::num_threads();
+    // Member flows when they take less memory than the histograms (8 bytes per member against 4 per bin)
+    let quantiles = if probabilities.is_empty() {
+        Quantiles::None
+    } else if 2 * n <= bins.n_bins {
+        Quantiles::Exact(n, Vec::new())
+    } else {
+        Quantiles::Histograms(bins, Vec::new())
+    };
+
+    let block_size = ((n_steps + n_threads - 1) / n_threads).max(1);
+    let mut blocks: Vec<Block> = (0..n_steps)
+        .step_by(block_size)
+        .map(|start| Block::new(start, (start + block_size).min(n_steps), &quantiles))
+        .collect();
+
+    let forcing_row = |i: usize| if rainfall.nrows() == 1 { 0 } else { i };
+    let group_size = n_threads * MEMBERS_PER_THREAD;
+    // Flow and states buffers of the members of a group, reused by the next groups
+    let mut slots: Vec<_> = (0..group_size.min(n))
+        .map(|_| {
+            (
+                vec![0.0; n_steps],
+                Array1::zeros(states.ncols()),
+                Array1::zeros(uh1.ncols()),
+                Array1::zeros(uh2.ncols()),
+            )
+        })
+        .collect();
+    for group_start in (0..n).step_by(group_size) {
+        let group_end = (group_start + group_size).min(n);
+        let group = &mut slots[..group_end - group_start];
+        parallel::for_each_mut(group, |k, (flow, member_states, member_uh1, member_uh2)| {
+            let i = group_start + k;
+            member_states.assign(&states.row(i));
+            member_uh1.assign(&uh1.row(i));
+            member_uh2.assign(&uh2.row(i));
+            run_member_into(
+                structure,
+                &parameters.row(i).to_vec(),
+                rainfall.row(forcing_row(i)),
+                evapotranspiration.row(forcing_row(i)),
+                member_states.view_mut(),
+                member_uh1.view_mut(),
+                member_uh2.view_mut(),
+                fast,
+                ArrayViewMut1::from(&mut flow[..]),
+            );
+        });
+        let flows: Vec<&[f64]> = group.iter().map(|slot| &slot.0[..]).collect();
+        parallel::for_each_mut(&mut blocks, |_, block| block.add(&flows));
+    }
+    parallel::for_each_mut(&mut blocks, |_, block| block.sort());
+
+    let mut out = Array2::zeros((3 + probabilities.len(), n_steps));
+    for block in blocks.iter() {
+        for k in 0..block.count.len() {
+            let t = block.start + k;
+            out[[0, t]] = block.count[k];
+            out[[1, t]] = if block.count[k] > 0.0 {
+                block.mean[k]
+            } else {
+                f64::NAN
+            };
+            out[[2, t]] = if block.count[k] > 0.0 {
+                block.m2[k] / block.count[k]
+            } else {
+                f64::NAN
+            };
+            for (j, probability) in probabilities.iter().enumerate() {
+                out[[3 + j, t]] = block.quantile(k, *probability);
+            }
+        }
+    }
+    out
+}
+
+#[cfg(test)]
+mod tests {
+    use super::super::batch::run_batch;
+    use super::*;
+
+    #[test]
+    fn test_summarise_batch() {
+        let n = 37;
+        let n_steps = 200;
+        let mut parameters = Vec::new();
+        let mut states = Vec::new();
+        for i in 0..n {
+            let x1 = 150.0 + 10.0 * i as f64;
+            let x3 = 40.0 + 3.0 * i as f64;
+            parameters.extend_from_slice(&[x1, 0.5 - 0.05 * i as f64, x3, 1.2 + 0.05 * i as f64]);
+            states.extend_from_slice(&[0.3 * x1, 0.5 * x3]);
+        }
+        let parameters = Array2::from_shape_vec((n, 4), parameters).unwrap();
+        let states = Array2::from_shape_vec((n, 2), states).unwrap();
+        let rainfall: Vec<f64> = (0..n_steps).map(|t| ((t * 7) % 11) as f64).collect();
+        let rainfall = Array2::from_shape_vec((1, n_steps), rainfall).unwrap();
+        let evapotranspiration = Array2::from_shape_vec((1, n_steps), vec![1.5; n_steps]).unwrap();
+        let uh1 = Array2::zeros((n, 20));
+        let uh2 = Array2::zeros((n, 40));
+        let probabilities = [0.1, 0.5, 0.9];
+        // Reference : full flow matrix, the forcing being repeated for each member
+        let repeat = |row: &Array2<f64>| {
+            let values: Vec<f64> = (0..n).flat_map(|_| row.row(0).to_vec()).collect();
+            Array2::from_shape_vec((n, n_steps), values).unwrap()
+        };
+        let (_, _, _, flow) = run_batch(
+            Structure::Gr4j,
+            parameters.view(),
+            repeat(&rainfall).view(),
+            repeat(&evapotranspiration).view(),
+            states.view(),
+            uh1.view(),
+            uh2.view(),
+            false,
+        );
+
+        // Exact quantiles up to n_bins / 2 members, histograms beyond
+        for n_bins in [400, 50] {
+            let summary = summarise_batch(
+                Structure::Gr4j,
+                parameters.view(),
+                rainfall.view(),
+                evapotranspiration.view(),
+                states.view(),
+                uh1.view(),
+                uh2.view(),
+                &probabilities,
+                Bins::new(1e-4, 1e4, n_bins),
+                false,
+            );
+            let ratio = (1e8f64).powf(1.0 / n_bins as f64);
+            for t in 0..n_steps {
+                let mut values: Vec<f64> = (0..n).map(|i| flow[[i, t]]).collect();
+                let mean = values.iter().sum::<f64>() / n as f64;
+                let variance =
+                    values.iter().map(|v| (v - mean) * (v - mean)).sum::<f64>() / n as f64;
+                assert_eq!(summary[[0, t]], n as f64);
+                assert!((summary[[1, t]] - mean).abs() <= 1e-12 * mean.abs().max(1.0));
+                assert!((summary[[2, t]] - variance).abs() <= 1e-10 * variance.max(1.0));
+                values.sort_by(|a, b| a.partial_cmp(b).unwrap());
+                for (j, probability) in probabilities.iter().enumerate() {
+                    let estimate = summary[[3 + j, t]];
+                    if 2 * n <= n_bins {
+                        let position = probability * (n - 1) as f64;
+                        let below = position.floor() as usize;
+                        let expected = values[below]
+                            + (position - below as f64) * (values[below + 1] - values[below]);
+                        assert!((estimate - expected).abs() <= 1e-12 * expected.abs().max(1.0));
+                        continue;
+                    }
+                    // The estimate lies between the order statistics around the probability, within one bin
+                    let lower = values[((probability * n as f64).ceil() as usize).max(1) - 1];
+                    let upper = values[((probability * n as f64).ceil() as usize).min(n - 1)];
+                    if lower > 1e-4 {
+                        assert!(estimate >= lower / ratio && estimate <= upper * ratio);
+                    }
+                }
+            }
+        }
+    }
+}